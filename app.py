@@ -1,3 +1,17 @@
+import importlib.util
+import time
+
+# Referência do tempo até o primeiro frame, tomada antes das importações da interface
+INICIO = time.perf_counter()
+
+from config import OPENGL_SOFTWARE
+
+# O triton (instalado com o torch para CUDA) é importado pelo torch ao carregar o modelo;
+# carregado depois de criada a janela, com OpenGL por software (Mesa llvmpipe), derruba o
+# processo, pois os dois trazem o próprio LLVM. Só nesse caso ele vem antes do Kivy
+if OPENGL_SOFTWARE and importlib.util.find_spec("triton") is not None:
+    import triton  # noqa: F401
+
 from kivymd.app import MDApp
 from kivymd.uix.boxlayout import MDBoxLayout
 from kivymd.uix.button import MDRaisedButton
@@ -6,20 +20,50 @@ from kivymd.uix.textfield import MDTextField
 from kivymd.uix.scrollview import MDScrollView
 from kivymd.uix.gridlayout import MDGridLayout
 from kivymd.uix.snackbar import MDSnackbar
+from kivymd.uix.progressbar import MDProgressBar
 from kivy.uix.image import Image
 from kivy.clock import Clock
 from kivy.core.clipboard import Clipboard
 from kivy.graphics.texture import Texture
-import cv2, numpy as np, os
-from ultralytics import YOLO
-
-MODEL_PATH = os.path.join("resultados", "modelo_treinado.pt")
+import cv2, math, numpy as np, threading
+from concurrent.futures import ThreadPoolExecutor
+from stream import GateMovimento
+from multicamera import EscalonadorInferencia, CameraEscalonada, somar_contagens
+from deteccao import extrair_deteccoes, desenhar_deteccoes, contar_itens, deteccoes_vazias
+from backends import carregar_modelo
+from rastreamento import RastreadorIoU
+from fatiamento import inferir_fatiado
+from servidor import ClienteServidor
+from estoque import EstoqueInventario
+from coleta_ativa import ColetorAtivo
+from instrumentacao import medir, contar, observar, iniciar_instrumentacao
+from logger import logger
+from config import GATE_MOVIMENTO, FATIAMENTO_CAPTURA, SERVIDOR_URL, CAMERA_PADRAO, MULTICAMERA_PRIORIDADES, COLETA_ATIVA
+
+
+def camera_sources(text):
+    """
+    Converte o texto do campo de conexão nas fontes das câmeras.
+
+    Parâmetros
+    ----------
+    text : str
+        URLs ou arquivos de vídeo separados por vírgula; números são índices de
+        webcam. Vazio conecta a webcam padrão.
+
+    Retorno
+    -------
+    list
+        Fontes para `cv2.VideoCapture`, uma por câmera.
+    """
+    sources = [source.strip() for source in text.split(",") if source.strip()]
+    return [int(source) if source.isdigit() else source for source in sources] or [0]
 
 class ItemRow(MDBoxLayout):
     """
     Representa uma linha com o nome do item detectado e um campo para alterar a quantidade manualmente.
     """
-    def __init__(self, name, quantity, **kwargs):
+    def __init__(self, name, quantity, on_change=None, **kwargs):
         """
         Inicializa a linha do item com nome e quantidade.
 
@@ -29,14 +73,31 @@ class ItemRow(MDBoxLayout):
             Nome do item detectado.
         quantity : int
             Quantidade detectada inicialmente do item.
+        on_change : callable, opcional
+            Chamada como `on_change(name, anterior, nova)` quando o campo perde
+            o foco com uma quantidade diferente.
         """
         super().__init__(orientation='horizontal', size_hint_y=None, height=50, spacing=10, **kwargs)
         self.name = name
+        self.quantity = quantity
+        self.on_change = on_change
         self.label = MDLabel(text=name, halign="left", size_hint_x=0.6)
         self.input = MDTextField(text=str(quantity), input_filter='int', size_hint_x=0.4)
+        self.input.bind(focus=self.on_input_focus)
         self.add_widget(self.label)
         self.add_widget(self.input)
 
+    def on_input_focus(self, instance, focused):
+        """
+        Avisa `on_change` da edição da quantidade ao sair do campo.
+        """
+        quantity = self.get_quantity()
+        if focused or quantity == self.quantity:
+            return
+        previous, self.quantity = self.quantity, quantity
+        if self.on_change is not None:
+            self.on_change(self.name, previous, quantity)
+
     def get_quantity(self):
         """
         Retorna a quantidade inserida no campo de texto.
@@ -65,25 +126,55 @@ class MainApp(MDApp):
         MDBoxLayout
             Layout raiz da aplicação.
         """
+        iniciar_instrumentacao()
         self.theme_cls.theme_style = "Dark"
         self.theme_cls.primary_palette = "BlueGray"
-        self.model = YOLO(MODEL_PATH)
+        # Com SERVIDOR_URL, o modelo fica no servidor de inferência e é compartilhado com outras câmeras
+        self.client = ClienteServidor(SERVIDOR_URL) if SERVIDOR_URL else None
+        # Sem o servidor, o modelo é carregado em segundo plano depois que a janela abre (on_start)
+        self.model = None
+        self.model_lock = threading.Lock()
+        self.model_ready = threading.Event()
+        self.first_frame_shown = False
+        # Histórico do inventário: capturas, trilhas e correções gravadas em segundo plano
+        self.inventory = EstoqueInventario()
+        # Coleta ativa: frames incertos ou corrigidos na lista viram amostras de treino pré-rotuladas
+        self.collector = ColetorAtivo(limiar=0.5) if COLETA_ATIVA else None
+        self.tiled_capture_running = False
         self.detected_items = {}
-        self.capture = None
+        # Uma ou mais câmeras, com a inferência em lote feita por um único escalonador
+        self.scheduler = None
+        self.stream_event = None
+        self.views = {}
+        self.last_detections = {}
+        self.tracking = False
+        self.trackers = {}
+        # Correções manuais da sessão de rastreamento, somadas às contagens das trilhas
+        self.corrections = {}
 
         self.root = MDBoxLayout(orientation='vertical', padding=[20, 30, 20, 20], spacing=15)
 
         # Campo de IP + botão de conexão
         ip_layout = MDBoxLayout(size_hint_y=None, height=50, spacing=10)
-        self.url_input = MDTextField(hint_text="Camera IP URL (leave empty for default)")
+        self.url_input = MDTextField(hint_text="Camera IP URLs, comma-separated (leave empty for default)")
         self.btn_connect = MDRaisedButton(text="Connect", icon="access-point", on_release=self.connect_camera)
         ip_layout.add_widget(self.url_input)
         ip_layout.add_widget(self.btn_connect)
         self.root.add_widget(ip_layout)
 
-        # Área de vídeo
-        self.img = Image(size_hint_y=0.6)
-        self.root.add_widget(self.img)
+        # Área de vídeo: um quadro por câmera
+        self.video_grid = MDGridLayout(cols=1, size_hint_y=0.6, spacing=5)
+        self.root.add_widget(self.video_grid)
+        self.stats_label = MDLabel(text="", halign="center", size_hint_y=None, height=20, font_style="Caption")
+        self.root.add_widget(self.stats_label)
+        Clock.schedule_interval(self.update_stats, 1.0)
+        self.progress = None
+        if self.client is None:
+            # Barra determinada, por etapa: a animação da indeterminada redesenha a janela a
+            # cada frame e, com OpenGL por software, atrasa o próprio carregamento
+            self.progress = MDProgressBar(max=3, value=0, size_hint_y=None, height=4)
+            self.loading_step = "Loading model"
+            self.root.add_widget(self.progress)
 
         # Botões de ação
         from kivy.uix.widget import Widget
@@ -94,11 +185,13 @@ class MainApp(MDApp):
         self.btn_capture = MDRaisedButton(text="Capture", icon="camera", on_release=self.capture_frame, size_hint_x=None, width=130)
         self.btn_clear = MDRaisedButton(text="Clear", icon="refresh", on_release=self.clear_list, size_hint_x=None, width=130)
         self.btn_copy = MDRaisedButton(text="Copy List", icon="content-copy", on_release=self.copy_list, size_hint_x=None, width=130)
+        self.btn_track = MDRaisedButton(text="Track: Off", icon="crosshairs-gps", on_release=self.toggle_tracking, size_hint_x=None, width=130)
 
         btn_layout.add_widget(left_spacer)
         btn_layout.add_widget(self.btn_capture)
         btn_layout.add_widget(self.btn_clear)
         btn_layout.add_widget(self.btn_copy)
+        btn_layout.add_widget(self.btn_track)
         btn_layout.add_widget(right_spacer)
 
         self.root.add_widget(btn_layout)
@@ -110,8 +203,89 @@ class MainApp(MDApp):
         self.scroll.add_widget(self.grid)
         self.root.add_widget(self.scroll)
 
+        if CAMERA_PADRAO is not None:
+            self.url_input.text = CAMERA_PADRAO
+            Clock.schedule_once(lambda dt: self.connect_camera(None))
+
         return self.root
 
+    def on_start(self):
+        """
+        Inicia o carregamento do modelo em segundo plano, com a janela já aberta.
+        """
+        if self.client is None:
+            self.update_stats(0)
+            threading.Thread(target=self.load_model, name="carregamento_modelo", daemon=True).start()
+
+    def load_model(self):
+        """
+        Carrega e aquece o modelo (fora da thread da interface).
+
+        O aquecimento executa o modelo uma vez em um frame vazio, para que a
+        primeira inferência da câmera não pague a inicialização do backend.
+        Até o modelo ficar pronto, `infer` devolve detecções vazias e o
+        streaming exibe os frames sem anotações.
+        """
+        try:
+            self.show_loading_step(0, "Loading libraries")
+            import ultralytics  # noqa: F401
+
+            self.show_loading_step(1, "Loading weights")
+            model = carregar_modelo()
+            self.show_loading_step(2, "Warming up model")
+            with medir("app.aquecimento"):
+                model(np.zeros((480, 640, 3), dtype=np.uint8), verbose=False)
+        except Exception as e:
+            logger.exception("Falha ao carregar o modelo da interface")
+            message = str(e)
+            Clock.schedule_once(lambda dt: self.finish_model_loading(message))
+            return
+        self.model = model
+        self.model_ready.set()
+        Clock.schedule_once(lambda dt: self.finish_model_loading())
+
+    def show_loading_step(self, step, text):
+        """
+        Mostra a etapa do carregamento do modelo (chamada pela thread de carregamento).
+
+        Parâmetros
+        ----------
+        step : int
+            Etapas já concluídas.
+        text : str
+            Descrição da etapa em andamento.
+        """
+        def update(dt):
+            if self.progress is not None:
+                self.progress.value = step
+                self.loading_step = text
+                self.update_stats(0)
+        Clock.schedule_once(update)
+
+    def finish_model_loading(self, error=None):
+        """
+        Remove o indicador de carregamento e informa o resultado (na thread da interface).
+
+        Parâmetros
+        ----------
+        error : str, opcional
+            Mensagem da falha ao carregar o modelo; None se ele está pronto.
+        """
+        self.root.remove_widget(self.progress)
+        self.progress = None
+        self.update_stats(0)
+        if error is not None:
+            self.show_snackbar(f"Failed to load model: {error}")
+            return
+        elapsed = time.perf_counter() - INICIO
+        observar("app.modelo_pronto", elapsed)
+        logger.info(f"Modelo pronto {elapsed:.2f}s após o início da interface")
+        # O próximo frame passa pelo modelo mesmo com a cena parada
+        for camera in self.scheduler.cameras if self.scheduler is not None else []:
+            if camera.gate is not None:
+                camera.gate.forcar()
+        self.show_snackbar("Model ready")
+
     def show_snackbar(self, message):
         """
         Exibe uma mensagem temporária na tela.
@@ -131,94 +305,377 @@ class MainApp(MDApp):
 
     def connect_camera(self, instance):
         """
-        Conecta à câmera IP ou webcam local e inicia o streaming.
+        Conecta às câmeras IP ou webcams do campo de conexão e inicia o streaming.
+
+        Cada câmera tem a própria thread de captura, e um único escalonador
+        envia o frame mais recente de cada uma ao modelo em um lote; a
+        interface exibe, em uma grade, o frame anotado mais recente de cada
+        câmera. As câmeras que não abrem são informadas e ignoradas.
 
         Parâmetros
         ----------
         instance : Widget
             Referência ao botão que acionou a função.
         """
-        url = self.url_input.text.strip()
-        self.capture = cv2.VideoCapture(url if url else 0)
-        if not self.capture.isOpened():
+        sources = camera_sources(self.url_input.text)
+        # Abertas em paralelo: cada conexão RTSP pode levar alguns segundos
+        with ThreadPoolExecutor(max_workers=len(sources)) as pool:
+            captures = list(pool.map(cv2.VideoCapture, sources))
+        failed = [str(source) for source, capture in zip(sources, captures) if not capture.isOpened()]
+        if len(failed) == len(sources):
             self.show_snackbar("Failed to connect to camera!")
             return
-        Clock.schedule_interval(self.update_stream, 1.0 / 60.0)
-        self.show_snackbar("Camera connected successfully!")
+        self.stop_stream()
+
+        self.scheduler = EscalonadorInferencia(self.infer_batch)
+        self.views = {}
+        self.video_grid.clear_widgets()
+        self.video_grid.cols = math.ceil(math.sqrt(len(sources) - len(failed)))
+        for i, (source, capture) in enumerate(zip(sources, captures)):
+            if not capture.isOpened():
+                capture.release()
+                continue
+            name = f"Camera {i + 1}"
+            camera = CameraEscalonada(
+                name, capture, self.draw_detections,
+                gate=GateMovimento() if GATE_MOVIMENTO else None,
+                prioridade=MULTICAMERA_PRIORIDADES.get(source, 0),
+                apos_inferir=lambda frame, detections, name=name: self.after_inference(name, frame, detections),
+            )
+            self.scheduler.adicionar(camera)
+            tile = MDBoxLayout(orientation='vertical', spacing=2)
+            image = Image()
+            tile.add_widget(image)
+            caption = None
+            if len(sources) > 1:
+                caption = MDLabel(text=name, halign="center", size_hint_y=None, height=20, font_style="Caption")
+                tile.add_widget(caption)
+            self.video_grid.add_widget(tile)
+            self.views[name] = (image, caption)
+
+        if self.tracking:
+            self.trackers = {name: RastreadorIoU() for name in self.views}
+            self.corrections = {}
+            self.inventory.nova_sessao()
+            self.new_count()
+        self.scheduler.iniciar()
+        self.stream_event = Clock.schedule_interval(self.update_stream, 1.0 / 60.0)
+        if failed:
+            self.show_snackbar(f"Failed to connect to: {', '.join(failed)}")
+        else:
+            self.show_snackbar("Camera connected successfully!" if len(sources) == 1 else f"{len(sources)} cameras connected!")
+
+    def stop_stream(self):
+        """
+        Interrompe o streaming atual, se houver, e libera a câmera.
+        """
+        if self.stream_event is not None:
+            self.stream_event.cancel()
+            self.stream_event = None
+        if self.scheduler is not None:
+            self.scheduler.parar()
+            self.scheduler = None
+        self.last_detections = {}
+
+    @medir("app.inferencia")
+    def infer_batch(self, frames):
+        """
+        Executa o modelo YOLO em um lote de frames, um por câmera (chamado pelo escalonador).
+
+        Parâmetros
+        ----------
+        frames : list of numpy.ndarray
+            Frames BGR capturados das câmeras.
+
+        Retorno
+        -------
+        list of Deteccoes
+            Detecções com confiança de ao menos 50% de cada frame (com a coleta
+            ativa, a partir do limite inferior da margem), vazias até o modelo
+            ficar pronto.
+        """
+        conf_min = self.collector.conf_min if self.collector is not None else 0.5
+        if self.client is not None:
+            return [self.client.detectar(frame, conf_min=conf_min) for frame in frames]
+        if not self.model_ready.is_set():
+            return [deteccoes_vazias({}) for _ in frames]
+        with self.model_lock:
+            # Uma única chamada para o lote, sem a linha de velocidade que o Ultralytics imprime
+            results = self.model(frames, verbose=False)
+        return [extrair_deteccoes(result, conf_min=conf_min) for result in results]
+
+    def after_inference(self, name, frame, detections):
+        """
+        Passa o resultado de uma câmera pela coleta ativa e pelo rastreador (chamado pelo escalonador).
+
+        Parâmetros
+        ----------
+        name : str
+            Nome da câmera.
+        frame : numpy.ndarray
+            Frame inferido, ainda sem anotações.
+        detections : Deteccoes
+            Detecções retornadas por `infer_batch` para o frame da câmera.
+
+        Retorno
+        -------
+        Deteccoes
+            Detecções com confiança de ao menos 50%, com os IDs de rastreamento
+            no modo de rastreamento.
+        """
+        if self.collector is not None:
+            detections = self.collector.observar(name, frame, detections)
+        tracker = self.trackers.get(name)
+        return tracker.atualizar(detections) if tracker is not None else detections
+
+    @medir("app.desenho")
+    def draw_detections(self, frame, detections):
+        """
+        Desenha as caixas e os rótulos das detecções sobre o frame.
+
+        Parâmetros
+        ----------
+        frame : numpy.ndarray
+            Frame BGR a ser anotado (modificado no próprio array).
+        detections : Deteccoes
+            Detecções retornadas por `infer_batch`.
+
+        Retorno
+        -------
+        numpy.ndarray
+            Frame anotado.
+        """
+        return desenhar_deteccoes(frame, detections)
 
     def update_stream(self, dt):
         """
-        Atualiza o frame da câmera e aplica detecção do modelo YOLO.
+        Exibe o frame anotado mais recente de cada câmera.
 
         Parâmetros
         ----------
         dt : float
             Tempo decorrido desde a última chamada (gerenciado pelo Kivy Clock).
         """
-        if self.capture:
-            ret, frame = self.capture.read()
-            if not ret:
-                return
+        if not self.scheduler:
+            return
+        for camera in self.scheduler.cameras:
+            result = camera.ultimo_resultado()
+            if result is None:
+                continue
+            frame, self.last_detections[camera.nome] = result
+            image = self.views[camera.nome][0]
+
+            # Uma textura por câmera e resolução, invertida pelas coordenadas UV e
+            # preenchida direto da memória do frame, sem cópias
+            with medir("app.textura"):
+                size = (frame.shape[1], frame.shape[0])
+                if image.texture is None or image.texture.size != size:
+                    texture = Texture.create(size=size, colorfmt='bgr')
+                    texture.flip_vertical()
+                    image.texture = texture
+                image.texture.blit_buffer(memoryview(np.ascontiguousarray(frame)).cast('B'), colorfmt='bgr', bufferfmt='ubyte')
+                image.canvas.ask_update()
+            # O conteúdo já está na textura; o buffer volta para a próxima leitura da câmera
+            camera.liberar_frame(frame)
+            contar("app.frames_exibidos")
+        if self.last_detections and not self.first_frame_shown:
+            self.first_frame_shown = True
+            elapsed = time.perf_counter() - INICIO
+            observar("app.primeiro_frame", elapsed)
+            logger.info(f"Primeiro frame exibido {elapsed:.2f}s após o início da interface")
+
+    def update_stats(self, dt):
+        """
+        Atualiza o texto com as estatísticas do streaming e a legenda de cada câmera.
+
+        Com uma câmera, mostra os FPS, os descartes e o gate de movimento; com
+        várias, os totais e o tamanho médio dos lotes, e cada câmera mostra o
+        próprio FPS de inferência e os itens que vê.
+
+        Parâmetros
+        ----------
+        dt : float
+            Tempo decorrido desde a última chamada (gerenciado pelo Kivy Clock).
+        """
+        loading = f"{self.loading_step}..." if self.progress is not None else ""
+        if not self.scheduler:
+            self.stats_label.text = loading
+            return
+        stats = self.scheduler.estatisticas()
+        cameras = stats["cameras"]
+        if len(cameras) == 1:
+            (camera_stats,) = cameras.values()
+            text = (
+                f"Capture: {camera_stats['fps_captura']:.1f} FPS | "
+                f"Inference: {camera_stats['fps_inferencia']:.1f} FPS | "
+                f"Dropped: {camera_stats['frames_descartados']}"
+            )
+            if "razao_pulo" in camera_stats:
+                text += (
+                    f" | Skipped: {camera_stats['razao_pulo']:.0%} "
+                    f"(motion {camera_stats['diferenca']:.1f}/{camera_stats['limiar_movimento']:.1f}, "
+                    f"max {camera_stats['intervalo_max']:.1f}s, every {camera_stats['cadencia_minima']} frames)"
+                )
+        else:
+            text = (
+                f"{len(cameras)} cameras | "
+                f"Capture: {sum(c['fps_captura'] for c in cameras.values()):.1f} FPS | "
+                f"Inference: {sum(c['fps_inferencia'] for c in cameras.values()):.1f} FPS | "
+                f"Batch: {stats['lote_medio']:.1f} | "
+                f"Dropped: {sum(c['frames_descartados'] for c in cameras.values())}"
+            )
+
+        if self.tracking:
+            trackers = self.trackers
+            tracker_stats = [tracker.estatisticas() for tracker in trackers.values()]
+            text += (
+                f" | Tracks: {sum(t['trilhas_ativas'] for t in tracker_stats)} active, "
+                f"{sum(t['itens_confirmados'] for t in tracker_stats)} counted"
+            )
+            for tracker in trackers.values():
+                self.inventory.registrar_trilhas(tracker.confirmacoes())
+            camera_counts = {name: tracker.contagem() for name, tracker in trackers.items()}
+            # Lista com a soma das câmeras (uma câmera conta cada item uma vez) e das correções
+            counts = somar_contagens([*camera_counts.values(), self.corrections])
+            if counts != self.detected_items:
+                self.detected_items = counts
+                self.update_list()
+        else:
+            camera_counts = self.scheduler.contagem()
+        for name, (image, caption) in self.views.items():
+            if caption is not None and name in cameras:
+                caption.text = (
+                    f"{name}: {cameras[name]['fps_inferencia']:.1f} FPS | "
+                    f"{sum(camera_counts.get(name, {}).values())} items"
+                )
+        if self.collector is not None and self.collector.salvas:
+            text += f" | Samples: {self.collector.salvas}"
+        self.stats_label.text = f"{loading} | {text}" if loading else text
+
+    def toggle_tracking(self, instance):
+        """
+        Liga ou desliga o modo de rastreamento.
 
-            results = self.model(frame)
-
-            for result in results:
-                for box in result.boxes:
-                    conf = float(box.conf[0]) * 100
-                    if conf < 50:
-                        continue
-
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    cls_id = int(box.cls[0])
-                    name = result.names[cls_id]
-                    label = f"{name} ({conf:.1f}%)"
-
-                    # Caixa de detecção
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
-
-                    # Texto sobreposto com fundo
-                    font_scale, font_thickness = 2.1, 6
-                    (label_width, label_height), baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, font_thickness)
-                    overlay = frame.copy()
-                    cv2.rectangle(overlay, (x1, y1 - label_height - baseline), (x1 + label_width, y1), (0, 0, 0), -1)
-                    cv2.putText(overlay, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), font_thickness)
-                    alpha = 0.5
-                    cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
-
-            # Atualiza o widget de imagem no app
-            buf = cv2.flip(frame, 0).tobytes()
-            texture = Texture.create(size=(frame.shape[1], frame.shape[0]), colorfmt='bgr')
-            texture.blit_buffer(buf, colorfmt='bgr', bufferfmt='ubyte')
-            self.img.texture = texture
+        No modo de rastreamento, a lista mostra o número de itens únicos
+        (IDs confirmados) por classe vistos no streaming, atualizado a cada
+        segundo, mais as correções feitas na lista; ao desligar, a lista
+        mantém a última contagem.
+
+        Parâmetros
+        ----------
+        instance : Widget
+            Referência ao botão que acionou a função.
+        """
+        if not self.tracking:
+            self.tracking = True
+            self.trackers = {name: RastreadorIoU() for name in self.views}
+            self.corrections = {}
+            self.inventory.nova_sessao()
+            self.new_count()
+            self.detected_items = {}
+            self.update_list()
+            self.btn_track.text = "Track: On"
+            self.show_snackbar("Tracking on: counting unique items")
+        else:
+            self.tracking = False
+            self.trackers = {}
+            self.btn_track.text = "Track: Off"
+            self.show_snackbar("Tracking off")
 
     def capture_frame(self, instance):
         """
-        Captura um frame atual da câmera e atualiza os itens detectados.
+        Adiciona aos itens detectados as detecções do frame anotado mais recente de cada câmera.
+
+        No modo de rastreamento a contagem já é atualizada continuamente, e a
+        captura não soma nada. Com FATIAMENTO_CAPTURA, o próximo frame de cada
+        câmera é processado pela inferência fatiada em uma thread separada.
 
         Parâmetros
         ----------
         instance : Widget
             Referência ao botão que acionou a função.
         """
-        if not self.capture:
+        if not self.scheduler:
             self.show_snackbar("No camera connected!")
             return
 
-        ret, frame = self.capture.read()
-        if not ret:
+        if self.tracking:
+            self.show_snackbar("Tracking on: counts update automatically")
+            return
+
+        if self.client is None and not self.model_ready.is_set():
+            self.show_snackbar("Model still loading...")
+            return
+
+        if FATIAMENTO_CAPTURA:
+            if self.tiled_capture_running:
+                self.show_snackbar("Tiled capture already running...")
+                return
+            self.tiled_capture_running = True
+            self.show_snackbar("Running tiled detection...")
+            threading.Thread(target=self.capture_tiled, args=(self.scheduler.cameras,), daemon=True).start()
+            return
+
+        if not self.last_detections:
+            self.show_snackbar("Failed to capture image!")
+            return
+
+        self.add_detections(list(self.last_detections.values()))
+        if self.collector is not None:
+            self.collector.registrar_captura(list(self.last_detections))
+
+    def capture_tiled(self, cameras):
+        """
+        Executa a inferência fatiada no próximo frame de cada câmera (fora da thread da interface).
+
+        O modelo é compartilhado com o escalonador do streaming, por isso a
+        chamada é protegida por `model_lock`; no modo cliente, as janelas são
+        processadas pelo servidor de inferência.
+
+        Parâmetros
+        ----------
+        cameras : list of CameraEscalonada
+            Câmeras de onde os frames sem anotações são obtidos.
+        """
+        detections = None
+        try:
+            frames = [frame for frame in (camera.proximo_frame() for camera in cameras) if frame is not None]
+            if frames and self.client is not None:
+                detections = [self.client.detectar(frame, conf_min=0.5, fatiado=True) for frame in frames]
+            elif frames:
+                with self.model_lock:
+                    detections = [inferir_fatiado(self.model, frame, conf_min=0.5) for frame in frames]
+        finally:
+            Clock.schedule_once(lambda dt: self.finish_tiled_capture(detections))
+
+    def finish_tiled_capture(self, detections):
+        """
+        Adiciona à lista o resultado da captura fatiada (na thread da interface).
+
+        Parâmetros
+        ----------
+        detections : list of Deteccoes ou None
+            Detecções da imagem inteira de cada câmera, ou None se a captura falhou.
+        """
+        self.tiled_capture_running = False
+        if detections is None:
             self.show_snackbar("Failed to capture image!")
             return
+        self.add_detections(detections)
 
-        results = self.model(frame)
+    def add_detections(self, detections):
+        """
+        Soma as detecções por classe aos itens detectados e atualiza a lista.
 
-        for result in results:
-            for box in result.boxes:
-                conf = float(box.conf[0]) * 100
-                if conf < 50:
-                    continue
-                cls_id = int(box.cls[0])
-                name = result.names[cls_id]
-                self.detected_items[name] = self.detected_items.get(name, 0) + 1
+        Parâmetros
+        ----------
+        detections : list of Deteccoes
+            Detecções a adicionar, uma por câmera.
+        """
+        counts = somar_contagens(contar_itens(d) for d in detections)
+        for name, quantity in counts.items():
+            self.detected_items[name] = self.detected_items.get(name, 0) + quantity
+        self.inventory.registrar(counts)
 
         self.update_list()
 
@@ -228,9 +685,40 @@ class MainApp(MDApp):
         """
         self.grid.clear_widgets()
         for name, quantity in self.detected_items.items():
-            item_row = ItemRow(name, quantity)
+            item_row = ItemRow(name, quantity, on_change=self.correct_item)
             self.grid.add_widget(item_row)
 
+    def correct_item(self, name, previous, quantity):
+        """
+        Aplica e registra no histórico a quantidade editada manualmente na lista.
+
+        No modo de rastreamento, a diferença é guardada e somada às contagens
+        das trilhas nas próximas atualizações. Com a coleta ativa, uma
+        correção grande salva os frames da contagem como amostras de treino.
+
+        Parâmetros
+        ----------
+        name : str
+            Nome do item.
+        previous : int
+            Quantidade antes da edição.
+        quantity : int
+            Quantidade informada.
+        """
+        self.detected_items[name] = quantity
+        if self.tracking:
+            self.corrections[name] = self.corrections.get(name, 0) + quantity - previous
+        self.inventory.corrigir(name, previous, quantity)
+        if self.collector is not None:
+            self.collector.corrigir(name, previous, quantity)
+
+    def new_count(self):
+        """
+        Inicia uma nova contagem na coleta ativa, esquecendo os frames capturados da anterior.
+        """
+        if self.collector is not None:
+            self.collector.nova_contagem()
+
     def copy_list(self, instance):
         """
         Copia a lista de itens com quantidades para a área de transferência.
@@ -254,16 +742,30 @@ class MainApp(MDApp):
 
     def clear_list(self, instance):
         """
-        Limpa a lista de itens detectados.
+        Limpa a lista de itens detectados (e reinicia a contagem do rastreamento, se ativo).
 
         Parâmetros
         ----------
         instance : Widget
             Referência ao botão que acionou a função.
         """
-        self.detected_items.clear()
+        if self.tracking:
+            self.trackers = {name: RastreadorIoU() for name in self.trackers}
+        self.corrections = {}
+        self.inventory.nova_sessao()
+        self.new_count()
+        self.detected_items = {}
         self.grid.clear_widgets()
         self.show_snackbar("List cleared!")
 
+    def on_stop(self):
+        """
+        Encerra o streaming e grava o histórico e as amostras pendentes ao fechar o aplicativo.
+        """
+        self.stop_stream()
+        self.inventory.fechar()
+        if self.collector is not None:
+            self.collector.fechar()
+
 if __name__ == "__main__":
     MainApp().run()
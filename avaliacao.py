@@ -0,0 +1,481 @@
+"""
+Avaliação de um split com as predições do modelo em cache.
+
+O modelo percorre as imagens do split uma única vez, com confiança mínima
+AVALIACAO_CONF e NMS em AVALIACAO_IOU, e as caixas resultantes são gravadas
+em AVALIACAO_CACHE_DIR, em um arquivo por (hash dos pesos, split). Métricas
+(precisão, recall, mAP50, mAP50-95), matriz de confusão, curvas, rótulos
+`.txt` preditos e imagens anotadas são todos calculados a partir desse cache:
+avaliar de novo os mesmos pesos, com outra confiança mínima ou com um NMS mais
+restrito, não executa o modelo.
+
+Layout de <split>_<hash dos pesos>.npz:
+    caixas      float32 (M, 4)  caixas xyxy em pixels da imagem original
+    confiancas  float32 (M,)
+    classes     int16   (M,)
+    offsets     int64   (N+1,)  caixas da imagem i em [offsets[i], offsets[i+1])
+    formas      int32   (N, 2)  (altura, largura) original de cada imagem
+    imagens     str     (N,)    caminhos das imagens relativos a base_dir
+    nomes       str     (C,)    classes do modelo
+    velocidade  float64 (3,)    ms por imagem: pré-processamento, inferência, pós-processamento
+    chave       str             hash das imagens e dos parâmetros da inferência
+
+Uso:
+    predicoes = predizer_split(MODELO_TREINADO, "test")     # executa o modelo só se preciso
+    metricas = pontuar_predicoes(predicoes, conf=0.25)        # não executa o modelo
+    metricas = avaliar(MODELO_TREINADO, "test")               # predizer_split + pontuar_predicoes
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+from config import (
+    BASE_DIR, ROTULOS_DIR, ROTULOS_PACOTES, IMGSZ_TREINO, AVALIACAO_CACHE_DIR, AVALIACAO_CONF, AVALIACAO_IOU,
+    AVALIACAO_MAX_DET, AVALIACAO_LOTE, AVALIACAO_CONF_IMAGENS,
+)
+from deteccao import Deteccoes, iou_matriz, desenhar_deteccoes
+from etapas import impressao, impressao_caminho
+from fatiamento import nms_por_classe
+from indice_dataset import EXTENSOES_IMAGEM
+from instrumentacao import medir, contar
+from logger import logger
+from rotulos import ArmazemRotulos, _caixa_da_linha
+
+# Chave de cada split no data.yaml
+CHAVES_DATA_YAML = {"train": "train", "valid": "val", "test": "test"}
+
+# Limiares de IoU do mAP50-95, os mesmos do validador do Ultralytics
+LIMIARES_IOU = np.linspace(0.5, 0.95, 10)
+
+
+def impressao_pesos(modelo) -> str:
+    """
+    Calcula o hash dos pesos de um modelo.
+
+    Parâmetros
+    ----------
+    modelo : str ou ultralytics.YOLO
+        Caminho dos pesos (arquivo `.pt`/`.onnx` ou pasta exportada) ou modelo
+        carregado. Para um modelo sem arquivo (criado de um `.yaml`), o hash é
+        calculado sobre os tensores dos pesos em memória.
+
+    Retorno
+    -------
+    str
+        Hash em hexadecimal.
+    """
+    if isinstance(modelo, (str, os.PathLike)):
+        caminho = str(modelo)
+    else:
+        caminho = getattr(modelo, "ckpt_path", None)
+    if caminho and os.path.exists(caminho):
+        return impressao_caminho(caminho)
+
+    h = hashlib.blake2b(digest_size=16)
+    for nome, tensor in modelo.model.state_dict().items():
+        h.update(nome.encode())
+        h.update(tensor.detach().cpu().numpy().tobytes())
+    return h.hexdigest()
+
+
+def _ler_data_yaml(base_dir: str) -> dict:
+    with open(os.path.join(base_dir, "data.yaml"), "r") as f:
+        return yaml.safe_load(f)
+
+
+def _nomes_data_yaml(base_dir: str) -> list:
+    nomes = _ler_data_yaml(base_dir).get("names", [])
+    return list(nomes.values()) if isinstance(nomes, dict) else list(nomes)
+
+
+def _referencias_txt(split: str, base_dir: str) -> dict:
+    """
+    Lê as imagens do split no data.yaml e os rótulos `.txt` ao lado de cada uma.
+    """
+    from ultralytics.data.utils import img2label_paths
+
+    data = _ler_data_yaml(base_dir)
+    pastas = data.get(CHAVES_DATA_YAML.get(split, split)) or []
+    if isinstance(pastas, str):
+        pastas = [pastas]
+
+    imagens = []
+    for pasta in pastas:
+        for raiz, subpastas, arquivos in os.walk(os.path.join(base_dir, pasta)):
+            subpastas.sort()
+            imagens.extend(
+                os.path.join(raiz, a) for a in sorted(arquivos) if os.path.splitext(a)[1].lower() in EXTENSOES_IMAGEM
+            )
+
+    caixas, classes, offsets = [], [], [0]
+    for rotulo in img2label_paths(imagens):
+        if os.path.exists(rotulo):
+            with open(rotulo, "r") as f:
+                for linha in f:
+                    valores = linha.split()
+                    caixa = _caixa_da_linha(valores[1:]) if valores else None
+                    if caixa is not None:
+                        caixas.append(caixa)
+                        classes.append(int(float(valores[0])))
+        offsets.append(len(classes))
+
+    return {
+        "imagens": imagens,
+        "caixas": np.asarray(caixas, dtype=np.float32).reshape(-1, 4),
+        "classes": np.asarray(classes, dtype=np.int64),
+        "offsets": np.asarray(offsets, dtype=np.int64),
+    }
+
+
+def carregar_referencias(split: str = "test", base_dir: str = BASE_DIR) -> dict:
+    """
+    Carrega as imagens e os rótulos verdadeiros de um split.
+
+    Usa o armazenamento compacto de `rotulos.py` (classes já remapeadas para o
+    `data.yaml` consolidado) quando ele existe para o split e corresponde às
+    classes do `data.yaml`; caso contrário, lê os `.txt` das pastas listadas
+    no `data.yaml`, como o `val` do Ultralytics.
+
+    Parâmetros
+    ----------
+    split : str, opcional
+        "train", "valid" ou "test" (padrão: "test").
+    base_dir : str, opcional
+        Diretório com o `data.yaml` consolidado (padrão: BASE_DIR).
+
+    Retorno
+    -------
+    dict
+        `imagens` (caminhos), `caixas` (M, 4) xywh normalizadas, `classes` (M,)
+        e `offsets` (N+1,), no layout de `ArmazemRotulos`.
+    """
+    # ROTULOS_DIR pertence a BASE_DIR; para outro diretório, o armazenamento fica em <base_dir>/rotulos
+    padrao = os.path.abspath(base_dir) == os.path.abspath(BASE_DIR)
+    destino = ROTULOS_DIR if padrao else os.path.join(base_dir, "rotulos")
+    armazem = None
+    if ROTULOS_PACOTES and ArmazemRotulos.existe(split, destino):
+        armazem = ArmazemRotulos(split, destino, base_dir)
+    if armazem is not None and armazem.meta.get("names") == _nomes_data_yaml(base_dir):
+        return {
+            "imagens": armazem.imagens,
+            "caixas": np.asarray(armazem.caixas, dtype=np.float32),
+            "classes": np.asarray(armazem.classes, dtype=np.int64),
+            "offsets": np.asarray(armazem.offsets, dtype=np.int64),
+        }
+    return _referencias_txt(split, base_dir)
+
+
+def _chave_cache(imagens: list, base_dir: str, imgsz: int) -> str:
+    arquivos = []
+    for caminho in imagens:
+        info = os.stat(caminho)
+        arquivos.append((os.path.relpath(caminho, base_dir), info.st_size, info.st_mtime_ns))
+    return impressao({
+        "imagens": arquivos,
+        "conf": AVALIACAO_CONF,
+        "iou": AVALIACAO_IOU,
+        "max_det": AVALIACAO_MAX_DET,
+        "imgsz": imgsz,
+    })
+
+
+def _ler_cache(caminho: str, chave: str):
+    try:
+        with np.load(caminho, allow_pickle=False) as dados:
+            if str(dados["chave"]) != chave:
+                return None
+            return {nome: dados[nome] for nome in dados.files}
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+@medir("avaliacao.inferencia")
+def _inferir(modelo, imagens: list, lote: int, imgsz: int) -> dict:
+    """
+    Executa o modelo em todas as imagens e junta as caixas em arrays planos.
+    """
+    caixas, confiancas, classes, offsets, formas = [], [], [], [0], []
+    velocidade = np.zeros(3)
+    for inicio in range(0, len(imagens), lote):
+        resultados = modelo.predict(
+            imagens[inicio:inicio + lote],
+            conf=AVALIACAO_CONF,
+            iou=AVALIACAO_IOU,
+            max_det=AVALIACAO_MAX_DET,
+            imgsz=imgsz,
+            verbose=False,
+        )
+        for resultado in resultados:
+            dados = resultado.boxes.data.cpu().numpy() if resultado.boxes is not None else np.empty((0, 6))
+            caixas.append(dados[:, :4])
+            confiancas.append(dados[:, -2])
+            classes.append(dados[:, -1])
+            offsets.append(offsets[-1] + len(dados))
+            formas.append(resultado.orig_shape)
+            velocidade += [resultado.speed.get(k) or 0.0 for k in ("preprocess", "inference", "postprocess")]
+        contar("avaliacao.imagens", len(resultados))
+
+    return {
+        "caixas": np.concatenate(caixas).astype(np.float32) if caixas else np.empty((0, 4), np.float32),
+        "confiancas": np.concatenate(confiancas).astype(np.float32) if caixas else np.empty(0, np.float32),
+        "classes": np.concatenate(classes).astype(np.int16) if caixas else np.empty(0, np.int16),
+        "offsets": np.asarray(offsets, dtype=np.int64),
+        "formas": np.asarray(formas, dtype=np.int32).reshape(-1, 2),
+        "velocidade": velocidade / max(1, len(imagens)),
+    }
+
+
+def predizer_split(modelo, split: str = "test", base_dir: str = BASE_DIR, cache_dir: str = AVALIACAO_CACHE_DIR,
+                   lote: int = AVALIACAO_LOTE, imgsz: int = IMGSZ_TREINO) -> dict:
+    """
+    Retorna as predições do modelo em todas as imagens de um split, do cache ou executando o modelo.
+
+    Parâmetros
+    ----------
+    modelo : str ou ultralytics.YOLO
+        Caminho dos pesos ou modelo carregado. Com um caminho, o modelo só é
+        carregado se as predições não estiverem em cache.
+    split : str, opcional
+        "train", "valid" ou "test" (padrão: "test").
+    base_dir : str, opcional
+        Diretório com o `data.yaml` consolidado (padrão: BASE_DIR).
+    cache_dir : str, opcional
+        Diretório do cache de predições (padrão: AVALIACAO_CACHE_DIR).
+    lote : int, opcional
+        Imagens por chamada ao modelo (padrão: AVALIACAO_LOTE).
+    imgsz : int, opcional
+        Tamanho de entrada do modelo (padrão: IMGSZ_TREINO).
+
+    Retorno
+    -------
+    dict
+        Arrays descritos no cabeçalho do módulo, mais `referencias` (ver
+        `carregar_referencias`) e `base_dir`.
+    """
+    referencias = carregar_referencias(split, base_dir)
+    imagens = referencias["imagens"]
+    chave = _chave_cache(imagens, base_dir, imgsz)
+    hash_pesos = impressao_pesos(modelo)
+    caminho_cache = os.path.join(cache_dir, f"{split}_{hash_pesos}.npz")
+
+    predicoes = _ler_cache(caminho_cache, chave)
+    if predicoes is not None:
+        contar("avaliacao.cache_acertos")
+        logger.info(f"Predições de {split} lidas do cache: {caminho_cache}")
+    else:
+        if isinstance(modelo, (str, os.PathLike)):
+            from ultralytics import YOLO
+
+            logger.info(f"Carregando modelo para a avaliação: {modelo}")
+            modelo = YOLO(str(modelo), task="detect")
+        logger.info(f"Executando o modelo em {len(imagens)} imagens de {split}.")
+        predicoes = _inferir(modelo, imagens, max(1, lote), imgsz)
+        predicoes["imagens"] = np.array([os.path.relpath(c, base_dir) for c in imagens], dtype=str)
+        predicoes["nomes"] = np.array([modelo.names[i] for i in range(len(modelo.names))], dtype=str)
+        predicoes["chave"] = np.array(chave)
+
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(caminho_cache + ".tmp", "wb") as f:
+            np.savez(f, **predicoes)
+        os.replace(caminho_cache + ".tmp", caminho_cache)
+        logger.info(f"Predições de {split} salvas em cache: {caminho_cache}")
+
+    predicoes["referencias"] = referencias
+    predicoes["base_dir"] = base_dir
+    return predicoes
+
+
+def _predicoes_imagem(predicoes: dict, i: int, conf: float, iou: float) -> np.ndarray:
+    """
+    Retorna as predições da imagem `i` como (K, 6) xyxy, confiança, classe,
+    filtradas por `conf`, com NMS em `iou` e em ordem decrescente de confiança.
+    """
+    inicio, fim = int(predicoes["offsets"][i]), int(predicoes["offsets"][i + 1])
+    dados = np.concatenate([
+        predicoes["caixas"][inicio:fim],
+        predicoes["confiancas"][inicio:fim, None],
+        predicoes["classes"][inicio:fim, None].astype(np.float32),
+    ], axis=1)
+    dados = dados[dados[:, 4] >= conf]
+    if iou < AVALIACAO_IOU:
+        return dados[nms_por_classe(dados, iou, "iou")]
+    return dados[np.argsort(-dados[:, 4], kind="stable")]
+
+
+def _referencias_imagem(predicoes: dict, i: int):
+    """
+    Retorna as caixas verdadeiras da imagem `i` em xyxy (pixels) e suas classes.
+    """
+    referencias = predicoes["referencias"]
+    inicio, fim = int(referencias["offsets"][i]), int(referencias["offsets"][i + 1])
+    altura, largura = predicoes["formas"][i]
+    xywh = referencias["caixas"][inicio:fim] * np.array([largura, altura, largura, altura], dtype=np.float32)
+    xyxy = np.concatenate([xywh[:, :2] - xywh[:, 2:] / 2, xywh[:, :2] + xywh[:, 2:] / 2], axis=1)
+    return xyxy, referencias["classes"][inicio:fim]
+
+
+def _acertos(dados: np.ndarray, caixas_ref: np.ndarray, classes_ref: np.ndarray) -> np.ndarray:
+    """
+    Marca cada predição como verdadeiro positivo em cada limiar de LIMIARES_IOU.
+
+    Mesma associação gulosa do validador do Ultralytics: em ordem decrescente
+    de confiança, cada predição fica com a caixa verdadeira livre da mesma
+    classe de maior IoU.
+    """
+    acertos = np.zeros((len(dados), len(LIMIARES_IOU)), dtype=bool)
+    if len(dados) == 0 or len(caixas_ref) == 0:
+        return acertos
+    iou = iou_matriz(caixas_ref, dados[:, :4]) * (classes_ref[:, None] == dados[:, 5].astype(np.int64))
+    usadas = np.zeros((len(caixas_ref), len(LIMIARES_IOU)), dtype=bool)
+    for j in np.flatnonzero((iou >= LIMIARES_IOU.min()).any(0)):
+        disponiveis = np.where(usadas, 0, iou[:, j, None])
+        k = disponiveis.argmax(0)
+        acertos[j] = disponiveis[k, range(len(LIMIARES_IOU))] >= LIMIARES_IOU
+        usadas[k, range(len(LIMIARES_IOU))] |= acertos[j]
+    return acertos
+
+
+def _salvar_txt(caminho: str, dados: np.ndarray, forma) -> None:
+    """
+    Grava as predições no formato de rótulo YOLO com a confiança: classe cx cy w h conf.
+    """
+    altura, largura = forma
+    xyxy = dados[:, :4] / np.array([largura, altura, largura, altura], dtype=np.float32)
+    xywh = np.concatenate([(xyxy[:, :2] + xyxy[:, 2:]) / 2, xyxy[:, 2:] - xyxy[:, :2]], axis=1)
+    with open(caminho, "w") as f:
+        for classe, caixa, confianca in zip(dados[:, 5].astype(int), xywh, dados[:, 4]):
+            f.write(f"{classe} {' '.join(f'{v:.6g}' for v in caixa)} {confianca:.6g}\n")
+
+
+def pontuar_predicoes(predicoes: dict, conf: float = AVALIACAO_CONF, iou: float = AVALIACAO_IOU,
+                      pasta_saida: str = None, graficos: bool = True, salvar_txt: bool = False,
+                      salvar_imagens: bool = False, conf_imagens: float = AVALIACAO_CONF_IMAGENS) -> dict:
+    """
+    Calcula as métricas de detecção a partir de predições já calculadas, sem executar o modelo.
+
+    Parâmetros
+    ----------
+    predicoes : dict
+        Predições de um split, como retornadas por `predizer_split`.
+    conf : float, opcional
+        Confiança mínima das predições consideradas; valores abaixo de
+        AVALIACAO_CONF não recuperam caixas fora do cache (padrão: AVALIACAO_CONF).
+    iou : float, opcional
+        Limiar do NMS; abaixo de AVALIACAO_IOU, o NMS é refeito sobre as caixas
+        do cache, acima dele as caixas já suprimidas não voltam (padrão: AVALIACAO_IOU).
+    pasta_saida : str, opcional
+        Pasta dos gráficos, rótulos e imagens; se None, só as métricas são
+        calculadas (padrão: None).
+    graficos : bool, opcional
+        Salva a matriz de confusão e as curvas P, R, F1 e PR em `pasta_saida` (padrão: True).
+    salvar_txt : bool, opcional
+        Salva as predições de cada imagem em `pasta_saida/labels/<imagem>.txt` (padrão: False).
+    salvar_imagens : bool, opcional
+        Salva cada imagem com as caixas acima de `conf_imagens` desenhadas (padrão: False).
+    conf_imagens : float, opcional
+        Confiança mínima das caixas desenhadas (padrão: AVALIACAO_CONF_IMAGENS).
+
+    Retorno
+    -------
+    dict
+        Métricas no formato de `results_dict` do Ultralytics (precisão, recall,
+        mAP50, mAP50-95 e fitness).
+    """
+    if conf < AVALIACAO_CONF or iou > AVALIACAO_IOU:
+        logger.warning(
+            f"conf={conf} / iou={iou} fora do cache (conf >= {AVALIACAO_CONF}, iou <= {AVALIACAO_IOU}); "
+            "usando as predições guardadas."
+        )
+    import torch
+    from ultralytics.utils.metrics import ConfusionMatrix, DetMetrics
+
+    nomes = dict(enumerate(predicoes["nomes"].tolist()))
+    metricas = DetMetrics(names=nomes)
+    matriz = ConfusionMatrix(names=nomes)
+
+    salvar = pasta_saida is not None
+    if salvar:
+        os.makedirs(pasta_saida, exist_ok=True)
+    if salvar and salvar_txt:
+        # Os rótulos de uma avaliação anterior não devem se misturar aos novos
+        pasta_rotulos = os.path.join(pasta_saida, "labels")
+        os.makedirs(pasta_rotulos, exist_ok=True)
+        for arquivo in os.listdir(pasta_rotulos):
+            if arquivo.endswith(".txt"):
+                os.remove(os.path.join(pasta_rotulos, arquivo))
+
+    for i, relativo in enumerate(predicoes["imagens"].tolist()):
+        dados = _predicoes_imagem(predicoes, i, max(conf, AVALIACAO_CONF), min(iou, AVALIACAO_IOU))
+        caixas_ref, classes_ref = _referencias_imagem(predicoes, i)
+        metricas.update_stats({
+            "tp": _acertos(dados, caixas_ref, classes_ref),
+            "conf": dados[:, 4],
+            "pred_cls": dados[:, 5],
+            "target_cls": classes_ref.astype(np.float32),
+            "target_img": np.unique(classes_ref).astype(np.float32),
+            "im_name": os.path.basename(relativo),
+        })
+        if not salvar:
+            continue
+
+        if graficos:
+            matriz.process_batch(
+                {"bboxes": torch.from_numpy(dados[:, :4]), "conf": torch.from_numpy(dados[:, 4]),
+                 "cls": torch.from_numpy(dados[:, 5])},
+                {"bboxes": torch.from_numpy(caixas_ref), "cls": torch.from_numpy(classes_ref.astype(np.float32))},
+                conf=conf,
+            )
+        if salvar_txt and len(dados):
+            nome = os.path.splitext(os.path.basename(relativo))[0]
+            _salvar_txt(os.path.join(pasta_saida, "labels", f"{nome}.txt"), dados, predicoes["formas"][i])
+        if salvar_imagens:
+            frame = cv2.imread(os.path.join(predicoes["base_dir"], relativo))
+            if frame is not None:
+                visiveis = dados[dados[:, 4] >= conf_imagens]
+                deteccoes = Deteccoes(visiveis[:, :4].astype(np.int32), visiveis[:, 4],
+                                      visiveis[:, 5].astype(np.int64), nomes)
+                cv2.imwrite(os.path.join(pasta_saida, os.path.basename(relativo)), desenhar_deteccoes(frame, deteccoes))
+
+    if len(predicoes["imagens"]):
+        metricas.process(save_dir=Path(pasta_saida or "."), plot=salvar and graficos)
+    if salvar and graficos:
+        for normalizar in (True, False):
+            matriz.plot(normalize=normalizar, save_dir=pasta_saida)
+
+    resultado = metricas.results_dict
+    logger.info(
+        f"Métricas (conf={conf}, iou={iou}, {len(predicoes['imagens'])} imagens): "
+        f"mAP50={resultado['metrics/mAP50(B)']:.4f} mAP50-95={resultado['metrics/mAP50-95(B)']:.4f}"
+    )
+    return resultado
+
+
+def avaliar(modelo, split: str = "test", base_dir: str = BASE_DIR, cache_dir: str = AVALIACAO_CACHE_DIR,
+            **opcoes) -> dict:
+    """
+    Avalia o modelo em um split, executando-o apenas se as predições não estiverem em cache.
+
+    Parâmetros
+    ----------
+    modelo : str ou ultralytics.YOLO
+        Caminho dos pesos ou modelo carregado.
+    split : str, opcional
+        "train", "valid" ou "test" (padrão: "test").
+    base_dir : str, opcional
+        Diretório com o `data.yaml` consolidado (padrão: BASE_DIR).
+    cache_dir : str, opcional
+        Diretório do cache de predições (padrão: AVALIACAO_CACHE_DIR).
+    **opcoes
+        Repassadas a `pontuar_predicoes` (`conf`, `iou`, `pasta_saida`, ...).
+
+    Retorno
+    -------
+    dict
+        Métricas no formato de `results_dict` do Ultralytics.
+    """
+    return pontuar_predicoes(predizer_split(modelo, split, base_dir, cache_dir), **opcoes)
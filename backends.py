@@ -0,0 +1,153 @@
+"""
+Exportação do modelo treinado para backends otimizados de CPU.
+
+Após o treinamento, os pesos `.pt` são exportados para ONNX, OpenVINO e
+OpenVINO INT8 (calibrado no split de validação). Cada backend é avaliado no
+conjunto de teste e a comparação de latência e mAP com o modelo PyTorch é
+salva em `comparacao_backends.json`. O backend usado pela interface e pela
+avaliação é escolhido por `BACKEND_INFERENCIA` em `config.py`.
+"""
+
+import os
+import json
+
+from avaliacao import predizer_split, pontuar_predicoes
+from config import BASE_DIR, RESULTADOS_DIR, MODELO_TREINADO, CAMINHOS_BACKENDS, BACKEND_INFERENCIA
+from logger import logger
+
+# Argumentos de `YOLO.export` para cada backend exportado
+FORMATOS_EXPORTACAO = {
+    "onnx": {"format": "onnx"},
+    "openvino": {"format": "openvino"},
+    "openvino_int8": {"format": "openvino", "int8": True},
+}
+
+
+def exportar_backends(caminho_pesos: str = MODELO_TREINADO) -> dict:
+    """
+    Exporta os pesos treinados para todos os formatos de `FORMATOS_EXPORTACAO`.
+
+    A variante INT8 é calibrada com as imagens do split `val` do `data.yaml`
+    consolidado (pastas `valid` dos datasets).
+
+    Parâmetros
+    ----------
+    caminho_pesos : str, opcional
+        Caminho dos pesos `.pt` treinados (padrão: MODELO_TREINADO).
+
+    Retorno
+    -------
+    dict
+        Mapeamento backend -> caminho do modelo exportado, incluindo "pytorch".
+    """
+    from ultralytics import YOLO
+
+    modelo = YOLO(caminho_pesos)
+    caminhos = {"pytorch": caminho_pesos}
+
+    for backend, opcoes in FORMATOS_EXPORTACAO.items():
+        logger.info(f"Exportando modelo para o backend: {backend}")
+        if opcoes.get("int8"):
+            opcoes = {**opcoes, "data": os.path.join(BASE_DIR, "data.yaml")}
+        caminhos[backend] = str(modelo.export(**opcoes)).rstrip(os.sep)
+        logger.info(f"Modelo exportado em: {caminhos[backend]}")
+
+    return caminhos
+
+
+def comparar_backends(caminhos: dict) -> dict:
+    """
+    Avalia cada backend no conjunto de teste e compara latência e mAP com o `.pt`.
+
+    As predições de cada backend vêm do cache de `avaliacao.py`: o modelo só
+    é executado para pesos ainda não avaliados, e a latência é a medida na
+    execução que preencheu o cache.
+
+    Parâmetros
+    ----------
+    caminhos : dict
+        Mapeamento backend -> caminho do modelo, como retornado por `exportar_backends`.
+
+    Retorno
+    -------
+    dict
+        Métricas por backend: mAP50, mAP50-95, latência de inferência em ms por
+        imagem e diferenças em relação ao backend "pytorch". A comparação também
+        é salva em `comparacao_backends.json` dentro de RESULTADOS_DIR.
+    """
+    comparacao = {}
+    for backend, caminho in caminhos.items():
+        logger.info(f"Avaliando backend {backend} no conjunto de teste.")
+        predicoes = predizer_split(caminho, "test")
+        metricas = pontuar_predicoes(predicoes)
+        comparacao[backend] = {
+            "caminho": caminho,
+            "mAP50": metricas["metrics/mAP50(B)"],
+            "mAP50-95": metricas["metrics/mAP50-95(B)"],
+            "latencia_ms": float(predicoes["velocidade"][1]),
+            "latencia_total_ms": float(predicoes["velocidade"].sum()),
+        }
+
+    referencia = comparacao.get("pytorch")
+    if referencia:
+        for metricas in comparacao.values():
+            metricas["delta_mAP50-95"] = metricas["mAP50-95"] - referencia["mAP50-95"]
+            metricas["aceleracao"] = referencia["latencia_ms"] / metricas["latencia_ms"] if metricas["latencia_ms"] else None
+
+    path_json = os.path.join(RESULTADOS_DIR, "comparacao_backends.json")
+    with open(path_json, "w") as f:
+        json.dump(comparacao, f, indent=4)
+
+    logger.info(f"Comparação de backends salva em: {path_json}")
+    for backend, metricas in comparacao.items():
+        logger.info(
+            f"{backend}: mAP50-95={metricas['mAP50-95']:.4f} "
+            f"latência={metricas['latencia_ms']:.1f} ms/imagem"
+        )
+
+    return comparacao
+
+
+def caminho_backend(backend: str = BACKEND_INFERENCIA) -> str:
+    """
+    Retorna o caminho do modelo treinado no backend escolhido.
+
+    Parâmetros
+    ----------
+    backend : str, opcional
+        Chave de CAMINHOS_BACKENDS (padrão: BACKEND_INFERENCIA).
+
+    Retorno
+    -------
+    str
+        Arquivo ou pasta do modelo exportado.
+    """
+    if backend not in CAMINHOS_BACKENDS:
+        raise ValueError(f"Backend desconhecido: {backend}. Opções: {list(CAMINHOS_BACKENDS)}")
+
+    caminho = CAMINHOS_BACKENDS[backend]
+    if not os.path.exists(caminho):
+        logger.error(f"Modelo do backend {backend} não encontrado: {caminho}")
+        raise FileNotFoundError(f"Modelo do backend {backend} não encontrado: {caminho}")
+    return caminho
+
+
+def carregar_modelo(backend: str = BACKEND_INFERENCIA):
+    """
+    Carrega o modelo treinado no backend escolhido.
+
+    Parâmetros
+    ----------
+    backend : str, opcional
+        Chave de CAMINHOS_BACKENDS (padrão: BACKEND_INFERENCIA).
+
+    Retorno
+    -------
+    ultralytics.YOLO
+        Modelo pronto para inferência.
+    """
+    from ultralytics import YOLO
+
+    caminho = caminho_backend(backend)
+    logger.info(f"Carregando modelo ({backend}): {caminho}")
+    return YOLO(caminho, task="detect")
@@ -0,0 +1,102 @@
+"""
+Custo da coleta ativa (`coleta_ativa.py`) no streaming e efeito do filtro de frames repetidos.
+
+1. Tempo de `ColetorAtivo.observar` por frame, na thread do escalonador, com
+   e sem caixas incertas, em 640x480 e 1920x1080.
+2. Uma câmera parada diante de uma prateleira que, às vezes, é mexida: cada
+   frame tem uma caixa incerta e a coleta roda sem intervalo mínimo. Compara
+   quantas imagens são salvas sem o filtro (distância -1) e com
+   COLETA_HASH_DISTANCIA, e mede o dHash por frame.
+
+Uso:
+    python benchmarks/bench_coleta.py --frames 300
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import COLETA_HASH_DISTANCIA
+from coleta_ativa import ColetorAtivo, hash_perceptual
+from deteccao import Deteccoes
+
+NOMES = {0: "Drinks", 1: "Egg", 2: "Juice", 3: "Milk", 4: "beverage", 5: "food-box", 6: "fruit"}
+
+
+def deteccoes(confiancas) -> Deteccoes:
+    n = len(confiancas)
+    caixas = np.tile(np.array([[100, 100, 200, 220]], dtype=np.int32), (n, 1)) + 30 * np.arange(n, dtype=np.int32)[:, None]
+    return Deteccoes(caixas, np.asarray(confiancas, dtype=np.float32), np.arange(n, dtype=np.int64) % len(NOMES), NOMES)
+
+
+def gerar_prateleira(rng, largura: int = 640, altura: int = 480):
+    frame = np.full((altura, largura, 3), 60, dtype=np.uint8)
+    for _ in range(12):
+        x, y = int(rng.integers(0, largura - 80)), int(rng.integers(0, altura - 100))
+        cor = tuple(int(c) for c in rng.integers(0, 256, 3))
+        cv2.rectangle(frame, (x, y), (x + int(rng.integers(30, 80)), y + int(rng.integers(40, 100))), cor, -1)
+    return frame
+
+
+def medir_observar(tamanho: tuple, frames: int) -> dict:
+    largura, altura = tamanho
+    frame = np.random.default_rng(0).integers(0, 256, (altura, largura, 3), dtype=np.uint8)
+    certas, incertas = deteccoes([0.9, 0.8, 0.95]), deteccoes([0.9, 0.55, 0.95])
+    resultado = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        coletor = ColetorAtivo(pasta=tmp, intervalo=3600)
+        for caso, det in (("sem incertas", certas), ("com incerta", incertas)):
+            tempos = []
+            for _ in range(frames):
+                inicio = time.perf_counter()
+                coletor.observar("camera_0", frame, det)
+                tempos.append(time.perf_counter() - inicio)
+            resultado[caso] = np.median(tempos) * 1000
+        coletor.fechar()
+    return resultado
+
+
+def medir_repetidos(frames: int, distancia: int) -> dict:
+    rng = np.random.default_rng(0)
+    cena = gerar_prateleira(rng)
+    incertas = deteccoes([0.9, 0.55])
+    with tempfile.TemporaryDirectory() as tmp:
+        coletor = ColetorAtivo(pasta=tmp, distancia=distancia, intervalo=0, max_imagens=frames, fila_max=frames + 1)
+        for i in range(frames):
+            # A cada 50 frames alguém mexe na prateleira; entre eles, só ruído de sensor
+            if i and i % 50 == 0:
+                cena = gerar_prateleira(rng)
+            ruido = rng.normal(0, 3, cena.shape)
+            frame = np.clip(cena + ruido, 0, 255).astype(np.uint8)
+            coletor.observar("camera_0", frame, incertas)
+        coletor.fechar(timeout=600)
+        return coletor.estatisticas()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Custo da coleta ativa e filtro de frames repetidos")
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+
+    print("observar() por frame (mediana):")
+    for tamanho in ((640, 480), (1920, 1080)):
+        r = medir_observar(tamanho, args.frames)
+        print(f"  {tamanho[0]}x{tamanho[1]}: " + ", ".join(f"{caso} {ms:.3f} ms" for caso, ms in r.items()))
+
+    frame = gerar_prateleira(np.random.default_rng(1), 1920, 1080)
+    inicio = time.perf_counter()
+    for _ in range(args.frames):
+        hash_perceptual(frame)
+    print(f"dHash 1920x1080: {(time.perf_counter() - inicio) / args.frames * 1000:.3f} ms por frame")
+
+    print(f"\ncâmera parada, {args.frames} frames incertos, prateleira mexida a cada 50 frames:")
+    for distancia in (-1, COLETA_HASH_DISTANCIA):
+        r = medir_repetidos(args.frames, distancia)
+        print(f"  distância {distancia:>2}: {r['salvas']} salvas, {r['repetidas']} repetidas descartadas")
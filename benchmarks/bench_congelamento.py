@@ -0,0 +1,101 @@
+"""
+Custo do treino por nível de congelamento (HIPERPARAMETROS_TREINO["congelar"]).
+
+Para cada nível, treina o YOLO11n sem pesos (criado a partir do yaml do
+Ultralytics, sem download) em um dataset sintético, em um processo novo, e
+informa o tempo de cada época de treino, o pico de RSS do processo, os
+parâmetros treináveis e a perda da última época. Níveis:
+    nenhum                 todas as camadas treinam
+    backbone               camadas do backbone congeladas
+    backbone_sem_aumento   idem, sem aumento de dados
+    backbone_cache         idem, com o cache das saídas do backbone (CACHE_CARACTERISTICAS)
+    so_cabeca              só a última camada (Detect) treina
+
+Os dataloaders rodam no próprio processo (workers=0), para que o pico de RSS
+inclua a leitura das imagens. Com a mesma seed, "backbone_sem_aumento" e
+"backbone_cache" devem terminar com a mesma perda.
+
+Uso:
+    python benchmarks/bench_congelamento.py --imagens 200 --imgsz 320 --epocas 3
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+NIVEIS = {
+    "nenhum": {"congelar": None},
+    "backbone": {"congelar": "backbone"},
+    "backbone_sem_aumento": {"congelar": "backbone", "aumentar": False},
+    "backbone_cache": {"congelar": "backbone", "aumentar": False, "cache": True},
+    "so_cabeca": {"camadas_descongeladas": 1},
+}
+
+
+def treinar_nivel(nivel: str, data: str, pasta: str, imgsz: int, epocas: int, lote: int) -> dict:
+    from ultralytics import YOLO
+    from train import TreinadorYOLO, argumentos_treino, pico_rss_mb, setar_seed
+
+    opcoes = dict(NIVEIS[nivel])
+    cache = opcoes.pop("cache", False)
+    setar_seed(42)
+    modelo = YOLO("yolo11n.yaml")
+    argumentos = argumentos_treino(
+        modelo, {**opcoes, "data": data, "imgsz": imgsz, "epochs": epocas, "batch": lote, "patience": epocas}
+    )
+    argumentos["trainer"] = partial(
+        TreinadorYOLO, rotulos_pacotes=False, aumentar=opcoes.get("aumentar", True), cache_caracteristicas=cache
+    )
+
+    tempos, inicio, perda = [], {}, {}
+
+    def ao_terminar_epoca(trainer):
+        tempos.append(time.perf_counter() - inicio["t"])
+        perda["ultima"] = float(sum(trainer.tloss.values()))
+
+    modelo.add_callback("on_train_epoch_start", lambda trainer: inicio.update(t=time.perf_counter()))
+    modelo.add_callback("on_train_epoch_end", ao_terminar_epoca)
+    modelo.train(**argumentos, project=pasta, name=nivel, workers=0, val=False, plots=False, verbose=False)
+
+    trainer = modelo.trainer
+    return {
+        "epocas_s": tempos,
+        "pico_rss_mb": pico_rss_mb(),
+        "treinaveis": sum(p.numel() for p in trainer.model.parameters() if p.requires_grad),
+        "perda": perda["ultima"],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tempo por época e pico de RSS por nível de congelamento")
+    parser.add_argument("--imagens", type=int, default=200, help="imagens do dataset sintético (80%% no treino)")
+    parser.add_argument("--imgsz", type=int, default=320)
+    parser.add_argument("--epocas", type=int, default=3)
+    parser.add_argument("--lote", type=int, default=16)
+    parser.add_argument("--niveis", nargs="+", choices=list(NIVEIS), default=list(NIVEIS))
+    args = parser.parse_args()
+
+    from suite import criar_datasets_sinteticos
+    from prepare_data import gerar_data_yaml
+
+    contexto = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        base_dir = os.path.join(tmp, "datasets")
+        criar_datasets_sinteticos(base_dir, args.imagens, largura=640, altura=480)
+        gerar_data_yaml(base_dir, os.path.join(tmp, "indice.json.gz"), os.path.join(tmp, "rotulos"))
+
+        print(f"{'nível':<22} {'treináveis':>11} {'épocas (s)':>22} {'pico RSS':>9} {'perda':>8}")
+        for nivel in args.niveis:
+            with contexto.Pool(1) as pool:
+                r = pool.apply(treinar_nivel, (
+                    nivel, os.path.join(base_dir, "data.yaml"), os.path.join(tmp, "treinos"),
+                    args.imgsz, args.epocas, args.lote,
+                ))
+            epocas = " ".join(f"{t:.1f}" for t in r["epocas_s"])
+            print(f"{nivel:<22} {r['treinaveis']:>11,} {epocas:>22} {r['pico_rss_mb']:>6.0f} MB {r['perda']:>8.4f}")
@@ -0,0 +1,104 @@
+"""
+Micro-benchmark do pós-processamento e do desenho das detecções por frame.
+
+Compara o caminho antigo de `update_stream` (uma conversão tensor -> Python
+por caixa e uma cópia + mescla do frame inteiro por rótulo) com o caminho
+vetorizado de `deteccao.py`, para diferentes quantidades de caixas.
+
+Uso:
+    python benchmarks/bench_deteccao.py --largura 1920 --altura 1080 --repeticoes 30
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deteccao import extrair_deteccoes, desenhar_deteccoes
+
+NOMES = {0: "Drinks", 1: "Egg", 2: "Juice", 3: "Milk", 4: "beverage", 5: "food-box", 6: "fruit"}
+
+
+def caminho_antigo(frame, result) -> None:
+    """
+    Reproduz o processamento por caixa anterior à vetorização.
+    """
+    for box in result.boxes:
+        conf = float(box.conf[0]) * 100
+        if conf < 50:
+            continue
+        x1, y1, x2, y2 = map(int, box.xyxy[0])
+        cls_id = int(box.cls[0])
+        label = f"{result.names[cls_id]} ({conf:.1f}%)"
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
+        (label_width, label_height), baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 2.1, 6)
+        overlay = frame.copy()
+        cv2.rectangle(overlay, (x1, y1 - label_height - baseline), (x1 + label_width, y1), (0, 0, 0), -1)
+        cv2.putText(overlay, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 2.1, (255, 255, 255), 6)
+        cv2.addWeighted(overlay, 0.5, frame, 0.5, 0, frame)
+
+
+def caminho_vetorizado(frame, result) -> None:
+    """
+    Processamento atual com filtro vetorizado e mescla apenas nas regiões dos rótulos.
+    """
+    desenhar_deteccoes(frame, extrair_deteccoes(result, conf_min=0.5))
+
+
+def resultado_sintetico(n_caixas: int, largura: int, altura: int, rng) -> Results:
+    """
+    Cria um `Results` com caixas aleatórias, todas acima do limiar de confiança.
+    """
+    x1 = rng.uniform(0, largura - 200, n_caixas)
+    y1 = rng.uniform(80, altura - 200, n_caixas)
+    dados = np.stack(
+        [x1, y1, x1 + rng.uniform(40, 200, n_caixas), y1 + rng.uniform(40, 200, n_caixas),
+         rng.uniform(0.5, 1.0, n_caixas), rng.integers(0, len(NOMES), n_caixas)],
+        axis=1,
+    ).astype(np.float32)
+    frame = np.zeros((altura, largura, 3), dtype=np.uint8)
+    return Results(frame, path="", names=NOMES, boxes=torch.from_numpy(dados))
+
+
+def medir(funcao, frame_base, result, repeticoes: int) -> float:
+    """
+    Retorna o tempo mediano, em ms, de uma chamada de `funcao` por frame.
+    """
+    tempos = []
+    for _ in range(repeticoes):
+        frame = frame_base.copy()
+        inicio = time.perf_counter()
+        funcao(frame, result)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return float(np.median(tempos))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--largura", type=int, default=1920)
+    parser.add_argument("--altura", type=int, default=1080)
+    parser.add_argument("--repeticoes", type=int, default=30)
+    parser.add_argument("--caixas", type=int, nargs="+", default=[0, 1, 10, 40, 100])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frame_base = rng.integers(0, 256, (args.altura, args.largura, 3), dtype=np.uint8)
+
+    print(f"Frame {args.largura}x{args.altura}, mediana de {args.repeticoes} repetições")
+    print(f"{'caixas':>7} {'antigo (ms)':>12} {'vetorizado (ms)':>16} {'ganho':>7}")
+    for n_caixas in args.caixas:
+        result = resultado_sintetico(n_caixas, args.largura, args.altura, rng)
+        antigo = medir(caminho_antigo, frame_base, result, args.repeticoes)
+        novo = medir(caminho_vetorizado, frame_base, result, args.repeticoes)
+        print(f"{n_caixas:>7} {antigo:>12.2f} {novo:>16.2f} {antigo / novo:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
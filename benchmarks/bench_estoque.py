@@ -0,0 +1,97 @@
+"""
+Vazão de gravação e latência das consultas do histórico do inventário (estoque.py).
+
+Preenche um banco temporário com --registros linhas de --terminais
+terminais, distribuídas em contagens de --por-contagem registros ao longo de
+--dias dias, gravadas pela thread de lotes de `EstoqueInventario`. Depois
+mede, com o banco cheio:
+- a vazão da mesma gravação sem lotes, com uma transação por registro;
+- a mediana do tempo de `estoque()`, `estoque(momento)`, `historico(item)`
+  dos últimos 30 dias e `consumo(30)`.
+
+Uso:
+    python benchmarks/bench_estoque.py --registros 2000000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from estoque import EstoqueInventario, conectar
+
+
+def mediana_ms(funcao, repeticoes: int = 5) -> float:
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return float(np.median(tempos))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gravação em lotes e consultas do histórico do inventário")
+    parser.add_argument("--registros", type=int, default=2_000_000)
+    parser.add_argument("--terminais", type=int, default=5)
+    parser.add_argument("--itens", type=int, default=40)
+    parser.add_argument("--por-contagem", type=int, default=20, help="registros por contagem (sessão)")
+    parser.add_argument("--dias", type=float, default=365)
+    parser.add_argument("--amostra-sem-lotes", type=int, default=2000, help="registros da gravação sem lotes")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    itens = [f"item_{i:03d}" for i in range(args.itens)]
+    fim = time.time()
+    inicio = fim - args.dias * 86400
+
+    with tempfile.TemporaryDirectory() as tmp:
+        banco = os.path.join(tmp, "estoque.sqlite")
+        estoques = [EstoqueInventario(banco, terminal=f"terminal_{t}") for t in range(args.terminais)]
+        n_contagens = args.registros // args.por_contagem
+        momentos = np.sort(rng.uniform(inicio, fim, n_contagens))
+        terminais = rng.integers(0, args.terminais, n_contagens)
+        escolhidos = rng.integers(0, args.itens, (n_contagens, args.por_contagem))
+        quantidades = rng.integers(1, 6, (n_contagens, args.por_contagem))
+
+        t0 = time.perf_counter()
+        for momento, t, linha_itens, linha_qtd in zip(momentos.tolist(), terminais.tolist(),
+                                                     escolhidos.tolist(), quantidades.tolist()):
+            estoque = estoques[t]
+            estoque.nova_sessao()
+            for i, q in zip(linha_itens, linha_qtd):
+                estoque.registrar({itens[i]: q}, momento=momento)
+        for estoque in estoques:
+            estoque.fechar()
+        decorrido = time.perf_counter() - t0
+        total = n_contagens * args.por_contagem
+        print(f"Gravação em lotes: {total:,} registros, {n_contagens:,} contagens em {decorrido:.1f}s "
+              f"({total / decorrido:,.0f} registros/s), banco com {os.path.getsize(banco) / 2**20:.0f} MB")
+
+        consulta = EstoqueInventario(banco, terminal="consulta")
+        conexao = conectar(banco)
+        sessao = consulta.nova_sessao()
+        t0 = time.perf_counter()
+        for i in range(args.amostra_sem_lotes):
+            consulta._gravar(conexao, [(sessao, fim, itens[i % args.itens], 1, "captura", None)])
+        decorrido = time.perf_counter() - t0
+        with conexao:
+            for tabela, coluna in (("registros", "sessao"), ("totais", "sessao"), ("sessoes", "id")):
+                conexao.execute(f"DELETE FROM {tabela} WHERE {coluna} = ?", (sessao,))
+        conexao.close()
+        print(f"Gravação sem lotes (uma transação por registro): {args.amostra_sem_lotes / decorrido:,.0f} registros/s")
+
+        casos = {
+            "estoque()": lambda: consulta.estoque(),
+            "estoque(momento=-180 dias)": lambda: consulta.estoque(fim - 180 * 86400),
+            "historico(item, 30 dias)": lambda: consulta.historico(itens[0], desde=fim - 30 * 86400),
+            "consumo(30 dias)": lambda: consulta.consumo(30, ate=fim),
+        }
+        for nome, funcao in casos.items():
+            print(f"{nome:<28} {mediana_ms(funcao):>8.1f} ms")
+        consulta.fechar()
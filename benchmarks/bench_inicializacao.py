@@ -0,0 +1,149 @@
+"""
+Tempo até o primeiro frame da interface (app.py), a partir do lançamento do processo.
+
+Cada modo abre a interface em um processo novo, conectada (CAMERA_PADRAO) a
+um vídeo sintético lido em loop no ritmo de --fps, e informa, em segundos
+desde o lançamento:
+- janela: `on_start`, com a janela aberta;
+- primeiro frame: primeiro frame da câmera exibido;
+- modelo pronto: modelo carregado e aquecido;
+- primeira detecção: primeiro frame exibido que passou pelo modelo.
+
+Modos:
+    segundo_plano   app.py atual: o modelo carrega em uma thread, com a janela aberta
+    sincrono        o modelo carrega e aquece na thread da interface antes da
+                    janela abrir, como antes do carregamento em segundo plano
+
+O modelo é o de MODELO_TREINADO no backend BACKEND_INFERENCIA (`config.py`),
+que precisa existir. Requer uma tela (ou um servidor X virtual).
+
+Uso:
+    python benchmarks/bench_inicializacao.py --repeticoes 3
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODOS = ("segundo_plano", "sincrono")
+
+
+def criar_video(caminho: str, fps: float, segundos: float = 2.0) -> None:
+    import cv2
+    import numpy as np
+
+    escritor = cv2.VideoWriter(caminho, cv2.VideoWriter_fourcc(*"mp4v"), fps, (640, 480))
+    for i in range(int(fps * segundos)):
+        frame = np.full((480, 640, 3), 40, dtype=np.uint8)
+        cv2.rectangle(frame, (40 + 8 * i, 180), (140 + 8 * i, 300), (0, 200, 255), -1)
+        escritor.write(frame)
+    escritor.release()
+
+
+def medir_modo(modo: str, video: str, fps: float, lancamento: float) -> dict:
+    os.environ.setdefault("KIVY_NO_ARGS", "1")
+    os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+    import cv2
+
+    import app
+
+    VideoCapture = cv2.VideoCapture
+
+    class CapturaEmLoop:
+        # Vídeo no ritmo de uma câmera, voltando ao início no fim do arquivo
+        def __init__(self, origem):
+            self.captura = VideoCapture(origem)
+            self.proximo = time.perf_counter()
+
+        def isOpened(self):
+            return self.captura.isOpened()
+
+        def read(self, imagem=None):
+            self.proximo += 1 / fps
+            time.sleep(max(0.0, self.proximo - time.perf_counter()))
+            ret, frame = self.captura.read(imagem)
+            if not ret:
+                self.captura.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = self.captura.read(imagem)
+            return ret, frame
+
+        def release(self):
+            self.captura.release()
+
+    marcas = {}
+
+    def marcar(nome):
+        marcas.setdefault(nome, time.time() - lancamento)
+
+    class App(app.MainApp):
+        def on_start(self):
+            if modo == "sincrono":
+                self.load_model()
+            else:
+                super().on_start()
+            marcar("janela")
+
+        def finish_model_loading(self, error=None):
+            if self.progress is not None:
+                super().finish_model_loading(error)
+            marcar("modelo_pronto")
+
+        primeira_inferencia = None
+
+        def infer_batch(self, frames):
+            detections = super().infer_batch(frames)
+            if self.model_ready.is_set() and self.primeira_inferencia is None:
+                self.primeira_inferencia = detections[0]
+            return detections
+
+        def update_stream(self, dt):
+            super().update_stream(dt)
+            if self.first_frame_shown:
+                marcar("primeiro_frame")
+            if self.primeira_inferencia is not None and any(
+                    d is self.primeira_inferencia for d in self.last_detections.values()):
+                marcar("primeira_deteccao")
+                self.stop()
+
+    app.cv2.VideoCapture = CapturaEmLoop
+    app.CAMERA_PADRAO = video
+    App().run()
+    return marcas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tempo até o primeiro frame da interface")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--modos", nargs="+", choices=MODOS, default=list(MODOS))
+    parser.add_argument("--modo", choices=MODOS, help=argparse.SUPPRESS)
+    parser.add_argument("--video", help=argparse.SUPPRESS)
+    parser.add_argument("--lancamento", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        sys.path.insert(0, RAIZ)
+        resultado = medir_modo(args.modo, args.video, args.fps, args.lancamento)
+        print(json.dumps(resultado), file=sys.__stdout__)
+        sys.exit(0)
+
+    colunas = ("janela", "primeiro_frame", "modelo_pronto", "primeira_deteccao")
+    print(f"{'modo':<14} " + " ".join(f"{c:>18}" for c in colunas))
+    with tempfile.TemporaryDirectory() as tmp:
+        video = os.path.join(tmp, "camera.mp4")
+        criar_video(video, args.fps)
+        for modo in args.modos:
+            for _ in range(args.repeticoes):
+                lancamento = time.time()
+                saida = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--modo", modo, "--video", video,
+                     "--fps", str(args.fps), "--lancamento", str(lancamento)],
+                    capture_output=True, text=True, check=True,
+                ).stdout
+                r = json.loads(saida.strip().splitlines()[-1])
+                print(f"{modo:<14} " + " ".join(f"{r.get(c, float('nan')):>16.2f} s" for c in colunas))
@@ -0,0 +1,100 @@
+"""
+Tempo que uma chamada de log prende a thread que registra (ex.: a da interface).
+
+Compara, em processos separados:
+- síncrono: `FileHandler` + `StreamHandler` no logger raiz (configuração
+  anterior de logger.py), escrevendo na própria thread;
+- fila: logger.py atual, com a escrita feita por uma thread a partir da fila.
+
+O console é simulado com um atraso fixo por escrita (--atraso-console-ms),
+como um terminal remoto ou lento. As mensagens são emitidas a --taxa por
+segundo, como logs por frame, e o script informa p50, p99 e o máximo do
+tempo de cada chamada.
+
+Uso:
+    python benchmarks/bench_logging.py --mensagens 600 --taxa 60 --atraso-console-ms 2
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ConsoleLento:
+    def __init__(self, atraso: float):
+        self.atraso = atraso
+
+    def write(self, texto):
+        time.sleep(self.atraso)
+        return len(texto)
+
+    def flush(self):
+        pass
+
+
+def medir_modo(modo: str, mensagens: int, taxa: float, atraso: float) -> dict:
+    import logging
+
+    console = ConsoleLento(atraso)
+    if modo == "sincrono":
+        import config
+        os.makedirs(config.RESULTADOS_DIR, exist_ok=True)
+        logging.basicConfig(
+            level=logging.INFO,
+            format="%(asctime)s - %(levelname)s - %(message)s",
+            handlers=[
+                logging.FileHandler(os.path.join(config.RESULTADOS_DIR, "app.log"), mode="a", encoding="utf-8"),
+                logging.StreamHandler(console),
+            ],
+        )
+        logger = logging.getLogger()
+    else:
+        sys.stderr = console
+        from logger import logger
+
+    tempos = []
+    for i in range(mensagens):
+        t0 = time.perf_counter()
+        logger.info("frame %d: %d detecções", i, i % 7)
+        tempos.append(time.perf_counter() - t0)
+        time.sleep(max(0.0, 1 / taxa - tempos[-1]))
+    tempos.sort()
+    return {
+        "p50_ms": tempos[len(tempos) // 2] * 1000,
+        "p99_ms": tempos[int(len(tempos) * 0.99)] * 1000,
+        "max_ms": tempos[-1] * 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latência das chamadas de log na thread que registra")
+    parser.add_argument("--mensagens", type=int, default=600)
+    parser.add_argument("--taxa", type=float, default=60.0, help="mensagens por segundo")
+    parser.add_argument("--atraso-console-ms", type=float, default=2.0)
+    parser.add_argument("--modo", choices=["sincrono", "fila"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        sys.path.insert(0, RAIZ)
+        resultado = medir_modo(args.modo, args.mensagens, args.taxa, args.atraso_console_ms / 1000)
+        print(json.dumps(resultado), file=sys.__stdout__)
+        sys.exit(0)
+
+    print(f"{args.mensagens} mensagens a {args.taxa:g}/s, console com {args.atraso_console_ms:g} ms por escrita")
+    print(f"{'modo':<10} {'p50':>9} {'p99':>9} {'máximo':>9}")
+    for modo in ("sincrono", "fila"):
+        with tempfile.TemporaryDirectory() as tmp:
+            saida = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--modo", modo, "--mensagens", str(args.mensagens),
+                 "--taxa", str(args.taxa), "--atraso-console-ms", str(args.atraso_console_ms)],
+                cwd=tmp, capture_output=True, text=True, check=True,
+            ).stdout
+        r = json.loads(saida.strip().splitlines()[-1])
+        print(f"{modo:<10} {r['p50_ms']:>6.3f} ms {r['p99_ms']:>6.3f} ms "
+              f"{r['max_ms']:>6.3f} ms")
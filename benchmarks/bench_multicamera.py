@@ -0,0 +1,118 @@
+"""
+Vazão do escalonador de várias câmeras (`multicamera.py`) por número de câmeras.
+
+Cada câmera é um arquivo de vídeo sintético lido em loop no ritmo de --fps,
+como uma câmera IP. Para cada número de câmeras, o escalonador roda por
+--duracao segundos em dois modos:
+- sequencial: `lote_max=1`, uma chamada ao modelo por frame, como N pipelines
+  independentes disputando o mesmo modelo;
+- lote: `lote_max=N`, o frame mais recente de cada câmera em uma só chamada.
+São reportadas as inferências por segundo (total e por câmera) e o tamanho
+médio dos lotes. O modelo é o YOLO11n sem pesos (criado a partir do yaml, sem
+download), em CPU.
+
+Uso:
+    python benchmarks/bench_multicamera.py --duracao 10
+    python benchmarks/bench_multicamera.py --cameras 1 4 --fps 15 --imgsz 320
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deteccao import extrair_deteccoes
+from multicamera import EscalonadorInferencia, CameraEscalonada
+
+
+class CapturaEmLoop:
+    # Vídeo no ritmo de uma câmera, voltando ao início no fim do arquivo
+    def __init__(self, caminho: str, fps: float):
+        self.captura = cv2.VideoCapture(caminho)
+        self.fps = fps
+        self.proximo = time.perf_counter()
+
+    def read(self, imagem=None):
+        self.proximo = max(self.proximo + 1 / self.fps, time.perf_counter() - 1 / self.fps)
+        time.sleep(max(0.0, self.proximo - time.perf_counter()))
+        ret, frame = self.captura.read(imagem)
+        if not ret:
+            self.captura.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.captura.read(imagem)
+        return ret, frame
+
+    def release(self):
+        self.captura.release()
+
+
+def criar_video(caminho: str, fps: float, deslocamento: int, segundos: float = 2.0) -> None:
+    escritor = cv2.VideoWriter(caminho, cv2.VideoWriter_fourcc(*"mp4v"), fps, (640, 480))
+    for i in range(int(fps * segundos)):
+        frame = np.full((480, 640, 3), 40, dtype=np.uint8)
+        x = (deslocamento + 8 * i) % 540
+        cv2.rectangle(frame, (x, 180), (x + 100, 300), (0, 200, 255), -1)
+        escritor.write(frame)
+    escritor.release()
+
+
+def medir(modelo, videos: list, lote_max: int, fps: float, duracao: float, imgsz: int) -> dict:
+    lock = threading.Lock()
+
+    def inferir_lote(frames):
+        with lock:
+            resultados = modelo(frames, imgsz=imgsz, verbose=False)
+        return [extrair_deteccoes(r, conf_min=0.5) for r in resultados]
+
+    escalonador = EscalonadorInferencia(inferir_lote, lote_max=lote_max)
+    for i, video in enumerate(videos):
+        escalonador.adicionar(CameraEscalonada(f"camera_{i}", CapturaEmLoop(video, fps), lambda f, d: f))
+    escalonador.iniciar()
+    # Descarta o início (primeiras chamadas ao modelo e abertura dos vídeos)
+    time.sleep(1.0)
+    antes = escalonador.estatisticas()
+    inicio = time.perf_counter()
+    time.sleep(duracao)
+    depois = escalonador.estatisticas()
+    decorrido = time.perf_counter() - inicio
+    escalonador.parar()
+
+    imagens = depois["imagens"] - antes["imagens"]
+    lotes = depois["lotes"] - antes["lotes"]
+    return {
+        "vazao": imagens / decorrido,
+        "por_camera": imagens / decorrido / len(videos),
+        "lote_medio": imagens / lotes if lotes else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vazão do escalonador de várias câmeras")
+    parser.add_argument("--cameras", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--duracao", type=float, default=10.0)
+    parser.add_argument("--fps", type=float, default=30.0, help="ritmo de cada câmera simulada")
+    parser.add_argument("--imgsz", type=int, default=640)
+    args = parser.parse_args()
+
+    from ultralytics import YOLO
+
+    modelo = YOLO("yolo11n.yaml")
+    modelo(np.zeros((480, 640, 3), dtype=np.uint8), imgsz=args.imgsz, verbose=False)
+
+    print(f"câmeras a {args.fps:g} FPS, imgsz {args.imgsz}, {args.duracao:g} s por caso")
+    print(f"{'câmeras':>7} {'modo':<10} {'inferências/s':>14} {'por câmera':>11} {'lote médio':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        videos = []
+        for i in range(max(args.cameras)):
+            videos.append(os.path.join(tmp, f"camera_{i}.mp4"))
+            criar_video(videos[-1], args.fps, deslocamento=60 * i)
+        for n in args.cameras:
+            for modo, lote_max in (("sequencial", 1), ("lote", n)):
+                r = medir(modelo, videos[:n], lote_max, args.fps, args.duracao, args.imgsz)
+                print(f"{n:>7} {modo:<10} {r['vazao']:>14.1f} {r['por_camera']:>11.1f} {r['lote_medio']:>11.1f}")
@@ -0,0 +1,55 @@
+"""
+Latência em CPU e parâmetros do modelo por fração de poda (`compressao.podar_modelo`).
+
+Poda o modelo em cada fração, sem ajuste, e mede a latência mediana de um
+frame 640x480 (com pré e pós-processamento) e o número de parâmetros, além
+do desvio médio da saída em relação ao modelo original, antes do ajuste
+que recupera a precisão. Sem --pesos, usa o YOLO11n sem pesos (criado a
+partir do yaml, sem download); o desvio só tem sentido com pesos treinados.
+
+Uso:
+    python benchmarks/bench_poda.py
+    python benchmarks/bench_poda.py --pesos resultados/modelo_treinado.pt --fracoes 0 0.25 0.5 0.75
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+
+from compressao import podar_modelo, medir_latencia
+
+
+def saida_bruta(modelo, x):
+    modelo.model.eval()
+    with torch.no_grad():
+        return modelo.model(x)[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latência e parâmetros por fração de poda")
+    parser.add_argument("--pesos", default="yolo11n.yaml")
+    parser.add_argument("--fracoes", type=float, nargs="+", default=[0.0, 0.25, 0.5, 0.75])
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--repeticoes", type=int, default=30)
+    args = parser.parse_args()
+
+    from ultralytics import YOLO
+
+    x = torch.rand(1, 3, args.imgsz, args.imgsz)
+    referencia = saida_bruta(YOLO(args.pesos), x)
+
+    print(f"{args.pesos}, imgsz {args.imgsz}, {torch.get_num_threads()} threads")
+    print(f"{'fração':>6} {'parâmetros':>11} {'canais podáveis':>16} {'ms/frame':>9} {'desvio da saída':>16}")
+    for fracao in args.fracoes:
+        modelo = YOLO(args.pesos)
+        resumo = podar_modelo(modelo.model, fracao)
+        desvio = (saida_bruta(modelo, x) - referencia).abs().mean().item()
+        latencia = medir_latencia(modelo, args.imgsz, args.repeticoes)
+        print(
+            f"{fracao:>6.2f} {resumo['parametros_depois']:>11,} "
+            f"{resumo['canais_depois']:>7} de {resumo['canais_antes']:<6} {latencia:>9.1f} {desvio:>16.4f}"
+        )
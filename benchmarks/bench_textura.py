@@ -0,0 +1,116 @@
+"""
+Micro-benchmark do caminho frame -> textura de `update_stream` e da leitura da câmera.
+
+Compara, por frame:
+- exibição antiga: `cv2.flip` + `.tobytes()` + `Texture.create` + `blit_buffer`;
+- exibição atual: uma textura por resolução, invertida pelas coordenadas UV
+  (`flip_vertical`) e preenchida a partir de um `memoryview` do frame;
+- leitura antiga: `VideoCapture.read()` alocando um novo array;
+- leitura atual: `VideoCapture.read(buffer)` reaproveitando o buffer.
+
+A alocação por frame é o pico de memória do tracemalloc (numpy e bytes)
+acima do nível anterior à chamada; a taxa é esse valor multiplicado por
+--fps. A memória das texturas na GPU não é vista pelo tracemalloc e é
+informada à parte. Requer uma janela do Kivy (contexto OpenGL).
+
+Uso:
+    python benchmarks/bench_textura.py --largura 1920 --altura 1080 --repeticoes 60
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def exibicao_antiga(frame, estado) -> None:
+    from kivy.graphics.texture import Texture
+
+    buf = cv2.flip(frame, 0).tobytes()
+    textura = Texture.create(size=(frame.shape[1], frame.shape[0]), colorfmt="bgr")
+    textura.blit_buffer(buf, colorfmt="bgr", bufferfmt="ubyte")
+    estado["texturas"] += 1
+
+
+def exibicao_atual(frame, estado) -> None:
+    from kivy.graphics.texture import Texture
+
+    tamanho = (frame.shape[1], frame.shape[0])
+    textura = estado.get("textura")
+    if textura is None or textura.size != tamanho:
+        textura = estado["textura"] = Texture.create(size=tamanho, colorfmt="bgr")
+        textura.flip_vertical()
+        estado["texturas"] += 1
+    textura.blit_buffer(memoryview(np.ascontiguousarray(frame)).cast("B"), colorfmt="bgr", bufferfmt="ubyte")
+
+
+def medir(funcao, repeticoes: int) -> tuple:
+    """
+    Retorna o tempo mediano em ms e a alocação mediana em bytes por chamada.
+    """
+    funcao()
+    tempos, alocacoes = [], []
+    tracemalloc.start()
+    for _ in range(repeticoes):
+        antes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        alocacoes.append(tracemalloc.get_traced_memory()[1] - antes)
+    tracemalloc.stop()
+    return float(np.median(tempos)), float(np.median(alocacoes))
+
+
+def video_sintetico(caminho: str, largura: int, altura: int, n_frames: int) -> None:
+    escritor = cv2.VideoWriter(caminho, cv2.VideoWriter_fourcc(*"MJPG"), 30, (largura, altura))
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 256, (altura, largura, 3), dtype=np.uint8)
+    for i in range(n_frames):
+        escritor.write(np.roll(base, i * 8, axis=1))
+    escritor.release()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Caminho frame -> textura e leitura da câmera")
+    parser.add_argument("--largura", type=int, default=1920)
+    parser.add_argument("--altura", type=int, default=1080)
+    parser.add_argument("--repeticoes", type=int, default=60)
+    parser.add_argument("--fps", type=float, default=60.0, help="taxa usada para converter alocação em MB/s")
+    args = parser.parse_args()
+
+    from kivy.core.window import Window  # noqa: F401  cria o contexto OpenGL
+
+    frame = np.random.default_rng(0).integers(0, 256, (args.altura, args.largura, 3), dtype=np.uint8)
+    mb_textura = frame.nbytes / 1e6
+    print(f"Frame {args.largura}x{args.altura} ({mb_textura:.1f} MB), taxa de referência {args.fps:g} Hz")
+    print(f"{'caminho':<20} {'ms/frame':>9} {'MB/frame':>9} {'MB/s':>8} {'texturas':>9}")
+
+    for nome, funcao in (("exibição antiga", exibicao_antiga), ("exibição atual", exibicao_atual)):
+        estado = {"texturas": 0}
+        ms, alocado = medir(lambda: funcao(frame, estado), args.repeticoes)
+        print(
+            f"{nome:<20} {ms:>9.2f} {alocado / 1e6:>9.2f} {alocado / 1e6 * args.fps:>8.0f} "
+            f"{estado['texturas']:>9}  (+{estado['texturas'] * mb_textura:.0f} MB de GPU)"
+        )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho = os.path.join(tmp, "video.avi")
+        video_sintetico(caminho, args.largura, args.altura, args.repeticoes * 2 + 2)
+        for nome, com_buffer in (("leitura antiga", False), ("leitura atual", True)):
+            captura = cv2.VideoCapture(caminho)
+            buffer = np.empty_like(frame)
+            ler = (lambda: captura.read(buffer)) if com_buffer else captura.read
+            ms, alocado = medir(ler, args.repeticoes)
+            captura.release()
+            print(f"{nome:<20} {ms:>9.2f} {alocado / 1e6:>9.2f} {alocado / 1e6 * args.fps:>8.0f}")
@@ -0,0 +1,99 @@
+"""
+Teste de carga do servidor de inferência: latência e vazão por número de câmeras.
+
+Cada câmera simulada é uma thread com conexão própria que envia frames em
+sequência durante `--duracao` segundos. Para cada nível de concorrência são
+reportadas a vazão total, a latência mediana e p99 e o tamanho médio dos lotes
+formados pelo servidor (de /saude). Sem `--url`, o servidor é iniciado no
+próprio processo, em uma porta livre.
+
+Uso:
+    python benchmarks/carga_servidor.py --imagem foto.jpg --duracao 10
+    python benchmarks/carga_servidor.py --url http://127.0.0.1:8765 --cameras 1 2 4 8 16
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import SERVIDOR_LOTE_MAX, SERVIDOR_ESPERA_MAX_MS
+from servidor import ClienteServidor, ServidorInferencia
+
+
+def iniciar_servidor_local(lote_max: int, espera_max_ms: float) -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        porta = s.getsockname()[1]
+    pronto = threading.Event()
+    servidor = ServidorInferencia(lote_max=lote_max, espera_max_ms=espera_max_ms)
+    threading.Thread(
+        target=lambda: asyncio.run(servidor.servir("127.0.0.1", porta, pronto)), daemon=True
+    ).start()
+    pronto.wait()
+    return f"http://127.0.0.1:{porta}"
+
+
+def medir(url: str, frame, cameras: int, duracao: float) -> dict:
+    cliente = ClienteServidor(url)
+    antes = cliente.saude()
+    latencias = [[] for _ in range(cameras)]
+    fim = time.perf_counter() + duracao
+
+    def camera(i):
+        while time.perf_counter() < fim:
+            inicio = time.perf_counter()
+            cliente.detectar(frame)
+            latencias[i].append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=camera, args=(i,)) for i in range(cameras)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    decorrido = time.perf_counter() - inicio
+
+    depois = cliente.saude()
+    todas = np.concatenate([np.asarray(l) for l in latencias]) * 1000
+    lotes = depois["lotes"] - antes["lotes"]
+    return {
+        "vazao": len(todas) / decorrido,
+        "p50": float(np.median(todas)),
+        "p99": float(np.percentile(todas, 99)),
+        "lote_medio": (depois["imagens"] - antes["imagens"]) / lotes if lotes else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None, help="servidor já em execução; sem ele, inicia um local")
+    parser.add_argument("--imagem", default=None, help="imagem enviada; sem ela, usa um frame sintético 640x480")
+    parser.add_argument("--cameras", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--duracao", type=float, default=10.0)
+    parser.add_argument("--lote-max", type=int, default=SERVIDOR_LOTE_MAX)
+    parser.add_argument("--espera-max-ms", type=float, default=SERVIDOR_ESPERA_MAX_MS)
+    args = parser.parse_args()
+
+    if args.imagem:
+        frame = cv2.imread(args.imagem)
+    else:
+        frame = np.random.default_rng(0).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+
+    url = args.url or iniciar_servidor_local(args.lote_max, args.espera_max_ms)
+
+    ClienteServidor(url).detectar(frame)  # aquecimento
+    for cameras in args.cameras:
+        r = medir(url, frame, cameras, args.duracao)
+        print(
+            f"{cameras:3d} câmeras: {r['vazao']:6.1f} imagens/s, p50 {r['p50']:7.1f} ms, "
+            f"p99 {r['p99']:7.1f} ms, lote médio {r['lote_medio']:.2f}"
+        )
@@ -0,0 +1,92 @@
+"""
+Verificação do custo de importação dos pontos de entrada.
+
+Cada módulo de ORCAMENTO_IMPORTACAO_MS (`config.py`) é importado em um
+processo novo com `python -X importtime`, --repeticoes vezes, e o menor tempo
+acumulado é comparado com o orçamento do módulo. Também falha quando a
+importação carrega algum dos pacotes de IMPORTACOES_SOB_DEMANDA (torch,
+Ultralytics, ...), que só devem ser importados dentro das funções que os
+usam. Termina com código 1 se algum módulo estourar o orçamento ou importar
+um pacote pesado, indicando quem o importou.
+
+Importar app.py abre a janela do Kivy, que entra no tempo medido.
+
+Uso:
+    python benchmarks/importacoes.py
+    python benchmarks/importacoes.py --modulos main predict --repeticoes 5
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from config import ORCAMENTO_IMPORTACAO_MS, IMPORTACOES_SOB_DEMANDA
+
+
+def medir_importacao(modulo: str) -> tuple:
+    """
+    Importa o módulo em um processo novo com `-X importtime`.
+
+    Parâmetros
+    ----------
+    modulo : str
+        Nome do módulo na raiz do projeto.
+
+    Retorno
+    -------
+    tuple
+        (tempo acumulado em ms, {pacote pesado: módulo que o importou}).
+    """
+    ambiente = {**os.environ, "KIVY_NO_ARGS": "1", "KIVY_NO_CONSOLELOG": "1"}
+    saida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=RAIZ, env=ambiente, capture_output=True, text=True, check=True,
+    ).stderr
+
+    total, pesados, pilha = None, {}, []
+    # As linhas vêm em pós-ordem: cada módulo aparece depois dos que ele importou,
+    # com um nível de indentação a menos
+    for linha in reversed(saida.splitlines()):
+        if not linha.startswith("import time:") or "|" not in linha:
+            continue
+        _, acumulado, nome = linha.split("|")
+        if not acumulado.strip().isdigit():
+            continue
+        nivel = (len(nome) - len(nome.lstrip())) // 2
+        nome = nome.strip()
+        del pilha[nivel:]
+        pilha.append(nome)
+        if nivel == 0 and nome == modulo:
+            total = int(acumulado) / 1000
+        pacote = nome.split(".")[0]
+        if pacote in IMPORTACOES_SOB_DEMANDA and pacote not in pesados:
+            pesados[pacote] = pilha[-2] if len(pilha) > 1 else modulo
+    return total, pesados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tempo de importação dos pontos de entrada e pacotes pesados")
+    parser.add_argument("--modulos", nargs="+", default=list(ORCAMENTO_IMPORTACAO_MS))
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    falhas = 0
+    print(f"{'módulo':<12} {'tempo':>9} {'orçamento':>10}  pacotes pesados importados")
+    for modulo in args.modulos:
+        medicoes = [medir_importacao(modulo) for _ in range(max(1, args.repeticoes))]
+        tempo = min(t for t, _ in medicoes)
+        pesados = medicoes[0][1]
+        orcamento = ORCAMENTO_IMPORTACAO_MS.get(modulo)
+        estourou = orcamento is not None and tempo > orcamento
+        falhas += estourou or bool(pesados)
+        importados = ", ".join(f"{p} (por {origem})" for p, origem in pesados.items()) or "-"
+        print(f"{modulo:<12} {tempo:>6.0f} ms {orcamento if orcamento is not None else '-':>7} ms"
+              f"{'  ESTOUROU' if estourou else ''}  {importados}")
+
+    if falhas:
+        print(f"\n{falhas} módulo(s) acima do orçamento ou importando pacotes pesados.")
+        sys.exit(1)
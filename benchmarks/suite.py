@@ -0,0 +1,262 @@
+"""
+Suíte de benchmarks do pipeline com baselines em JSON e limite de regressão.
+
+Casos (todos em CPU, sem interface gráfica, com dados sintéticos e o YOLO11n
+sem pesos, criado a partir do yaml do Ultralytics, sem download):
+    data_yaml/<n>/frio, data_yaml/<n>/incremental
+        `gerar_data_yaml` em uma árvore sintética com n imagens, com o índice
+        vazio e depois sem alterações.
+    update_stream/<n>_caixas
+        Processamento de um frame 1280x720 com n caixas: filtro das detecções,
+        desenho das anotações e a visão do buffer passada por `update_stream`
+        à textura (o upload requer OpenGL e é medido por bench_textura.py).
+    modelo/imgsz<s>/lote<b>
+        Latência de `model()` por chamada.
+    avaliar_e_predizer
+        Imagens por segundo da avaliação no conjunto de teste.
+
+Com `--salvar`, os resultados passam a ser a baseline. Sem ele, cada caso é
+comparado com a baseline, e o script termina com código 1 quando algum piora
+mais do que `--tolerancia` por cento.
+
+Uso:
+    python benchmarks/suite.py --salvar                      # grava a baseline
+    python benchmarks/suite.py --tolerancia 15               # compara com a baseline
+    python benchmarks/suite.py --casos update_stream modelo  # só os casos com esses prefixos
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+import torch
+import ultralytics
+from ultralytics import YOLO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_deteccao import NOMES, resultado_sintetico
+from config import BENCHMARK_BASELINE, BENCHMARK_TOLERANCIA, DATASET_COM_TESTE
+from deteccao import extrair_deteccoes, desenhar_deteccoes
+from logger import logger
+from predict import avaliar_e_predizer
+from prepare_data import gerar_data_yaml
+
+
+def maquina() -> dict:
+    """
+    Identifica o ambiente em que os números foram medidos.
+    """
+    return {
+        "processador": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "ultralytics": ultralytics.__version__,
+    }
+
+
+def mediana_ms(funcao, repeticoes: int, aquecimento: int = 1) -> float:
+    """
+    Retorna o tempo mediano de `funcao()` em ms, depois de `aquecimento` chamadas descartadas.
+    """
+    for _ in range(aquecimento):
+        funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return float(np.median(tempos))
+
+
+def criar_datasets_sinteticos(base_dir: str, n_imagens: int, nome: str = DATASET_COM_TESTE,
+                              largura: int = 32, altura: int = 32) -> None:
+    """
+    Cria um dataset no formato do Roboflow com `n_imagens` divididas em 80/10/10
+    entre train, valid e test, cada uma com um rótulo de três caixas aleatórias.
+
+    Os primeiros pixels de cada imagem guardam o seu número, para que cada
+    arquivo tenha um hash diferente.
+    """
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 256, (altura, largura, 3), dtype=np.uint8)
+    pasta = os.path.join(base_dir, nome)
+    os.makedirs(pasta, exist_ok=True)
+    with open(os.path.join(pasta, "data.yaml"), "w") as f:
+        f.write("names: [" + ", ".join(NOMES.values()) + "]\n")
+
+    limites = {"train": int(0.8 * n_imagens), "valid": int(0.9 * n_imagens), "test": n_imagens}
+    inicio = 0
+    for split, fim in limites.items():
+        os.makedirs(os.path.join(pasta, split, "images"), exist_ok=True)
+        os.makedirs(os.path.join(pasta, split, "labels"), exist_ok=True)
+        for i in range(inicio, fim):
+            base[0, :3] = [(i >> 16) & 255, (i >> 8) & 255, i & 255]
+            cv2.imwrite(os.path.join(pasta, split, "images", f"img_{i:06d}.jpg"), base)
+            centros = rng.uniform(0.2, 0.8, (3, 2))
+            with open(os.path.join(pasta, split, "labels", f"img_{i:06d}.txt"), "w") as f:
+                for c, (x, y) in zip(rng.integers(0, len(NOMES), 3).tolist(), centros.tolist()):
+                    f.write(f"{c} {x:.4f} {y:.4f} 0.2 0.2\n")
+        inicio = fim
+
+
+def casos_data_yaml(tamanhos: list, repeticoes: int = 3) -> dict:
+    resultados = {}
+    for n in tamanhos:
+        with tempfile.TemporaryDirectory() as tmp:
+            base_dir = os.path.join(tmp, "datasets")
+            criar_datasets_sinteticos(base_dir, n)
+            indice, rotulos = os.path.join(tmp, "indice.json.gz"), os.path.join(tmp, "rotulos")
+
+            def frio():
+                if os.path.exists(indice):
+                    os.remove(indice)
+                shutil.rmtree(rotulos, ignore_errors=True)
+                gerar_data_yaml(base_dir, indice, rotulos)
+
+            resultados[f"data_yaml/{n}/frio"] = {
+                "valor": mediana_ms(frio, repeticoes, aquecimento=0), "unidade": "ms", "maior_melhor": False,
+            }
+            resultados[f"data_yaml/{n}/incremental"] = {
+                "valor": mediana_ms(lambda: gerar_data_yaml(base_dir, indice, rotulos), repeticoes, aquecimento=0),
+                "unidade": "ms",
+                "maior_melhor": False,
+            }
+    return resultados
+
+
+def casos_update_stream(caixas: list, repeticoes: int) -> dict:
+    rng = np.random.default_rng(0)
+    largura, altura = 1280, 720
+    frame_base = rng.integers(0, 256, (altura, largura, 3), dtype=np.uint8)
+    resultados = {}
+    for n in caixas:
+        result = resultado_sintetico(n, largura, altura, rng)
+
+        def processar():
+            frame = frame_base.copy()
+            desenhar_deteccoes(frame, extrair_deteccoes(result, conf_min=0.5))
+            memoryview(np.ascontiguousarray(frame)).cast("B")
+
+        resultados[f"update_stream/{n}_caixas"] = {
+            "valor": mediana_ms(processar, repeticoes, aquecimento=3), "unidade": "ms", "maior_melhor": False,
+        }
+    return resultados
+
+
+def casos_modelo(modelo, tamanhos: list, lotes: list, repeticoes: int) -> dict:
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (480, 640, 3), dtype=np.uint8) for _ in range(max(lotes))]
+    resultados = {}
+    for imgsz in tamanhos:
+        for lote in lotes:
+            resultados[f"modelo/imgsz{imgsz}/lote{lote}"] = {
+                "valor": mediana_ms(lambda: modelo(frames[:lote], imgsz=imgsz, verbose=False), repeticoes),
+                "unidade": "ms",
+                "maior_melhor": False,
+            }
+    return resultados
+
+
+def caso_avaliacao(modelo, n_imagens: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        base_dir = os.path.join(tmp, "datasets")
+        # Imagens de 640x480 para a avaliação ter o custo de uma foto real; n_imagens no conjunto de teste
+        criar_datasets_sinteticos(base_dir, n_imagens * 10, largura=640, altura=480)
+        gerar_data_yaml(base_dir, os.path.join(tmp, "indice.json.gz"), os.path.join(tmp, "rotulos"))
+        inicio = time.perf_counter()
+        avaliar_e_predizer(modelo, base_dir=base_dir, resultados_dir=os.path.join(tmp, "resultados"))
+        decorrido = time.perf_counter() - inicio
+    return {"avaliar_e_predizer": {"valor": n_imagens / decorrido, "unidade": "imagens/s", "maior_melhor": True}}
+
+
+def comparar(atuais: dict, baseline: dict, tolerancia: float) -> list:
+    """
+    Compara os casos com a baseline e retorna os nomes dos que regrediram.
+
+    A variação é positiva quando o caso piorou (mais tempo, ou menos
+    imagens/s nos casos em que maior é melhor).
+    """
+    regressoes = []
+    print(f"{'caso':<36} {'baseline':>12} {'atual':>12} {'variação':>9}")
+    for nome, atual in atuais.items():
+        base = baseline.get(nome)
+        if base is None:
+            print(f"{nome:<36} {'-':>12} {atual['valor']:>12.2f} {'novo':>9}  {atual['unidade']}")
+            continue
+        variacao = (atual["valor"] - base["valor"]) / base["valor"] * 100
+        if atual["maior_melhor"]:
+            variacao = -variacao
+        marca = "  REGRESSÃO" if variacao > tolerancia else ""
+        if marca:
+            regressoes.append(nome)
+        print(
+            f"{nome:<36} {base['valor']:>12.2f} {atual['valor']:>12.2f} {variacao:>+8.1f}%  "
+            f"{atual['unidade']}{marca}"
+        )
+    return regressoes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", default=BENCHMARK_BASELINE)
+    parser.add_argument("--tolerancia", type=float, default=BENCHMARK_TOLERANCIA,
+                        help="piora máxima aceita por caso, em %%")
+    parser.add_argument("--salvar", action="store_true", help="grava os resultados como a nova baseline")
+    parser.add_argument("--casos", nargs="+", default=None, help="prefixos dos casos executados")
+    parser.add_argument("--imagens-dataset", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeticoes-dataset", type=int, default=5)
+    parser.add_argument("--caixas", type=int, nargs="+", default=[0, 10, 100])
+    parser.add_argument("--imgsz", type=int, nargs="+", default=[320, 640])
+    parser.add_argument("--lotes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--imagens-teste", type=int, default=32)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    def selecionado(prefixo):
+        return args.casos is None or any(prefixo.startswith(c) or c.startswith(prefixo) for c in args.casos)
+
+    # Os logs de cada etapa poluiriam a tabela
+    logger.setLevel(logging.WARNING)
+
+    atuais = {}
+    if selecionado("data_yaml"):
+        atuais.update(casos_data_yaml(args.imagens_dataset, args.repeticoes_dataset))
+    if selecionado("update_stream"):
+        atuais.update(casos_update_stream(args.caixas, args.repeticoes))
+    if selecionado("modelo") or selecionado("avaliar_e_predizer"):
+        modelo = YOLO("yolo11n.yaml")
+        if selecionado("modelo"):
+            atuais.update(casos_modelo(modelo, args.imgsz, args.lotes, max(3, args.repeticoes // 4)))
+        if selecionado("avaliar_e_predizer"):
+            atuais.update(caso_avaliacao(modelo, args.imagens_teste))
+    if args.casos is not None:
+        atuais = {nome: r for nome, r in atuais.items() if any(nome.startswith(c) for c in args.casos)}
+
+    anterior = {"maquina": maquina(), "casos": {}}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            anterior = json.load(f)
+        if anterior["maquina"] != maquina():
+            print(f"Aviso: baseline medida em outro ambiente: {anterior['maquina']}")
+
+    regressoes = comparar(atuais, anterior["casos"], args.tolerancia)
+
+    if args.salvar:
+        anterior["maquina"] = maquina()
+        anterior["casos"].update(atuais)
+        with open(args.baseline, "w") as f:
+            json.dump(anterior, f, indent=2, ensure_ascii=False)
+        print(f"Baseline gravada em {args.baseline}")
+    elif regressoes:
+        print(f"{len(regressoes)} caso(s) pioraram mais de {args.tolerancia:.0f}%: {', '.join(regressoes)}")
+        sys.exit(1)
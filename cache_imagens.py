@@ -0,0 +1,236 @@
+"""
+Cache de imagens pré-decodificadas e redimensionadas para o treino.
+
+Cada imagem é decodificada uma única vez e redimensionada como o Ultralytics
+faz em `load_image` (lado maior igual a `imgsz`, mantendo a proporção). O
+resultado é gravado em um array uint8 mapeado em memória, com um slot de
+`imgsz x imgsz x 3` por imagem, indexado pelo hash do conteúdo da imagem (do
+índice de datasets). Há um cache por `imgsz`; imagens alteradas ganham um novo
+hash e são decodificadas de novo, e os slots de imagens removidas são reaproveitados.
+
+Layout em CACHE_IMAGENS_DIR/<imgsz>/:
+    dados.u8     uint8 (capacidade, imgsz, imgsz, 3)  pixels BGR
+    formas.npy   int32 (capacidade, 4)                (h0, w0, h, w) original e redimensionada
+    chaves.json                                       hash da imagem -> slot
+"""
+
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from config import CACHE_IMAGENS_DIR
+from logger import logger
+
+
+def redimensionar(imagem, imgsz: int):
+    """
+    Redimensiona a imagem para que o lado maior seja `imgsz`, como o `load_image` do Ultralytics.
+
+    Parâmetros
+    ----------
+    imagem : numpy.ndarray
+        Imagem BGR decodificada.
+    imgsz : int
+        Tamanho do lado maior.
+
+    Retorno
+    -------
+    numpy.ndarray
+        Imagem redimensionada.
+    """
+    h0, w0 = imagem.shape[:2]
+    r = imgsz / max(h0, w0)
+    if r != 1:
+        w, h = min(math.ceil(w0 * r), imgsz), min(math.ceil(h0 * r), imgsz)
+        imagem = cv2.resize(imagem, (w, h), interpolation=cv2.INTER_LINEAR)
+    return imagem
+
+
+class CacheImagens:
+    """
+    Armazenamento de imagens redimensionadas para um `imgsz`, indexado por hash.
+    """
+
+    def __init__(self, imgsz: int, diretorio: str = CACHE_IMAGENS_DIR, somente_leitura: bool = False):
+        """
+        Parâmetros
+        ----------
+        imgsz : int
+            Tamanho de treino das imagens.
+        diretorio : str, opcional
+            Diretório raiz dos caches (padrão: CACHE_IMAGENS_DIR).
+        somente_leitura : bool, opcional
+            Abre o array em modo "r", como no dataloader (padrão: False).
+        """
+        self.imgsz = imgsz
+        self.pasta = os.path.join(diretorio, str(imgsz))
+        self.somente_leitura = somente_leitura
+        self.slots = {}
+        self.formas = np.zeros((0, 4), dtype=np.int32)
+        self.dados = None
+
+        chaves_path = os.path.join(self.pasta, "chaves.json")
+        if os.path.exists(chaves_path):
+            with open(chaves_path, "r") as f:
+                self.slots = json.load(f)
+            self.formas = np.load(os.path.join(self.pasta, "formas.npy"))
+            self._abrir(len(self.formas))
+
+    @property
+    def bytes_por_slot(self) -> int:
+        return self.imgsz * self.imgsz * 3
+
+    @property
+    def capacidade(self) -> int:
+        return len(self.formas)
+
+    def _abrir(self, capacidade: int) -> None:
+        if capacidade == 0:
+            self.dados = None
+            return
+        self.dados = np.memmap(
+            os.path.join(self.pasta, "dados.u8"),
+            dtype=np.uint8,
+            mode="r" if self.somente_leitura else "r+",
+            shape=(capacidade, self.imgsz, self.imgsz, 3),
+        )
+
+    def _crescer(self, capacidade: int) -> None:
+        os.makedirs(self.pasta, exist_ok=True)
+        self.dados = None
+        caminho = os.path.join(self.pasta, "dados.u8")
+        with open(caminho, "ab") as f:
+            f.truncate(capacidade * self.bytes_por_slot)
+        formas = np.zeros((capacidade, 4), dtype=np.int32)
+        formas[:len(self.formas)] = self.formas
+        self.formas = formas
+        self._abrir(capacidade)
+
+    def _salvar_metadados(self) -> None:
+        self.dados.flush()
+        np.save(os.path.join(self.pasta, "formas.tmp.npy"), self.formas)
+        os.replace(os.path.join(self.pasta, "formas.tmp.npy"), os.path.join(self.pasta, "formas.npy"))
+        with open(os.path.join(self.pasta, "chaves.tmp.json"), "w") as f:
+            json.dump(self.slots, f)
+        os.replace(os.path.join(self.pasta, "chaves.tmp.json"), os.path.join(self.pasta, "chaves.json"))
+
+    def obter(self, hash_imagem: str):
+        """
+        Retorna a imagem redimensionada com o hash informado.
+
+        Parâmetros
+        ----------
+        hash_imagem : str
+            Hash do conteúdo da imagem original.
+
+        Retorno
+        -------
+        tuple ou None
+            `(imagem, (h0, w0))` ou None se a imagem não está no cache.
+        """
+        slot = self.slots.get(hash_imagem)
+        if slot is None:
+            return None
+        h0, w0, h, w = self.formas[slot].tolist()
+        # Cópia: as transformações do Ultralytics podem alterar a imagem no próprio array
+        return self.dados[slot, :h, :w].copy(), (h0, w0)
+
+    def preparar(self, itens: list, trabalhadores: int = 8) -> dict:
+        """
+        Decodifica e grava as imagens que ainda não estão no cache.
+
+        Entradas cujo hash não aparece em `itens` são descartadas e seus slots,
+        reaproveitados.
+
+        Parâmetros
+        ----------
+        itens : list of tuple
+            Pares `(hash, caminho)` de todas as imagens que devem estar no cache.
+        trabalhadores : int, opcional
+            Número de threads de decodificação (padrão: 8).
+
+        Retorno
+        -------
+        dict
+            Número de imagens no cache, novas, removidas e com falha, o tempo
+            gasto em segundos e o tamanho em disco em bytes.
+        """
+        inicio = time.perf_counter()
+        validos = {h for h, _ in itens}
+        removidos = [h for h in self.slots if h not in validos]
+        for h in removidos:
+            del self.slots[h]
+
+        faltando = list({h: p for h, p in itens if h not in self.slots}.items())
+        ocupados = set(self.slots.values())
+        livres = [s for s in range(self.capacidade) if s not in ocupados]
+        if len(faltando) > len(livres):
+            capacidade_antiga = self.capacidade
+            self._crescer(capacidade_antiga + len(faltando) - len(livres))
+            livres += list(range(capacidade_antiga, self.capacidade))
+
+        def gravar(item):
+            (hash_imagem, caminho), slot = item
+            imagem = cv2.imread(caminho)
+            if imagem is None:
+                return hash_imagem, slot, False
+            h0, w0 = imagem.shape[:2]
+            imagem = redimensionar(imagem, self.imgsz)
+            h, w = imagem.shape[:2]
+            self.dados[slot, :h, :w] = imagem
+            self.formas[slot] = (h0, w0, h, w)
+            return hash_imagem, slot, True
+
+        falhas = 0
+        with ThreadPoolExecutor(max_workers=trabalhadores) as pool:
+            for hash_imagem, slot, ok in pool.map(gravar, zip(faltando, livres)):
+                if ok:
+                    self.slots[hash_imagem] = slot
+                else:
+                    falhas += 1
+
+        if self.dados is not None and (faltando or removidos):
+            self._salvar_metadados()
+
+        return {
+            "imagens": len(self.slots),
+            "novas": len(faltando) - falhas,
+            "removidas": len(removidos),
+            "falhas": falhas,
+            "tempo_s": time.perf_counter() - inicio,
+            "bytes_disco": self.capacidade * self.bytes_por_slot,
+        }
+
+
+def preparar_cache_imagens(imgsz: int, armazens: list, diretorio: str = CACHE_IMAGENS_DIR) -> dict:
+    """
+    Garante que todas as imagens dos splits informados estejam no cache de `imgsz`.
+
+    Parâmetros
+    ----------
+    imgsz : int
+        Tamanho de treino das imagens.
+    armazens : list of ArmazemRotulos
+        Splits cujas imagens devem ser cacheadas (com hashes do índice).
+    diretorio : str, opcional
+        Diretório raiz dos caches (padrão: CACHE_IMAGENS_DIR).
+
+    Retorno
+    -------
+    dict
+        Relatório retornado por `CacheImagens.preparar`.
+    """
+    itens = [(h, p) for armazem in armazens for h, p in zip(armazem.hashes, armazem.imagens)]
+    relatorio = CacheImagens(imgsz, diretorio).preparar(itens, trabalhadores=min(8, os.cpu_count() or 1))
+    logger.info(
+        f"Cache de imagens (imgsz={imgsz}): {relatorio['imagens']} imagens, "
+        f"{relatorio['novas']} novas, {relatorio['removidas']} removidas, {relatorio['falhas']} falhas "
+        f"em {relatorio['tempo_s']:.1f}s; {relatorio['bytes_disco'] / 2**30:.2f} GB em disco "
+        f"(lido via mmap: a RAM usada é o cache de páginas do sistema, liberável sob pressão)"
+    )
+    return relatorio
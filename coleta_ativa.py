@@ -0,0 +1,368 @@
+"""
+Coleta ativa de amostras de treino a partir do streaming da interface.
+
+Dois tipos de frame vão para um dataset em COLETA_DIR, com os pré-rótulos do
+modelo no formato YOLO (`train/images`, `train/labels` e `data.yaml`), que
+`gerar_data_yaml` inclui no treino como qualquer outro dataset de BASE_DIR:
+- margem: frames com alguma caixa de confiança a menos de COLETA_MARGEM do
+  limiar da interface (o modelo quase contou, ou quase deixou de contar, um
+  item), no máximo um a cada COLETA_INTERVALO_S segundos por câmera;
+- correção: quando uma quantidade editada na lista difere da contada em pelo
+  menos COLETA_DIVERGENCIA, os frames capturados desde o último "Clear" (ou,
+  sem capturas, os últimos frames de cada câmera).
+
+A thread da interface e a do escalonador só copiam o frame e o colocam em uma
+fila limitada; uma thread calcula o hash perceptual (dHash de 64 bits) e
+descarta os frames a até COLETA_HASH_DISTANCIA bits de algum já salvo, de modo
+que uma câmera parada diante da mesma prateleira não repete a mesma imagem.
+Cada amostra salva ganha uma linha em `coleta.jsonl`, com o motivo, a câmera
+e o hash; os hashes continuam valendo mesmo depois que a imagem é apagada
+(rejeitada na revisão). Os pré-rótulos precisam de revisão antes do treino.
+
+Uso:
+    coletor = ColetorAtivo(limiar=0.5)
+    deteccoes = coletor.observar("camera_0", frame, deteccoes)  # a cada inferência; retorna as acima do limiar
+    coletor.registrar_captura(["camera_0"])                     # "Capture"
+    coletor.corrigir("arroz", anterior=3, nova=5)               # edição na lista
+    coletor.nova_contagem()                                     # "Clear"
+    coletor.fechar()                                            # grava o que falta
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from config import (COLETA_DIR, COLETA_MARGEM, COLETA_DIVERGENCIA, COLETA_HASH_DISTANCIA, COLETA_INTERVALO_S,
+                    COLETA_MAX_IMAGENS, COLETA_FRAMES_CONTAGEM, COLETA_FILA_MAX)
+from deteccao import filtrar_confianca
+from instrumentacao import medir, contar
+from logger import logger, log_limitado
+
+# Marca na fila que encerra a thread de gravação
+_FIM = object()
+
+# Diferença mínima, em níveis de cinza, para um bit do hash ser 1: sem ela, as regiões lisas
+# da miniatura (parede, prateleira vazia) viram bits aleatórios com o ruído do sensor
+ZONA_MORTA_HASH = 2
+
+
+def hash_perceptual(frame) -> int:
+    """
+    Calcula o dHash de 64 bits do frame: o sinal do gradiente horizontal em uma miniatura 9x8.
+
+    Parâmetros
+    ----------
+    frame : numpy.ndarray
+        Imagem BGR.
+
+    Retorno
+    -------
+    int
+        Hash de 64 bits; frames parecidos diferem em poucos bits.
+    """
+    altura, largura = frame.shape[:2]
+    # Uma amostra esparsa antes da média por área: em 1080p, 0,1 ms em vez de 8 ms
+    amostra = frame[::max(1, altura // 64), ::max(1, largura // 72)]
+    miniatura = cv2.cvtColor(cv2.resize(amostra, (9, 8), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+    miniatura = miniatura.astype(np.int16)
+    bits = miniatura[:, 1:] - miniatura[:, :-1] > ZONA_MORTA_HASH
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def distancias_hamming(hashes: np.ndarray, h: int) -> np.ndarray:
+    """
+    Conta os bits diferentes entre `h` e cada hash de `hashes`.
+
+    Parâmetros
+    ----------
+    hashes : numpy.ndarray
+        Hashes (N,) dtype uint64.
+    h : int
+        Hash de 64 bits comparado.
+
+    Retorno
+    -------
+    numpy.ndarray
+        Distâncias (N,) entre 0 e 64.
+    """
+    diferentes = np.bitwise_xor(hashes, np.uint64(h))
+    return np.unpackbits(diferentes.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+class ColetorAtivo:
+    """
+    Seleciona frames informativos do streaming e os grava como dataset pré-rotulado em segundo plano.
+    """
+
+    def __init__(self, pasta: str = COLETA_DIR, limiar: float = 0.5, margem: float = COLETA_MARGEM,
+                 divergencia: float = COLETA_DIVERGENCIA, distancia: int = COLETA_HASH_DISTANCIA,
+                 intervalo: float = COLETA_INTERVALO_S, max_imagens: int = COLETA_MAX_IMAGENS,
+                 frames_contagem: int = COLETA_FRAMES_CONTAGEM, fila_max: int = COLETA_FILA_MAX):
+        """
+        Parâmetros
+        ----------
+        pasta : str, opcional
+            Pasta do dataset coletado, dentro de BASE_DIR (padrão: COLETA_DIR).
+        limiar : float, opcional
+            Confiança a partir da qual a interface conta um item (padrão: 0.5).
+        margem : float, opcional
+            Distância ao limiar abaixo da qual uma caixa é incerta (padrão: COLETA_MARGEM).
+        divergencia : float, opcional
+            Correção relativa mínima que salva os frames da contagem (padrão: COLETA_DIVERGENCIA).
+        distancia : int, opcional
+            Bits diferentes até os quais um frame repete um já salvo (padrão: COLETA_HASH_DISTANCIA).
+        intervalo : float, opcional
+            Segundos entre frames incertos salvos da mesma câmera (padrão: COLETA_INTERVALO_S).
+        max_imagens : int, opcional
+            Imagens no dataset a partir das quais a coleta para (padrão: COLETA_MAX_IMAGENS).
+        frames_contagem : int, opcional
+            Frames capturados mantidos para as correções (padrão: COLETA_FRAMES_CONTAGEM).
+        fila_max : int, opcional
+            Frames aguardando gravação antes de descartar os novos (padrão: COLETA_FILA_MAX).
+        """
+        self.pasta = pasta
+        self.limiar = limiar
+        self.margem = margem
+        # Confiança mínima que o modelo deve retornar para `observar` ver as caixas incertas
+        self.conf_min = max(0.0, limiar - margem)
+        self.divergencia = divergencia
+        self.distancia = distancia
+        self.intervalo = intervalo
+        self.max_imagens = max_imagens
+        self.salvas = 0
+        self.repetidas = 0
+        self.descartadas = 0
+        self._ultimos = {}
+        self._ultima_coleta = {}
+        self._contagem = deque(maxlen=frames_contagem)
+        self._lock = threading.Lock()
+        self._fila = queue.Queue(fila_max)
+        self._nomes = []
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self._total = 0
+        self._thread = threading.Thread(target=self._loop_gravacao, name="coleta_ativa", daemon=True)
+        self._thread.start()
+
+    def observar(self, camera: str, frame, deteccoes):
+        """
+        Examina o resultado de uma inferência (chamado pelo escalonador, antes de anotar o frame).
+
+        O frame é copiado para o buffer da câmera, usado pelas capturas e
+        correções, e enfileirado para gravação se tiver alguma caixa incerta.
+
+        Parâmetros
+        ----------
+        camera : str
+            Nome da câmera.
+        frame : numpy.ndarray
+            Frame BGR ainda sem anotações.
+        deteccoes : Deteccoes
+            Detecções com confiança de ao menos `conf_min`.
+
+        Retorno
+        -------
+        Deteccoes
+            Detecções com confiança de ao menos `limiar`, as que a interface conta.
+        """
+        with self._lock:
+            ultimo = self._ultimos.get(camera)
+            if ultimo is None or ultimo[0].shape != frame.shape:
+                ultimo = self._ultimos[camera] = [np.empty_like(frame), None]
+            np.copyto(ultimo[0], frame)
+            ultimo[1] = deteccoes
+
+        distancias = np.abs(deteccoes.confiancas - self.limiar)
+        agora = time.monotonic()
+        if (distancias < self.margem).any() and agora - self._ultima_coleta.get(camera, -np.inf) >= self.intervalo:
+            self._ultima_coleta[camera] = agora
+            self._enfileirar(frame.copy(), deteccoes,
+                             {"motivo": "margem", "camera": camera, "margem": round(float(distancias.min()), 3)})
+        return filtrar_confianca(deteccoes, self.limiar)
+
+    def registrar_captura(self, cameras) -> None:
+        """
+        Guarda os últimos frames inferidos das câmeras, que entraram na contagem da lista.
+
+        Parâmetros
+        ----------
+        cameras : iterable of str
+            Nomes das câmeras capturadas.
+        """
+        with self._lock:
+            for camera in cameras:
+                if camera in self._ultimos:
+                    frame, deteccoes = self._ultimos[camera]
+                    self._contagem.append((camera, frame.copy(), deteccoes))
+
+    def corrigir(self, item: str, anterior: int, nova: int) -> int:
+        """
+        Enfileira os frames da contagem se a quantidade corrigida divergir o bastante da contada.
+
+        Parâmetros
+        ----------
+        item : str
+            Nome do item corrigido.
+        anterior : int
+            Quantidade antes da edição.
+        nova : int
+            Quantidade informada.
+
+        Retorno
+        -------
+        int
+            Número de frames enfileirados.
+        """
+        if abs(nova - anterior) / max(anterior, 1) < self.divergencia:
+            return 0
+        with self._lock:
+            frames = list(self._contagem) or [
+                (camera, frame.copy(), deteccoes) for camera, (frame, deteccoes) in self._ultimos.items()
+            ]
+        for camera, frame, deteccoes in frames:
+            self._enfileirar(frame, deteccoes, {"motivo": "correcao", "camera": camera, "item": item,
+                                                "anterior": anterior, "nova": nova})
+        return len(frames)
+
+    def nova_contagem(self) -> None:
+        """
+        Esquece os frames capturados da contagem anterior ("Clear").
+        """
+        with self._lock:
+            self._contagem.clear()
+
+    def estatisticas(self) -> dict:
+        """
+        Retorna os contadores da coleta.
+
+        Retorno
+        -------
+        dict
+            Amostras salvas, repetidas (descartadas pelo hash), descartadas
+            (fila cheia ou limite de imagens) e aguardando gravação.
+        """
+        return {
+            "salvas": self.salvas,
+            "repetidas": self.repetidas,
+            "descartadas": self.descartadas,
+            "na_fila": self._fila.qsize(),
+        }
+
+    def fechar(self, timeout: float = 10.0) -> None:
+        """
+        Grava os frames pendentes e encerra a thread de gravação.
+
+        Parâmetros
+        ----------
+        timeout : float, opcional
+            Tempo máximo de espera, em segundos (padrão: 10.0).
+        """
+        self._fila.put(_FIM)
+        self._thread.join(timeout)
+
+    def _enfileirar(self, frame, deteccoes, info: dict) -> None:
+        info["momento"] = time.time()
+        try:
+            self._fila.put_nowait((frame, deteccoes, info))
+        except queue.Full:
+            self.descartadas += 1
+            contar("coleta.descartadas")
+
+    def _carregar(self) -> None:
+        """
+        Lê as classes, os hashes já salvos e o número de imagens do dataset coletado.
+        """
+        import yaml
+
+        caminho_yaml = os.path.join(self.pasta, "data.yaml")
+        if os.path.exists(caminho_yaml):
+            with open(caminho_yaml) as f:
+                self._nomes = list(yaml.safe_load(f).get("names") or [])
+        caminho_manifesto = os.path.join(self.pasta, "coleta.jsonl")
+        if os.path.exists(caminho_manifesto):
+            with open(caminho_manifesto, encoding="utf-8") as f:
+                hashes = [int(json.loads(linha)["hash"], 16) for linha in f if linha.strip()]
+            self._hashes = np.array(hashes, dtype=np.uint64)
+        pasta_imagens = os.path.join(self.pasta, "train", "images")
+        self._total = len(os.listdir(pasta_imagens)) if os.path.isdir(pasta_imagens) else 0
+
+    def _indices_classes(self, nomes: dict) -> np.ndarray:
+        """
+        Mapeia os índices de classe do modelo para os do dataset, acrescentando as classes novas ao `data.yaml`.
+        """
+        import yaml
+
+        novas = [nomes[i] for i in sorted(nomes) if nomes[i] not in self._nomes]
+        caminho_yaml = os.path.join(self.pasta, "data.yaml")
+        if novas or not os.path.exists(caminho_yaml):
+            self._nomes += novas
+            with open(caminho_yaml, "w") as f:
+                yaml.safe_dump({"train": "train/images", "nc": len(self._nomes), "names": self._nomes}, f)
+        mapa = np.zeros(max(nomes) + 1, dtype=np.int64)
+        for i, nome in nomes.items():
+            mapa[i] = self._nomes.index(nome)
+        return mapa
+
+    def _salvar(self, frame, deteccoes, info: dict) -> None:
+        if self._total >= self.max_imagens:
+            self.descartadas += 1
+            log_limitado("coleta.limite", "Coleta ativa parada: %d imagens em %s (COLETA_MAX_IMAGENS)",
+                         self._total, self.pasta, nivel=logging.WARNING, intervalo=3600)
+            return
+        h = hash_perceptual(frame)
+        if self._hashes.size and distancias_hamming(self._hashes, h).min() <= self.distancia:
+            self.repetidas += 1
+            contar("coleta.repetidas")
+            return
+
+        pasta_imagens = os.path.join(self.pasta, "train", "images")
+        pasta_rotulos = os.path.join(self.pasta, "train", "labels")
+        os.makedirs(pasta_imagens, exist_ok=True)
+        os.makedirs(pasta_rotulos, exist_ok=True)
+
+        # Pré-rótulos: as caixas que a interface contou, em xywh normalizado
+        rotulos = filtrar_confianca(deteccoes, self.limiar)
+        classes = self._indices_classes(rotulos.nomes)[rotulos.classes] if len(rotulos.classes) else []
+        altura, largura = frame.shape[:2]
+        caixas = rotulos.caixas.astype(np.float64)
+        xywh = np.stack([
+            (caixas[:, 0] + caixas[:, 2]) / 2 / largura,
+            (caixas[:, 1] + caixas[:, 3]) / 2 / altura,
+            (caixas[:, 2] - caixas[:, 0]) / largura,
+            (caixas[:, 3] - caixas[:, 1]) / altura,
+        ], axis=1).clip(0, 1)
+
+        nome = f"{time.strftime('%Y%m%d_%H%M%S', time.localtime(info['momento']))}_{h:016x}"
+        with open(os.path.join(pasta_rotulos, f"{nome}.txt"), "w") as f:
+            f.writelines(f"{c} {x:.6f} {y:.6f} {w:.6f} {a:.6f}\n" for c, (x, y, w, a) in zip(classes, xywh.tolist()))
+        cv2.imwrite(os.path.join(pasta_imagens, f"{nome}.jpg"), frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
+        with open(os.path.join(self.pasta, "coleta.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps({"imagem": f"{nome}.jpg", "hash": f"{h:016x}", "caixas": len(classes), **info},
+                               ensure_ascii=False) + "\n")
+
+        self._hashes = np.append(self._hashes, np.uint64(h))
+        self._total += 1
+        self.salvas += 1
+        contar("coleta.salvas")
+        logger.info(f"Amostra da coleta ativa salva ({info['motivo']}, {info['camera']}): {nome}.jpg")
+
+    def _loop_gravacao(self) -> None:
+        try:
+            self._carregar()
+        except (OSError, ValueError) as e:
+            logger.error(f"Falha ao ler o dataset da coleta ativa em {self.pasta}: {e}")
+        while True:
+            amostra = self._fila.get()
+            if amostra is _FIM:
+                return
+            try:
+                with medir("coleta.gravacao"):
+                    self._salvar(*amostra)
+            except Exception as e:
+                log_limitado("coleta.gravacao", "Falha ao salvar amostra da coleta ativa: %s", e, nivel=logging.ERROR)
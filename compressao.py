@@ -0,0 +1,629 @@
+"""
+Compressão do modelo treinado: destilação de conhecimento e poda estruturada de canais.
+
+1. Professor: um YOLO maior (COMPRESSAO_PROFESSOR, ex. yolo11s ou yolo11m) é
+   treinado no mesmo `data.yaml` que o modelo da etapa de treino.
+2. Destilação: o aluno nano (NOME_MODELO) é treinado com a perda do
+   Ultralytics mais um termo de destilação. Ele aproxima as probabilidades
+   de classe do professor (BCE com temperatura) e as distribuições de
+   distância das caixas (KL sobre as faixas da DFL), âncora por âncora,
+   com peso pela confiança do professor em cada âncora.
+3. Poda: os canais internos dos Bottleneck e das convoluções intermediárias
+   da cabeça Detect com menor |gama| do BatchNorm são removidos, em cada
+   fração de COMPRESSAO_PODA. Só são podados canais consumidos por uma
+   única camada, de modo que nenhuma concatenação ou soma residual muda de
+   largura. Cada modelo podado recebe um ajuste curto, também destilado.
+4. Pareto: o modelo treinado, o professor, o destilado e os podados são
+   avaliados no split de teste (o mesmo de `avaliar_e_predizer`). Para cada
+   um são medidos a latência por frame em CPU e o número de parâmetros, e os
+   pontos não dominados são marcados. O escolhido é o de maior mAP50-95
+   cuja latência não passa da do modelo treinado em mais de
+   COMPRESSAO_TOLERANCIA_LATENCIA. Ele é copiado para MODELO_COMPRIMIDO,
+   carregado pela interface com BACKEND_INFERENCIA = "comprimido".
+
+Uso:
+    python compressao.py               # destilação, poda e tabela de Pareto
+    python compressao.py --pareto      # só refaz a tabela com os modelos já gerados
+"""
+
+import argparse
+import json
+import math
+import os
+import shutil
+import statistics
+import time
+from functools import partial
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from torch import nn
+from ultralytics.utils.torch_utils import unwrap_model
+
+from avaliacao import avaliar
+from config import (
+    NOME_MODELO, IMGSZ_TREINO, MODELO_TREINADO, MODELO_COMPRIMIDO, HIPERPARAMETROS_PROFESSOR, COMPRESSAO_DIR,
+    COMPRESSAO_PROFESSOR, PROFESSOR_TREINADO, COMPRESSAO_PESO_DESTILACAO, COMPRESSAO_TEMPERATURA, COMPRESSAO_PODA,
+    COMPRESSAO_EPOCAS_AJUSTE, COMPRESSAO_TOLERANCIA_LATENCIA,
+)
+from instrumentacao import medir
+from logger import logger
+from train import TreinadorYOLO, argumentos_treino, registrar_tempo_epocas, setar_seed
+
+# Múltiplo do número de canais mantidos em cada camada podada (larguras alinhadas aos kernels de CPU)
+MULTIPLO_CANAIS = 8
+
+
+def _ramo_muitos(preds) -> dict:
+    # Saída bruta da cabeça: (y, preds) em avaliação; {"one2many", "one2one"} nas cabeças ponta a ponta
+    if isinstance(preds, (tuple, list)):
+        preds = preds[1]
+    return preds.get("one2many", preds)
+
+
+def perda_destilacao(preds_aluno, preds_professor, temperatura: float = COMPRESSAO_TEMPERATURA):
+    """
+    Calcula o termo de destilação entre as saídas brutas da cabeça Detect do aluno e do professor.
+
+    As classes são comparadas com BCE entre os logits do aluno e as
+    probabilidades do professor, ambos divididos pela temperatura. As caixas
+    são comparadas com KL entre as distribuições das faixas da DFL. Os dois
+    termos são ponderados, em cada âncora, pela maior probabilidade de classe
+    do professor, para que o fundo não domine a média.
+
+    Parâmetros
+    ----------
+    preds_aluno : dict
+        Saída de treino da cabeça do aluno ("boxes" (B, 4*reg_max, A) e "scores" (B, nc, A)).
+    preds_professor : dict ou tuple
+        Saída da cabeça do professor, em treino ou em avaliação.
+    temperatura : float, opcional
+        Temperatura aplicada aos logits (padrão: COMPRESSAO_TEMPERATURA).
+
+    Retorno
+    -------
+    torch.Tensor
+        Escalar com o termo de destilação médio por imagem.
+    """
+    aluno, professor = _ramo_muitos(preds_aluno), _ramo_muitos(preds_professor)
+    scores_aluno, scores_prof = aluno["scores"].float(), professor["scores"].float().detach()
+    caixas_aluno, caixas_prof = aluno["boxes"].float(), professor["boxes"].float().detach()
+    if scores_aluno.shape != scores_prof.shape or caixas_aluno.shape != caixas_prof.shape:
+        raise ValueError(
+            f"Saídas incompatíveis entre aluno e professor: {tuple(scores_aluno.shape)} x {tuple(scores_prof.shape)}"
+        )
+
+    lote, _, ancoras = scores_aluno.shape
+    peso = scores_prof.sigmoid().amax(1)  # (B, A)
+    peso = peso / peso.sum(1, keepdim=True).clamp_min(1e-6)
+
+    alvo_classes = (scores_prof / temperatura).sigmoid()
+    classes = F.binary_cross_entropy_with_logits(scores_aluno / temperatura, alvo_classes, reduction="none").mean(1)
+
+    reg_max = caixas_aluno.shape[1] // 4
+    log_aluno = (caixas_aluno.view(lote, 4, reg_max, ancoras) / temperatura).log_softmax(2)
+    log_prof = (caixas_prof.view(lote, 4, reg_max, ancoras) / temperatura).log_softmax(2)
+    caixas = (log_prof.exp() * (log_prof - log_aluno)).sum(2).mean(1)
+
+    return ((classes + caixas) * peso).sum(1).mean() * temperatura**2
+
+
+class TreinadorDestilacao(TreinadorYOLO):
+    """
+    `TreinadorYOLO` que soma à perda do aluno o termo de destilação de um professor congelado.
+    """
+
+    def __init__(self, *args, professor: str = PROFESSOR_TREINADO, peso: float = COMPRESSAO_PESO_DESTILACAO,
+                 temperatura: float = COMPRESSAO_TEMPERATURA, manter_arquitetura: bool = False, **kwargs):
+        """
+        Parâmetros
+        ----------
+        professor : str, opcional
+            Pesos `.pt` do professor (padrão: PROFESSOR_TREINADO).
+        peso : float, opcional
+            Peso do termo de destilação na perda (padrão: COMPRESSAO_PESO_DESTILACAO).
+        temperatura : float, opcional
+            Temperatura dos logits (padrão: COMPRESSAO_TEMPERATURA).
+        manter_arquitetura : bool, opcional
+            Treina o modelo recebido como está, em vez de reconstruí-lo a
+            partir do yaml; necessário para modelos podados (padrão: False).
+        *args, **kwargs
+            Argumentos repassados a `TreinadorYOLO`.
+        """
+        self.caminho_professor = professor
+        self.peso = peso
+        self.temperatura = temperatura
+        self.manter_arquitetura = manter_arquitetura
+        self.professor = None
+        self._ganchos = []
+        self._preds_aluno = None
+        self._soma_destilacao = 0.0
+        self._passos = 0
+        # O cache de características substitui a passada do aluno, que a destilação precisa
+        super().__init__(*args, **{**kwargs, "cache_caracteristicas": False})
+
+    def get_model(self, cfg=None, weights=None, verbose=True):
+        # O yaml de um modelo podado ainda descreve as larguras originais
+        if self.manter_arquitetura and isinstance(weights, nn.Module):
+            return weights
+        return super().get_model(cfg, weights, verbose)
+
+    def _setup_train(self):
+        super()._setup_train()
+        from ultralytics import YOLO
+
+        aluno = unwrap_model(self.model)
+        professor = YOLO(self.caminho_professor).model.to(self.device).float().eval()
+        for p in professor.parameters():
+            p.requires_grad_(False)
+        cabeca_aluno, cabeca_prof = aluno.model[-1], professor.model[-1]
+        if (cabeca_aluno.nc, cabeca_aluno.reg_max) != (cabeca_prof.nc, cabeca_prof.reg_max) or not torch.equal(
+            cabeca_aluno.stride.cpu(), cabeca_prof.stride.cpu()
+        ):
+            raise ValueError(
+                f"Professor incompatível com o aluno: nc={cabeca_prof.nc}, reg_max={cabeca_prof.reg_max}, "
+                f"strides={cabeca_prof.stride.tolist()} (aluno: nc={cabeca_aluno.nc}, "
+                f"reg_max={cabeca_aluno.reg_max}, strides={cabeca_aluno.stride.tolist()})"
+            )
+        self.professor = professor
+
+        # Como o cache de características, os ganchos entram depois da criação da EMA
+        # e saem ao fim do treino, para não irem parar nos checkpoints
+        self._ganchos = [
+            self.model.register_forward_pre_hook(self._predizer_aluno, with_kwargs=True),
+            self.model.register_forward_hook(self._somar_destilacao, with_kwargs=True),
+        ]
+        self.add_callback("on_train_epoch_end", lambda trainer: trainer._registrar_destilacao())
+        self.add_callback("on_train_end", lambda trainer: trainer._remover_destilacao())
+        logger.info(
+            f"Destilação de {self.caminho_professor}: peso {self.peso}, temperatura {self.temperatura}, "
+            f"professor com {sum(p.numel() for p in professor.parameters()):,} parâmetros"
+        )
+
+    def _predizer_aluno(self, modulo, args, kwargs):
+        # Só no passo de treino, chamado como model(batch)
+        if not modulo.training or not args or not isinstance(args[0], dict) or "preds" in kwargs:
+            return None
+        self._preds_aluno = unwrap_model(modulo).predict(args[0]["img"])
+        return args, {**kwargs, "preds": self._preds_aluno}
+
+    def _somar_destilacao(self, modulo, args, kwargs, saida):
+        preds, self._preds_aluno = self._preds_aluno, None
+        if preds is None:
+            return None
+        imagens = args[0]["img"]
+        with torch.no_grad():
+            preds_professor = self.professor(imagens)
+        destilacao = perda_destilacao(preds, preds_professor, self.temperatura) * self.peso
+        self._soma_destilacao += destilacao.item()
+        self._passos += 1
+
+        # O treinador soma os componentes da perda (já multiplicados pelo lote);
+        # o termo é dividido entre eles para entrar uma única vez na soma
+        perda, itens = saida
+        return perda + destilacao * imagens.shape[0] / perda.numel(), itens
+
+    def _registrar_destilacao(self) -> None:
+        if self._passos:
+            logger.info(f"Época {self.epoch + 1}: termo de destilação médio {self._soma_destilacao / self._passos:.4f}")
+        self._soma_destilacao, self._passos = 0.0, 0
+
+    def _remover_destilacao(self) -> None:
+        for gancho in self._ganchos:
+            gancho.remove()
+        self._ganchos = []
+        self.professor = None
+
+
+def _conv(camada) -> nn.Conv2d:
+    return camada.conv if hasattr(camada, "conv") else camada
+
+
+def _importancia(camada) -> torch.Tensor:
+    # |gama| do BatchNorm; em camadas fundidas ou sem BN, a norma L1 dos filtros
+    bn = getattr(camada, "bn", None)
+    if bn is not None:
+        return bn.weight.detach().abs()
+    return _conv(camada).weight.detach().abs().sum((1, 2, 3))
+
+
+def _podar_saida(camada, manter: torch.Tensor) -> None:
+    conv = _conv(camada)
+    conv.weight = nn.Parameter(conv.weight.data[manter].clone())
+    if conv.bias is not None:
+        conv.bias = nn.Parameter(conv.bias.data[manter].clone())
+    conv.out_channels = len(manter)
+    bn = getattr(camada, "bn", None)
+    if bn is not None:
+        bn.weight = nn.Parameter(bn.weight.data[manter].clone())
+        bn.bias = nn.Parameter(bn.bias.data[manter].clone())
+        bn.running_mean = bn.running_mean[manter].clone()
+        bn.running_var = bn.running_var[manter].clone()
+        bn.num_features = len(manter)
+
+
+def _podar_por_canal(camada, manter: torch.Tensor) -> None:
+    # Convolução depthwise: cada canal de saída depende só do canal de entrada correspondente
+    _podar_saida(camada, manter)
+    conv = _conv(camada)
+    conv.in_channels = conv.groups = len(manter)
+
+
+def _podar_entrada(camada, manter: torch.Tensor) -> None:
+    conv = _conv(camada)
+    conv.weight = nn.Parameter(conv.weight.data[:, manter].clone())
+    conv.in_channels = len(manter)
+
+
+def grupos_podaveis(modelo) -> list:
+    """
+    Lista os canais que podem ser podados sem alterar a largura de nenhuma concatenação ou soma.
+
+    Cada grupo é uma camada produtora cujos canais de saída passam, opcionalmente,
+    por convoluções depthwise e chegam a uma única camada consumidora: o canal
+    oculto de cada Bottleneck (cv1 -> cv2) e as convoluções intermediárias de
+    cada ramo da cabeça Detect.
+
+    Parâmetros
+    ----------
+    modelo : ultralytics.nn.tasks.DetectionModel
+        Modelo PyTorch (`YOLO(...).model`).
+
+    Retorno
+    -------
+    list of tuple
+        Tuplas (produtora, [depthwise, ...], consumidora).
+    """
+    from ultralytics.nn.modules.block import Bottleneck
+
+    grupos = []
+    for modulo in modelo.modules():
+        if type(modulo) is Bottleneck and _conv(modulo.cv2).groups == 1:
+            grupos.append((modulo.cv1, [], modulo.cv2))
+
+    cabeca = modelo.model[-1]
+    ramos = [(getattr(cabeca, "cv2", None), getattr(cabeca, "cv3", None)),
+             (getattr(cabeca, "one2one_cv2", None), getattr(cabeca, "one2one_cv3", None))]
+    for caixas, classes in ramos:
+        for sequencia in caixas or []:
+            grupos += [(sequencia[0], [], sequencia[1]), (sequencia[1], [], sequencia[2])]
+        for sequencia in classes or []:
+            if isinstance(sequencia[0], nn.Sequential):
+                # DWConv -> Conv 1x1 -> DWConv -> Conv 1x1 -> Conv2d
+                grupos += [(sequencia[0][1], [sequencia[1][0]], sequencia[1][1]), (sequencia[1][1], [], sequencia[2])]
+            else:
+                grupos += [(sequencia[0], [], sequencia[1]), (sequencia[1], [], sequencia[2])]
+    return grupos
+
+
+def podar_modelo(modelo, fracao: float) -> dict:
+    """
+    Remove, no próprio modelo, a fração dos canais podáveis de menor importância em cada grupo.
+
+    O número de canais mantidos em cada grupo é arredondado para cima até um
+    múltiplo de MULTIPLO_CANAIS (no mínimo MULTIPLO_CANAIS).
+
+    Parâmetros
+    ----------
+    modelo : ultralytics.nn.tasks.DetectionModel
+        Modelo PyTorch (`YOLO(...).model`), modificado no próprio objeto.
+    fracao : float
+        Fração dos canais de cada grupo a remover, entre 0 e 1.
+
+    Retorno
+    -------
+    dict
+        Parâmetros e canais podáveis antes e depois da poda.
+    """
+    if not 0 <= fracao < 1:
+        raise ValueError(f"Fração de poda inválida: {fracao}. Use um valor em [0, 1).")
+
+    parametros_antes = sum(p.numel() for p in modelo.parameters())
+    canais_antes = canais_depois = 0
+    with torch.no_grad():
+        for produtora, depthwise, consumidora in grupos_podaveis(modelo):
+            importancia = _importancia(produtora)
+            total = len(importancia)
+            n = min(total, max(MULTIPLO_CANAIS, math.ceil(total * (1 - fracao) / MULTIPLO_CANAIS) * MULTIPLO_CANAIS))
+            canais_antes += total
+            canais_depois += n
+            if n == total:
+                continue
+            manter = importancia.argsort(descending=True)[:n].sort().values
+            _podar_saida(produtora, manter)
+            for camada in depthwise:
+                _podar_por_canal(camada, manter)
+            _podar_entrada(consumidora, manter)
+
+    return {
+        "parametros_antes": parametros_antes,
+        "parametros_depois": sum(p.numel() for p in modelo.parameters()),
+        "canais_antes": canais_antes,
+        "canais_depois": canais_depois,
+    }
+
+
+def _treinar(modelo, nome: str, hiperparametros: dict, destino: str, **destilacao) -> str:
+    # Treino no mesmo data.yaml e hiperparâmetros da etapa de treino; com `destilacao`, usa TreinadorDestilacao
+    setar_seed(42)
+    argumentos = argumentos_treino(modelo, hiperparametros)
+    if destilacao:
+        argumentos["trainer"] = partial(TreinadorDestilacao, aumentar=argumentos["trainer"].keywords["aumentar"], **destilacao)
+    registrar_tempo_epocas(modelo)
+    modelo.train(**argumentos, project=COMPRESSAO_DIR, name=nome, exist_ok=True, verbose=False)
+    modelo.save(destino)
+    logger.info(f"Modelo {nome} salvo em: {destino}")
+    return destino
+
+
+@medir("compressao.professor")
+def treinar_professor(modelo_base: str = COMPRESSAO_PROFESSOR, hiperparametros: dict = None) -> str:
+    """
+    Treina o professor da destilação no `data.yaml` consolidado.
+
+    Parâmetros
+    ----------
+    modelo_base : str, opcional
+        Pesos ou yaml do professor (padrão: COMPRESSAO_PROFESSOR).
+    hiperparametros : dict, opcional
+        Valores que substituem os de HIPERPARAMETROS_TREINO (padrão: HIPERPARAMETROS_PROFESSOR).
+
+    Retorno
+    -------
+    str
+        Caminho dos pesos do professor (PROFESSOR_TREINADO).
+    """
+    from ultralytics import YOLO
+
+    os.makedirs(COMPRESSAO_DIR, exist_ok=True)
+    hp = HIPERPARAMETROS_PROFESSOR if hiperparametros is None else hiperparametros
+    return _treinar(YOLO(modelo_base), "professor", hp, PROFESSOR_TREINADO)
+
+
+@medir("compressao.destilacao")
+def destilar(professor: str = PROFESSOR_TREINADO, aluno: str = NOME_MODELO, hiperparametros: dict = None) -> str:
+    """
+    Treina o aluno com a perda do Ultralytics mais o termo de destilação do professor.
+
+    Parâmetros
+    ----------
+    professor : str, opcional
+        Pesos do professor (padrão: PROFESSOR_TREINADO).
+    aluno : str, opcional
+        Modelo base do aluno (padrão: NOME_MODELO).
+    hiperparametros : dict, opcional
+        Valores que substituem os de HIPERPARAMETROS_TREINO.
+
+    Retorno
+    -------
+    str
+        Caminho dos pesos do aluno destilado.
+    """
+    from ultralytics import YOLO
+
+    destino = os.path.join(COMPRESSAO_DIR, "destilado.pt")
+    return _treinar(YOLO(aluno), "destilado", hiperparametros, destino, professor=professor)
+
+
+@medir("compressao.poda")
+def podar_e_ajustar(modelo: str, fracao: float, professor: str = PROFESSOR_TREINADO,
+                    epocas: int = COMPRESSAO_EPOCAS_AJUSTE) -> str:
+    """
+    Poda o modelo e recupera a precisão com um ajuste curto destilado do professor.
+
+    Parâmetros
+    ----------
+    modelo : str
+        Pesos do modelo a podar (normalmente o aluno destilado).
+    fracao : float
+        Fração dos canais podáveis a remover.
+    professor : str, opcional
+        Pesos do professor (padrão: PROFESSOR_TREINADO).
+    epocas : int, opcional
+        Épocas de ajuste (padrão: COMPRESSAO_EPOCAS_AJUSTE).
+
+    Retorno
+    -------
+    str
+        Caminho dos pesos podados e ajustados.
+    """
+    from ultralytics import YOLO
+
+    yolo = YOLO(modelo)
+    resumo = podar_modelo(yolo.model, fracao)
+    logger.info(
+        f"Poda de {fracao:.0%}: {resumo['parametros_antes']:,} -> {resumo['parametros_depois']:,} parâmetros, "
+        f"{resumo['canais_antes']} -> {resumo['canais_depois']} canais podáveis"
+    )
+    nome = f"podado_{round(fracao * 100)}"
+    destino = os.path.join(COMPRESSAO_DIR, f"{nome}.pt")
+    # Sem aquecimento: o modelo já está treinado e o ajuste é curto
+    hp = {"epochs": epocas, "warmup_epochs": 0, "patience": epocas}
+    return _treinar(yolo, nome, hp, destino, professor=professor, manter_arquitetura=True)
+
+
+def medir_latencia(modelo, imgsz: int = IMGSZ_TREINO, repeticoes: int = 50, aquecimento: int = 5) -> float:
+    """
+    Mede a latência mediana de uma inferência de um frame 640x480 em CPU, com pré e pós-processamento.
+
+    Parâmetros
+    ----------
+    modelo : str ou ultralytics.YOLO
+        Caminho dos pesos ou modelo carregado.
+    imgsz : int, opcional
+        Tamanho de inferência (padrão: IMGSZ_TREINO).
+    repeticoes : int, opcional
+        Inferências medidas (padrão: 50).
+    aquecimento : int, opcional
+        Inferências descartadas antes da medição (padrão: 5).
+
+    Retorno
+    -------
+    float
+        Latência mediana em ms por frame.
+    """
+    from ultralytics import YOLO
+
+    if isinstance(modelo, str):
+        modelo = YOLO(modelo, task="detect")
+    frame = np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+    tempos = []
+    for i in range(aquecimento + repeticoes):
+        inicio = time.perf_counter()
+        modelo(frame, imgsz=imgsz, device="cpu", verbose=False)
+        if i >= aquecimento:
+            tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000
+
+
+def fronteira_pareto(pontos: list) -> list:
+    """
+    Marca os pontos não dominados em (mAP50-95 maior, latência menor, parâmetros menos).
+
+    Parâmetros
+    ----------
+    pontos : list of dict
+        Pontos com as chaves "mAP50-95", "latencia_ms" e "parametros".
+
+    Retorno
+    -------
+    list of dict
+        Os mesmos pontos com a chave "pareto" preenchida.
+    """
+    def domina(a, b):
+        melhor_ou_igual = (a["mAP50-95"] >= b["mAP50-95"] and a["latencia_ms"] <= b["latencia_ms"]
+                           and a["parametros"] <= b["parametros"])
+        estritamente = (a["mAP50-95"] > b["mAP50-95"] or a["latencia_ms"] < b["latencia_ms"]
+                        or a["parametros"] < b["parametros"])
+        return melhor_ou_igual and estritamente
+
+    for ponto in pontos:
+        ponto["pareto"] = not any(domina(outro, ponto) for outro in pontos if outro is not ponto)
+    return pontos
+
+
+def escolher_ponto(pontos: list, referencia: str = "treinado",
+                   tolerancia: float = COMPRESSAO_TOLERANCIA_LATENCIA) -> dict:
+    """
+    Escolhe o ponto de maior mAP50-95 com latência de até (1 + tolerancia) vezes a da referência.
+
+    Parâmetros
+    ----------
+    pontos : list of dict
+        Pontos da tabela de Pareto.
+    referencia : str, opcional
+        Nome do ponto cuja latência é o limite (padrão: "treinado").
+    tolerancia : float, opcional
+        Folga relativa de latência (padrão: COMPRESSAO_TOLERANCIA_LATENCIA).
+
+    Retorno
+    -------
+    dict
+        Ponto escolhido; a própria referência, se nenhum outro couber no limite.
+    """
+    base = next(p for p in pontos if p["nome"] == referencia)
+    limite = base["latencia_ms"] * (1 + tolerancia)
+    candidatos = [p for p in pontos if p["latencia_ms"] <= limite]
+    return max(candidatos, key=lambda p: (p["mAP50-95"], p["mAP50"], -p["latencia_ms"]))
+
+
+def tabela_pareto(modelos: dict, imgsz: int = IMGSZ_TREINO) -> list:
+    """
+    Avalia cada modelo no split de teste e mede a latência em CPU e o número de parâmetros.
+
+    Parâmetros
+    ----------
+    modelos : dict
+        Mapeamento nome -> caminho dos pesos.
+    imgsz : int, opcional
+        Tamanho de inferência da medição de latência (padrão: IMGSZ_TREINO).
+
+    Retorno
+    -------
+    list of dict
+        Um ponto por modelo, com nome, caminho, mAP50, mAP50-95, latência em
+        ms por frame, parâmetros e se está na fronteira de Pareto.
+    """
+    from ultralytics import YOLO
+
+    pontos = []
+    for nome, caminho in modelos.items():
+        if not os.path.exists(caminho):
+            logger.warning(f"Modelo {nome} não encontrado, fora da tabela: {caminho}")
+            continue
+        # As predições do teste ficam no cache de avaliacao.py, compartilhado com avaliar_e_predizer
+        metricas = avaliar(caminho, "test")
+        modelo = YOLO(caminho, task="detect")
+        pontos.append({
+            "nome": nome,
+            "caminho": caminho,
+            "mAP50": metricas["metrics/mAP50(B)"],
+            "mAP50-95": metricas["metrics/mAP50-95(B)"],
+            "latencia_ms": medir_latencia(modelo, imgsz),
+            "parametros": sum(p.numel() for p in modelo.model.parameters()),
+        })
+    return fronteira_pareto(pontos)
+
+
+@medir("compressao")
+def comprimir_modelo(fracoes=COMPRESSAO_PODA, professor: str = PROFESSOR_TREINADO, apenas_pareto: bool = False) -> dict:
+    """
+    Destila o aluno, poda-o em cada fração, monta a tabela de Pareto e copia o ponto escolhido.
+
+    Parâmetros
+    ----------
+    fracoes : iterable of float, opcional
+        Frações de poda (padrão: COMPRESSAO_PODA).
+    professor : str, opcional
+        Pesos do professor (padrão: PROFESSOR_TREINADO).
+    apenas_pareto : bool, opcional
+        Não treina; só monta a tabela com os modelos já gerados (padrão: False).
+
+    Retorno
+    -------
+    dict
+        Pontos da tabela e nome do escolhido, também salvos em `pareto.json` dentro de COMPRESSAO_DIR.
+    """
+    if not os.path.exists(professor):
+        raise FileNotFoundError(f"Professor não encontrado: {professor}. Rode a etapa 'professor' antes.")
+    os.makedirs(COMPRESSAO_DIR, exist_ok=True)
+
+    destilado = os.path.join(COMPRESSAO_DIR, "destilado.pt")
+    modelos = {"treinado": MODELO_TREINADO, "professor": professor, "destilado": destilado}
+    for fracao in fracoes:
+        modelos[f"podado_{round(fracao * 100)}"] = os.path.join(COMPRESSAO_DIR, f"podado_{round(fracao * 100)}.pt")
+
+    if not apenas_pareto:
+        destilar(professor)
+        for fracao in fracoes:
+            podar_e_ajustar(destilado, fracao, professor)
+
+    with medir("compressao.pareto"):
+        pontos = tabela_pareto(modelos)
+    escolhido = escolher_ponto(pontos)
+    shutil.copyfile(escolhido["caminho"], MODELO_COMPRIMIDO)
+
+    resultado = {"pontos": pontos, "escolhido": escolhido["nome"]}
+    caminho_json = os.path.join(COMPRESSAO_DIR, "pareto.json")
+    with open(caminho_json, "w") as f:
+        json.dump(resultado, f, indent=4)
+
+    logger.info(f"{'modelo':<12} {'mAP50':>7} {'mAP50-95':>9} {'ms/frame':>9} {'parâmetros':>11}  pareto")
+    for p in pontos:
+        logger.info(
+            f"{p['nome']:<12} {p['mAP50']:>7.4f} {p['mAP50-95']:>9.4f} {p['latencia_ms']:>9.1f} "
+            f"{p['parametros']:>11,}  {'*' if p['pareto'] else ''}"
+        )
+    logger.info(f"Modelo escolhido: {escolhido['nome']}, copiado para {MODELO_COMPRIMIDO}")
+    return resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Destilação, poda e tabela de Pareto do modelo treinado")
+    parser.add_argument("--pareto", action="store_true", help="só refaz a tabela com os modelos já gerados")
+    parser.add_argument("--professor", action="store_true", help="treina o professor antes")
+    args = parser.parse_args()
+    if args.professor:
+        treinar_professor()
+    comprimir_modelo(apenas_pareto=args.pareto)
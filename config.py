@@ -13,15 +13,209 @@ API_KEY = 'API_KEY para o Dataset'
 YOLO_MODELO = "yolo11n"
 NOME_MODELO = f"{YOLO_MODELO}.pt"
 
+# Downloads paralelos do Roboflow com novas tentativas (espera base dobrada a cada falha)
+DOWNLOAD_CONCORRENCIA = 2
+DOWNLOAD_TENTATIVAS = 3
+DOWNLOAD_BACKOFF = 2.0    # segundos
+
 # Diretórios principais
 BASE_DIR = os.path.join(os.getcwd(), "datasets")
 RESULTADOS_DIR = os.path.join(os.getcwd(), "resultados")
 
+# Índice persistente das imagens e rótulos dos datasets (ver indice_dataset.py)
+INDICE_DATASETS = os.path.join(BASE_DIR, "indice_datasets.json.gz")
+
+# Rótulos remapeados para as classes unificadas, em arrays .npy lidos direto pelo treino
+ROTULOS_PACOTES = True
+ROTULOS_DIR = os.path.join(BASE_DIR, "rotulos")
+
+# Tamanho das imagens no treino
+IMGSZ_TREINO = 640
+
+# Hiperparâmetros de treinar_modelo; camadas_descongeladas = None treina todas as camadas
+HIPERPARAMETROS_TREINO = {
+    "epochs": 15,
+    "lr0": 0.001,
+    "batch": 16,
+    "imgsz": IMGSZ_TREINO,
+    "patience": 3,
+    "camadas_descongeladas": None,
+    # Camadas congeladas: "backbone", número de camadas iniciais ou lista de
+    # índices/nomes ("model.9", "SPPF"); tem prioridade sobre camadas_descongeladas
+    "congelar": None,
+    # False treina sem aumento de dados (só letterbox), o que permite CACHE_CARACTERISTICAS
+    "aumentar": True,
+}
+
+# Guarda em memória as saídas das camadas iniciais congeladas e não as recalcula
+# nas épocas seguintes; só vale com "aumentar": False e "congelar" definido
+CACHE_CARACTERISTICAS = False
+CACHE_CARACTERISTICAS_MB = 4096
+
+# Cache opcional das imagens já decodificadas e redimensionadas para IMGSZ_TREINO
+# (memmap em disco, ~1,2 MB por imagem em 640); requer ROTULOS_PACOTES
+CACHE_IMAGENS = False
+CACHE_IMAGENS_DIR = os.path.join(BASE_DIR, "cache_imagens")
+
+# Pesos treinados e versões exportadas para backends otimizados de CPU
+MODELO_TREINADO = os.path.join(RESULTADOS_DIR, "modelo_treinado.pt")
+MODELO_COMPRIMIDO = os.path.join(RESULTADOS_DIR, "modelo_comprimido.pt")  # ponto escolhido por compressao.py
+CAMINHOS_BACKENDS = {
+    "pytorch": MODELO_TREINADO,
+    "comprimido": MODELO_COMPRIMIDO,
+    "onnx": os.path.join(RESULTADOS_DIR, "modelo_treinado.onnx"),
+    "openvino": os.path.join(RESULTADOS_DIR, "modelo_treinado_openvino_model"),
+    "openvino_int8": os.path.join(RESULTADOS_DIR, "modelo_treinado_int8_openvino_model"),
+}
+
+# Backend usado por app.py e predict.py: "pytorch", "comprimido", "onnx", "openvino" ou "openvino_int8"
+BACKEND_INFERENCIA = "pytorch"
+
+# Compressão do modelo (ver compressao.py): um professor maior é destilado no aluno NOME_MODELO,
+# que é podado em cada fração de COMPRESSAO_PODA e ajustado; a tabela de Pareto (mAP x latência
+# em CPU x parâmetros) fica em COMPRESSAO_DIR e o ponto escolhido em MODELO_COMPRIMIDO
+COMPRESSAO = False
+COMPRESSAO_DIR = os.path.join(RESULTADOS_DIR, "compressao")
+COMPRESSAO_PROFESSOR = "yolo11s.pt"     # modelo base do professor (ex.: "yolo11m.pt")
+HIPERPARAMETROS_PROFESSOR = {"epochs": 30, "patience": 5}  # substituem os de HIPERPARAMETROS_TREINO no professor
+PROFESSOR_TREINADO = os.path.join(COMPRESSAO_DIR, "professor.pt")
+COMPRESSAO_PESO_DESTILACAO = 1.0        # peso do termo de destilação somado à perda do aluno
+COMPRESSAO_TEMPERATURA = 2.0            # temperatura dos logits do aluno e do professor
+COMPRESSAO_PODA = (0.25, 0.5)           # frações dos canais podáveis removidas (um modelo por fração)
+COMPRESSAO_EPOCAS_AJUSTE = 5            # épocas de ajuste destilado depois da poda
+COMPRESSAO_TOLERANCIA_LATENCIA = 0.05   # o ponto escolhido pode ser até 5% mais lento que o modelo treinado
+
+# Busca de hiperparâmetros (sweep.py): valores testados por parâmetro
+ESPACO_BUSCA = {
+    "epochs": [10, 15, 25],
+    "lr0": [0.0005, 0.001, 0.005, 0.01],
+    "batch": [8, 16],
+    "imgsz": [480, 640],
+    "patience": [3, 5],
+    "camadas_descongeladas": [5, 10, None],
+}
+SWEEP_TENTATIVAS = 12             # combinações sorteadas do espaço (todas, se o espaço for menor)
+SWEEP_CONCORRENCIA = 2            # tentativas executadas ao mesmo tempo
+SWEEP_CPUS_POR_TENTATIVA = None   # núcleos fixados por tentativa; None divide os núcleos disponíveis
+SWEEP_PODA_AQUECIMENTO = 3        # épocas antes de uma tentativa poder ser podada
+SWEEP_PODA_MIN_TENTATIVAS = 3     # tentativas com a mesma época necessárias para calcular a mediana
+SWEEP_BANCO = os.path.join(RESULTADOS_DIR, "sweep.sqlite")
+
+# Exporta os backends e compara latência/mAP com o .pt após o treinamento
+EXPORTAR_BACKENDS = True
+
 # Dataset que contém um conjunto de teste
 DATASET_COM_TESTE = "itens-de-dispensa-8pudf_v4"
 
+# Avaliação (ver avaliacao.py): as predições de cada split são calculadas uma vez por
+# pesos e guardadas em cache; métricas, matriz de confusão e rótulos saem do cache
+AVALIACAO_CACHE_DIR = os.path.join(RESULTADOS_DIR, "cache_avaliacao")
+AVALIACAO_CONF = 0.001            # confiança mínima guardada no cache (a mesma do `val` do Ultralytics)
+AVALIACAO_IOU = 0.7               # limiar do NMS das predições guardadas
+AVALIACAO_MAX_DET = 300           # máximo de caixas por imagem
+AVALIACAO_LOTE = 16               # imagens por chamada ao modelo
+AVALIACAO_CONF_IMAGENS = 0.25     # confiança mínima das caixas desenhadas nas imagens de predição
+
 # Lista de datasets adicionais no formato (workspace, projeto, versão)
 LISTA_DATASETS = [
     ("identvintern", "groceries-9vwuo", 3),
     ("ic-rfkuy", "itens-de-dispensa-8pudf", 4),
 ]
+
+# Contagem offline de inventário (python predict.py <pastas/vídeos>)
+INVENTARIO_LOTE = 8               # frames por chamada ao modelo
+INVENTARIO_TRABALHADORES = 4      # threads de decodificação das imagens
+INVENTARIO_PREFETCH = 4           # lotes decodificados à frente da inferência
+INVENTARIO_PASSO_VIDEO = 30       # usa 1 a cada N frames dos vídeos
+INVENTARIO_CONF = 0.5             # confiança mínima das detecções contadas
+
+# Inferência fatiada para fotos de alta resolução (ver fatiamento.py)
+FATIAMENTO_TAMANHO = 640          # lado das janelas em pixels
+FATIAMENTO_SOBREPOSICAO = 0.2     # fração de sobreposição entre janelas vizinhas
+FATIAMENTO_LIMIAR_NMS = 0.6       # sobreposição a partir da qual caixas da mesma classe são fundidas
+FATIAMENTO_METRICA = "ios"        # "ios" (interseção sobre a menor caixa) ou "iou"
+FATIAMENTO_IMAGEM_INTEIRA = True  # inclui a imagem inteira no lote, para itens grandes
+FATIAMENTO_LOTE = None            # janelas por chamada ao modelo; None envia todas em um único lote
+FATIAMENTO_CAPTURA = False        # o botão Capture da interface usa a inferência fatiada
+
+# Streaming da interface gráfica: o modelo só roda quando há movimento na cena
+# ou quando o intervalo máximo expira; entre execuções reutiliza as últimas detecções
+GATE_MOVIMENTO = True
+LIMIAR_MOVIMENTO = 4.0            # diferença média absoluta (0-255) entre frames reduzidos
+INTERVALO_MAX_INFERENCIA = 2.0    # segundos sem inferência antes de forçar uma nova
+CADENCIA_MINIMA_INFERENCIA = 1    # com movimento, infere no máximo a cada N frames
+
+# Modo de rastreamento da interface: conta IDs únicos por classe (ver rastreamento.py)
+RASTREAMENTO_IOU = 0.3            # IoU mínima entre caixa prevista e detecção
+RASTREAMENTO_CONFIRMACAO = 3      # inferências com correspondência para confirmar um item
+RASTREAMENTO_MAX_PERDIDOS = 15    # inferências sem correspondência antes de encerrar a trilha
+
+# Histórico do inventário da interface (ver estoque.py): uma linha por captura,
+# trilha confirmada ou correção, gravadas em lotes por uma thread em segundo plano
+ESTOQUE_BANCO = os.path.join(RESULTADOS_DIR, "estoque.sqlite")
+ESTOQUE_TERMINAL = None           # identificação deste terminal; None usa o nome da máquina
+ESTOQUE_LOTE = 500                # registros por transação
+ESTOQUE_INTERVALO_S = 1.0         # espera máxima antes de gravar um lote incompleto
+
+# Servidor local de inferência com micro-lotes (ver servidor.py)
+SERVIDOR_HOST = "127.0.0.1"
+SERVIDOR_PORTA = 8765
+SERVIDOR_LOTE_MAX = 8             # máximo de imagens por chamada ao modelo
+SERVIDOR_ESPERA_MAX_MS = 5        # espera máxima pelo lote encher, em milissegundos
+SERVIDOR_QUALIDADE_JPEG = 90      # qualidade dos frames enviados pelo cliente
+SERVIDOR_URL = None               # ex.: "http://127.0.0.1:8765"; a interface usa o servidor em vez de carregar o modelo
+
+# Inicialização da interface: a janela abre antes do modelo, que é carregado e aquecido
+# em segundo plano; até ele ficar pronto, os frames da câmera são exibidos sem detecções
+CAMERA_PADRAO = None              # ex.: "" (webcam) ou "rtsp://..."; conecta ao abrir a interface
+# Com OpenGL por software (Mesa llvmpipe), o triton precisa ser importado antes da janela (ver app.py);
+# por padrão segue a variável LIBGL_ALWAYS_SOFTWARE do Mesa
+OPENGL_SOFTWARE = os.environ.get("LIBGL_ALWAYS_SOFTWARE", "").lower() in ("1", "true")
+
+# Várias câmeras na interface (ver multicamera.py): URLs separadas por vírgula no campo de
+# conexão ou em CAMERA_PADRAO; o frame mais recente de cada câmera vai ao modelo em um único lote
+MULTICAMERA_LOTE_MAX = 8          # máximo de câmeras por chamada ao modelo
+MULTICAMERA_ESPERA_MAX_MS = 10    # espera máxima pelas demais câmeras para completar o lote
+MULTICAMERA_POLITICA = "rodizio"  # "rodizio" (a atendida há mais tempo primeiro) ou "prioridade"
+MULTICAMERA_PRIORIDADES = {}      # URL -> prioridade (maior primeiro), usada com "prioridade"
+MULTICAMERA_FPS_MAX = None        # inferências por segundo de cada câmera; None sem limite
+
+# Coleta ativa da interface (ver coleta_ativa.py): frames em que o modelo está em dúvida ou
+# cuja contagem foi corrigida na lista são salvos com pré-rótulos YOLO em um dataset de BASE_DIR,
+# incluído por gerar_data_yaml no próximo treino
+COLETA_ATIVA = True
+COLETA_DIR = os.path.join(BASE_DIR, "coleta_ativa")
+COLETA_MARGEM = 0.15              # caixa a menos disso do limiar de confiança da interface deixa o frame incerto
+COLETA_DIVERGENCIA = 0.3          # correção relativa (|nova - anterior| / anterior) que salva os frames da contagem
+COLETA_HASH_DISTANCIA = 6         # bits diferentes (de 64) do hash perceptual até os quais o frame é quase repetido
+COLETA_INTERVALO_S = 2.0          # intervalo mínimo entre frames incertos salvos da mesma câmera
+COLETA_MAX_IMAGENS = 500          # imagens no dataset a partir das quais a coleta para
+COLETA_FRAMES_CONTAGEM = 16       # frames capturados mantidos em memória para associar às correções
+COLETA_FILA_MAX = 32              # frames aguardando gravação; com a fila cheia, o frame é descartado
+
+# Suíte de benchmarks (benchmarks/suite.py): baseline em JSON e piora máxima aceita por caso, em %
+BENCHMARK_BASELINE = os.path.join(os.getcwd(), "benchmarks", "baseline.json")
+BENCHMARK_TOLERANCIA = 15
+
+# Verificação da importação dos pontos de entrada (benchmarks/importacoes.py): tempo
+# máximo de `import <módulo>` em ms e módulos pesados que só podem ser importados sob demanda
+ORCAMENTO_IMPORTACAO_MS = {"app": 1500, "main": 600, "predict": 600, "servidor": 600, "stream": 400}
+IMPORTACOES_SOB_DEMANDA = ("torch", "triton", "ultralytics", "matplotlib", "roboflow")
+
+# Instrumentação por etapa (ver instrumentacao.py); desativada, cada etapa custa só uma verificação
+INSTRUMENTACAO = False
+INSTRUMENTACAO_SAIDA = os.path.join(RESULTADOS_DIR, "metricas_etapas.json")  # terminado em .prom: formato Prometheus
+INSTRUMENTACAO_PORTA = None       # ex.: 9108 serve /metrics e /metrics.json em localhost
+INSTRUMENTACAO_PERFIL = False     # grava um perfil cProfile por etapa
+INSTRUMENTACAO_PERFIS_DIR = os.path.join(RESULTADOS_DIR, "perfis")
+
+# Logging (ver logger.py): mensagens vão para uma fila limitada e uma thread as escreve
+LOG_NIVEL = "INFO"
+LOG_ARQUIVO = os.path.join(RESULTADOS_DIR, "app.log")
+LOG_JSONL = None                  # ex.: os.path.join(RESULTADOS_DIR, "app.jsonl"): um objeto JSON por mensagem
+LOG_FILA_MAX = 10000              # mensagens pendentes antes de aplicar LOG_FILA_CHEIA
+LOG_FILA_CHEIA = "descartar"      # "descartar" a mensagem ou "bloquear" quem registra até haver espaço
+LOG_INTERVALO_LIMITADO = 5.0      # intervalo mínimo, em segundos, entre mensagens por frame (log_limitado)
+
+# Estado do pipeline incremental de main.py: hashes das entradas e dos artefatos de cada etapa
+ESTADO_PIPELINE = os.path.join(RESULTADOS_DIR, "estado_pipeline.json")
@@ -0,0 +1,266 @@
+"""
+Pós-processamento vetorizado das detecções do YOLO e desenho das anotações.
+
+As caixas de um `Results` do Ultralytics são transferidas para a CPU em uma
+única chamada (`boxes.data`) e filtradas por confiança e classe com operações
+vetorizadas do numpy, em vez de uma conversão tensor -> Python por caixa.
+O fundo semitransparente dos rótulos é mesclado apenas sobre a região de cada
+rótulo, e não sobre o frame inteiro.
+
+Uso:
+    deteccoes = extrair_deteccoes(resultado, conf_min=0.5)
+    frame = desenhar_deteccoes(frame, deteccoes)
+    contagem = contar_itens(deteccoes)
+"""
+
+from typing import NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+FONTE = cv2.FONT_HERSHEY_SIMPLEX
+ESCALA_FONTE = 2.1
+ESPESSURA_FONTE = 6
+ALPHA_ROTULO = 0.5
+
+
+class Deteccoes(NamedTuple):
+    """
+    Detecções de um frame em arrays numpy alinhados.
+
+    Atributos
+    ---------
+    caixas : numpy.ndarray
+        Caixas (N, 4) em pixels, formato xyxy, dtype int32.
+    confiancas : numpy.ndarray
+        Confianças (N,) entre 0 e 1, dtype float32.
+    classes : numpy.ndarray
+        Índices de classe (N,), dtype int64.
+    nomes : dict
+        Mapeamento índice -> nome da classe (`result.names`).
+    ids : numpy.ndarray, opcional
+        IDs de rastreamento (N,), -1 para detecções sem trilha confirmada;
+        None fora do modo de rastreamento.
+    """
+
+    caixas: np.ndarray
+    confiancas: np.ndarray
+    classes: np.ndarray
+    nomes: dict
+    ids: Optional[np.ndarray] = None
+
+    def rotulos(self) -> list:
+        """
+        Retorna o nome da classe de cada detecção.
+
+        Retorno
+        -------
+        list of str
+            Nomes das classes na ordem das detecções.
+        """
+        return [self.nomes[c] for c in self.classes.tolist()]
+
+
+def deteccoes_vazias(nomes: dict) -> Deteccoes:
+    """
+    Cria um conjunto de detecções vazio.
+
+    Parâmetros
+    ----------
+    nomes : dict
+        Mapeamento índice -> nome da classe.
+
+    Retorno
+    -------
+    Deteccoes
+        Detecções sem nenhuma caixa.
+    """
+    return Deteccoes(
+        np.empty((0, 4), dtype=np.int32),
+        np.empty(0, dtype=np.float32),
+        np.empty(0, dtype=np.int64),
+        nomes,
+    )
+
+
+def filtrar_deteccoes(dados, nomes: dict, conf_min: float = 0.5, classes=None) -> Deteccoes:
+    """
+    Filtra um array de caixas por confiança e classe de forma vetorizada.
+
+    Parâmetros
+    ----------
+    dados : numpy.ndarray
+        Array (N, 6) ou (N, 7) no formato de `Boxes.data`: x1, y1, x2, y2,
+        [id de rastreamento,] confiança, classe.
+    nomes : dict
+        Mapeamento índice -> nome da classe.
+    conf_min : float, opcional
+        Confiança mínima entre 0 e 1 (padrão: 0.5).
+    classes : iterable of int, opcional
+        Classes mantidas; se None, todas são mantidas.
+
+    Retorno
+    -------
+    Deteccoes
+        Detecções que passaram no filtro.
+    """
+    dados = np.asarray(dados)
+    if dados.size == 0:
+        return deteccoes_vazias(nomes)
+
+    confiancas = dados[:, -2]
+    ids_classe = dados[:, -1].astype(np.int64)
+    mascara = confiancas >= conf_min
+    if classes is not None:
+        mascara &= np.isin(ids_classe, np.fromiter(classes, dtype=np.int64))
+
+    return Deteccoes(
+        dados[mascara, :4].astype(np.int32),
+        confiancas[mascara].astype(np.float32),
+        ids_classe[mascara],
+        nomes,
+    )
+
+
+def extrair_deteccoes(resultado, conf_min: float = 0.5, classes=None) -> Deteccoes:
+    """
+    Extrai as detecções de um `Results` do Ultralytics com uma única cópia para a CPU.
+
+    Parâmetros
+    ----------
+    resultado : ultralytics.engine.results.Results
+        Resultado de uma inferência do modelo.
+    conf_min : float, opcional
+        Confiança mínima entre 0 e 1 (padrão: 0.5).
+    classes : iterable of int, opcional
+        Classes mantidas; se None, todas são mantidas.
+
+    Retorno
+    -------
+    Deteccoes
+        Detecções que passaram no filtro.
+    """
+    if resultado.boxes is None:
+        return deteccoes_vazias(resultado.names)
+    return filtrar_deteccoes(resultado.boxes.data.cpu().numpy(), resultado.names, conf_min, classes)
+
+
+def filtrar_confianca(deteccoes: Deteccoes, conf_min: float) -> Deteccoes:
+    """
+    Mantém só as detecções com confiança de ao menos `conf_min`.
+
+    Parâmetros
+    ----------
+    deteccoes : Deteccoes
+        Detecções de um frame.
+    conf_min : float
+        Confiança mínima entre 0 e 1.
+
+    Retorno
+    -------
+    Deteccoes
+        Detecções que passaram no filtro, com os mesmos nomes e IDs.
+    """
+    mascara = deteccoes.confiancas >= conf_min
+    if mascara.all():
+        return deteccoes
+    return Deteccoes(
+        deteccoes.caixas[mascara],
+        deteccoes.confiancas[mascara],
+        deteccoes.classes[mascara],
+        deteccoes.nomes,
+        deteccoes.ids[mascara] if deteccoes.ids is not None else None,
+    )
+
+
+def iou_matriz(a, b):
+    """
+    Calcula a IoU entre todas as caixas de `a` e de `b`.
+
+    Parâmetros
+    ----------
+    a : numpy.ndarray
+        Caixas (N, 4) no formato xyxy.
+    b : numpy.ndarray
+        Caixas (M, 4) no formato xyxy.
+
+    Retorno
+    -------
+    numpy.ndarray
+        Matriz (N, M) float32 de IoU.
+    """
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    largura = np.clip(np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0]), 0, None)
+    altura = np.clip(np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1]), 0, None)
+    intersecao = largura * altura
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    uniao = area_a[:, None] + area_b[None, :] - intersecao
+    return intersecao / np.maximum(uniao, 1e-9)
+
+
+def contar_itens(deteccoes: Deteccoes) -> dict:
+    """
+    Conta as detecções por nome de classe.
+
+    Parâmetros
+    ----------
+    deteccoes : Deteccoes
+        Detecções de um frame.
+
+    Retorno
+    -------
+    dict
+        Mapeamento nome da classe -> quantidade detectada.
+    """
+    ids, quantidades = np.unique(deteccoes.classes, return_counts=True)
+    return {deteccoes.nomes[i]: q for i, q in zip(ids.tolist(), quantidades.tolist())}
+
+
+def desenhar_deteccoes(frame, deteccoes: Deteccoes):
+    """
+    Desenha as caixas e os rótulos semitransparentes das detecções no frame.
+
+    O fundo e o texto de cada rótulo são desenhados em uma cópia apenas da
+    região do rótulo, que é então mesclada de volta sobre o frame.
+
+    Parâmetros
+    ----------
+    frame : numpy.ndarray
+        Frame BGR a ser anotado (modificado no próprio array).
+    deteccoes : Deteccoes
+        Detecções a desenhar.
+
+    Retorno
+    -------
+    numpy.ndarray
+        Frame anotado.
+    """
+    altura, largura = frame.shape[:2]
+
+    rotulos = deteccoes.rotulos()
+    ids = deteccoes.ids.tolist() if deteccoes.ids is not None else [-1] * len(rotulos)
+    for (x1, y1, x2, y2), nome, conf, id_trilha in zip(
+        deteccoes.caixas.tolist(), rotulos, deteccoes.confiancas.tolist(), ids
+    ):
+        # Caixa e rótulo de cada detecção em sequência, para que as caixas
+        # seguintes fiquem por cima dos rótulos anteriores onde se sobrepõem
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
+        texto = f"{nome} #{id_trilha} ({conf * 100:.1f}%)" if id_trilha >= 0 else f"{nome} ({conf * 100:.1f}%)"
+        (largura_texto, altura_texto), baseline = cv2.getTextSize(texto, FONTE, ESCALA_FONTE, ESPESSURA_FONTE)
+
+        # Região afetada: fundo do rótulo mais a parte do texto que passa da linha de base
+        topo = y1 - altura_texto - baseline
+        ra, rb = max(topo, 0), min(y1 - 5 + baseline + ESPESSURA_FONTE, altura)
+        ca, cb = max(x1 - ESPESSURA_FONTE, 0), min(x1 + largura_texto + ESPESSURA_FONTE, largura)
+        if ra >= rb or ca >= cb:
+            continue
+
+        roi = frame[ra:rb, ca:cb]
+        overlay = roi.copy()
+        cv2.rectangle(overlay, (x1 - ca, topo - ra), (x1 + largura_texto - ca, y1 - ra), (0, 0, 0), -1)
+        cv2.putText(overlay, texto, (x1 - ca, y1 - 5 - ra), FONTE, ESCALA_FONTE, (255, 255, 255), ESPESSURA_FONTE)
+        cv2.addWeighted(overlay, ALPHA_ROTULO, roi, 1 - ALPHA_ROTULO, 0, roi)
+
+    return frame
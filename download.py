@@ -1,41 +1,322 @@
 import os
-from roboflow import Roboflow
-from config import API_KEY, LISTA_DATASETS, BASE_DIR, RESULTADOS_DIR
+import json
+import random
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from types import SimpleNamespace
+
+import yaml
+
+from config import (
+    API_KEY, LISTA_DATASETS, BASE_DIR, RESULTADOS_DIR,
+    DOWNLOAD_CONCORRENCIA, DOWNLOAD_TENTATIVAS, DOWNLOAD_BACKOFF,
+)
+from indice_dataset import hash_arquivo, EXTENSOES_IMAGEM
+from instrumentacao import medir, contar
 from logger import logger
 
-def baixar_datasets() -> None:
+MANIFESTO = "manifesto.json"
+SPLITS = ("train", "valid", "test")
+
+
+def _listar(pasta: str, extensoes) -> list:
+    if not os.path.isdir(pasta):
+        return []
+    return [n for n in os.listdir(pasta) if os.path.splitext(n)[1].lower() in extensoes]
+
+
+class ClienteDiretorioLocal:
+    """
+    Cliente com a mesma interface usada do `Roboflow` que copia os datasets de
+    um diretório local (`<raiz>/<projeto>_v<versao>`), para testes com fixtures
+    ou espelhos offline.
+    """
+
+    def __init__(self, raiz: str):
+        """
+        Parâmetros
+        ----------
+        raiz : str
+            Diretório que contém as pastas `<projeto>_v<versao>`.
+        """
+        self.raiz = raiz
+
+    def workspace(self, workspace: str):
+        return SimpleNamespace(project=lambda projeto: SimpleNamespace(
+            version=lambda versao: SimpleNamespace(
+                download=lambda formato, location, **kwargs: self._copiar(projeto, versao, location)
+            )
+        ))
+
+    def _copiar(self, projeto, versao, location) -> None:
+        shutil.copytree(os.path.join(self.raiz, f"{projeto}_v{versao}"), location, dirs_exist_ok=True)
+
+
+def gerar_manifesto(pasta: str) -> dict:
+    """
+    Verifica a estrutura de um dataset baixado e gera seu manifesto.
+
+    O dataset precisa ter um `data.yaml` com `names`, ao menos um split com
+    imagens, nenhum arquivo vazio e nenhum rótulo sem a imagem correspondente.
+
+    Parâmetros
+    ----------
+    pasta : str
+        Pasta do dataset.
+
+    Retorno
+    -------
+    dict
+        Manifesto com a contagem de imagens e rótulos por split e o tamanho e
+        hash de cada arquivo.
+
+    Raises
+    ------
+    RuntimeError
+        Se o dataset estiver incompleto ou inconsistente.
+    """
+    yaml_path = os.path.join(pasta, "data.yaml")
+    if not os.path.exists(yaml_path):
+        raise RuntimeError(f"data.yaml ausente em {pasta}")
+    with open(yaml_path, "r") as f:
+        if not (yaml.safe_load(f) or {}).get("names"):
+            raise RuntimeError(f"data.yaml sem classes em {pasta}")
+
+    contagens, arquivos = {}, {}
+    for split in SPLITS:
+        pasta_imagens = os.path.join(pasta, split, "images")
+        pasta_rotulos = os.path.join(pasta, split, "labels")
+        imagens = _listar(pasta_imagens, EXTENSOES_IMAGEM)
+        rotulos = _listar(pasta_rotulos, {".txt"})
+        if not imagens:
+            continue
+        bases = {os.path.splitext(i)[0] for i in imagens}
+        orfaos = [r for r in rotulos if os.path.splitext(r)[0] not in bases]
+        if orfaos:
+            raise RuntimeError(f"{len(orfaos)} rótulos sem imagem em {pasta}/{split}")
+        contagens[split] = {"imagens": len(imagens), "rotulos": len(rotulos)}
+
+    if not contagens:
+        raise RuntimeError(f"Nenhum split com imagens em {pasta}")
+
+    for raiz, _, nomes in os.walk(pasta):
+        for nome in nomes:
+            caminho = os.path.join(raiz, nome)
+            relativo = os.path.relpath(caminho, pasta)
+            if relativo == MANIFESTO or nome.endswith(".cache"):
+                continue
+            tamanho = os.path.getsize(caminho)
+            if tamanho == 0 and relativo.split(os.sep)[-2:-1] == ["images"]:
+                raise RuntimeError(f"Imagem vazia: {caminho}")
+            arquivos[relativo.replace(os.sep, "/")] = {"tamanho": tamanho, "hash": hash_arquivo(caminho)}
+
+    return {"contagens": contagens, "arquivos": arquivos}
+
+
+def _ler_manifesto(pasta: str):
+    try:
+        with open(os.path.join(pasta, MANIFESTO), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def contagens_completas(pasta: str, manifesto: dict) -> bool:
+    """
+    Indica se cada split da pasta tem ao menos as imagens e rótulos do manifesto.
+
+    Parâmetros
+    ----------
+    pasta : str
+        Pasta do dataset.
+    manifesto : dict
+        Manifesto gerado por `gerar_manifesto`.
+
+    Retorno
+    -------
+    bool
+        False se algum split tiver menos imagens ou rótulos que o manifesto.
+    """
+    for split, contagem in manifesto["contagens"].items():
+        for tipo, sub, extensoes in (("imagens", "images", EXTENSOES_IMAGEM), ("rotulos", "labels", {".txt"})):
+            if len(_listar(os.path.join(pasta, split, sub), extensoes)) < contagem[tipo]:
+                return False
+    return True
+
+
+def dataset_valido(pasta: str, verificar_hashes: bool = False) -> bool:
+    """
+    Indica se um dataset já baixado corresponde exatamente ao seu manifesto.
+
+    Parâmetros
+    ----------
+    pasta : str
+        Pasta do dataset.
+    verificar_hashes : bool, opcional
+        Se True, recalcula o hash de cada arquivo; caso contrário compara
+        apenas as contagens por split e os tamanhos (padrão: False).
+
+    Retorno
+    -------
+    bool
+        True se o manifesto existe e corresponde ao conteúdo da pasta.
+    """
+    manifesto = _ler_manifesto(pasta)
+    if manifesto is None:
+        return False
+
+    for split, contagem in manifesto["contagens"].items():
+        for tipo, sub, extensoes in (("imagens", "images", EXTENSOES_IMAGEM), ("rotulos", "labels", {".txt"})):
+            if len(_listar(os.path.join(pasta, split, sub), extensoes)) != contagem[tipo]:
+                return False
+
+    for relativo, info in manifesto["arquivos"].items():
+        caminho = os.path.join(pasta, *relativo.split("/"))
+        if not os.path.exists(caminho) or os.path.getsize(caminho) != info["tamanho"]:
+            return False
+        if verificar_hashes and hash_arquivo(caminho) != info["hash"]:
+            return False
+    return True
+
+
+def _salvar_manifesto(pasta: str, manifesto: dict) -> None:
+    with open(os.path.join(pasta, MANIFESTO), "w") as f:
+        json.dump(manifesto, f)
+
+
+def _baixar_dataset(cliente, workspace: str, projeto: str, versao: int, destino: str) -> None:
+    """
+    Baixa um dataset em uma pasta temporária, verifica e a renomeia para `destino`.
+    """
+    nome_pasta = os.path.basename(destino)
+    temporaria = os.path.join(os.path.dirname(destino), f".{nome_pasta}.parcial")
+    if os.path.exists(temporaria):
+        shutil.rmtree(temporaria)
+
+    projeto_rf = cliente.workspace(workspace).project(projeto)
+    projeto_rf.version(versao).download("yolo11", location=temporaria)
+
+    _salvar_manifesto(temporaria, gerar_manifesto(temporaria))
+
+    if os.path.exists(destino):
+        descartada = os.path.join(os.path.dirname(destino), f".{nome_pasta}.invalida")
+        shutil.rmtree(descartada, ignore_errors=True)
+        os.rename(destino, descartada)
+        shutil.rmtree(descartada)
+    os.rename(temporaria, destino)
+
+
+def _baixar_com_tentativas(cliente, workspace, projeto, versao, destino, tentativas, backoff) -> None:
+    for tentativa in range(1, tentativas + 1):
+        try:
+            logger.info(f"Baixando: {workspace}/{projeto} (versão {versao}), tentativa {tentativa}/{tentativas}")
+            with medir("download.dataset"):
+                _baixar_dataset(cliente, workspace, projeto, versao, destino)
+            logger.info(f"Download concluído: {destino}")
+            return
+        except Exception as e:
+            contar("download.falhas")
+            if tentativa == tentativas:
+                raise
+            espera = backoff * 2 ** (tentativa - 1) * random.uniform(0.5, 1.5)
+            logger.warning(f"Falha ao baixar {workspace}/{projeto}: {e}. Nova tentativa em {espera:.1f}s")
+            time.sleep(espera)
+
+
+@medir("download")
+def baixar_datasets(
+    cliente=None,
+    max_concorrencia: int = DOWNLOAD_CONCORRENCIA,
+    tentativas: int = DOWNLOAD_TENTATIVAS,
+    backoff: float = DOWNLOAD_BACKOFF,
+    forcar: bool = False,
+) -> None:
     """
     Baixa os datasets especificados na configuração a partir da plataforma Roboflow.
 
-    Os datasets são baixados e salvos na pasta definida por BASE_DIR.
-    Evita downloads duplicados caso os dados já estejam presentes localmente.
+    Os datasets são baixados em paralelo e salvos na pasta definida por BASE_DIR.
+    Cada download é feito em uma pasta temporária e só é renomeado para o
+    destino depois que um manifesto com a contagem e o hash dos arquivos é
+    gerado e verificado; downloads interrompidos são refeitos na próxima
+    execução. Pastas existentes sem manifesto, mas íntegras, são adotadas.
+    Pastas com manifesto só são baixadas novamente se algum split tiver
+    menos arquivos que o manifesto; arquivos editados à mão geram apenas um
+    aviso e a pasta é mantida.
     Os logs das operações são registrados usando o logger centralizado.
 
     Parâmetros
     ----------
-    Nenhum
+    cliente : object, opcional
+        Cliente com a interface `workspace().project().version().download()`
+        do Roboflow (padrão: `Roboflow(api_key=API_KEY)`). Use
+        `ClienteDiretorioLocal` para testes com fixtures.
+    max_concorrencia : int, opcional
+        Número máximo de downloads simultâneos (padrão: DOWNLOAD_CONCORRENCIA).
+    tentativas : int, opcional
+        Número de tentativas por dataset (padrão: DOWNLOAD_TENTATIVAS).
+    backoff : float, opcional
+        Espera base, em segundos, dobrada a cada nova tentativa (padrão: DOWNLOAD_BACKOFF).
+    forcar : bool, opcional
+        Se True, baixa novamente todos os datasets, substituindo as pastas
+        existentes (padrão: False).
 
     Retorno
     -------
     None
         Esta função não retorna nenhum valor. Apenas realiza o download, salva os dados e registra logs.
     """
-    
+
     # Garante que as pastas existam
     os.makedirs(BASE_DIR, exist_ok=True)
     os.makedirs(RESULTADOS_DIR, exist_ok=True)
 
-    roboflow = Roboflow(api_key=API_KEY)
-
+    pendentes = []
     for workspace, projeto, versao in LISTA_DATASETS:
         nome_pasta = f"{projeto}_v{versao}"
         destino = os.path.join(BASE_DIR, nome_pasta)
 
-        if os.path.exists(destino):
-            logger.warning(f"Dataset já existente: {destino}")
-            continue
+        manifesto = None if forcar else _ler_manifesto(destino)
+        if manifesto is not None:
+            if not contagens_completas(destino, manifesto):
+                logger.warning(f"Dataset existente com menos arquivos que o manifesto, será baixado novamente: {destino}")
+            else:
+                if dataset_valido(destino):
+                    logger.warning(f"Dataset já existente: {destino}")
+                else:
+                    logger.warning(f"Dataset já existente com arquivos diferentes do manifesto, mantido: {destino}")
+                continue
+        elif not forcar and os.path.exists(destino):
+            try:
+                _salvar_manifesto(destino, gerar_manifesto(destino))
+                logger.warning(f"Dataset já existente sem manifesto, adotado após verificação: {destino}")
+                continue
+            except RuntimeError as e:
+                logger.warning(f"Dataset existente incompleto ({e}), será baixado novamente: {destino}")
+
+        pendentes.append((workspace, projeto, versao, destino))
+
+    if not pendentes:
+        return
+
+    if cliente is None:
+        from roboflow import Roboflow
+
+        cliente = Roboflow(api_key=API_KEY)
+
+    erros = []
+    with ThreadPoolExecutor(max_workers=max(1, max_concorrencia)) as pool:
+        futuros = {
+            pool.submit(_baixar_com_tentativas, cliente, *pendente, tentativas, backoff): pendente
+            for pendente in pendentes
+        }
+        for futuro in as_completed(futuros):
+            workspace, projeto, versao, _ = futuros[futuro]
+            try:
+                futuro.result()
+            except Exception as e:
+                erros.append(f"{workspace}/{projeto} (versão {versao}): {e}")
 
-        logger.info(f"Baixando: {workspace}/{projeto} (versão {versao})")
-        projeto_rf = roboflow.workspace(workspace).project(projeto)
-        projeto_rf.version(versao).download("yolo11", location=destino)
-        logger.info(f"Download concluído: {destino}")
+    if erros:
+        logger.error(f"Falha ao baixar datasets: {erros}")
+        raise RuntimeError(f"Falha ao baixar datasets: {erros}")
@@ -0,0 +1,397 @@
+"""
+Histórico persistente do inventário em SQLite, compartilhado por vários terminais.
+
+Cada contagem da interface (a lista entre dois "Clear", ou um rastreamento) é
+uma sessão. Cada captura, trilha confirmada ou correção manual de quantidade
+vira uma linha de `registros` com a variação que causou na sessão, de modo
+que a soma das linhas de uma sessão é a lista mostrada na tela. As linhas vão
+para uma fila e são gravadas em lotes, numa única transação, por uma thread
+em segundo plano; a interface nunca espera o disco.
+
+Na mesma transação são atualizados os agregados `sessoes` (terminal, início e
+fim) e `totais` (quantidade por sessão e item). As consultas usam só os
+agregados, cujo tamanho depende do número de contagens e não do número de
+registros:
+- estoque atual (ou em um instante passado): soma, entre os terminais, da
+  última contagem de cada um;
+- histórico de um item: o estoque depois de cada contagem em um intervalo;
+- consumo por item: soma das quedas entre contagens seguidas do mesmo
+  terminal, por dia (reposições não descontam).
+
+Uso:
+    estoque = EstoqueInventario()
+    estoque.registrar({"arroz": 3, "feijao": 2})       # captura
+    estoque.corrigir("arroz", anterior=3, nova=4)      # edição na lista
+    estoque.nova_sessao()                              # "Clear": nova contagem
+    estoque.estoque()                                  # {"arroz": 4, "feijao": 2}
+    estoque.fechar()                                   # grava o que falta
+"""
+
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from itertools import groupby
+
+from config import ESTOQUE_BANCO, ESTOQUE_TERMINAL, ESTOQUE_LOTE, ESTOQUE_INTERVALO_S
+from instrumentacao import medir, contar
+from logger import logger
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS registros (
+    id INTEGER PRIMARY KEY,
+    sessao TEXT NOT NULL,
+    momento REAL NOT NULL,
+    item TEXT NOT NULL,
+    quantidade INTEGER NOT NULL,
+    origem TEXT NOT NULL,
+    trilha INTEGER
+);
+CREATE INDEX IF NOT EXISTS registros_item_momento ON registros (item, momento);
+CREATE INDEX IF NOT EXISTS registros_momento ON registros (momento);
+CREATE TABLE IF NOT EXISTS sessoes (
+    id TEXT PRIMARY KEY,
+    terminal TEXT NOT NULL,
+    inicio REAL NOT NULL,
+    fim REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessoes_terminal_fim ON sessoes (terminal, fim);
+CREATE INDEX IF NOT EXISTS sessoes_fim ON sessoes (fim);
+CREATE TABLE IF NOT EXISTS totais (
+    sessao TEXT NOT NULL,
+    item TEXT NOT NULL,
+    quantidade INTEGER NOT NULL,
+    PRIMARY KEY (sessao, item)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS totais_item ON totais (item, sessao);
+"""
+
+# Última contagem de cada terminal terminada até o instante informado
+_ULTIMAS_SESSOES = """
+    SELECT s.id, s.terminal FROM (
+        SELECT terminal, MAX(fim) AS fim FROM sessoes WHERE fim <= ? GROUP BY terminal
+    ) u JOIN sessoes s ON s.terminal = u.terminal AND s.fim = u.fim
+"""
+
+# Marca na fila que encerra a thread de gravação
+_FIM = object()
+
+
+def conectar(banco: str = ESTOQUE_BANCO) -> sqlite3.Connection:
+    """
+    Abre o banco do inventário em modo WAL, criando as tabelas se necessário.
+
+    Parâmetros
+    ----------
+    banco : str, opcional
+        Caminho do arquivo SQLite (padrão: ESTOQUE_BANCO).
+
+    Retorno
+    -------
+    sqlite3.Connection
+        Conexão aberta.
+    """
+    os.makedirs(os.path.dirname(banco) or ".", exist_ok=True)
+    conexao = sqlite3.connect(banco, timeout=60)
+    conexao.execute("PRAGMA journal_mode=WAL")
+    # Com WAL, NORMAL só sincroniza nos checkpoints e continua sem corromper o banco
+    conexao.execute("PRAGMA synchronous=NORMAL")
+    conexao.executescript(ESQUEMA)
+    return conexao
+
+
+class EstoqueInventario:
+    """
+    Registro das contagens de um terminal e consultas ao histórico de todos os terminais.
+    """
+
+    def __init__(self, banco: str = ESTOQUE_BANCO, terminal: str = ESTOQUE_TERMINAL,
+                 lote: int = ESTOQUE_LOTE, intervalo: float = ESTOQUE_INTERVALO_S):
+        """
+        Parâmetros
+        ----------
+        banco : str, opcional
+            Caminho do arquivo SQLite (padrão: ESTOQUE_BANCO).
+        terminal : str, opcional
+            Identificação deste terminal; None usa o nome da máquina (padrão: ESTOQUE_TERMINAL).
+        lote : int, opcional
+            Máximo de registros por transação (padrão: ESTOQUE_LOTE).
+        intervalo : float, opcional
+            Espera máxima, em segundos, para completar um lote (padrão: ESTOQUE_INTERVALO_S).
+        """
+        self.banco = banco
+        self.terminal = terminal or socket.gethostname()
+        self.lote = lote
+        self.intervalo = intervalo
+        conectar(banco).close()
+        self.sessao = None
+        self.nova_sessao()
+        self._fila = queue.Queue()
+        self._thread = threading.Thread(target=self._loop_gravacao, name="estoque", daemon=True)
+        self._thread.start()
+
+    def nova_sessao(self) -> str:
+        """
+        Inicia uma nova contagem; os próximos registros pertencem a ela.
+
+        Retorno
+        -------
+        str
+            Identificador da sessão.
+        """
+        # Prefixo com o instante: ids crescentes mantêm as inserções no fim dos
+        # índices de `sessoes` e `totais`, em vez de espalhá-las pelo arquivo
+        self.sessao = f"{time.time_ns():016x}{os.urandom(4).hex()}"
+        return self.sessao
+
+    def registrar(self, itens: dict, origem: str = "captura", momento: float = None) -> None:
+        """
+        Enfileira a variação da contagem atual causada por uma captura.
+
+        Parâmetros
+        ----------
+        itens : dict
+            Mapeamento nome do item -> quantidade somada à contagem.
+        origem : str, opcional
+            Origem dos registros (padrão: "captura").
+        momento : float, opcional
+            Instante Unix dos registros (padrão: agora).
+        """
+        momento = time.time() if momento is None else momento
+        self._enfileirar([(self.sessao, momento, item, int(quantidade), origem, None) for item, quantidade in itens.items()])
+
+    def registrar_trilhas(self, trilhas: list, momento: float = None) -> None:
+        """
+        Enfileira uma linha por trilha confirmada no modo de rastreamento.
+
+        Parâmetros
+        ----------
+        trilhas : list of tuple
+            `(id, nome do item)` de cada trilha, como em `RastreadorIoU.confirmacoes`.
+        momento : float, opcional
+            Instante Unix dos registros (padrão: agora).
+        """
+        momento = time.time() if momento is None else momento
+        self._enfileirar([(self.sessao, momento, item, 1, "rastreamento", int(id_trilha)) for id_trilha, item in trilhas])
+
+    def corrigir(self, item: str, anterior: int, nova: int) -> None:
+        """
+        Enfileira a correção manual da quantidade de um item na contagem atual.
+
+        Parâmetros
+        ----------
+        item : str
+            Nome do item.
+        anterior : int
+            Quantidade antes da edição.
+        nova : int
+            Quantidade informada.
+        """
+        if nova != anterior:
+            self.registrar({item: nova - anterior}, origem="correcao")
+
+    def _enfileirar(self, linhas: list) -> None:
+        if linhas:
+            self._fila.put(linhas)
+
+    def descarregar(self, timeout: float = None) -> bool:
+        """
+        Espera a gravação de tudo que já foi enfileirado.
+
+        Parâmetros
+        ----------
+        timeout : float, opcional
+            Espera máxima em segundos (padrão: sem limite).
+
+        Retorno
+        -------
+        bool
+            True se a fila foi gravada dentro do prazo.
+        """
+        gravado = threading.Event()
+        self._fila.put(gravado)
+        return gravado.wait(timeout)
+
+    def fechar(self) -> None:
+        """
+        Grava os registros pendentes e encerra a thread de gravação.
+        """
+        if self._thread.is_alive():
+            self._fila.put(_FIM)
+            self._thread.join()
+
+    def _loop_gravacao(self) -> None:
+        conexao = conectar(self.banco)
+        try:
+            encerrar = False
+            while not encerrar:
+                linhas, avisos = [], []
+                limite = None
+                while len(linhas) < self.lote:
+                    espera = None if limite is None else limite - time.monotonic()
+                    if espera is not None and espera <= 0:
+                        break
+                    try:
+                        entrada = self._fila.get(timeout=espera)
+                    except queue.Empty:
+                        break
+                    if entrada is _FIM:
+                        encerrar = True
+                        break
+                    if isinstance(entrada, threading.Event):
+                        avisos.append(entrada)
+                        break
+                    linhas.extend(entrada)
+                    if limite is None:
+                        limite = time.monotonic() + self.intervalo
+                if linhas:
+                    self._gravar(conexao, linhas)
+                for aviso in avisos:
+                    aviso.set()
+        finally:
+            conexao.close()
+
+    @medir("estoque.gravacao")
+    def _gravar(self, conexao: sqlite3.Connection, linhas: list) -> None:
+        sessoes, totais = {}, {}
+        for sessao, momento, item, quantidade, _, _ in linhas:
+            inicio, fim = sessoes.get(sessao, (momento, momento))
+            sessoes[sessao] = (min(inicio, momento), max(fim, momento))
+            totais[sessao, item] = totais.get((sessao, item), 0) + quantidade
+        try:
+            with conexao:
+                conexao.executemany(
+                    "INSERT INTO registros (sessao, momento, item, quantidade, origem, trilha) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    linhas,
+                )
+                conexao.executemany(
+                    "INSERT INTO sessoes (id, terminal, inicio, fim) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET fim = max(fim, excluded.fim)",
+                    [(sessao, self.terminal, inicio, fim) for sessao, (inicio, fim) in sessoes.items()],
+                )
+                conexao.executemany(
+                    "INSERT INTO totais (sessao, item, quantidade) VALUES (?, ?, ?) "
+                    "ON CONFLICT(sessao, item) DO UPDATE SET quantidade = quantidade + excluded.quantidade",
+                    [(sessao, item, quantidade) for (sessao, item), quantidade in totais.items()],
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Falha ao gravar {len(linhas)} registros do inventário em {self.banco}: {e}")
+            return
+        contar("estoque.registros", len(linhas))
+
+    def _ler(self):
+        return closing(sqlite3.connect(self.banco, timeout=60))
+
+    def estoque(self, momento: float = None) -> dict:
+        """
+        Retorna o estoque por item: a soma, entre os terminais, da última contagem de cada um.
+
+        Parâmetros
+        ----------
+        momento : float, opcional
+            Instante Unix do retrato; considera só as contagens cujo último
+            registro é anterior a ele (padrão: todas).
+
+        Retorno
+        -------
+        dict
+            Mapeamento nome do item -> quantidade (itens com quantidade 0 são omitidos).
+        """
+        momento = float("inf") if momento is None else momento
+        with self._ler() as conexao:
+            linhas = conexao.execute(
+                f"SELECT t.item, SUM(t.quantidade) FROM ({_ULTIMAS_SESSOES}) u "
+                "JOIN totais t ON t.sessao = u.id GROUP BY t.item HAVING SUM(t.quantidade) > 0 ORDER BY t.item",
+                (momento,),
+            ).fetchall()
+        return dict(linhas)
+
+    def historico(self, item: str, desde: float = None, ate: float = None) -> list:
+        """
+        Retorna o estoque de um item depois de cada contagem terminada no intervalo.
+
+        Parâmetros
+        ----------
+        item : str
+            Nome do item.
+        desde : float, opcional
+            Início do intervalo, instante Unix exclusivo (padrão: sem limite).
+        ate : float, opcional
+            Fim do intervalo, instante Unix inclusivo (padrão: sem limite).
+
+        Retorno
+        -------
+        list of tuple
+            `(momento, quantidade)` em ordem cronológica.
+        """
+        desde = float("-inf") if desde is None else desde
+        ate = float("inf") if ate is None else ate
+        with self._ler() as conexao:
+            por_terminal = dict(conexao.execute(
+                f"SELECT u.terminal, COALESCE(t.quantidade, 0) FROM ({_ULTIMAS_SESSOES}) u "
+                "LEFT JOIN totais t ON t.sessao = u.id AND t.item = ?",
+                (desde, item),
+            ).fetchall())
+            contagens = conexao.execute(
+                "SELECT s.terminal, s.fim, COALESCE(t.quantidade, 0) FROM sessoes s "
+                "LEFT JOIN totais t ON t.sessao = s.id AND t.item = ? "
+                "WHERE s.fim > ? AND s.fim <= ? ORDER BY s.fim",
+                (item, desde, ate),
+            ).fetchall()
+
+        total = sum(por_terminal.values())
+        pontos = []
+        for terminal, fim, quantidade in contagens:
+            total += quantidade - por_terminal.get(terminal, 0)
+            por_terminal[terminal] = quantidade
+            pontos.append((fim, total))
+        return pontos
+
+    def consumo(self, dias: float = 30.0, ate: float = None) -> dict:
+        """
+        Estima o consumo diário de cada item pelas contagens de um período.
+
+        O consumo de um item é a soma das quedas de quantidade entre contagens
+        seguidas do mesmo terminal, dividida pelo tempo entre a primeira e a
+        última contagem do período. Aumentos (reposições) não são descontados.
+
+        Parâmetros
+        ----------
+        dias : float, opcional
+            Tamanho do período, em dias (padrão: 30).
+        ate : float, opcional
+            Fim do período, instante Unix (padrão: agora).
+
+        Retorno
+        -------
+        dict
+            Mapeamento nome do item -> unidades consumidas por dia; vazio com
+            menos de duas contagens no período.
+        """
+        ate = time.time() if ate is None else ate
+        with self._ler() as conexao:
+            linhas = conexao.execute(
+                "SELECT s.id, s.terminal, s.fim, t.item, t.quantidade FROM sessoes s "
+                "JOIN totais t ON t.sessao = s.id WHERE s.fim > ? AND s.fim <= ? ORDER BY s.fim, s.id",
+                (ate - dias * 86400, ate),
+            ).fetchall()
+
+        anteriores, consumido, momentos = {}, {}, []
+        for (_, terminal, fim), grupo in groupby(linhas, key=lambda linha: linha[:3]):
+            atual = {item: quantidade for *_, item, quantidade in grupo}
+            anterior = anteriores.get(terminal)
+            momentos.append(fim)
+            for item in atual.keys() | (anterior or {}).keys():
+                consumido.setdefault(item, 0)
+                if anterior is not None:
+                    consumido[item] += max(0, anterior.get(item, 0) - atual.get(item, 0))
+            anteriores[terminal] = atual
+
+        if len(momentos) < 2 or momentos[-1] <= momentos[0]:
+            return {}
+        periodo = (momentos[-1] - momentos[0]) / 86400
+        return {item: total / periodo for item, total in sorted(consumido.items())}
@@ -0,0 +1,242 @@
+"""
+Execução incremental do pipeline: etapas com entradas declaradas e cache dos artefatos.
+
+Cada etapa declara suas entradas (valores de configuração, hashes de
+arquivos) e uma função que calcula a impressão dos seus artefatos de saída.
+As impressões das saídas das etapas de que ela depende entram
+automaticamente nas suas entradas. Depois de cada execução, o hash de cada
+entrada e as impressões das saídas são gravados em ESTADO_PIPELINE. Na
+próxima execução, a etapa é pulada se nenhuma entrada mudou e os artefatos
+continuam no disco, iguais aos gravados.
+
+Uso:
+    etapas = [Etapa("dados", gerar_data_yaml, entradas_dados, saidas_dados), ...]
+    executar_etapas(etapas, de="treino")      # força "treino" e as seguintes
+    executar_etapas(etapas, simular=True)     # só mostra o que seria executado
+"""
+
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from typing import Callable, NamedTuple, Optional
+
+from config import ESTADO_PIPELINE
+from indice_dataset import hash_arquivo
+from logger import logger
+
+
+class Etapa(NamedTuple):
+    """
+    Etapa do pipeline.
+
+    Atributos
+    ---------
+    nome : str
+        Nome usado em --from/--only e no arquivo de estado.
+    executar : callable
+        Função sem argumentos que executa a etapa.
+    entradas : callable
+        Retorna um dict nome -> valor serializável em JSON com tudo que afeta o resultado.
+    saidas : callable
+        Retorna um dict nome -> impressão do artefato (None se ausente).
+    depende : tuple of str
+        Etapas cujas saídas são entradas desta.
+    ativa : callable, opcional
+        Retorna False quando a etapa está desligada na configuração.
+    """
+
+    nome: str
+    executar: Callable[[], object]
+    entradas: Callable[[], dict]
+    saidas: Callable[[], dict]
+    depende: tuple = ()
+    ativa: Optional[Callable[[], bool]] = None
+
+
+def impressao(valor) -> str:
+    """
+    Calcula um hash estável de um valor serializável em JSON.
+
+    Parâmetros
+    ----------
+    valor : object
+        Valor a ser resumido (chaves de dicts são ordenadas).
+
+    Retorno
+    -------
+    str
+        Hash em hexadecimal.
+    """
+    dados = json.dumps(valor, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.blake2b(dados.encode(), digest_size=16).hexdigest()
+
+
+def impressao_caminho(caminho: str) -> Optional[str]:
+    """
+    Calcula o hash do conteúdo de um arquivo ou de todos os arquivos de uma pasta.
+
+    Parâmetros
+    ----------
+    caminho : str
+        Arquivo ou pasta.
+
+    Retorno
+    -------
+    str ou None
+        Hash em hexadecimal, ou None se o caminho não existe.
+    """
+    if os.path.isfile(caminho):
+        return hash_arquivo(caminho)
+    if not os.path.isdir(caminho):
+        return None
+    arquivos = []
+    for raiz, pastas, nomes in os.walk(caminho):
+        pastas.sort()
+        for nome in sorted(nomes):
+            completo = os.path.join(raiz, nome)
+            arquivos.append((os.path.relpath(completo, caminho), hash_arquivo(completo)))
+    return impressao(arquivos)
+
+
+def carregar_estado(caminho: str = ESTADO_PIPELINE) -> dict:
+    """
+    Lê o estado das últimas execuções (vazio se o arquivo não existe ou é inválido).
+    """
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def salvar_estado(estado: dict, caminho: str = ESTADO_PIPELINE) -> None:
+    """
+    Grava o estado de forma atômica (arquivo temporário + rename).
+    """
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    with open(caminho + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(estado, f, indent=2, ensure_ascii=False)
+    os.replace(caminho + ".tmp", caminho)
+
+
+def _motivo_execucao(anterior: dict, entradas: dict, saidas: dict) -> Optional[str]:
+    if anterior is None:
+        return "sem execução anterior"
+    if any(v is None for v in saidas.values()):
+        return "artefatos ausentes: " + ", ".join(k for k, v in saidas.items() if v is None)
+    if saidas != anterior.get("saidas"):
+        return "artefatos alterados desde a última execução"
+    registradas = anterior.get("entradas", {})
+    mudaram = sorted(k for k in set(entradas) | set(registradas) if entradas.get(k) != registradas.get(k))
+    if mudaram:
+        return "entradas mudaram: " + ", ".join(mudaram)
+    return None
+
+
+def executar_etapas(etapas: list, de: str = None, somente: list = None, simular: bool = False,
+                    marcar: bool = False, caminho_estado: str = ESTADO_PIPELINE) -> list:
+    """
+    Executa, em ordem, as etapas cujas entradas ou artefatos mudaram.
+
+    Parâmetros
+    ----------
+    etapas : list of Etapa
+        Etapas em ordem topológica.
+    de : str, opcional
+        Força a execução desta etapa e das seguintes; as anteriores não são
+        executadas, e seus artefatos atuais são usados.
+    somente : list of str, opcional
+        Força a execução apenas destas etapas.
+    simular : bool, opcional
+        Apenas informa o que seria executado, sem executar nem gravar o estado
+        (padrão: False).
+    marcar : bool, opcional
+        Em vez de executar, registra as entradas atuais e os artefatos já
+        existentes como resultado das etapas, por exemplo para adotar os pesos
+        de um treino feito antes do estado existir (padrão: False).
+    caminho_estado : str, opcional
+        Arquivo do estado (padrão: ESTADO_PIPELINE).
+
+    Retorno
+    -------
+    list of tuple
+        `(etapa, decisão, motivo)` para cada etapa, com decisão "executar",
+        "pular" ou "ignorar".
+    """
+    nomes = [etapa.nome for etapa in etapas]
+    for nome in ([de] if de else []) + list(somente or []):
+        if nome not in nomes:
+            logger.error(f"Etapa desconhecida: {nome} (etapas: {', '.join(nomes)})")
+            raise RuntimeError(f"Etapa desconhecida: {nome}")
+
+    estado = carregar_estado(caminho_estado)
+    por_nome = {etapa.nome: etapa for etapa in etapas}
+    saidas_atuais = {}
+    a_executar = set()
+    plano = []
+
+    def saidas_de(nome):
+        if nome not in saidas_atuais:
+            saidas_atuais[nome] = por_nome[nome].saidas()
+        return saidas_atuais[nome]
+
+    def registrar(nome, decisao, motivo):
+        plano.append((nome, decisao, motivo))
+        prefixo = "[simulação] " if simular else ""
+        logger.info(f"{prefixo}Etapa {nome}: {decisao} ({motivo})")
+
+    for posicao, etapa in enumerate(etapas):
+        if etapa.ativa is not None and not etapa.ativa():
+            registrar(etapa.nome, "ignorar", "desativada na configuração")
+            continue
+        if somente and etapa.nome not in somente:
+            registrar(etapa.nome, "ignorar", "fora de --only")
+            continue
+        if de and posicao < nomes.index(de):
+            registrar(etapa.nome, "ignorar", "anterior a --from")
+            continue
+
+        pendentes = [d for d in etapa.depende if d in a_executar]
+        if simular and pendentes:
+            a_executar.add(etapa.nome)
+            registrar(etapa.nome, "executar", "etapa anterior será executada: " + ", ".join(pendentes))
+            continue
+
+        entradas = {k: impressao(v) for k, v in etapa.entradas().items()}
+        for dependencia in etapa.depende:
+            entradas[f"etapa:{dependencia}"] = impressao(saidas_de(dependencia))
+
+        if somente or de:
+            motivo = "forçada por --only" if somente else "forçada por --from"
+        else:
+            motivo = _motivo_execucao(estado.get(etapa.nome), entradas, saidas_de(etapa.nome))
+        if motivo is None:
+            registrar(etapa.nome, "pular", f"em cache desde {estado[etapa.nome]['concluida_em']}")
+            continue
+
+        a_executar.add(etapa.nome)
+        registrar(etapa.nome, "executar", motivo)
+        if simular:
+            continue
+
+        inicio = time.perf_counter()
+        if not marcar:
+            etapa.executar()
+        duracao = time.perf_counter() - inicio
+        saidas_atuais.pop(etapa.nome, None)
+        saidas = saidas_de(etapa.nome)
+        ausentes = [k for k, v in saidas.items() if v is None]
+        if ausentes:
+            logger.warning(f"Etapa {etapa.nome} terminou sem os artefatos: {', '.join(ausentes)}")
+        estado[etapa.nome] = {
+            "entradas": entradas,
+            "saidas": saidas,
+            "concluida_em": datetime.now().isoformat(timespec="seconds"),
+            "duracao_s": round(duracao, 1),
+        }
+        salvar_estado(estado, caminho_estado)
+        logger.info(f"Etapa {etapa.nome} marcada como concluída" if marcar else f"Etapa {etapa.nome} concluída em {duracao:.1f}s")
+
+    return plano
@@ -0,0 +1,179 @@
+"""
+Inferência fatiada para fotos de alta resolução.
+
+O modelo recebe imagens redimensionadas para 640 px, e itens pequenos (ovos,
+caixas de suco) de uma foto inteira da despensa somem nessa redução. Aqui a
+imagem é dividida em janelas sobrepostas de `tamanho` pixels, que o modelo vê
+na resolução original. Todas as janelas (e, opcionalmente, a imagem inteira,
+para os itens grandes) vão em uma única chamada ao modelo, em lote. As caixas
+são levadas de volta às coordenadas da imagem e as duplicatas entre janelas
+são removidas por NMS por classe.
+
+Na NMS, a sobreposição entre duas caixas pode ser medida pela IoU ou pela
+interseção sobre a menor caixa ("ios"), que também elimina a caixa parcial
+de um item cortado na borda de uma janela.
+
+Uso:
+    deteccoes = inferir_fatiado(modelo, imagem)
+"""
+
+import numpy as np
+
+from config import (
+    FATIAMENTO_TAMANHO, FATIAMENTO_SOBREPOSICAO, FATIAMENTO_LIMIAR_NMS, FATIAMENTO_METRICA,
+    FATIAMENTO_IMAGEM_INTEIRA, FATIAMENTO_LOTE,
+)
+from deteccao import Deteccoes, filtrar_deteccoes
+
+
+def gerar_janelas(altura: int, largura: int, tamanho: int = FATIAMENTO_TAMANHO,
+                  sobreposicao: float = FATIAMENTO_SOBREPOSICAO):
+    """
+    Calcula janelas quadradas sobrepostas que cobrem toda a imagem.
+
+    A última janela de cada eixo é alinhada à borda da imagem, de modo que
+    todas têm o mesmo tamanho (exceto quando a imagem é menor que `tamanho`).
+
+    Parâmetros
+    ----------
+    altura, largura : int
+        Dimensões da imagem.
+    tamanho : int, opcional
+        Lado das janelas em pixels (padrão: FATIAMENTO_TAMANHO).
+    sobreposicao : float, opcional
+        Fração de sobreposição entre janelas vizinhas, de 0 a <1 (padrão: FATIAMENTO_SOBREPOSICAO).
+
+    Retorno
+    -------
+    numpy.ndarray
+        Janelas (K, 4) no formato xyxy, dtype int64.
+    """
+    passo = max(1, int(tamanho * (1 - sobreposicao)))
+
+    def inicios(total):
+        if total <= tamanho:
+            return [0]
+        return sorted(set(list(range(0, total - tamanho, passo)) + [total - tamanho]))
+
+    ys, xs = inicios(altura), inicios(largura)
+    return np.array(
+        [(x, y, min(x + tamanho, largura), min(y + tamanho, altura)) for y in ys for x in xs],
+        dtype=np.int64,
+    )
+
+
+def nms_por_classe(dados, limiar: float = FATIAMENTO_LIMIAR_NMS, metrica: str = FATIAMENTO_METRICA):
+    """
+    Supressão de não máximos por classe, vetorizada com numpy.
+
+    Parâmetros
+    ----------
+    dados : numpy.ndarray
+        Array (N, 6): x1, y1, x2, y2, confiança, classe.
+    limiar : float, opcional
+        Sobreposição a partir da qual a caixa de menor confiança é removida
+        (padrão: FATIAMENTO_LIMIAR_NMS).
+    metrica : str, opcional
+        "iou" ou "ios" (interseção sobre a menor área) (padrão: FATIAMENTO_METRICA).
+
+    Retorno
+    -------
+    numpy.ndarray
+        Índices das caixas mantidas, em ordem decrescente de confiança.
+    """
+    if len(dados) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    # Desloca cada classe para uma região própria, para que caixas de classes diferentes não se sobreponham
+    deslocamento = dados[:, 5:6] * (dados[:, :4].max() + 1)
+    caixas = dados[:, :4] + deslocamento
+    areas = (caixas[:, 2] - caixas[:, 0]) * (caixas[:, 3] - caixas[:, 1])
+    ordem = np.argsort(-dados[:, 4], kind="stable")
+
+    mantidas = []
+    while len(ordem):
+        i, resto = ordem[0], ordem[1:]
+        mantidas.append(i)
+        largura = np.clip(np.minimum(caixas[i, 2], caixas[resto, 2]) - np.maximum(caixas[i, 0], caixas[resto, 0]), 0, None)
+        altura = np.clip(np.minimum(caixas[i, 3], caixas[resto, 3]) - np.maximum(caixas[i, 1], caixas[resto, 1]), 0, None)
+        intersecao = largura * altura
+        if metrica == "ios":
+            base = np.minimum(areas[i], areas[resto])
+        else:
+            base = areas[i] + areas[resto] - intersecao
+        ordem = resto[intersecao / np.maximum(base, 1e-9) < limiar]
+    return np.array(mantidas, dtype=np.int64)
+
+
+def inferir_fatiado(
+    modelo,
+    imagem,
+    conf_min: float = 0.5,
+    tamanho: int = FATIAMENTO_TAMANHO,
+    sobreposicao: float = FATIAMENTO_SOBREPOSICAO,
+    limiar_nms: float = FATIAMENTO_LIMIAR_NMS,
+    metrica: str = FATIAMENTO_METRICA,
+    imagem_inteira: bool = FATIAMENTO_IMAGEM_INTEIRA,
+    lote: int = FATIAMENTO_LOTE,
+) -> Deteccoes:
+    """
+    Detecta objetos em janelas sobrepostas da imagem com uma única chamada ao modelo.
+
+    Parâmetros
+    ----------
+    modelo : ultralytics.YOLO
+        Modelo carregado (qualquer backend).
+    imagem : numpy.ndarray
+        Imagem BGR em resolução original.
+    conf_min : float, opcional
+        Confiança mínima entre 0 e 1 (padrão: 0.5).
+    tamanho : int, opcional
+        Lado das janelas em pixels (padrão: FATIAMENTO_TAMANHO).
+    sobreposicao : float, opcional
+        Fração de sobreposição entre janelas (padrão: FATIAMENTO_SOBREPOSICAO).
+    limiar_nms : float, opcional
+        Limiar da NMS entre janelas (padrão: FATIAMENTO_LIMIAR_NMS).
+    metrica : str, opcional
+        Métrica de sobreposição da NMS, "iou" ou "ios" (padrão: FATIAMENTO_METRICA).
+    imagem_inteira : bool, opcional
+        Inclui a imagem inteira no lote, para os itens maiores que uma janela
+        (padrão: FATIAMENTO_IMAGEM_INTEIRA).
+    lote : int, opcional
+        Máximo de janelas por chamada ao modelo; None envia todas de uma vez
+        (padrão: FATIAMENTO_LOTE).
+
+    Retorno
+    -------
+    Deteccoes
+        Detecções combinadas, em coordenadas da imagem original.
+    """
+    altura, largura = imagem.shape[:2]
+    janelas = gerar_janelas(altura, largura, tamanho, sobreposicao)
+    recortes = [imagem[y1:y2, x1:x2] for x1, y1, x2, y2 in janelas.tolist()]
+    origens = janelas[:, :2]
+    if imagem_inteira and len(janelas) > 1:
+        recortes.append(imagem)
+        origens = np.vstack([origens, np.zeros((1, 2), dtype=np.int64)])
+
+    lote = lote or len(recortes)
+    resultados = [
+        resultado
+        for i in range(0, len(recortes), lote)
+        for resultado in modelo(recortes[i:i + lote], conf=conf_min, verbose=False)
+    ]
+
+    partes = []
+    for resultado, (x0, y0) in zip(resultados, origens.tolist()):
+        if resultado.boxes is None or len(resultado.boxes) == 0:
+            continue
+        dados = resultado.boxes.data.cpu().numpy()
+        dados = np.concatenate([dados[:, :4], dados[:, -2:]], axis=1)
+        dados[:, [0, 2]] += x0
+        dados[:, [1, 3]] += y0
+        partes.append(dados)
+
+    if not partes:
+        return filtrar_deteccoes(np.empty((0, 6), dtype=np.float32), resultados[0].names, conf_min)
+
+    dados = np.concatenate(partes)
+    return filtrar_deteccoes(dados[nms_por_classe(dados, limiar_nms, metrica)], resultados[0].names, conf_min)
@@ -0,0 +1,312 @@
+"""
+Índice persistente dos datasets baixados em BASE_DIR.
+
+O índice fica em um único arquivo JSON compactado com gzip (INDICE_DATASETS)
+e registra, para cada dataset e split, as imagens (tamanho em bytes, mtime,
+hash do conteúdo e dimensões), os rótulos (mtime, hash e número de caixas por
+classe) e estatísticas por classe.
+
+A cada execução, uma pasta só é listada novamente se o seu mtime mudou
+(arquivos adicionados ou removidos); dentro dela, apenas arquivos com tamanho
+ou mtime diferentes são relidos e têm o hash recalculado. Edições no próprio
+arquivo não alteram o mtime da pasta; use `verificar=True` para checar o
+mtime de cada arquivo.
+
+Uso:
+    indice, relatorio = atualizar_indice()
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import time
+
+import yaml
+from PIL import Image
+
+from config import BASE_DIR, INDICE_DATASETS
+from logger import logger
+
+VERSAO_INDICE = 2
+SPLITS = ("train", "valid", "test")
+EXTENSOES_IMAGEM = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"}
+
+
+def hash_arquivo(caminho: str) -> str:
+    """
+    Calcula o hash BLAKE2b (128 bits) do conteúdo de um arquivo.
+
+    Parâmetros
+    ----------
+    caminho : str
+        Caminho do arquivo.
+
+    Retorno
+    -------
+    str
+        Hash em hexadecimal.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def carregar_indice(caminho_indice: str = INDICE_DATASETS) -> dict:
+    """
+    Carrega o índice salvo, ou retorna um índice vazio se não existir ou for incompatível.
+
+    Parâmetros
+    ----------
+    caminho_indice : str, opcional
+        Caminho do arquivo do índice (padrão: INDICE_DATASETS).
+
+    Retorno
+    -------
+    dict
+        Índice dos datasets.
+    """
+    if os.path.exists(caminho_indice):
+        try:
+            with gzip.open(caminho_indice, "rt", encoding="utf-8") as f:
+                indice = json.load(f)
+            if indice.get("versao") == VERSAO_INDICE:
+                return indice
+            logger.warning(f"Índice de datasets em versão antiga, será recriado: {caminho_indice}")
+        except (OSError, ValueError):
+            logger.warning(f"Índice de datasets corrompido, será recriado: {caminho_indice}")
+    return {"versao": VERSAO_INDICE, "datasets": {}}
+
+
+def salvar_indice(indice: dict, caminho_indice: str = INDICE_DATASETS) -> None:
+    """
+    Salva o índice de forma atômica (arquivo temporário + rename).
+
+    Parâmetros
+    ----------
+    indice : dict
+        Índice dos datasets.
+    caminho_indice : str, opcional
+        Caminho do arquivo do índice (padrão: INDICE_DATASETS).
+    """
+    temporario = caminho_indice + ".tmp"
+    with gzip.open(temporario, "wt", encoding="utf-8") as f:
+        json.dump(indice, f, separators=(",", ":"))
+    os.replace(temporario, caminho_indice)
+
+
+def hash_indice(indice: dict) -> str:
+    """
+    Calcula um hash que muda sempre que o conteúdo de alguma imagem ou rótulo muda.
+
+    Parâmetros
+    ----------
+    indice : dict
+        Índice dos datasets.
+
+    Retorno
+    -------
+    str
+        Hash em hexadecimal.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for nome in sorted(indice["datasets"]):
+        dataset = indice["datasets"][nome]
+        h.update(json.dumps([nome, dataset["names"]]).encode())
+        for split in sorted(dataset["splits"]):
+            dados = dataset["splits"][split]
+            for arquivo in sorted(dados["imagens"]):
+                h.update(f"{split}/{arquivo}:{dados['imagens'][arquivo]['hash']}".encode())
+            for arquivo in sorted(dados["rotulos"]):
+                h.update(f"{split}/{arquivo}:{dados['rotulos'][arquivo]['hash']}".encode())
+    return h.hexdigest()
+
+
+def _mtime_pasta(pasta: str):
+    try:
+        return os.stat(pasta).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _ler_imagem(entrada: os.DirEntry, stat: os.stat_result) -> dict:
+    with Image.open(entrada.path) as imagem:
+        largura, altura = imagem.size
+        if imagem.getexif().get(0x0112) in (5, 6, 7, 8):  # orientação EXIF com rotação de 90°
+            largura, altura = altura, largura
+    return {
+        "tamanho": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "hash": hash_arquivo(entrada.path),
+        "largura": largura,
+        "altura": altura,
+    }
+
+
+def _ler_rotulo(entrada: os.DirEntry, stat: os.stat_result) -> dict:
+    caixas = {}
+    with open(entrada.path, "rb") as f:
+        conteudo = f.read()
+    for linha in conteudo.splitlines():
+        partes = linha.split(maxsplit=1)
+        if partes:
+            classe = partes[0].decode()
+            caixas[classe] = caixas.get(classe, 0) + 1
+    return {
+        "tamanho": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "hash": hashlib.blake2b(conteudo, digest_size=16).hexdigest(),
+        "caixas": caixas,
+    }
+
+
+def _atualizar_pasta(pasta, anteriores, mtime_anterior, extensoes, ler, verificar, relatorio, prefixo):
+    """
+    Sincroniza as entradas de uma pasta com o disco e retorna `(entradas, mtime)`.
+    """
+    mtime = _mtime_pasta(pasta)
+    if mtime is None:
+        relatorio["removidos"].extend(f"{prefixo}/{nome}" for nome in anteriores)
+        return {}, None
+    if mtime == mtime_anterior and not verificar:
+        return anteriores, mtime
+
+    relatorio["pastas_listadas"] += 1
+    entradas = {}
+    for entrada in os.scandir(pasta):
+        if not entrada.is_file() or os.path.splitext(entrada.name)[1].lower() not in extensoes:
+            continue
+        stat = entrada.stat()
+        anterior = anteriores.get(entrada.name)
+        if anterior and anterior["tamanho"] == stat.st_size and anterior["mtime"] == stat.st_mtime_ns:
+            entradas[entrada.name] = anterior
+            continue
+        entradas[entrada.name] = ler(entrada, stat)
+        relatorio["modificados" if anterior else "adicionados"].append(f"{prefixo}/{entrada.name}")
+
+    relatorio["removidos"].extend(f"{prefixo}/{nome}" for nome in anteriores if nome not in entradas)
+    return entradas, mtime
+
+
+def _estatisticas_split(rotulos: dict, names: list) -> dict:
+    estatisticas = {}
+    for rotulo in rotulos.values():
+        for classe, n in rotulo["caixas"].items():
+            nome = names[int(classe)] if classe.isdigit() and int(classe) < len(names) else classe
+            atual = estatisticas.setdefault(nome, {"caixas": 0, "imagens": 0})
+            atual["caixas"] += n
+            atual["imagens"] += 1
+    return estatisticas
+
+
+def atualizar_indice(base_dir: str = BASE_DIR, caminho_indice: str = INDICE_DATASETS, verificar: bool = False,
+                     salvar: bool = True):
+    """
+    Atualiza o índice dos datasets em `base_dir`, relendo apenas o que mudou.
+
+    Parâmetros
+    ----------
+    base_dir : str, opcional
+        Diretório com os datasets (padrão: BASE_DIR).
+    caminho_indice : str, opcional
+        Caminho do arquivo do índice (padrão: INDICE_DATASETS).
+    verificar : bool, opcional
+        Se True, lista todas as pastas e compara o mtime de cada arquivo, mesmo
+        quando o mtime da pasta não mudou (padrão: False).
+    salvar : bool, opcional
+        Se False, não grava o índice atualizado no disco; usado pelo `--dry-run`
+        de `main.py` (padrão: True).
+
+    Retorno
+    -------
+    tuple
+        `(indice, relatorio)`, em que `relatorio` contém as listas de arquivos
+        adicionados, removidos e modificados, o número de pastas listadas e o
+        tempo gasto em ms.
+    """
+    inicio = time.perf_counter()
+    indice = carregar_indice(caminho_indice)
+    relatorio = {"adicionados": [], "removidos": [], "modificados": [], "pastas_listadas": 0}
+    datasets = {}
+
+    for entrada in os.scandir(base_dir):
+        yaml_path = os.path.join(entrada.path, "data.yaml")
+        if not entrada.is_dir() or entrada.name.startswith(".") or not os.path.exists(yaml_path):
+            continue
+
+        anterior = indice["datasets"].get(entrada.name, {})
+        mtime_yaml = os.stat(yaml_path).st_mtime_ns
+        if anterior.get("mtime_yaml") == mtime_yaml:
+            names = anterior["names"]
+        else:
+            with open(yaml_path, "r") as f:
+                names = yaml.safe_load(f).get("names")
+            if isinstance(names, dict):
+                names = [names[k] for k in sorted(names)]
+
+        splits = {}
+        for split in SPLITS:
+            anterior_split = anterior.get("splits", {}).get(split, {"imagens": {}, "rotulos": {}})
+            prefixo = f"{entrada.name}/{split}"
+            imagens, mtime_imagens = _atualizar_pasta(
+                os.path.join(entrada.path, split, "images"), anterior_split["imagens"],
+                anterior_split.get("mtime_imagens"), EXTENSOES_IMAGEM, _ler_imagem,
+                verificar, relatorio, f"{prefixo}/images",
+            )
+            rotulos, mtime_rotulos = _atualizar_pasta(
+                os.path.join(entrada.path, split, "labels"), anterior_split["rotulos"],
+                anterior_split.get("mtime_rotulos"), {".txt"}, _ler_rotulo,
+                verificar, relatorio, f"{prefixo}/labels",
+            )
+            if not imagens:
+                continue
+            if rotulos is anterior_split["rotulos"] and names == anterior.get("names"):
+                classes = anterior_split["classes"]
+            else:
+                classes = _estatisticas_split(rotulos, names or [])
+            splits[split] = {
+                "mtime_imagens": mtime_imagens,
+                "mtime_rotulos": mtime_rotulos,
+                "imagens": imagens,
+                "rotulos": rotulos,
+                "classes": classes,
+            }
+
+        datasets[entrada.name] = {"mtime_yaml": mtime_yaml, "names": names, "splits": splits}
+
+    for nome, dataset in indice["datasets"].items():
+        if nome not in datasets:
+            for split, dados in dataset["splits"].items():
+                relatorio["removidos"].extend(f"{nome}/{split}/images/{a}" for a in dados["imagens"])
+
+    mudou = datasets != indice["datasets"]
+    indice["datasets"] = datasets
+    if mudou and salvar:
+        salvar_indice(indice, caminho_indice)
+
+    relatorio["tempo_ms"] = (time.perf_counter() - inicio) * 1000
+    return indice, relatorio
+
+
+def imagens_split(indice: dict, dataset: str, split: str) -> dict:
+    """
+    Retorna as entradas das imagens de um split.
+
+    Parâmetros
+    ----------
+    indice : dict
+        Índice dos datasets.
+    dataset : str
+        Nome da pasta do dataset.
+    split : str
+        "train", "valid" ou "test".
+
+    Retorno
+    -------
+    dict
+        Mapeamento nome do arquivo -> entrada da imagem.
+    """
+    dados = indice["datasets"].get(dataset, {}).get("splits", {}).get(split)
+    return dados["imagens"] if dados else {}
@@ -0,0 +1,392 @@
+"""
+Instrumentação leve por etapa: temporizadores, contadores e histogramas.
+
+As etapas são medidas com `medir`, que funciona como gerenciador de contexto
+ou como decorador, e cada duração entra no histograma da etapa (baldes fixos
+de 1 ms a 1 h). Os contadores acumulam valores inteiros com `contar`.
+
+Com INSTRUMENTACAO desativada, `medir` e `contar` apenas verificam uma
+variável do módulo, sem ler o relógio nem tomar a trava. Ativada, os dados
+podem ser:
+    - gravados em INSTRUMENTACAO_SAIDA ao fim do processo (JSON, ou texto do
+      Prometheus se o arquivo terminar em .prom);
+    - servidos em http://127.0.0.1:<INSTRUMENTACAO_PORTA>/metrics (Prometheus)
+      e /metrics.json.
+
+Com INSTRUMENTACAO_PERFIL, cada etapa também é perfilada com cProfile (só a
+etapa mais externa de cada thread, pois o cProfile não aceita perfis
+aninhados), e os perfis são gravados em INSTRUMENTACAO_PERFIS_DIR/<etapa>.prof,
+para abrir com `python -m pstats` ou snakeviz. Para amostragem externa com o
+py-spy (`py-spy record --pid <pid>`), as threads do streaming têm nome
+("captura", "inferencia") e as etapas são funções nomeadas.
+
+Uso:
+    from instrumentacao import medir, contar
+
+    with medir("treino.epoca"):
+        ...
+
+    @medir("preparacao")
+    def gerar_data_yaml(): ...
+
+    contar("inventario.imagens", len(frames))
+"""
+
+import atexit
+import bisect
+import cProfile
+import functools
+import json
+import os
+import pstats
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import (
+    INSTRUMENTACAO, INSTRUMENTACAO_SAIDA, INSTRUMENTACAO_PORTA, INSTRUMENTACAO_PERFIL, INSTRUMENTACAO_PERFIS_DIR,
+)
+from logger import logger
+
+# Limites superiores dos baldes dos histogramas, em segundos (o último balde é +Inf)
+LIMITES = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 1800, 3600)
+
+_ativo = INSTRUMENTACAO
+_perfilar = INSTRUMENTACAO_PERFIL
+_trava = threading.Lock()
+_histogramas = {}
+_contadores = {}
+_perfis = {}
+_local = threading.local()
+_iniciado = False
+
+
+class Histograma:
+    """
+    Histograma de durações com baldes fixos, soma, mínimo e máximo.
+    """
+
+    __slots__ = ("baldes", "soma", "contagem", "minimo", "maximo")
+
+    def __init__(self):
+        self.baldes = [0] * (len(LIMITES) + 1)
+        self.soma = 0.0
+        self.contagem = 0
+        self.minimo = float("inf")
+        self.maximo = 0.0
+
+    def observar(self, valor: float) -> None:
+        self.baldes[bisect.bisect_left(LIMITES, valor)] += 1
+        self.soma += valor
+        self.contagem += 1
+        self.minimo = min(self.minimo, valor)
+        self.maximo = max(self.maximo, valor)
+
+    def quantil(self, q: float) -> float:
+        """
+        Estima o quantil `q` pelo limite superior do balde que o contém.
+        """
+        alvo = q * self.contagem
+        acumulado = 0
+        for limite, n in zip(LIMITES + (self.maximo,), self.baldes):
+            acumulado += n
+            if acumulado >= alvo:
+                return min(limite, self.maximo)
+        return self.maximo
+
+    def para_dict(self) -> dict:
+        return {
+            "contagem": self.contagem,
+            "soma_s": self.soma,
+            "media_s": self.soma / self.contagem if self.contagem else 0.0,
+            "min_s": self.minimo if self.contagem else 0.0,
+            "max_s": self.maximo,
+            "p50_s": self.quantil(0.5),
+            "p99_s": self.quantil(0.99),
+            "baldes": {str(l): n for l, n in zip(LIMITES + ("+Inf",), self.baldes)},
+        }
+
+
+def ativar(ativo: bool = True, perfil: bool = None) -> None:
+    """
+    Liga ou desliga a instrumentação em tempo de execução.
+
+    Parâmetros
+    ----------
+    ativo : bool, opcional
+        Coleta as medições (padrão: True).
+    perfil : bool, opcional
+        Perfila as etapas com cProfile; se None, mantém o valor atual.
+    """
+    global _ativo, _perfilar
+    _ativo = ativo
+    if perfil is not None:
+        _perfilar = perfil
+
+
+def observar(nome: str, segundos: float) -> None:
+    """
+    Registra uma duração no histograma da etapa `nome`.
+
+    Parâmetros
+    ----------
+    nome : str
+        Nome da etapa, com pontos separando os níveis (ex.: "treino.epoca").
+    segundos : float
+        Duração medida.
+    """
+    if not _ativo:
+        return
+    with _trava:
+        histograma = _histogramas.get(nome)
+        if histograma is None:
+            histograma = _histogramas[nome] = Histograma()
+        histograma.observar(segundos)
+
+
+def contar(nome: str, n: int = 1) -> None:
+    """
+    Soma `n` ao contador `nome`.
+
+    Parâmetros
+    ----------
+    nome : str
+        Nome do contador.
+    n : int, opcional
+        Valor somado (padrão: 1).
+    """
+    if not _ativo:
+        return
+    with _trava:
+        _contadores[nome] = _contadores.get(nome, 0) + n
+
+
+def _iniciar_perfil(nome: str):
+    if getattr(_local, "perfilando", False):
+        return None
+    chave = (nome, threading.current_thread().name)
+    with _trava:
+        perfil = _perfis.get(chave)
+        if perfil is None:
+            perfil = _perfis[chave] = cProfile.Profile()
+    try:
+        perfil.enable()
+    except ValueError:
+        # Outro perfilador já ativo nesta thread
+        return None
+    _local.perfilando = True
+    return perfil
+
+
+class _Medicao:
+    """
+    Mede uma etapa como gerenciador de contexto ou decorador (ver `medir`).
+    """
+
+    __slots__ = ("nome", "inicio", "perfil")
+
+    def __init__(self, nome: str):
+        self.nome = nome
+        self.inicio = None
+        self.perfil = None
+
+    def __enter__(self):
+        if _ativo:
+            if _perfilar:
+                self.perfil = _iniciar_perfil(self.nome)
+            self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excecao):
+        if self.inicio is not None:
+            observar(self.nome, time.perf_counter() - self.inicio)
+            if self.perfil is not None:
+                self.perfil.disable()
+                _local.perfilando = False
+        return False
+
+    def __call__(self, funcao):
+        nome = self.nome
+
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            if not _ativo:
+                return funcao(*args, **kwargs)
+            with _Medicao(nome):
+                return funcao(*args, **kwargs)
+
+        return medida
+
+
+def medir(nome: str) -> _Medicao:
+    """
+    Mede a duração de uma etapa.
+
+    Parâmetros
+    ----------
+    nome : str
+        Nome da etapa, com pontos separando os níveis (ex.: "app.inferencia").
+
+    Retorno
+    -------
+    _Medicao
+        Objeto usado com `with` ou como decorador.
+    """
+    return _Medicao(nome)
+
+
+def instantaneo() -> dict:
+    """
+    Retorna uma cópia das medições atuais.
+
+    Retorno
+    -------
+    dict
+        `{"etapas": {nome: resumo do histograma}, "contadores": {nome: valor}}`.
+    """
+    with _trava:
+        return {
+            "etapas": {nome: h.para_dict() for nome, h in sorted(_histogramas.items())},
+            "contadores": dict(sorted(_contadores.items())),
+        }
+
+
+def texto_prometheus() -> str:
+    """
+    Formata as medições no formato de texto do Prometheus.
+
+    Retorno
+    -------
+    str
+        Histograma `pipeline_etapa_segundos` com o rótulo `etapa` e contador
+        `pipeline_eventos_total` com o rótulo `nome`.
+    """
+    with _trava:
+        linhas = ["# TYPE pipeline_etapa_segundos histogram"]
+        for nome, h in sorted(_histogramas.items()):
+            acumulado = 0
+            for limite, n in zip(LIMITES + ("+Inf",), h.baldes):
+                acumulado += n
+                linhas.append(f'pipeline_etapa_segundos_bucket{{etapa="{nome}",le="{limite}"}} {acumulado}')
+            linhas.append(f'pipeline_etapa_segundos_sum{{etapa="{nome}"}} {h.soma}')
+            linhas.append(f'pipeline_etapa_segundos_count{{etapa="{nome}"}} {h.contagem}')
+        linhas.append("# TYPE pipeline_eventos_total counter")
+        for nome, valor in sorted(_contadores.items()):
+            linhas.append(f'pipeline_eventos_total{{nome="{nome}"}} {valor}')
+    return "\n".join(linhas) + "\n"
+
+
+def exportar(caminho: str = INSTRUMENTACAO_SAIDA) -> None:
+    """
+    Grava as medições em JSON ou, se `caminho` terminar em .prom, no formato do Prometheus.
+
+    Parâmetros
+    ----------
+    caminho : str, opcional
+        Arquivo de saída (padrão: INSTRUMENTACAO_SAIDA).
+    """
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        if caminho.endswith(".prom"):
+            f.write(texto_prometheus())
+        else:
+            json.dump(instantaneo(), f, indent=2, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+def salvar_perfis(diretorio: str = INSTRUMENTACAO_PERFIS_DIR) -> None:
+    """
+    Grava um arquivo .prof por etapa, somando os perfis de todas as threads.
+
+    Parâmetros
+    ----------
+    diretorio : str, opcional
+        Diretório dos perfis (padrão: INSTRUMENTACAO_PERFIS_DIR).
+    """
+    with _trava:
+        perfis = dict(_perfis)
+    por_etapa = {}
+    for (nome, _), perfil in perfis.items():
+        por_etapa.setdefault(nome, []).append(perfil)
+    if not por_etapa:
+        return
+    os.makedirs(diretorio, exist_ok=True)
+    for nome, lista in por_etapa.items():
+        try:
+            estatisticas = pstats.Stats(lista[0])
+            for perfil in lista[1:]:
+                estatisticas.add(perfil)
+        except TypeError:
+            # Perfil sem nenhuma chamada registrada
+            continue
+        estatisticas.dump_stats(os.path.join(diretorio, f"{nome}.prof"))
+    logger.info(f"Perfis por etapa salvos em: {diretorio}")
+
+
+class _ManipuladorMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            corpo, tipo = texto_prometheus().encode(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            corpo, tipo = json.dumps(instantaneo(), ensure_ascii=False).encode(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def servir_metricas(porta: int = INSTRUMENTACAO_PORTA, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Serve /metrics e /metrics.json em uma thread em segundo plano.
+
+    Parâmetros
+    ----------
+    porta : int, opcional
+        Porta TCP (padrão: INSTRUMENTACAO_PORTA).
+    host : str, opcional
+        Endereço de escuta (padrão: "127.0.0.1").
+
+    Retorno
+    -------
+    ThreadingHTTPServer
+        Servidor iniciado (encerre com `shutdown()`).
+    """
+    servidor = ThreadingHTTPServer((host, porta), _ManipuladorMetricas)
+    threading.Thread(target=servidor.serve_forever, name="metricas", daemon=True).start()
+    logger.info(f"Métricas por etapa em http://{host}:{porta}/metrics")
+    return servidor
+
+
+def finalizar_instrumentacao() -> None:
+    """
+    Grava as medições em INSTRUMENTACAO_SAIDA e os perfis por etapa.
+    """
+    if not (_histogramas or _contadores):
+        return
+    exportar()
+    logger.info(f"Métricas por etapa salvas em: {INSTRUMENTACAO_SAIDA}")
+    if _perfilar:
+        salvar_perfis()
+
+
+def iniciar_instrumentacao() -> None:
+    """
+    Prepara a exportação configurada: endpoint local e gravação ao fim do processo.
+
+    Não faz nada com INSTRUMENTACAO desativada; chamadas repetidas são ignoradas.
+    """
+    global _iniciado
+    if not _ativo or _iniciado:
+        return
+    _iniciado = True
+    atexit.register(finalizar_instrumentacao)
+    if INSTRUMENTACAO_PORTA:
+        servir_metricas(INSTRUMENTACAO_PORTA)
@@ -1,42 +1,240 @@
 """
 Configuração centralizada do logging para o projeto.
 
-Este módulo configura o logger padrão para registrar mensagens tanto em
-arquivo quanto no console. O arquivo de log é salvo dentro do diretório
-de resultados definido no arquivo de configuração `config.py`.
+O logger raiz recebe um único `QueueHandler`: registrar uma mensagem só a
+coloca em uma fila limitada, e uma thread (`QueueListener`) a escreve no
+console, no arquivo de log e, opcionalmente, em um arquivo JSONL. Assim as
+threads da interface e do streaming não esperam pelo console nem pelo disco.
 
-Configurações:
-- Nível de log: INFO
-- Formato: timestamp, nível do log e mensagem
-- Handlers:
-    - FileHandler: escreve logs no arquivo 'app.log' em modo append
-    - StreamHandler: imprime logs no console
+Configurações (`config.py`):
+- LOG_NIVEL: nível do logger raiz (padrão: INFO)
+- LOG_ARQUIVO: arquivo de log, em modo append (padrão: resultados/app.log)
+- LOG_JSONL: arquivo opcional com um objeto JSON por mensagem, incluindo os
+  campos passados em `extra`
+- LOG_FILA_MAX e LOG_FILA_CHEIA: tamanho da fila e o que fazer quando ela
+  enche: "descartar" a mensagem (as descartadas são informadas na próxima que
+  couber) ou "bloquear" quem registra até haver espaço
+- LOG_INTERVALO_LIMITADO: intervalo padrão de `log_limitado`
+
+Importar este módulo não cria pastas nem abre arquivos: os handlers e a
+thread são criados na primeira mensagem emitida, e a fila é esvaziada ao fim
+do processo (inclusive nos processos de `multiprocessing`).
 
 Variáveis exportadas:
 - logger: objeto logger raiz configurado para uso em outros módulos
+- log_limitado: registra mensagens de caminhos quentes (por frame) no máximo
+  uma vez por intervalo
 
 Uso:
 Importe o logger deste módulo para registrar mensagens uniformemente:
-    from logger import logger
+    from logger import logger, log_limitado
     logger.info("Mensagem de informação")
+    logger.info("Lote gravado", extra={"registros": 500})   # "registros" vai para o JSONL
+    log_limitado("stream.inferencia", "Falha na inferência: %s", erro, nivel=logging.ERROR)
 """
 
+import json
 import logging
 import os
-from config import RESULTADOS_DIR
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+from config import LOG_NIVEL, LOG_ARQUIVO, LOG_JSONL, LOG_FILA_MAX, LOG_FILA_CHEIA, LOG_INTERVALO_LIMITADO
+
+FORMATO = "%(asctime)s - %(levelname)s - %(message)s"
+POLITICAS_FILA_CHEIA = ("descartar", "bloquear")
+
+# Atributos de todo LogRecord; os demais vieram de `extra`
+_ATRIBUTOS_REGISTRO = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class FormatadorJSON(logging.Formatter):
+    """
+    Formata cada registro como um objeto JSON em uma linha, com os campos de `extra`.
+    """
+
+    def format(self, record):
+        dados = {
+            "momento": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "mensagem": record.getMessage(),
+        }
+        dados.update({k: v for k, v in vars(record).items() if k not in _ATRIBUTOS_REGISTRO})
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
 
-# Garante que o diretório de resultados exista
-os.makedirs(RESULTADOS_DIR, exist_ok=True)
+class HandlerFila(QueueHandler):
+    """
+    `QueueHandler` com fila limitada, política para a fila cheia e início preguiçoso da escrita.
+    """
 
-LOG_FILE = os.path.join(RESULTADOS_DIR, "app.log")
+    def __init__(self, fila: queue.Queue, politica: str = LOG_FILA_CHEIA):
+        """
+        Parâmetros
+        ----------
+        fila : queue.Queue
+            Fila limitada lida pelo `QueueListener`.
+        politica : str, opcional
+            "descartar" ou "bloquear" quando a fila está cheia (padrão: LOG_FILA_CHEIA).
+        """
+        if politica not in POLITICAS_FILA_CHEIA:
+            raise ValueError(f"LOG_FILA_CHEIA inválido: {politica} (opções: {', '.join(POLITICAS_FILA_CHEIA)})")
+        super().__init__(fila)
+        self.politica = politica
+        self.descartadas = 0
+
+    def emit(self, record):
+        configurar_logging()
+        super().emit(record)
+
+    def enqueue(self, record):
+        if self.politica == "bloquear":
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartadas += 1
+            return
+        if self.descartadas:
+            descartadas, self.descartadas = self.descartadas, 0
+            aviso = logging.makeLogRecord({
+                "name": record.name, "levelno": logging.WARNING, "levelname": "WARNING",
+                "msg": f"{descartadas} mensagens de log descartadas com a fila cheia",
+            })
+            try:
+                self.queue.put_nowait(aviso)
+            except queue.Full:
+                self.descartadas += descartadas
+
+
+class _OuvinteFila(QueueListener):
+    # A marca de fim espera espaço na fila em vez de falhar com ela cheia
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_FILE, mode='a', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
 
 logger = logging.getLogger()
+logger.setLevel(LOG_NIVEL)
+_handler = HandlerFila(queue.Queue(LOG_FILA_MAX))
+logger.addHandler(_handler)
+
+_ouvinte = None
+_trava = threading.Lock()
+
+
+def configurar_logging(arquivo: str = LOG_ARQUIVO, jsonl: str = LOG_JSONL) -> None:
+    """
+    Cria os handlers de saída e inicia a thread que esvazia a fila (só na primeira chamada).
+
+    Chamada automaticamente na primeira mensagem emitida.
+
+    Parâmetros
+    ----------
+    arquivo : str, opcional
+        Arquivo de log em texto; None desativa (padrão: LOG_ARQUIVO).
+    jsonl : str, opcional
+        Arquivo de log em JSONL; None desativa (padrão: LOG_JSONL).
+    """
+    global _ouvinte
+    if _ouvinte is not None:
+        return
+    with _trava:
+        if _ouvinte is not None:
+            return
+        # O stderr do processo: a interface (Kivy) troca sys.stderr por um redirecionamento
+        # para o próprio logging, o que faria cada mensagem voltar para a fila. As mensagens
+        # do Kivy já têm o console dele e vão só para os arquivos
+        console = logging.StreamHandler(sys.__stderr__)
+        console.addFilter(lambda registro: not registro.name.startswith("kivy"))
+        console.setFormatter(logging.Formatter(FORMATO))
+        handlers = [console]
+        for caminho, formatador in ((arquivo, logging.Formatter(FORMATO)), (jsonl, FormatadorJSON())):
+            if caminho:
+                os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+                handler = logging.FileHandler(caminho, mode="a", encoding="utf-8")
+                handler.setFormatter(formatador)
+                handlers.append(handler)
+        _ouvinte = _OuvinteFila(_handler.queue, *handlers)
+        _ouvinte.start()
+        # Roda no atexit do processo principal e ao fim dos processos do multiprocessing
+        # (importado aqui para não pesar na importação deste módulo)
+        from multiprocessing import util
+        util.Finalize(None, encerrar_logging, exitpriority=0)
+
+
+def encerrar_logging() -> None:
+    """
+    Escreve as mensagens pendentes, encerra a thread de escrita e fecha os arquivos.
+    """
+    global _ouvinte
+    with _trava:
+        if _ouvinte is None:
+            return
+        ouvinte, _ouvinte = _ouvinte, None
+        ouvinte.stop()
+        for handler in ouvinte.handlers:
+            handler.close()
+
+
+def _reiniciar_no_filho() -> None:
+    # Um processo criado por fork herda a fila, mas não a thread que a esvazia
+    global _ouvinte, _trava
+    _ouvinte = None
+    _trava = threading.Lock()
+    _handler.queue = queue.Queue(LOG_FILA_MAX)
+    _handler.descartadas = 0
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reiniciar_no_filho)
+
+
+_limitados = {}
+_trava_limitados = threading.Lock()
+
+
+def log_limitado(chave: str, mensagem: str, *args, nivel: int = logging.INFO,
+                 intervalo: float = LOG_INTERVALO_LIMITADO) -> bool:
+    """
+    Registra a mensagem no máximo uma vez a cada `intervalo` segundos por `chave`.
+
+    As chamadas suprimidas no intervalo são contadas e informadas na próxima
+    mensagem registrada. A formatação com `args` só ocorre quando a mensagem
+    é de fato registrada.
+
+    Parâmetros
+    ----------
+    chave : str
+        Identifica a origem da mensagem (ex.: "stream.inferencia").
+    mensagem : str
+        Mensagem no formato do `logging` (`%s` substituídos por `args`).
+    *args
+        Argumentos da mensagem.
+    nivel : int, opcional
+        Nível do registro (padrão: logging.INFO).
+    intervalo : float, opcional
+        Intervalo mínimo entre registros, em segundos (padrão: LOG_INTERVALO_LIMITADO).
+
+    Retorno
+    -------
+    bool
+        True se a mensagem foi registrada.
+    """
+    agora = time.monotonic()
+    with _trava_limitados:
+        ultimo, suprimidas = _limitados.get(chave, (None, 0))
+        if ultimo is not None and agora - ultimo < intervalo:
+            _limitados[chave] = (ultimo, suprimidas + 1)
+            return False
+        _limitados[chave] = (agora, 0)
+    if suprimidas:
+        mensagem, args = mensagem + " (+%d suprimidas)", args + (suprimidas,)
+    logger.log(nivel, mensagem, *args)
+    return True
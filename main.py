@@ -1,39 +1,217 @@
-from download import baixar_datasets
+import argparse
+import glob
+import os
+
+from download import baixar_datasets, MANIFESTO
 from prepare_data import gerar_data_yaml
-from train import treinar_modelo
 from predict import avaliar_e_predizer
-from config import NOME_MODELO
+from backends import exportar_backends, comparar_backends, FORMATOS_EXPORTACAO
+from config import (
+    NOME_MODELO, BACKEND_INFERENCIA, EXPORTAR_BACKENDS, LISTA_DATASETS, BASE_DIR, RESULTADOS_DIR,
+    DATASET_COM_TESTE, ROTULOS_PACOTES, ROTULOS_DIR, HIPERPARAMETROS_TREINO, IMGSZ_TREINO,
+    MODELO_TREINADO, CAMINHOS_BACKENDS, COMPRESSAO, COMPRESSAO_DIR, COMPRESSAO_PROFESSOR, HIPERPARAMETROS_PROFESSOR,
+    PROFESSOR_TREINADO, MODELO_COMPRIMIDO, COMPRESSAO_PESO_DESTILACAO, COMPRESSAO_TEMPERATURA, COMPRESSAO_PODA,
+    COMPRESSAO_EPOCAS_AJUSTE, COMPRESSAO_TOLERANCIA_LATENCIA, AVALIACAO_CONF, AVALIACAO_IOU, AVALIACAO_MAX_DET,
+    AVALIACAO_CONF_IMAGENS,
+)
+from etapas import Etapa, executar_etapas, impressao_caminho
+from indice_dataset import atualizar_indice, carregar_indice, hash_indice
+from instrumentacao import medir, iniciar_instrumentacao
+
+
+def _treinar() -> None:
+    # torch e Ultralytics só são importados quando a etapa de treino roda
+    from ultralytics import YOLO
+    from train import treinar_modelo
+
+    treinar_modelo(YOLO(NOME_MODELO))
+
+
+def _treinar_professor() -> None:
+    from compressao import treinar_professor
+
+    treinar_professor()
 
-from ultralytics import YOLO
 
+def _comprimir() -> None:
+    from compressao import comprimir_modelo
+
+    comprimir_modelo()
+
+
+@medir("exportacao")
+def _exportar() -> None:
+    comparar_backends(exportar_backends())
+
+
+def etapas_pipeline(simular: bool = False) -> list:
+    """
+    Declara as etapas do pipeline, suas entradas e seus artefatos.
 
-def main() -> None:
+    - download: LISTA_DATASETS -> manifestos dos datasets.
+    - dados: hash do índice dos datasets (atualizado de forma incremental) e
+      opções de preparação -> data.yaml, hash do índice e rótulos compactos.
+    - treino: saídas de "dados", hiperparâmetros e modelo base -> pesos treinados.
+    - professor (COMPRESSAO): saídas de "dados", modelo base e hiperparâmetros do
+      professor -> pesos do professor da destilação.
+    - compressao (COMPRESSAO): pesos do professor e do modelo treinado e opções de
+      destilação e poda -> modelo comprimido e tabela de Pareto.
+    - exportacao: pesos treinados e formatos -> modelos exportados e comparação.
+    - avaliacao: saídas de "dados", backend configurado, seus pesos e opções
+      de avaliação (imgsz, conf, iou, max_det) -> métricas de teste.
+
+    Parâmetros
+    ----------
+    simular : bool, opcional
+        Calcula as entradas sem efeitos colaterais: o índice dos datasets é
+        atualizado só em memória (padrão: False).
+
+    Retorno
+    -------
+    list of Etapa
+        Etapas em ordem de execução.
+    """
+    pastas_datasets = [os.path.join(BASE_DIR, f"{projeto}_v{versao}") for _, projeto, versao in LISTA_DATASETS]
+    metas_rotulos = lambda: sorted(glob.glob(os.path.join(ROTULOS_DIR, "*", "meta.json")))
+
+    return [
+        Etapa(
+            "download",
+            baixar_datasets,
+            entradas=lambda: {"datasets": LISTA_DATASETS},
+            saidas=lambda: {p: impressao_caminho(os.path.join(p, MANIFESTO)) for p in pastas_datasets},
+        ),
+        Etapa(
+            "dados",
+            gerar_data_yaml,
+            entradas=lambda: {
+                # Edições no próprio arquivo não mudam o mtime da pasta: confere o mtime de cada arquivo
+                "indice": hash_indice(atualizar_indice(verificar=True, salvar=not simular)[0]),
+                "dataset_com_teste": DATASET_COM_TESTE,
+                "rotulos_pacotes": ROTULOS_PACOTES,
+            },
+            saidas=lambda: {
+                "data.yaml": impressao_caminho(os.path.join(BASE_DIR, "data.yaml")),
+                "indice": hash_indice(carregar_indice()),
+                **({p: impressao_caminho(p) for p in metas_rotulos()} if ROTULOS_PACOTES else {}),
+            },
+            depende=("download",),
+        ),
+        Etapa(
+            "treino",
+            _treinar,
+            entradas=lambda: {
+                "modelo_base": NOME_MODELO,
+                "hiperparametros": HIPERPARAMETROS_TREINO,
+                "imgsz": IMGSZ_TREINO,
+            },
+            saidas=lambda: {"pesos": impressao_caminho(MODELO_TREINADO)},
+            depende=("dados",),
+        ),
+        Etapa(
+            "professor",
+            _treinar_professor,
+            entradas=lambda: {
+                "modelo_base": COMPRESSAO_PROFESSOR,
+                "hiperparametros": {**HIPERPARAMETROS_TREINO, **HIPERPARAMETROS_PROFESSOR},
+            },
+            saidas=lambda: {"pesos": impressao_caminho(PROFESSOR_TREINADO)},
+            depende=("dados",),
+            ativa=lambda: COMPRESSAO,
+        ),
+        Etapa(
+            "compressao",
+            _comprimir,
+            entradas=lambda: {
+                "aluno": NOME_MODELO,
+                "hiperparametros": HIPERPARAMETROS_TREINO,
+                "peso": COMPRESSAO_PESO_DESTILACAO,
+                "temperatura": COMPRESSAO_TEMPERATURA,
+                "poda": COMPRESSAO_PODA,
+                "epocas_ajuste": COMPRESSAO_EPOCAS_AJUSTE,
+                "tolerancia_latencia": COMPRESSAO_TOLERANCIA_LATENCIA,
+            },
+            saidas=lambda: {
+                "pesos": impressao_caminho(MODELO_COMPRIMIDO),
+                "pareto": impressao_caminho(os.path.join(COMPRESSAO_DIR, "pareto.json")),
+            },
+            depende=("professor", "treino"),
+            ativa=lambda: COMPRESSAO,
+        ),
+        Etapa(
+            "exportacao",
+            _exportar,
+            entradas=lambda: {"formatos": FORMATOS_EXPORTACAO},
+            saidas=lambda: {
+                **{b: impressao_caminho(c) for b, c in CAMINHOS_BACKENDS.items() if b in FORMATOS_EXPORTACAO},
+                "comparacao": impressao_caminho(os.path.join(RESULTADOS_DIR, "comparacao_backends.json")),
+            },
+            depende=("treino",),
+            ativa=lambda: EXPORTAR_BACKENDS,
+        ),
+        Etapa(
+            "avaliacao",
+            avaliar_e_predizer,
+            entradas=lambda: {
+                "backend": BACKEND_INFERENCIA,
+                "pesos_backend": impressao_caminho(CAMINHOS_BACKENDS[BACKEND_INFERENCIA]),
+                "imgsz": IMGSZ_TREINO,
+                "conf": AVALIACAO_CONF,
+                "iou": AVALIACAO_IOU,
+                "max_det": AVALIACAO_MAX_DET,
+                "conf_imagens": AVALIACAO_CONF_IMAGENS,
+            },
+            saidas=lambda: {"metricas": impressao_caminho(os.path.join(RESULTADOS_DIR, "metricas_teste.json"))},
+            depende=("dados", "treino"),
+        ),
+    ]
+
+
+def main(de: str = None, somente: list = None, simular: bool = False, marcar: bool = False) -> None:
     """Executa o fluxo principal do programa.
 
     Este pipeline realiza as seguintes etapas:
     1. Baixa os datasets do Roboflow.
     2. Gera o arquivo `data.yaml` unificado para o YOLO.
     3. Inicializa e treina o modelo YOLO com os dados.
-    4. Avalia o modelo treinado e realiza predições no conjunto de teste.
+    4. Destila um professor maior no modelo e o poda, gerando o modelo
+       comprimido e a tabela de Pareto (opcional).
+    5. Exporta o modelo para ONNX/OpenVINO e compara latência e mAP (opcional).
+    6. Avalia o modelo no backend configurado e realiza predições no conjunto de teste.
+
+    Cada etapa só é executada se alguma de suas entradas (configuração, hash do
+    índice dos datasets, hash dos pesos) ou algum de seus artefatos mudou
+    desde a última execução (ver `etapas.py`).
 
     Parâmetros
     ----------
-    Nenhum
+    de : str, opcional
+        Força a execução a partir desta etapa.
+    somente : list of str, opcional
+        Força a execução apenas destas etapas.
+    simular : bool, opcional
+        Apenas mostra o que seria executado (padrão: False).
+    marcar : bool, opcional
+        Registra os artefatos existentes como atualizados, sem executar (padrão: False).
 
     Retorno
     -------
     None
         Esta função não retorna nenhum valor. Executa o fluxo completo do projeto.
     """
-    
-    baixar_datasets()
-    gerar_data_yaml()
-
-    modelo = YOLO(NOME_MODELO)
-    modelo_treinado = treinar_modelo(modelo)
 
-    avaliar_e_predizer(modelo_treinado)
+    iniciar_instrumentacao()
+    executar_etapas(etapas_pipeline(simular), de=de, somente=somente, simular=simular, marcar=marcar)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    nomes = [etapa.nome for etapa in etapas_pipeline()]
+    parser = argparse.ArgumentParser(description="Pipeline incremental: download, dados, treino, compressão, exportação, avaliação")
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument("--from", dest="de", choices=nomes, help="força a execução a partir desta etapa")
+    grupo.add_argument("--only", dest="somente", nargs="+", choices=nomes, help="executa apenas estas etapas")
+    parser.add_argument("--dry-run", dest="simular", action="store_true", help="mostra o que seria executado")
+    parser.add_argument("--mark-done", dest="marcar", action="store_true",
+                        help="registra os artefatos existentes como atualizados, sem executar")
+    args = parser.parse_args()
+    main(args.de, args.somente, args.simular, args.marcar)
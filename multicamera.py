@@ -0,0 +1,308 @@
+"""
+Várias câmeras com um único escalonador de inferência em lote.
+
+Cada câmera tem a própria thread de captura (a de `PipelineStream`), que
+deixa o frame mais recente em um slot de profundidade 1. Uma única thread, a
+do `EscalonadorInferencia`, junta os frames novos das câmeras e os envia ao
+modelo em uma só chamada: com N câmeras, o custo por rodada cresce com o
+tamanho do lote, e não N vezes o de um frame.
+
+Depois do primeiro frame novo, o escalonador espera até `espera_max_ms`
+pelas demais câmeras aptas, para completar o lote; não espera pelas câmeras
+cujo último frame o gate de movimento recusou. Cada câmera pode limitar
+as próprias inferências por segundo (`fps_max`) e usar um `GateMovimento`;
+os frames que não vão ao modelo são anotados com as últimas detecções da
+câmera. Quando há mais câmeras esperando do que `lote_max`, a política
+escolhe quais entram no lote:
+- "rodizio": as atendidas há mais tempo primeiro;
+- "prioridade": maior `prioridade` primeiro e, entre iguais, as atendidas há mais tempo.
+As que ficam de fora entram no lote seguinte, com o frame mais recente.
+
+Uso:
+    escalonador = EscalonadorInferencia(inferir_lote)   # inferir_lote(frames) -> [Deteccoes]
+    for i, url in enumerate(urls):
+        escalonador.adicionar(CameraEscalonada(f"camera_{i}", cv2.VideoCapture(url), desenhar))
+    escalonador.iniciar()
+    resultado = escalonador.cameras[0].ultimo_resultado()  # (frame_anotado, deteccoes) ou None
+    contagens = escalonador.contagem()                       # {"camera_0": {item: n}, ...}
+    total = somar_contagens(contagens.values())
+    escalonador.parar()
+"""
+
+import logging
+import threading
+import time
+
+from config import MULTICAMERA_LOTE_MAX, MULTICAMERA_ESPERA_MAX_MS, MULTICAMERA_POLITICA, MULTICAMERA_FPS_MAX
+from deteccao import contar_itens, deteccoes_vazias
+from instrumentacao import medir
+from logger import log_limitado
+from stream import PipelineStream
+
+POLITICAS = ("rodizio", "prioridade")
+
+
+def somar_contagens(contagens) -> dict:
+    """
+    Soma contagens de itens de várias câmeras.
+
+    Câmeras com campos de visão sobrepostos contam o mesmo item mais de uma vez.
+
+    Parâmetros
+    ----------
+    contagens : iterable of dict
+        Mapeamentos nome do item -> quantidade.
+
+    Retorno
+    -------
+    dict
+        Mapeamento nome do item -> soma das quantidades.
+    """
+    total = {}
+    for contagem in contagens:
+        for item, quantidade in contagem.items():
+            total[item] = total.get(item, 0) + quantidade
+    return total
+
+
+class CameraEscalonada(PipelineStream):
+    """
+    Câmera com thread de captura própria, cuja inferência é feita pelo `EscalonadorInferencia`.
+    """
+
+    def __init__(self, nome: str, captura, desenhar, gate=None, prioridade: int = 0,
+                 fps_max: float = MULTICAMERA_FPS_MAX, apos_inferir=None):
+        """
+        Parâmetros
+        ----------
+        nome : str
+            Identificação da câmera nas estatísticas e contagens.
+        captura : cv2.VideoCapture
+            Fonte de frames já aberta (qualquer objeto com `read()` e `release()`).
+        desenhar : callable
+            Função `desenhar(frame, deteccoes) -> frame` que anota o frame.
+        gate : GateMovimento ou None, opcional
+            Se informado, só os frames aprovados pelo gate vão ao modelo.
+        prioridade : int, opcional
+            Prioridade na política "prioridade"; maior vem primeiro (padrão: 0).
+        fps_max : float ou None, opcional
+            Máximo de inferências por segundo desta câmera (padrão: MULTICAMERA_FPS_MAX).
+        apos_inferir : callable, opcional
+            Função `apos_inferir(frame, deteccoes) -> deteccoes` aplicada a cada
+            resultado do modelo, com o frame ainda sem anotações (ex.: o
+            rastreador da câmera).
+        """
+        super().__init__(captura, None, desenhar, gate=gate)
+        self.nome = nome
+        self.prioridade = prioridade
+        self.fps_max = fps_max
+        self.apos_inferir = apos_inferir
+        self.deteccoes = deteccoes_vazias({})
+        self.ultima_inferencia = 0.0
+        # O gate recusou o frame mais recente: a câmera não entra no lote até haver movimento
+        self.sem_movimento = False
+
+    def iniciar(self) -> None:
+        """
+        Inicia só a thread de captura; a inferência é do escalonador.
+        """
+        self._parar.clear()
+        self._threads = [threading.Thread(target=self._loop_captura, name=f"captura_{self.nome}", daemon=True)]
+        self._threads[0].start()
+
+    def pode_inferir(self, agora: float) -> bool:
+        """
+        Indica se o limite de inferências por segundo permite uma nova inferência.
+
+        Parâmetros
+        ----------
+        agora : float
+            Instante atual em `time.monotonic()`.
+        """
+        return not self.fps_max or agora - self.ultima_inferencia >= 1 / self.fps_max
+
+    def entregar(self, frame, deteccoes=None) -> None:
+        """
+        Anota o frame e o disponibiliza à interface (chamado pelo escalonador).
+
+        Parâmetros
+        ----------
+        frame : numpy.ndarray
+            Frame capturado.
+        deteccoes : Deteccoes ou None, opcional
+            Resultado do modelo para este frame; None reaproveita as últimas detecções.
+        """
+        if deteccoes is not None:
+            if self.apos_inferir is not None:
+                deteccoes = self.apos_inferir(frame, deteccoes)
+            self.deteccoes = deteccoes
+            self.fps_inferencia.marcar()
+        frame = self.desenhar(frame, self.deteccoes)
+        descartado = self.saida.colocar((frame, self.deteccoes))
+        if descartado is not None:
+            self.pool.devolver(descartado[0])
+
+
+class EscalonadorInferencia:
+    """
+    Thread única que agrupa os frames mais recentes das câmeras em lotes para o modelo.
+    """
+
+    def __init__(self, inferir_lote, lote_max: int = MULTICAMERA_LOTE_MAX,
+                 espera_max_ms: float = MULTICAMERA_ESPERA_MAX_MS, politica: str = MULTICAMERA_POLITICA):
+        """
+        Parâmetros
+        ----------
+        inferir_lote : callable
+            Função `inferir_lote(frames) -> list of Deteccoes`, uma chamada ao modelo por lote.
+        lote_max : int, opcional
+            Máximo de frames por chamada (padrão: MULTICAMERA_LOTE_MAX).
+        espera_max_ms : float, opcional
+            Tempo máximo que o primeiro frame de um lote espera pelas demais câmeras
+            (padrão: MULTICAMERA_ESPERA_MAX_MS).
+        politica : str, opcional
+            "rodizio" ou "prioridade" (padrão: MULTICAMERA_POLITICA).
+        """
+        if politica not in POLITICAS:
+            raise ValueError(f"MULTICAMERA_POLITICA inválida: {politica} (opções: {', '.join(POLITICAS)})")
+        self.inferir_lote = inferir_lote
+        self.lote_max = max(1, int(lote_max))
+        self.espera_max = espera_max_ms / 1000
+        self.politica = politica
+        self.cameras = []
+        self.lotes = 0
+        self.imagens = 0
+        self._novos = threading.Event()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def adicionar(self, camera: CameraEscalonada) -> None:
+        """
+        Adiciona uma câmera; com o escalonador em execução, sua captura começa na hora.
+
+        Parâmetros
+        ----------
+        camera : CameraEscalonada
+            Câmera ainda não iniciada.
+        """
+        camera.entrada.aviso = self._novos
+        self.cameras = self.cameras + [camera]
+        if self._thread is not None:
+            camera.iniciar()
+
+    def iniciar(self) -> None:
+        """
+        Inicia a captura de todas as câmeras e a thread do escalonador.
+        """
+        self._parar.clear()
+        for camera in self.cameras:
+            camera.iniciar()
+        self._thread = threading.Thread(target=self._loop, name="escalonador", daemon=True)
+        self._thread.start()
+
+    def parar(self, timeout: float = 2.0) -> None:
+        """
+        Encerra o escalonador e as câmeras, liberando as capturas.
+
+        Parâmetros
+        ----------
+        timeout : float, opcional
+            Tempo máximo de espera por thread, em segundos (padrão: 2.0).
+        """
+        self._parar.set()
+        self._novos.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        for camera in self.cameras:
+            camera.parar(timeout)
+
+    def contagem(self) -> dict:
+        """
+        Conta os itens das últimas detecções de cada câmera.
+
+        Retorno
+        -------
+        dict
+            Mapeamento nome da câmera -> {nome do item: quantidade}.
+        """
+        return {camera.nome: contar_itens(camera.deteccoes) for camera in self.cameras}
+
+    def estatisticas(self) -> dict:
+        """
+        Retorna as medições do escalonador e de cada câmera.
+
+        Retorno
+        -------
+        dict
+            Lotes executados, imagens inferidas, tamanho médio dos lotes e
+            `cameras`: nome -> `PipelineStream.estatisticas()` da câmera.
+        """
+        return {
+            "lotes": self.lotes,
+            "imagens": self.imagens,
+            "lote_medio": self.imagens / self.lotes if self.lotes else 0.0,
+            "cameras": {camera.nome: camera.estatisticas() for camera in self.cameras},
+        }
+
+    def _ordenar(self, cameras: list) -> list:
+        if self.politica == "prioridade":
+            return sorted(cameras, key=lambda c: (-c.prioridade, c.ultima_inferencia))
+        return sorted(cameras, key=lambda c: c.ultima_inferencia)
+
+    def _coletar(self, pendentes: dict, agora: float) -> None:
+        """
+        Retira os frames novos das câmeras: os aptos esperam o lote, os demais são entregues.
+        """
+        for camera in self.cameras:
+            frame = camera.entrada.retirar(timeout=0)
+            if frame is None:
+                continue
+            if camera in pendentes:
+                # Ainda fora de um lote: o frame mais recente toma o lugar do anterior
+                camera.pool.devolver(pendentes[camera])
+                camera.entrada.descartados += 1
+                pendentes[camera] = frame
+            elif not camera.pode_inferir(agora):
+                camera.entregar(frame)
+            else:
+                camera.sem_movimento = camera.gate is not None and not camera.gate.deve_inferir(frame)
+                if camera.sem_movimento:
+                    camera.entregar(frame)
+                else:
+                    pendentes[camera] = frame
+
+    def _loop(self) -> None:
+        pendentes = {}
+        limite = None
+        while not self._parar.is_set():
+            self._novos.wait(0.1 if limite is None else max(0.0, limite - time.monotonic()))
+            self._novos.clear()
+            agora = time.monotonic()
+            self._coletar(pendentes, agora)
+            if not pendentes:
+                limite = None
+                continue
+            if limite is None:
+                limite = agora + self.espera_max
+            # Câmeras paradas (frame recusado pelo gate) não completam o lote: não esperar por elas
+            aptas = sum(1 for camera in self.cameras if camera.pode_inferir(agora) and not camera.sem_movimento)
+            if len(pendentes) < min(self.lote_max, aptas) and agora < limite:
+                continue
+
+            lote = self._ordenar(list(pendentes))[:self.lote_max]
+            frames = [pendentes.pop(camera) for camera in lote]
+            # As câmeras que ficaram de fora entram no próximo lote sem esperar
+            limite = agora if pendentes else None
+            for camera in lote:
+                camera.ultima_inferencia = agora
+            try:
+                with medir("multicamera.lote"):
+                    resultados = self.inferir_lote(frames)
+            except Exception as e:
+                log_limitado("multicamera.inferencia", "Falha na inferência do lote: %s", e, nivel=logging.ERROR)
+                resultados = [None] * len(frames)
+            self.lotes += 1
+            self.imagens += len(frames)
+            for camera, frame, deteccoes in zip(lote, frames, resultados):
+                camera.entregar(frame, deteccoes)
@@ -1,54 +1,346 @@
 import os
+import csv
 import json
-from ultralytics import YOLO
-import matplotlib.pyplot as plt
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 
-from config import BASE_DIR, RESULTADOS_DIR, DATASET_COM_TESTE
+import cv2
+
+from avaliacao import avaliar
+from backends import carregar_modelo, caminho_backend
+from config import (
+    BASE_DIR, RESULTADOS_DIR, AVALIACAO_CACHE_DIR, INVENTARIO_LOTE, INVENTARIO_TRABALHADORES,
+    INVENTARIO_PREFETCH, INVENTARIO_PASSO_VIDEO, INVENTARIO_CONF,
+)
+from deteccao import extrair_deteccoes, contar_itens
+from fatiamento import inferir_fatiado
+from indice_dataset import EXTENSOES_IMAGEM
+from instrumentacao import medir, contar
 from logger import logger
 
+EXTENSOES_VIDEO = {".mp4", ".avi", ".mov", ".mkv", ".webm", ".m4v"}
+
 
-def avaliar_e_predizer(modelo, nome_subpasta="predicoes") -> None:
+@medir("avaliacao")
+def avaliar_e_predizer(modelo=None, nome_subpasta="predicoes", base_dir=BASE_DIR, resultados_dir=RESULTADOS_DIR) -> dict:
     """
     Avalia o modelo no conjunto de teste de forma quantitativa e visual.
-    Salva métricas em arquivo JSON, imagens com bounding boxes e, opcionalmente, gráfico PNG.
+    Salva métricas em arquivo JSON, imagens com bounding boxes, rótulos preditos
+    em `.txt`, matriz de confusão e curvas em PNG.
+
+    Tudo é calculado a partir das predições em cache de `avaliacao.py`; se os
+    mesmos pesos já foram avaliados no teste (por exemplo, ao fim de
+    `treinar_modelo`), o modelo não é executado de novo.
 
     Parâmetros
     ----------
-    modelo : YOLO
-        Modelo YOLO previamente treinado.
+    modelo : str ou YOLO, opcional
+        Caminho dos pesos ou modelo carregado. Se None, usa o backend definido
+        em BACKEND_INFERENCIA (`config.py`).
     nome_subpasta : str, opcional
-        Nome da subpasta dentro de RESULTADOS_DIR onde salvar as predições (padrão: 'predicoes').
-    salvar_grafico : bool, opcional
-        Se True, gera e salva gráfico das métricas (padrão: True).
+        Nome da subpasta dentro de `resultados_dir` onde salvar as predições (padrão: 'predicoes').
+    base_dir : str, opcional
+        Diretório com o `data.yaml` consolidado (padrão: BASE_DIR).
+    resultados_dir : str, opcional
+        Diretório onde salvar as métricas, as predições e o cache de predições
+        (padrão: RESULTADOS_DIR).
 
     Retorno
     -------
-    None
-        Função realiza salvamento dos resultados e não retorna valores.
+    dict
+        Métricas da avaliação (formato de `results_dict` do Ultralytics).
     """
 
-    os.makedirs(RESULTADOS_DIR, exist_ok=True)
+    os.makedirs(resultados_dir, exist_ok=True)
+
+    if modelo is None:
+        modelo = caminho_backend()
 
     logger.info("Iniciando avaliação do modelo no conjunto de teste.")
 
-    avaliacao = modelo.val(
-        data=os.path.join(BASE_DIR, "data.yaml"),
+    metricas = avaliar(
+        modelo,
         split="test",
-        project=RESULTADOS_DIR,
-        name=nome_subpasta,
-        save=True,          # salva imagens com bounding boxes
-        save_txt=True,      # salva labels preditas em txt (formato YOLO)
-        verbose=False
+        base_dir=base_dir,
+        cache_dir=os.path.join(resultados_dir, os.path.basename(AVALIACAO_CACHE_DIR)),
+        pasta_saida=os.path.join(resultados_dir, nome_subpasta),
+        salvar_txt=True,        # salva labels preditas em txt (formato YOLO)
+        salvar_imagens=True,    # salva imagens com bounding boxes
     )
 
     # Salvar métricas em JSON
-    path_json = os.path.join(RESULTADOS_DIR, "metricas_teste.json")
+    path_json = os.path.join(resultados_dir, "metricas_teste.json")
     with open(path_json, "w") as f:
-        json.dump(avaliacao.results_dict, f, indent=4)
+        json.dump(metricas, f, indent=4)
 
     logger.info(f"Métricas salvas em: {path_json}")
     logger.info("Métricas de avaliação no conjunto de teste:")
-    for chave, valor in avaliacao.results_dict.items():
+    for chave, valor in metricas.items():
         logger.info(f"{chave}: {valor}")
 
-    logger.info("Avaliação concluída.")
\ No newline at end of file
+    logger.info("Avaliação concluída.")
+    return metricas
+
+def listar_fontes(entradas: list):
+    """
+    Percorre arquivos e pastas (recursivamente, em ordem) e gera as imagens e vídeos encontrados.
+
+    Parâmetros
+    ----------
+    entradas : list of str
+        Caminhos de imagens, vídeos ou pastas.
+
+    Retorno
+    -------
+    generator of str
+        Caminhos das imagens e vídeos, sem montar a lista completa em memória.
+
+    Raises
+    ------
+    FileNotFoundError
+        Se alguma entrada não existir (verificado antes de gerar o primeiro caminho).
+    """
+    ausentes = [entrada for entrada in entradas if not os.path.exists(entrada)]
+    if ausentes:
+        raise FileNotFoundError(f"Entradas não encontradas: {ausentes}")
+    return _percorrer(entradas)
+
+
+def _percorrer(entradas: list):
+    extensoes = EXTENSOES_IMAGEM | EXTENSOES_VIDEO
+    for entrada in entradas:
+        if os.path.isfile(entrada):
+            yield entrada
+            continue
+        for raiz, pastas, arquivos in os.walk(entrada):
+            pastas.sort()
+            for arquivo in sorted(arquivos):
+                if os.path.splitext(arquivo)[1].lower() in extensoes:
+                    yield os.path.join(raiz, arquivo)
+
+
+def _produzir_frames(fontes, fila: queue.Queue, pool: ThreadPoolExecutor, passo_video: int, parar: threading.Event):
+    """
+    Enfileira `(id, futuro)` de cada frame: imagens são decodificadas no pool,
+    vídeos são lidos nesta thread (um vídeo que não abre vira um futuro com
+    OSError). A fila limitada segura a produção quando a
+    inferência está atrás, mantendo a memória constante.
+    """
+    try:
+        for caminho in fontes:
+            if parar.is_set():
+                break
+            if os.path.splitext(caminho)[1].lower() not in EXTENSOES_VIDEO:
+                fila.put((caminho, pool.submit(cv2.imread, caminho)))
+                continue
+
+            captura = cv2.VideoCapture(caminho)
+            if not captura.isOpened():
+                futuro = Future()
+                futuro.set_exception(OSError("falha ao abrir vídeo"))
+                fila.put((caminho, futuro))
+                continue
+            indice = 0
+            while not parar.is_set():
+                ok = captura.grab()
+                if not ok:
+                    break
+                if indice % passo_video == 0:
+                    ok, frame = captura.retrieve()
+                    futuro = Future()
+                    futuro.set_result(frame if ok else None)
+                    fila.put((f"{caminho}#{indice}", futuro))
+                indice += 1
+            captura.release()
+    finally:
+        fila.put(None)
+
+
+class _EscritorInventario:
+    """
+    Grava as contagens por frame em JSONL ou CSV à medida que são produzidas.
+    """
+
+    def __init__(self, caminho: str, formato: str, classes: list):
+        self.arquivo = open(caminho, "w", newline="", encoding="utf-8")
+        self.formato = formato
+        self.classes = classes
+        if formato == "csv":
+            self.csv = csv.writer(self.arquivo)
+            self.csv.writerow(["fonte", "total", *classes, "erro"])
+
+    def escrever(self, fonte: str, itens: dict, erro: str = None) -> None:
+        if self.formato == "csv":
+            self.csv.writerow([fonte, sum(itens.values()), *(itens.get(c, 0) for c in self.classes), erro or ""])
+            return
+        registro = {"fonte": fonte, "total": sum(itens.values()), "itens": itens}
+        if erro:
+            registro["erro"] = erro
+        self.arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+    def descarregar(self) -> None:
+        self.arquivo.flush()
+
+    def fechar(self) -> None:
+        self.arquivo.close()
+
+
+def contar_inventario(
+    entradas: list,
+    saida: str,
+    modelo=None,
+    lote: int = INVENTARIO_LOTE,
+    trabalhadores: int = INVENTARIO_TRABALHADORES,
+    prefetch: int = INVENTARIO_PREFETCH,
+    passo_video: int = INVENTARIO_PASSO_VIDEO,
+    conf_min: float = INVENTARIO_CONF,
+    fatiado: bool = False,
+) -> dict:
+    """
+    Conta os itens de pastas de imagens e vídeos, em lotes, gravando uma linha por frame.
+
+    Os frames são decodificados por um pool de threads à frente da inferência
+    (até `prefetch` lotes) e enviados ao modelo em lotes de `lote`. A contagem
+    de cada frame é a mesma do botão de captura da interface (`contar_itens`)
+    e é gravada em `saida` assim que o lote termina, de modo que a memória não
+    cresce com o número de imagens. O total somado de todos os frames é
+    retornado, como em `detected_items` na interface.
+
+    Parâmetros
+    ----------
+    entradas : list of str
+        Caminhos de imagens, vídeos ou pastas.
+    saida : str
+        Arquivo de saída; `.csv` grava uma coluna por classe, qualquer outra
+        extensão grava JSONL.
+    modelo : YOLO, opcional
+        Modelo carregado; se None, carrega o backend de BACKEND_INFERENCIA.
+    lote : int, opcional
+        Frames por chamada ao modelo (padrão: INVENTARIO_LOTE).
+    trabalhadores : int, opcional
+        Threads de decodificação (padrão: INVENTARIO_TRABALHADORES).
+    prefetch : int, opcional
+        Lotes decodificados à frente da inferência (padrão: INVENTARIO_PREFETCH).
+    passo_video : int, opcional
+        Usa 1 a cada N frames dos vídeos (padrão: INVENTARIO_PASSO_VIDEO).
+    conf_min : float, opcional
+        Confiança mínima das detecções contadas (padrão: INVENTARIO_CONF).
+    fatiado : bool, opcional
+        Usa a inferência fatiada (`fatiamento.inferir_fatiado`) em cada frame;
+        as janelas de um frame formam o lote do modelo (padrão: False).
+
+    Retorno
+    -------
+    dict
+        Total de itens por classe somado em todos os frames.
+
+    Raises
+    ------
+    FileNotFoundError
+        Se alguma entrada não existir; nada é gravado em `saida`.
+    """
+    fontes = listar_fontes(entradas)
+    if modelo is None:
+        modelo = carregar_modelo()
+
+    formato = "csv" if saida.lower().endswith(".csv") else "jsonl"
+    pasta_saida = os.path.dirname(os.path.abspath(saida))
+    os.makedirs(pasta_saida, exist_ok=True)
+    escritor = _EscritorInventario(saida, formato, list(modelo.names.values()))
+
+    fila = queue.Queue(maxsize=max(1, lote * prefetch))
+    parar = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=max(1, trabalhadores))
+    produtor = threading.Thread(
+        target=_produzir_frames, args=(fontes, fila, pool, max(1, passo_video), parar), daemon=True
+    )
+
+    totais, processados, falhas = {}, 0, 0
+    inicio = ultimo_log = time.perf_counter()
+    logger.info(
+        f"Contagem de inventário iniciada: {entradas} -> {saida} "
+        f"(lote={lote}, prefetch={prefetch}, fatiado={fatiado})"
+    )
+    produtor.start()
+
+    try:
+        fim = False
+        while not fim:
+            fontes, frames = [], []
+            while len(frames) < lote:
+                item = fila.get()
+                if item is None:
+                    fim = True
+                    break
+                fonte, futuro = item
+                try:
+                    frame = futuro.result()
+                    erro = "falha ao decodificar" if frame is None else None
+                except OSError as e:
+                    frame, erro = None, str(e)
+                if erro:
+                    escritor.escrever(fonte, {}, erro=erro)
+                    contar("inventario.falhas")
+                    falhas += 1
+                    continue
+                fontes.append(fonte)
+                frames.append(frame)
+
+            if frames:
+                with medir("inventario.lote"):
+                    if fatiado:
+                        deteccoes = [inferir_fatiado(modelo, frame, conf_min=conf_min) for frame in frames]
+                    else:
+                        resultados = modelo(frames, conf=conf_min, verbose=False)
+                        deteccoes = [extrair_deteccoes(resultado, conf_min=conf_min) for resultado in resultados]
+                contar("inventario.imagens", len(frames))
+                for fonte, det in zip(fontes, deteccoes):
+                    itens = contar_itens(det)
+                    escritor.escrever(fonte, itens)
+                    for nome, quantidade in itens.items():
+                        totais[nome] = totais.get(nome, 0) + quantidade
+                processados += len(frames)
+                escritor.descarregar()
+
+            agora = time.perf_counter()
+            if agora - ultimo_log >= 10:
+                logger.info(f"{processados} frames processados ({processados / (agora - inicio):.1f} imagens/s)")
+                ultimo_log = agora
+    finally:
+        parar.set()
+        while produtor.is_alive():
+            try:
+                fila.get_nowait()
+            except queue.Empty:
+                produtor.join(0.1)
+        pool.shutdown(wait=True)
+        escritor.fechar()
+
+    duracao = time.perf_counter() - inicio
+    logger.info(
+        f"Contagem concluída: {processados} frames em {duracao:.1f}s "
+        f"({processados / duracao if duracao else 0:.1f} imagens/s), {falhas} falhas. Saída: {saida}"
+    )
+    logger.info(f"Total de itens: {totais}")
+    return totais
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Contagem de inventário em pastas de imagens e vídeos")
+    parser.add_argument("entradas", nargs="+", help="Imagens, vídeos ou pastas")
+    parser.add_argument("-o", "--saida", default=os.path.join(RESULTADOS_DIR, "inventario.jsonl"),
+                        help="Arquivo de saída (.jsonl ou .csv)")
+    parser.add_argument("--lote", type=int, default=INVENTARIO_LOTE)
+    parser.add_argument("--trabalhadores", type=int, default=INVENTARIO_TRABALHADORES)
+    parser.add_argument("--prefetch", type=int, default=INVENTARIO_PREFETCH)
+    parser.add_argument("--passo-video", type=int, default=INVENTARIO_PASSO_VIDEO)
+    parser.add_argument("--conf", type=float, default=INVENTARIO_CONF)
+    parser.add_argument("--fatiado", action="store_true", help="Inferência fatiada para fotos de alta resolução")
+    args = parser.parse_args()
+    contar_inventario(args.entradas, args.saida, lote=args.lote, trabalhadores=args.trabalhadores,
+                      prefetch=args.prefetch, passo_video=args.passo_video, conf_min=args.conf,
+                      fatiado=args.fatiado)
@@ -1,55 +1,71 @@
 import os
 import yaml
-from config import BASE_DIR, DATASET_COM_TESTE
+from config import BASE_DIR, DATASET_COM_TESTE, INDICE_DATASETS, ROTULOS_DIR, ROTULOS_PACOTES
+from indice_dataset import atualizar_indice
+from instrumentacao import medir
+from rotulos import preparar_rotulos
 from logger import logger
 
 
-def gerar_data_yaml() -> None:
+@medir("preparacao")
+def gerar_data_yaml(base_dir: str = BASE_DIR, caminho_indice: str = INDICE_DATASETS,
+                    destino_rotulos: str = ROTULOS_DIR) -> None:
     """
-    Gera um arquivo `data.yaml` unificado a partir dos datasets baixados em BASE_DIR.
+    Gera um arquivo `data.yaml` unificado a partir dos datasets baixados em `base_dir`.
 
-    - Lê os arquivos `data.yaml` de cada dataset presente.
+    - Atualiza o índice persistente dos datasets, relendo apenas o que mudou.
+    - Lê as classes de cada dataset presente no índice.
     - Extrai as classes comuns entre os datasets.
     - Agrupa os caminhos das imagens de treino, validação e teste.
-    - Salva um arquivo `data.yaml` consolidado no BASE_DIR.
+    - Salva um arquivo `data.yaml` consolidado em `base_dir`.
+    - Remapeia os rótulos para as classes comuns e grava o armazenamento
+      compacto usado pelo treino (se ROTULOS_PACOTES estiver ativo).
 
     Parâmetros
     ----------
-    Nenhum
+    base_dir : str, opcional
+        Diretório com os datasets (padrão: BASE_DIR).
+    caminho_indice : str, opcional
+        Caminho do arquivo do índice (padrão: INDICE_DATASETS).
+    destino_rotulos : str, opcional
+        Diretório do armazenamento de rótulos (padrão: ROTULOS_DIR).
 
     Retorno
     -------
     None
-        Função cria/atualiza o arquivo `data.yaml` no diretório BASE_DIR.
+        Função cria/atualiza o arquivo `data.yaml` no diretório `base_dir`.
     """
     
-    subpastas = [p for p in os.listdir(BASE_DIR) if os.path.isdir(os.path.join(BASE_DIR, p))]
+    with medir("preparacao.indice"):
+        indice, relatorio = atualizar_indice(base_dir, caminho_indice)
+    logger.info(
+        f"Índice de datasets atualizado em {relatorio['tempo_ms']:.1f} ms: "
+        f"{len(relatorio['adicionados'])} adicionados, "
+        f"{len(relatorio['removidos'])} removidos, "
+        f"{len(relatorio['modificados'])} modificados "
+        f"({relatorio['pastas_listadas']} pastas listadas)"
+    )
+
     lista_classes = []
     caminhos_treino, caminhos_valid, caminhos_teste = [], [], []
+    selecao = {"train": [], "valid": [], "test": []}
 
-    for pasta in subpastas:
-        yaml_path = os.path.join(BASE_DIR, pasta, "data.yaml")
-        if not os.path.exists(yaml_path):
-            continue
-
-        with open(yaml_path, "r") as f:
-            dados = yaml.safe_load(f)
-            nomes = dados.get("names")
-            if isinstance(nomes, list):
-                lista_classes.append(set(nomes))
+    for pasta, dataset in sorted(indice["datasets"].items()):
+        nomes = dataset["names"]
+        if isinstance(nomes, list):
+            lista_classes.append(set(nomes))
 
-        caminho_treino = os.path.join(pasta, "train", "images")
-        caminho_valid = os.path.join(pasta, "valid", "images")
+        splits = dataset["splits"]
+        if "train" in splits:
+            caminhos_treino.append(os.path.join(pasta, "train", "images"))
+            selecao["train"].append(pasta)
+        if "valid" in splits:
+            caminhos_valid.append(os.path.join(pasta, "valid", "images"))
+            selecao["valid"].append(pasta)
 
-        if os.path.exists(os.path.join(BASE_DIR, caminho_treino)):
-            caminhos_treino.append(caminho_treino)
-        if os.path.exists(os.path.join(BASE_DIR, caminho_valid)):
-            caminhos_valid.append(caminho_valid)
-
-        if pasta == DATASET_COM_TESTE:
-            caminho_teste = os.path.join(pasta, "test", "images")
-            if os.path.exists(os.path.join(BASE_DIR, caminho_teste)):
-                caminhos_teste.append(caminho_teste)
+        if pasta == DATASET_COM_TESTE and "test" in splits:
+            caminhos_teste.append(os.path.join(pasta, "test", "images"))
+            selecao["test"].append(pasta)
 
     if not lista_classes:
         logger.error("Nenhum dataset com classes válidas encontrado.")
@@ -60,7 +76,7 @@ def gerar_data_yaml() -> None:
     )
 
     yaml_final = {
-        "path": BASE_DIR,
+        "path": base_dir,
         "train": caminhos_treino,
         "val": caminhos_valid,
         "test": caminhos_teste,
@@ -68,7 +84,7 @@ def gerar_data_yaml() -> None:
         "names": classes_comuns,
     }
 
-    caminho_yaml = os.path.join(BASE_DIR, "data.yaml")
+    caminho_yaml = os.path.join(base_dir, "data.yaml")
     with open(caminho_yaml, "w") as f:
         yaml.safe_dump(yaml_final, f)
 
@@ -78,3 +94,7 @@ def gerar_data_yaml() -> None:
     logger.info(f"Validação: {caminhos_valid}")
     logger.info(f"Teste: {caminhos_teste}")
     logger.info(f"Classes: {classes_comuns}")
+
+    if ROTULOS_PACOTES:
+        with medir("preparacao.rotulos"):
+            preparar_rotulos(indice, classes_comuns, selecao, destino_rotulos, base_dir)
@@ -0,0 +1,215 @@
+"""
+Rastreamento de objetos por IoU para contar itens únicos no streaming.
+
+Cada trilha guarda a última caixa, a velocidade do centro (média móvel), a
+classe e os contadores de acertos e de inferências sem correspondência. O
+estado fica em arrays numpy de capacidade fixa (dobrada quando enche), de modo
+que a atualização por frame é feita com operações vetorizadas: previsão das
+caixas pela velocidade, matriz de IoU entre trilhas e detecções da mesma
+classe e associação gulosa pelos maiores IoU.
+
+Uma trilha é confirmada depois de `confirmacao` inferências com
+correspondência e passa a contar como um item da sua classe. A contagem é o
+número de IDs confirmados por classe, inclusive de trilhas que já saíram do
+quadro, o que permite contar uma prateleira percorrendo-a com a câmera.
+
+Uso:
+    rastreador = RastreadorIoU()
+    deteccoes = rastreador.atualizar(deteccoes)   # deteccoes.ids com os IDs confirmados
+    contagem = rastreador.contagem()
+    novas = rastreador.confirmacoes()             # [(id, classe)] confirmadas desde a última chamada
+"""
+
+import threading
+
+import numpy as np
+
+from config import RASTREAMENTO_IOU, RASTREAMENTO_CONFIRMACAO, RASTREAMENTO_MAX_PERDIDOS
+from deteccao import Deteccoes, iou_matriz
+
+
+class RastreadorIoU:
+    """
+    Rastreador guloso por IoU com estado em arrays e contagem de IDs únicos por classe.
+    """
+
+    def __init__(
+        self,
+        limiar_iou: float = RASTREAMENTO_IOU,
+        confirmacao: int = RASTREAMENTO_CONFIRMACAO,
+        max_perdidos: int = RASTREAMENTO_MAX_PERDIDOS,
+        capacidade: int = 128,
+    ):
+        """
+        Parâmetros
+        ----------
+        limiar_iou : float, opcional
+            IoU mínima entre a caixa prevista e a detecção para associá-las
+            (padrão: RASTREAMENTO_IOU).
+        confirmacao : int, opcional
+            Inferências com correspondência para confirmar uma trilha
+            (padrão: RASTREAMENTO_CONFIRMACAO).
+        max_perdidos : int, opcional
+            Inferências seguidas sem correspondência antes de encerrar a trilha
+            (padrão: RASTREAMENTO_MAX_PERDIDOS).
+        capacidade : int, opcional
+            Número inicial de trilhas alocadas (padrão: 128).
+        """
+        self.limiar_iou = limiar_iou
+        self.confirmacao = confirmacao
+        self.max_perdidos = max_perdidos
+        self._trava = threading.Lock()
+        self._alocar(capacidade)
+        self.proximo_id = 1
+        self.confirmados_por_classe = {}
+        self.novas_confirmacoes = []
+        self.nomes = {}
+
+    def _alocar(self, capacidade: int) -> None:
+        self.caixas = np.zeros((capacidade, 4), dtype=np.float32)
+        self.velocidades = np.zeros((capacidade, 2), dtype=np.float32)
+        self.classes = np.zeros(capacidade, dtype=np.int64)
+        self.ids = np.full(capacidade, -1, dtype=np.int64)
+        self.acertos = np.zeros(capacidade, dtype=np.int32)
+        self.perdidos = np.zeros(capacidade, dtype=np.int32)
+        self.ativas = np.zeros(capacidade, dtype=bool)
+        self.confirmadas = np.zeros(capacidade, dtype=bool)
+
+    def _crescer(self) -> None:
+        antigos = {nome: getattr(self, nome) for nome in (
+            "caixas", "velocidades", "classes", "ids", "acertos", "perdidos", "ativas", "confirmadas"
+        )}
+        n = len(self.ativas)
+        self._alocar(2 * n)
+        for nome, array in antigos.items():
+            getattr(self, nome)[:n] = array
+
+    def _confirmar(self, trilhas: np.ndarray) -> None:
+        novas = trilhas[(self.acertos[trilhas] >= self.confirmacao) & ~self.confirmadas[trilhas]]
+        if len(novas) == 0:
+            return
+        self.confirmadas[novas] = True
+        for id_trilha, classe in zip(self.ids[novas].tolist(), self.classes[novas].tolist()):
+            self.confirmados_por_classe[classe] = self.confirmados_por_classe.get(classe, 0) + 1
+            self.novas_confirmacoes.append((id_trilha, classe))
+
+    def atualizar(self, deteccoes: Deteccoes) -> Deteccoes:
+        """
+        Associa as detecções de uma inferência às trilhas e atualiza o estado.
+
+        Parâmetros
+        ----------
+        deteccoes : Deteccoes
+            Detecções da inferência atual.
+
+        Retorno
+        -------
+        Deteccoes
+            As mesmas detecções, com `ids` preenchido (-1 para as que ainda
+            não pertencem a uma trilha confirmada).
+        """
+        with self._trava:
+            self.nomes = deteccoes.nomes
+            caixas = deteccoes.caixas.astype(np.float32)
+            n_det = len(caixas)
+            ativas = np.flatnonzero(self.ativas)
+            usadas_trilha = np.zeros(len(ativas), dtype=bool)
+            usadas_det = np.zeros(n_det, dtype=bool)
+            ids_det = np.full(n_det, -1, dtype=np.int64)
+
+            # Caixas previstas pela velocidade do centro
+            previstas = self.caixas[ativas] + np.tile(self.velocidades[ativas], 2)
+
+            if len(ativas) and n_det:
+                iou = iou_matriz(previstas, caixas)
+                iou[self.classes[ativas][:, None] != deteccoes.classes[None, :]] = 0.0
+                linhas, colunas = np.nonzero(iou >= self.limiar_iou)
+                ordem = np.argsort(-iou[linhas, colunas], kind="stable")
+                pares_t, pares_d = [], []
+                for t, d in zip(linhas[ordem].tolist(), colunas[ordem].tolist()):
+                    if usadas_trilha[t] or usadas_det[d]:
+                        continue
+                    usadas_trilha[t] = usadas_det[d] = True
+                    pares_t.append(t)
+                    pares_d.append(d)
+
+                if pares_t:
+                    trilhas = ativas[pares_t]
+                    novas = caixas[pares_d]
+                    deslocamento = (novas[:, :2] + novas[:, 2:]) / 2 - (
+                        self.caixas[trilhas, :2] + self.caixas[trilhas, 2:]
+                    ) / 2
+                    self.velocidades[trilhas] = 0.5 * self.velocidades[trilhas] + 0.5 * deslocamento
+                    self.caixas[trilhas] = novas
+                    self.acertos[trilhas] += 1
+                    self.perdidos[trilhas] = 0
+                    self._confirmar(trilhas)
+                    ids_det[pares_d] = np.where(self.confirmadas[trilhas], self.ids[trilhas], -1)
+
+            # Trilhas sem correspondência seguem a previsão até expirar
+            perdidas = ativas[~usadas_trilha]
+            self.caixas[perdidas] = previstas[~usadas_trilha]
+            self.perdidos[perdidas] += 1
+            self.ativas[perdidas[self.perdidos[perdidas] > self.max_perdidos]] = False
+
+            # Detecções sem correspondência abrem novas trilhas
+            sem_trilha = np.flatnonzero(~usadas_det)
+            if len(sem_trilha):
+                livres = np.flatnonzero(~self.ativas)
+                while len(livres) < len(sem_trilha):
+                    self._crescer()
+                    livres = np.flatnonzero(~self.ativas)
+                slots = livres[:len(sem_trilha)]
+                self.caixas[slots] = caixas[sem_trilha]
+                self.velocidades[slots] = 0.0
+                self.classes[slots] = deteccoes.classes[sem_trilha]
+                self.ids[slots] = np.arange(self.proximo_id, self.proximo_id + len(slots))
+                self.proximo_id += len(slots)
+                self.acertos[slots] = 1
+                self.perdidos[slots] = 0
+                self.ativas[slots] = True
+                self.confirmadas[slots] = False
+                self._confirmar(slots)
+                ids_det[sem_trilha] = np.where(self.confirmadas[slots], self.ids[slots], -1)
+
+        return deteccoes._replace(ids=ids_det)
+
+    def contagem(self) -> dict:
+        """
+        Retorna o número de IDs confirmados por classe desde o início do rastreamento.
+
+        Retorno
+        -------
+        dict
+            Mapeamento nome da classe -> quantidade de itens únicos.
+        """
+        with self._trava:
+            return {self.nomes.get(c, str(c)): n for c, n in self.confirmados_por_classe.items()}
+
+    def confirmacoes(self) -> list:
+        """
+        Retorna e esvazia a lista de trilhas confirmadas desde a última chamada.
+
+        Retorno
+        -------
+        list of tuple
+            `(id, nome da classe)` de cada trilha, na ordem de confirmação.
+        """
+        with self._trava:
+            novas, self.novas_confirmacoes = self.novas_confirmacoes, []
+            return [(id_trilha, self.nomes.get(c, str(c))) for id_trilha, c in novas]
+
+    def estatisticas(self) -> dict:
+        """
+        Retorna o número de trilhas ativas e de itens confirmados.
+
+        Retorno
+        -------
+        dict
+            Chaves `trilhas_ativas` e `itens_confirmados`.
+        """
+        with self._trava:
+            return {
+                "trilhas_ativas": int(self.ativas.sum()),
+                "itens_confirmados": sum(self.confirmados_por_classe.values()),
+            }
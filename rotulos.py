@@ -0,0 +1,276 @@
+"""
+Remapeamento de classes e armazenamento compacto dos rótulos para o treino.
+
+Os rótulos `.txt` de cada dataset indexam a lista `names` do próprio dataset.
+Este módulo converte cada rótulo para a lista unificada de classes do
+`data.yaml` consolidado, descarta as caixas de classes fora dela, converte
+polígonos em caixas e grava o resultado em arrays numpy (`.npy`) que podem
+ser abertos com `mmap_mode="r"`, sem nenhuma leitura de texto no treino.
+
+Layout em ROTULOS_DIR:
+    <dataset>/<split>/   shard de um dataset (refeito só quando a fonte muda)
+    <split>/             concatenação dos shards usada pelo dataloader
+        caixas.npy   float32 (M, 4)  caixas xywh normalizadas
+        classes.npy  int16   (M,)    índice na lista unificada
+        offsets.npy  int64   (N+1,)  caixas da imagem i em [offsets[i], offsets[i+1])
+        formas.npy   int32   (N, 2)  (altura, largura) original de cada imagem
+        imagens.json                 caminhos das imagens relativos a BASE_DIR
+        hashes.json                  hash do conteúdo de cada imagem (do índice)
+        meta.json                    chave de conteúdo e estatísticas
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from config import BASE_DIR, ROTULOS_DIR
+from logger import logger
+
+VERSAO_ROTULOS = 2
+ARRAYS = ("caixas", "classes", "offsets", "formas")
+
+
+def _chave(*partes) -> str:
+    return hashlib.blake2b(
+        json.dumps([VERSAO_ROTULOS, *partes], sort_keys=True).encode(), digest_size=16
+    ).hexdigest()
+
+
+def _ler_meta(pasta: str) -> dict:
+    try:
+        with open(os.path.join(pasta, "meta.json"), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _gravar(pasta: str, arrays: dict, imagens: list, hashes: list, meta: dict) -> None:
+    """
+    Grava os arrays e, por último, o `meta.json`, que marca o conjunto como completo.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    meta_path = os.path.join(pasta, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    for nome in ARRAYS:
+        temporario = os.path.join(pasta, f"{nome}.tmp.npy")
+        np.save(temporario, arrays[nome])
+        os.replace(temporario, os.path.join(pasta, f"{nome}.npy"))
+    with open(os.path.join(pasta, "imagens.json"), "w") as f:
+        json.dump(imagens, f)
+    with open(os.path.join(pasta, "hashes.json"), "w") as f:
+        json.dump(hashes, f)
+    with open(meta_path, "w") as f:
+        json.dump(meta, f, indent=4)
+
+
+def _caixa_da_linha(valores: list):
+    """
+    Converte as coordenadas de uma linha YOLO (caixa ou polígono) em xywh normalizado.
+    """
+    coords = np.asarray(valores, dtype=np.float32)
+    if len(coords) == 4:
+        return coords
+    if len(coords) >= 6 and len(coords) % 2 == 0:
+        xs, ys = coords[0::2], coords[1::2]
+        x1, x2, y1, y2 = xs.min(), xs.max(), ys.min(), ys.max()
+        return np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1], dtype=np.float32)
+    return None
+
+
+def _converter_shard(base_dir: str, nome: str, split: str, dados: dict, mapa: np.ndarray):
+    """
+    Lê os rótulos de um split de um dataset e retorna `(arrays, imagens, hashes, estatisticas)`.
+    """
+    caixas, classes, offsets, formas, imagens, hashes = [], [], [0], [], [], []
+    pasta_rotulos = os.path.join(base_dir, nome, split, "labels")
+    mantidas = descartadas = 0
+
+    for arquivo in sorted(dados["imagens"]):
+        entrada = dados["imagens"][arquivo]
+        rotulo = os.path.splitext(arquivo)[0] + ".txt"
+        if rotulo in dados["rotulos"]:
+            with open(os.path.join(pasta_rotulos, rotulo), "r") as f:
+                for linha in f:
+                    valores = linha.split()
+                    if len(valores) < 5:
+                        continue
+                    classe = int(valores[0])
+                    nova = mapa[classe] if 0 <= classe < len(mapa) else -1
+                    caixa = _caixa_da_linha(valores[1:]) if nova >= 0 else None
+                    if caixa is None:
+                        descartadas += 1
+                        continue
+                    caixas.append(caixa)
+                    classes.append(nova)
+                    mantidas += 1
+        offsets.append(len(caixas))
+        formas.append((entrada["altura"], entrada["largura"]))
+        imagens.append(os.path.join(nome, split, "images", arquivo))
+        hashes.append(entrada["hash"])
+
+    arrays = {
+        "caixas": np.array(caixas, dtype=np.float32).reshape(-1, 4),
+        "classes": np.array(classes, dtype=np.int16),
+        "offsets": np.array(offsets, dtype=np.int64),
+        "formas": np.array(formas, dtype=np.int32).reshape(-1, 2),
+    }
+    return arrays, imagens, hashes, {"imagens": len(imagens), "caixas": mantidas, "caixas_descartadas": descartadas}
+
+
+def _atualizar_shard(indice, nome, split, names_unificados, destino, base_dir) -> str:
+    """
+    Refaz o shard de um dataset/split se a fonte ou as classes mudaram e retorna sua chave.
+    """
+    dataset = indice["datasets"][nome]
+    dados = dataset["splits"][split]
+    chave = _chave(
+        dataset["names"],
+        names_unificados,
+        sorted((a, e["hash"]) for a, e in dados["imagens"].items()),
+        sorted((a, e["hash"]) for a, e in dados["rotulos"].items()),
+    )
+    pasta = os.path.join(destino, nome, split)
+    if _ler_meta(pasta).get("chave") == chave:
+        return chave
+
+    posicao = {classe: i for i, classe in enumerate(names_unificados)}
+    mapa = np.array([posicao.get(classe, -1) for classe in dataset["names"]], dtype=np.int64)
+    arrays, imagens, hashes, estatisticas = _converter_shard(base_dir, nome, split, dados, mapa)
+    _gravar(pasta, arrays, imagens, hashes, {"chave": chave, **estatisticas})
+    logger.info(
+        f"Rótulos convertidos: {nome}/{split} - {estatisticas['imagens']} imagens, "
+        f"{estatisticas['caixas']} caixas mantidas, {estatisticas['caixas_descartadas']} descartadas"
+    )
+    return chave
+
+
+def preparar_rotulos(indice: dict, names_unificados: list, selecao: dict,
+                     destino: str = ROTULOS_DIR, base_dir: str = BASE_DIR) -> None:
+    """
+    Remapeia os rótulos para a lista unificada e grava um armazenamento por split.
+
+    Só os datasets cuja fonte (hashes de imagens e rótulos) ou lista de classes
+    mudou são convertidos novamente; o arquivo de cada split é refeito apenas
+    concatenando os shards, sem reler os `.txt`.
+
+    Parâmetros
+    ----------
+    indice : dict
+        Índice dos datasets (ver `indice_dataset.atualizar_indice`).
+    names_unificados : list of str
+        Lista de classes do `data.yaml` consolidado.
+    selecao : dict
+        Mapeamento split ("train", "valid", "test") -> lista de datasets incluídos.
+    destino : str, opcional
+        Diretório do armazenamento (padrão: ROTULOS_DIR).
+    base_dir : str, opcional
+        Diretório com os datasets (padrão: BASE_DIR).
+    """
+    for split, nomes in selecao.items():
+        chaves = [_atualizar_shard(indice, nome, split, names_unificados, destino, base_dir) for nome in nomes]
+        chave_split = _chave(nomes, chaves)
+        pasta_split = os.path.join(destino, split)
+        if _ler_meta(pasta_split).get("chave") == chave_split:
+            continue
+
+        partes = [ArmazemRotulos(os.path.join(nome, split), destino) for nome in nomes]
+        deslocamentos = np.cumsum([0] + [len(p.caixas) for p in partes])
+        arrays = {
+            "caixas": np.concatenate([p.caixas for p in partes] or [np.empty((0, 4), np.float32)]),
+            "classes": np.concatenate([p.classes for p in partes] or [np.empty(0, np.int16)]),
+            "offsets": np.concatenate(
+                [np.zeros(1, np.int64)] + [p.offsets[1:] + d for p, d in zip(partes, deslocamentos)]
+            ),
+            "formas": np.concatenate([p.formas for p in partes] or [np.empty((0, 2), np.int32)]),
+        }
+        imagens = [caminho for p in partes for caminho in p.caminhos_relativos]
+        hashes = [h for p in partes for h in p.hashes]
+        _gravar(pasta_split, arrays, imagens, hashes, {
+            "chave": chave_split,
+            "names": names_unificados,
+            "datasets": nomes,
+            "imagens": len(imagens),
+            "caixas": int(len(arrays["caixas"])),
+        })
+        logger.info(f"Rótulos do split {split} gravados em: {pasta_split} ({len(imagens)} imagens)")
+
+
+class ArmazemRotulos:
+    """
+    Leitura dos rótulos de um split a partir dos arrays mapeados em memória.
+    """
+
+    def __init__(self, split: str, destino: str = ROTULOS_DIR, base_dir: str = BASE_DIR):
+        """
+        Parâmetros
+        ----------
+        split : str
+            Subpasta do armazenamento ("train", "valid", "test" ou "<dataset>/<split>").
+        destino : str, opcional
+            Diretório do armazenamento (padrão: ROTULOS_DIR).
+        base_dir : str, opcional
+            Diretório usado para resolver os caminhos das imagens (padrão: BASE_DIR).
+        """
+        pasta = os.path.join(destino, split)
+        self.meta = _ler_meta(pasta)
+        if not self.meta:
+            raise FileNotFoundError(f"Armazenamento de rótulos incompleto ou inexistente: {pasta}")
+        for nome in ARRAYS:
+            setattr(self, nome, np.load(os.path.join(pasta, f"{nome}.npy"), mmap_mode="r"))
+        with open(os.path.join(pasta, "imagens.json"), "r") as f:
+            self.caminhos_relativos = json.load(f)
+        with open(os.path.join(pasta, "hashes.json"), "r") as f:
+            self.hashes = json.load(f)
+        self.imagens = [os.path.join(base_dir, caminho) for caminho in self.caminhos_relativos]
+
+    @staticmethod
+    def existe(split: str, destino: str = ROTULOS_DIR) -> bool:
+        """
+        Indica se há um armazenamento completo para o split.
+
+        Parâmetros
+        ----------
+        split : str
+            Subpasta do armazenamento.
+        destino : str, opcional
+            Diretório do armazenamento (padrão: ROTULOS_DIR).
+
+        Retorno
+        -------
+        bool
+            True se o `meta.json` do split existe.
+        """
+        return os.path.exists(os.path.join(destino, split, "meta.json"))
+
+    def __len__(self) -> int:
+        return len(self.imagens)
+
+    def rotulo(self, i: int) -> dict:
+        """
+        Retorna o rótulo da imagem `i` no formato de label do Ultralytics.
+
+        Parâmetros
+        ----------
+        i : int
+            Posição da imagem no split.
+
+        Retorno
+        -------
+        dict
+            Dicionário com `im_file`, `shape`, `cls`, `bboxes` e demais chaves
+            esperadas por `YOLODataset`.
+        """
+        inicio, fim = int(self.offsets[i]), int(self.offsets[i + 1])
+        return {
+            "im_file": self.imagens[i],
+            "shape": tuple(int(v) for v in self.formas[i]),
+            "cls": np.asarray(self.classes[inicio:fim], dtype=np.float32).reshape(-1, 1),
+            "bboxes": np.array(self.caixas[inicio:fim], dtype=np.float32),
+            "segments": [],
+            "keypoints": None,
+            "normalized": True,
+            "bbox_format": "xywh",
+        }
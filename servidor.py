@@ -0,0 +1,374 @@
+"""
+Servidor local de inferência com micro-lotes, para várias câmeras compartilharem um modelo.
+
+O servidor carrega o modelo uma única vez e atende requisições HTTP/1.1 em
+localhost (apenas biblioteca padrão: `asyncio`). As requisições que chegam ao
+mesmo tempo são agrupadas em micro-lotes de até `lote_max` imagens, esperando
+no máximo `espera_max_ms` pelo lote encher; cada lote é uma única chamada ao
+modelo, feita em uma thread dedicada para não bloquear o laço de eventos.
+
+Rotas:
+    POST /detectar?conf=0.5[&fatiado=1]   corpo: imagem codificada (JPEG/PNG)
+    GET  /saude                           estado, classes e estatísticas dos lotes
+
+A resposta de /detectar é um JSON com `caixas` (xyxy), `confiancas`,
+`classes`, `nomes` e o tamanho do lote em que a imagem foi processada.
+
+Uso:
+    python servidor.py --porta 8765 --lote-max 8 --espera-max-ms 5
+    cliente = ClienteServidor("http://127.0.0.1:8765")
+    deteccoes = cliente.detectar(frame)
+"""
+
+import argparse
+import asyncio
+import http.client
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import cv2
+import numpy as np
+
+from backends import carregar_modelo
+from config import (
+    SERVIDOR_HOST, SERVIDOR_PORTA, SERVIDOR_LOTE_MAX, SERVIDOR_ESPERA_MAX_MS, SERVIDOR_QUALIDADE_JPEG,
+)
+from deteccao import Deteccoes, extrair_deteccoes
+from fatiamento import inferir_fatiado
+from logger import logger, log_limitado
+
+MOTIVOS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+
+
+def deteccoes_para_json(deteccoes: Deteccoes, **extras) -> dict:
+    """
+    Converte detecções em um dicionário serializável em JSON.
+
+    Parâmetros
+    ----------
+    deteccoes : Deteccoes
+        Detecções de uma imagem.
+    **extras
+        Campos adicionais incluídos na resposta.
+
+    Retorno
+    -------
+    dict
+        Caixas, confianças, classes e nomes das classes.
+    """
+    return {
+        "caixas": deteccoes.caixas.tolist(),
+        "confiancas": [round(c, 4) for c in deteccoes.confiancas.tolist()],
+        "classes": deteccoes.classes.tolist(),
+        "nomes": {str(k): v for k, v in deteccoes.nomes.items()},
+        **extras,
+    }
+
+
+def deteccoes_de_json(dados: dict) -> Deteccoes:
+    """
+    Reconstrói as detecções a partir da resposta JSON do servidor.
+
+    Parâmetros
+    ----------
+    dados : dict
+        Resposta de /detectar.
+
+    Retorno
+    -------
+    Deteccoes
+        Detecções com arrays numpy.
+    """
+    return Deteccoes(
+        np.asarray(dados["caixas"], dtype=np.int32).reshape(-1, 4),
+        np.asarray(dados["confiancas"], dtype=np.float32),
+        np.asarray(dados["classes"], dtype=np.int64),
+        {int(k): v for k, v in dados["nomes"].items()},
+    )
+
+
+class ServidorInferencia:
+    """
+    Servidor HTTP assíncrono que agrupa as requisições em micro-lotes para o modelo.
+    """
+
+    def __init__(self, modelo=None, lote_max: int = SERVIDOR_LOTE_MAX, espera_max_ms: float = SERVIDOR_ESPERA_MAX_MS):
+        """
+        Parâmetros
+        ----------
+        modelo : YOLO, opcional
+            Modelo carregado; se None, carrega o backend de BACKEND_INFERENCIA.
+        lote_max : int, opcional
+            Máximo de imagens por chamada ao modelo (padrão: SERVIDOR_LOTE_MAX).
+        espera_max_ms : float, opcional
+            Tempo máximo que a primeira imagem de um lote espera por outras (padrão: SERVIDOR_ESPERA_MAX_MS).
+        """
+        self.modelo = modelo if modelo is not None else carregar_modelo()
+        self.lote_max = max(1, lote_max)
+        self.espera_max = espera_max_ms / 1000
+        # Uma única thread executa o modelo; a decodificação usa o pool padrão do laço
+        self.executor_modelo = ThreadPoolExecutor(max_workers=1, thread_name_prefix="modelo")
+        self.fila = None
+        self.lotes = 0
+        self.imagens = 0
+
+    async def _executar_lotes(self) -> None:
+        """
+        Retira requisições da fila, forma os micro-lotes e executa o modelo.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            lote = [await self.fila.get()]
+            limite = loop.time() + self.espera_max
+            while len(lote) < self.lote_max:
+                restante = limite - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(await asyncio.wait_for(self.fila.get(), restante))
+                except asyncio.TimeoutError:
+                    break
+
+            frames = [frame for frame, _, _ in lote]
+            conf_lote = min(conf for _, conf, _ in lote)
+            try:
+                resultados = await loop.run_in_executor(
+                    self.executor_modelo, lambda: self.modelo(frames, conf=conf_lote, verbose=False)
+                )
+            except Exception as e:
+                for _, _, futuro in lote:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+                continue
+
+            self.lotes += 1
+            self.imagens += len(lote)
+            for resultado, (_, conf, futuro) in zip(resultados, lote):
+                if not futuro.done():
+                    futuro.set_result((extrair_deteccoes(resultado, conf_min=conf), len(lote)))
+
+    async def detectar(self, frame, conf_min: float = 0.5, fatiado: bool = False):
+        """
+        Enfileira uma imagem para o próximo micro-lote e aguarda suas detecções.
+
+        Parâmetros
+        ----------
+        frame : numpy.ndarray
+            Imagem BGR.
+        conf_min : float, opcional
+            Confiança mínima (padrão: 0.5).
+        fatiado : bool, opcional
+            Usa a inferência fatiada, que já forma o próprio lote com as janelas
+            da imagem (padrão: False).
+
+        Retorno
+        -------
+        tuple
+            `(deteccoes, tamanho_do_lote)`.
+        """
+        loop = asyncio.get_running_loop()
+        if fatiado:
+            deteccoes = await loop.run_in_executor(
+                self.executor_modelo, lambda: inferir_fatiado(self.modelo, frame, conf_min=conf_min)
+            )
+            return deteccoes, 1
+        futuro = loop.create_future()
+        await self.fila.put((frame, conf_min, futuro))
+        return await futuro
+
+    async def _responder(self, escritor, status: int, corpo: dict, manter: bool) -> None:
+        dados = json.dumps(corpo, ensure_ascii=False).encode()
+        cabecalho = (
+            f"HTTP/1.1 {status} {MOTIVOS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(dados)}\r\n"
+            f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n"
+        )
+        escritor.write(cabecalho.encode() + dados)
+        await escritor.drain()
+
+    async def _atender(self, leitor, escritor) -> None:
+        """
+        Atende uma conexão HTTP/1.1, com keep-alive.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                metodo, alvo, versao = linha.decode("latin-1").split()
+                cabecalhos = {}
+                while True:
+                    linha = await leitor.readline()
+                    if linha in (b"\r\n", b"\n", b""):
+                        break
+                    chave, _, valor = linha.decode("latin-1").partition(":")
+                    cabecalhos[chave.strip().lower()] = valor.strip()
+                corpo = await leitor.readexactly(int(cabecalhos.get("content-length", 0)))
+                manter = cabecalhos.get("connection", "").lower() != "close" and versao == "HTTP/1.1"
+
+                url = urlsplit(alvo)
+                parametros = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                if metodo == "GET" and url.path == "/saude":
+                    status, resposta = 200, {
+                        "status": "ok",
+                        "nomes": {str(k): v for k, v in self.modelo.names.items()},
+                        "lote_max": self.lote_max,
+                        "espera_max_ms": self.espera_max * 1000,
+                        "lotes": self.lotes,
+                        "imagens": self.imagens,
+                        "lote_medio": self.imagens / self.lotes if self.lotes else 0.0,
+                    }
+                elif metodo == "POST" and url.path == "/detectar":
+                    inicio = time.perf_counter()
+                    buffer = np.frombuffer(corpo, dtype=np.uint8)
+                    frame = await loop.run_in_executor(None, cv2.imdecode, buffer, cv2.IMREAD_COLOR)
+                    if frame is None:
+                        status, resposta = 400, {"erro": "imagem inválida"}
+                    else:
+                        try:
+                            deteccoes, tamanho_lote = await self.detectar(
+                                frame, float(parametros.get("conf", 0.5)), parametros.get("fatiado") == "1"
+                            )
+                            status, resposta = 200, deteccoes_para_json(
+                                deteccoes, lote=tamanho_lote, tempo_ms=(time.perf_counter() - inicio) * 1000
+                            )
+                        except Exception as e:
+                            log_limitado("servidor.inferencia", "Falha na inferência: %s", e, nivel=logging.ERROR)
+                            status, resposta = 500, {"erro": str(e)}
+                else:
+                    status, resposta = 404, {"erro": f"rota inexistente: {metodo} {url.path}"}
+
+                await self._responder(escritor, status, resposta, manter)
+                if not manter:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            escritor.close()
+
+    async def servir(self, host: str = SERVIDOR_HOST, porta: int = SERVIDOR_PORTA, pronto: threading.Event = None):
+        """
+        Inicia o servidor e atende conexões até ser cancelado.
+
+        Parâmetros
+        ----------
+        host : str, opcional
+            Endereço de escuta (padrão: SERVIDOR_HOST).
+        porta : int, opcional
+            Porta TCP (padrão: SERVIDOR_PORTA).
+        pronto : threading.Event, opcional
+            Sinalizado quando o servidor começa a aceitar conexões.
+        """
+        self.fila = asyncio.Queue()
+        tarefa_lotes = asyncio.create_task(self._executar_lotes())
+        servidor = await asyncio.start_server(self._atender, host, porta)
+        logger.info(
+            f"Servidor de inferência em http://{host}:{porta} "
+            f"(lote_max={self.lote_max}, espera_max={self.espera_max * 1000:.1f} ms)"
+        )
+        if pronto is not None:
+            pronto.set()
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            tarefa_lotes.cancel()
+            self.executor_modelo.shutdown(wait=False)
+
+
+class ClienteServidor:
+    """
+    Cliente síncrono do servidor de inferência, com uma conexão persistente por thread.
+    """
+
+    def __init__(self, url: str, timeout: float = 30.0, qualidade_jpeg: int = SERVIDOR_QUALIDADE_JPEG):
+        """
+        Parâmetros
+        ----------
+        url : str
+            Endereço do servidor, por exemplo "http://127.0.0.1:8765".
+        timeout : float, opcional
+            Tempo máximo de cada requisição, em segundos (padrão: 30.0).
+        qualidade_jpeg : int, opcional
+            Qualidade da compressão dos frames enviados (padrão: SERVIDOR_QUALIDADE_JPEG).
+        """
+        partes = urlsplit(url)
+        self.host = partes.hostname
+        self.porta = partes.port or 80
+        self.timeout = timeout
+        self.qualidade_jpeg = qualidade_jpeg
+        self._local = threading.local()
+
+    def _requisitar(self, metodo: str, caminho: str, corpo: bytes = None) -> dict:
+        for tentativa in range(2):
+            conexao = getattr(self._local, "conexao", None)
+            if conexao is None:
+                conexao = self._local.conexao = http.client.HTTPConnection(self.host, self.porta, timeout=self.timeout)
+            try:
+                conexao.request(metodo, caminho, body=corpo, headers={"Content-Type": "image/jpeg"} if corpo else {})
+                resposta = conexao.getresponse()
+                dados = json.loads(resposta.read())
+                if resposta.status != 200:
+                    raise RuntimeError(f"Servidor de inferência respondeu {resposta.status}: {dados.get('erro')}")
+                return dados
+            except (http.client.HTTPException, ConnectionError):
+                # Conexão keep-alive encerrada pelo servidor: reconecta uma vez
+                conexao.close()
+                self._local.conexao = None
+                if tentativa == 1:
+                    raise
+
+    def saude(self) -> dict:
+        """
+        Consulta o estado do servidor.
+
+        Retorno
+        -------
+        dict
+            Resposta de /saude.
+        """
+        return self._requisitar("GET", "/saude")
+
+    def detectar(self, frame, conf_min: float = 0.5, fatiado: bool = False) -> Deteccoes:
+        """
+        Envia um frame ao servidor e retorna as detecções.
+
+        Parâmetros
+        ----------
+        frame : numpy.ndarray
+            Frame BGR.
+        conf_min : float, opcional
+            Confiança mínima (padrão: 0.5).
+        fatiado : bool, opcional
+            Pede a inferência fatiada (padrão: False).
+
+        Retorno
+        -------
+        Deteccoes
+            Detecções retornadas pelo servidor.
+        """
+        ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.qualidade_jpeg])
+        if not ok:
+            raise RuntimeError("Falha ao codificar o frame em JPEG")
+        caminho = f"/detectar?conf={conf_min}" + ("&fatiado=1" if fatiado else "")
+        return deteccoes_de_json(self._requisitar("POST", caminho, jpeg.tobytes()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local de inferência com micro-lotes")
+    parser.add_argument("--host", default=SERVIDOR_HOST)
+    parser.add_argument("--porta", type=int, default=SERVIDOR_PORTA)
+    parser.add_argument("--lote-max", type=int, default=SERVIDOR_LOTE_MAX)
+    parser.add_argument("--espera-max-ms", type=float, default=SERVIDOR_ESPERA_MAX_MS)
+    args = parser.parse_args()
+    servidor = ServidorInferencia(lote_max=args.lote_max, espera_max_ms=args.espera_max_ms)
+    try:
+        asyncio.run(servidor.servir(args.host, args.porta))
+    except KeyboardInterrupt:
+        logger.info("Servidor de inferência encerrado.")
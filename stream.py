@@ -0,0 +1,437 @@
+"""
+Pipeline de streaming da câmera para a interface gráfica.
+
+A captura e a inferência rodam em threads próprias, fora da thread da
+interface do Kivy. As duas threads são ligadas por um slot de profundidade 1
+("o frame mais recente vence"): quando a inferência não acompanha a câmera,
+os frames antigos são descartados em vez de se acumularem numa fila.
+A interface apenas consome o último frame já anotado.
+
+Opcionalmente, um `GateMovimento` decide a cada frame se o modelo precisa
+rodar: sem movimento na cena, as últimas detecções são reaproveitadas.
+
+Os frames são lidos em buffers de um `PoolFrames`: um frame descartado por um
+slot, ou devolvido pela interface com `liberar_frame` depois de exibido, é
+reaproveitado na próxima leitura da câmera em vez de um novo array ser alocado.
+
+Uso:
+    pipeline = PipelineStream(captura, inferir, desenhar, gate=GateMovimento())
+    pipeline.iniciar()
+    resultado = pipeline.ultimo_resultado()  # (frame_anotado, deteccoes) ou None
+    pipeline.liberar_frame(resultado[0])     # depois de copiar o frame para a tela
+    pipeline.parar()
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as EsperaEsgotada
+
+import cv2
+
+from config import LIMIAR_MOVIMENTO, INTERVALO_MAX_INFERENCIA, CADENCIA_MINIMA_INFERENCIA
+from instrumentacao import medir
+from logger import log_limitado
+
+
+class SlotFrame:
+    """
+    Slot de profundidade 1 em que o item mais recente substitui o anterior.
+
+    Cada substituição de um item ainda não consumido é contabilizada como
+    descarte. Se `aviso` for um `threading.Event`, ele é sinalizado a cada
+    item colocado (um consumidor pode esperar por vários slots de uma vez).
+    """
+
+    def __init__(self, aviso: threading.Event = None):
+        self._cond = threading.Condition()
+        self._item = None
+        self.descartados = 0
+        self.aviso = aviso
+
+    def colocar(self, item):
+        """
+        Coloca um item no slot, descartando o anterior se não foi consumido.
+
+        Parâmetros
+        ----------
+        item : object
+            Item a ser disponibilizado ao consumidor.
+
+        Retorno
+        -------
+        object ou None
+            Item descartado, ou None se o slot estava vazio.
+        """
+        with self._cond:
+            descartado = self._item
+            if descartado is not None:
+                self.descartados += 1
+            self._item = item
+            self._cond.notify()
+        if self.aviso is not None:
+            self.aviso.set()
+        return descartado
+
+    def retirar(self, timeout=None):
+        """
+        Retira o item do slot, aguardando até `timeout` segundos se estiver vazio.
+
+        Parâmetros
+        ----------
+        timeout : float ou None, opcional
+            Tempo máximo de espera (None espera indefinidamente, 0 não espera).
+
+        Retorno
+        -------
+        object ou None
+            Item mais recente, ou None se o slot continuou vazio.
+        """
+        with self._cond:
+            if self._item is None and timeout != 0:
+                self._cond.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+
+class PoolFrames:
+    """
+    Buffers de frame livres para a próxima leitura da câmera.
+
+    `VideoCapture.read` escreve no buffer recebido quando ele tem a resolução
+    da câmera; caso contrário, aloca um novo array, que passa a circular no
+    lugar do antigo. Um buffer só deve ser devolvido quando nenhuma thread
+    ainda o usa.
+    """
+
+    def __init__(self, maximo: int = 4):
+        """
+        Parâmetros
+        ----------
+        maximo : int, opcional
+            Buffers livres guardados; os excedentes são deixados para o coletor (padrão: 4).
+        """
+        self.maximo = maximo
+        self.alocacoes = 0
+        self._livres = []
+        self._lock = threading.Lock()
+
+    def obter(self):
+        """
+        Retorna um buffer livre, ou None se não houver (a leitura aloca um novo).
+        """
+        with self._lock:
+            if self._livres:
+                return self._livres.pop()
+        self.alocacoes += 1
+        return None
+
+    def devolver(self, frame) -> None:
+        """
+        Devolve um buffer que não está mais em uso.
+
+        Parâmetros
+        ----------
+        frame : numpy.ndarray ou None
+            Frame cujo conteúdo pode ser sobrescrito.
+        """
+        if frame is None:
+            return
+        with self._lock:
+            if len(self._livres) < self.maximo:
+                self._livres.append(frame)
+
+
+class MedidorFPS:
+    """
+    Mede a taxa de eventos por segundo em janelas de tempo fixas.
+    """
+
+    def __init__(self, janela: float = 1.0):
+        """
+        Parâmetros
+        ----------
+        janela : float, opcional
+            Duração da janela de medição em segundos (padrão: 1.0).
+        """
+        self.janela = janela
+        self.fps = 0.0
+        self._contagem = 0
+        self._inicio = time.perf_counter()
+
+    def marcar(self) -> None:
+        """
+        Registra a ocorrência de um evento e atualiza o FPS ao fim da janela.
+        """
+        self._contagem += 1
+        agora = time.perf_counter()
+        decorrido = agora - self._inicio
+        if decorrido >= self.janela:
+            self.fps = self._contagem / decorrido
+            self._contagem = 0
+            self._inicio = agora
+
+
+class GateMovimento:
+    """
+    Decide se um frame precisa passar pelo modelo, comparando uma versão
+    reduzida em tons de cinza com o frame da última inferência.
+    """
+
+    def __init__(
+        self,
+        limiar: float = LIMIAR_MOVIMENTO,
+        intervalo_max: float = INTERVALO_MAX_INFERENCIA,
+        cadencia_minima: int = CADENCIA_MINIMA_INFERENCIA,
+        tamanho: tuple = (64, 36),
+    ):
+        """
+        Parâmetros
+        ----------
+        limiar : float, opcional
+            Diferença média absoluta (0-255) a partir da qual há movimento.
+        intervalo_max : float, opcional
+            Tempo máximo, em segundos, sem inferência antes de forçar uma nova.
+        cadencia_minima : int, opcional
+            Mesmo com movimento, infere no máximo a cada N frames.
+        tamanho : tuple, opcional
+            Resolução (largura, altura) usada na comparação (padrão: (64, 36)).
+        """
+        self.limiar = limiar
+        self.intervalo_max = intervalo_max
+        self.cadencia_minima = max(1, int(cadencia_minima))
+        self.tamanho = tamanho
+        self.frames = 0
+        self.pulados = 0
+        self.ultima_diferenca = 0.0
+        self._referencia = None
+        self._ultima_inferencia = 0.0
+        self._desde_inferencia = 0
+
+    def deve_inferir(self, frame) -> bool:
+        """
+        Indica se o frame deve ser enviado ao modelo.
+
+        Parâmetros
+        ----------
+        frame : numpy.ndarray
+            Frame BGR capturado da câmera.
+
+        Retorno
+        -------
+        bool
+            True se houve movimento suficiente ou o intervalo máximo expirou.
+        """
+        reduzido = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), self.tamanho, interpolation=cv2.INTER_AREA)
+        agora = time.monotonic()
+        self.frames += 1
+        self._desde_inferencia += 1
+
+        if self._referencia is None or agora - self._ultima_inferencia >= self.intervalo_max:
+            inferir = True
+        else:
+            self.ultima_diferenca = float(cv2.absdiff(reduzido, self._referencia).mean())
+            inferir = self.ultima_diferenca >= self.limiar and self._desde_inferencia >= self.cadencia_minima
+
+        if inferir:
+            self._referencia = reduzido
+            self._ultima_inferencia = agora
+            self._desde_inferencia = 0
+        else:
+            self.pulados += 1
+        return inferir
+
+    def forcar(self) -> None:
+        """
+        Faz o próximo frame passar pelo modelo, com ou sem movimento.
+        """
+        self._referencia = None
+
+    def estatisticas(self) -> dict:
+        """
+        Retorna a configuração do gate e a proporção de frames pulados.
+
+        Retorno
+        -------
+        dict
+            Limiar, intervalo máximo, cadência mínima, frames pulados,
+            razão de pulo e a última diferença medida.
+        """
+        return {
+            "limiar_movimento": self.limiar,
+            "intervalo_max": self.intervalo_max,
+            "cadencia_minima": self.cadencia_minima,
+            "frames_pulados": self.pulados,
+            "razao_pulo": self.pulados / self.frames if self.frames else 0.0,
+            "diferenca": self.ultima_diferenca,
+        }
+
+
+class PipelineStream:
+    """
+    Liga uma thread de captura a uma thread de inferência por meio de slots
+    de profundidade 1.
+    """
+
+    def __init__(self, captura, inferir, desenhar, gate=None):
+        """
+        Parâmetros
+        ----------
+        captura : cv2.VideoCapture
+            Fonte de frames já aberta (qualquer objeto com `read()` e `release()`).
+        inferir : callable
+            Função `inferir(frame) -> deteccoes` executada na thread de inferência.
+        desenhar : callable
+            Função `desenhar(frame, deteccoes) -> frame` que anota o frame.
+        gate : GateMovimento ou None, opcional
+            Se informado, o modelo só roda nos frames aprovados pelo gate;
+            nos demais as últimas detecções são reaproveitadas.
+        """
+        self.captura = captura
+        self.inferir = inferir
+        self.desenhar = desenhar
+        self.gate = gate
+        self.entrada = SlotFrame()
+        self.saida = SlotFrame()
+        self.fps_captura = MedidorFPS()
+        self.fps_inferencia = MedidorFPS()
+        self._parar = threading.Event()
+        self._threads = []
+        self._pedidos_frame = queue.SimpleQueue()
+        self.pool = PoolFrames()
+        # Só `cv2.VideoCapture.read` aceita o buffer de saída
+        self._ler_no_buffer = isinstance(captura, cv2.VideoCapture)
+
+    def iniciar(self) -> None:
+        """
+        Inicia as threads de captura e de inferência.
+        """
+        self._parar.clear()
+        self._threads = [
+            threading.Thread(target=self._loop_captura, name="captura", daemon=True),
+            threading.Thread(target=self._loop_inferencia, name="inferencia", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def parar(self, timeout: float = 2.0) -> None:
+        """
+        Sinaliza o fim das threads, aguarda seu término e libera a câmera.
+
+        Parâmetros
+        ----------
+        timeout : float, opcional
+            Tempo máximo de espera por thread, em segundos (padrão: 2.0).
+        """
+        self._parar.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self.captura.release()
+
+    def ultimo_resultado(self):
+        """
+        Retorna o frame anotado mais recente sem bloquear.
+
+        Retorno
+        -------
+        tuple ou None
+            `(frame_anotado, deteccoes)` ou None se não houver frame novo.
+        """
+        return self.saida.retirar(timeout=0)
+
+    def liberar_frame(self, frame) -> None:
+        """
+        Devolve ao pool um frame retornado por `ultimo_resultado` que já foi exibido.
+
+        Depois desta chamada, o array pode ser sobrescrito por uma nova leitura
+        da câmera a qualquer momento.
+
+        Parâmetros
+        ----------
+        frame : numpy.ndarray
+            Frame anotado que não será mais lido.
+        """
+        self.pool.devolver(frame)
+
+    def proximo_frame(self, timeout: float = 2.0):
+        """
+        Retorna uma cópia do próximo frame capturado, antes de qualquer anotação.
+
+        Bloqueia até a thread de captura ler um novo frame; deve ser chamado
+        fora da thread da interface.
+
+        Parâmetros
+        ----------
+        timeout : float, opcional
+            Tempo máximo de espera, em segundos (padrão: 2.0).
+
+        Retorno
+        -------
+        numpy.ndarray ou None
+            Frame BGR sem anotações, ou None se nenhum frame chegou a tempo.
+        """
+        pedido = Future()
+        self._pedidos_frame.put(pedido)
+        try:
+            return pedido.result(timeout)
+        except EsperaEsgotada:
+            pedido.cancel()
+            return None
+
+    def estatisticas(self) -> dict:
+        """
+        Retorna as medições atuais do pipeline.
+
+        Retorno
+        -------
+        dict
+            FPS de captura, FPS de inferência, total de frames descartados,
+            leituras sem buffer livre no pool e, com gate ativo, as
+            estatísticas do `GateMovimento`.
+        """
+        estatisticas = {
+            "fps_captura": self.fps_captura.fps,
+            "fps_inferencia": self.fps_inferencia.fps,
+            "frames_descartados": self.entrada.descartados,
+            "frames_alocados": self.pool.alocacoes,
+        }
+        if self.gate is not None:
+            estatisticas.update(self.gate.estatisticas())
+        return estatisticas
+
+    def _loop_captura(self) -> None:
+        while not self._parar.is_set():
+            buffer = self.pool.obter() if self._ler_no_buffer else None
+            with medir("app.captura"):
+                ret, frame = self.captura.read(buffer) if buffer is not None else self.captura.read()
+            if not ret:
+                self.pool.devolver(buffer)
+                time.sleep(0.01)
+                continue
+            self.fps_captura.marcar()
+            while not self._pedidos_frame.empty():
+                pedido = self._pedidos_frame.get()
+                if pedido.set_running_or_notify_cancel():
+                    pedido.set_result(frame.copy())
+            self.pool.devolver(self.entrada.colocar(frame))
+
+    def _loop_inferencia(self) -> None:
+        deteccoes = []
+        while not self._parar.is_set():
+            frame = self.entrada.retirar(timeout=0.1)
+            if frame is None:
+                continue
+            if self.gate is None or self.gate.deve_inferir(frame):
+                try:
+                    deteccoes = self.inferir(frame)
+                    self.fps_inferencia.marcar()
+                except Exception as e:
+                    # Falha passageira (ex.: servidor de inferência fora do ar): o
+                    # streaming continua com as últimas detecções
+                    log_limitado("stream.inferencia", "Falha na inferência do streaming: %s", e, nivel=logging.ERROR)
+            frame = self.desenhar(frame, deteccoes)
+            descartado = self.saida.colocar((frame, deteccoes))
+            if descartado is not None:
+                self.pool.devolver(descartado[0])
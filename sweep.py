@@ -0,0 +1,383 @@
+"""
+Busca de hiperparâmetros do treino em processos paralelos.
+
+Cada tentativa é uma combinação de valores de ESPACO_BUSCA (os mesmos
+parâmetros de HIPERPARAMETROS_TREINO) treinada em um processo próprio. Cada
+processo do pool fica fixado em uma fatia dos núcleos disponíveis
+(`os.sched_setaffinity`), com o número de threads do PyTorch igual ao tamanho
+da fatia, para que as tentativas simultâneas não disputem os mesmos núcleos.
+
+Ao fim de cada época, a tentativa grava o fitness de validação no banco SQLite
+e é podada (`trainer.stop`) se ficar abaixo da mediana das outras tentativas
+na mesma época. Todas as tentativas, concluídas, podadas ou com falha, ficam
+na tabela `tentativas` de SWEEP_BANCO.
+
+Uso:
+    python sweep.py --tentativas 12 --concorrencia 2 --cpus 4
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import torch
+from ultralytics import YOLO
+
+from config import (
+    NOME_MODELO, RESULTADOS_DIR, CACHE_IMAGENS, ROTULOS_PACOTES, ESPACO_BUSCA, SWEEP_TENTATIVAS,
+    SWEEP_CONCORRENCIA, SWEEP_CPUS_POR_TENTATIVA, SWEEP_PODA_AQUECIMENTO, SWEEP_PODA_MIN_TENTATIVAS, SWEEP_BANCO,
+)
+from cache_imagens import preparar_cache_imagens
+from logger import logger
+from rotulos import ArmazemRotulos
+from train import argumentos_treino
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS tentativas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sweep TEXT NOT NULL,
+    parametros TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    fitness REAL,
+    map50 REAL,
+    map50_95 REAL,
+    epocas INTEGER,
+    duracao_s REAL,
+    nucleos TEXT,
+    erro TEXT
+);
+CREATE TABLE IF NOT EXISTS epocas (
+    tentativa INTEGER NOT NULL REFERENCES tentativas(id),
+    epoca INTEGER NOT NULL,
+    fitness REAL NOT NULL,
+    PRIMARY KEY (tentativa, epoca)
+);
+"""
+
+# Núcleos do processo atual do pool, definidos em `_inicializar_trabalhador`
+_NUCLEOS = None
+
+
+def conectar(banco: str = SWEEP_BANCO) -> sqlite3.Connection:
+    """
+    Abre o banco de resultados em modo WAL, criando as tabelas se necessário.
+
+    Parâmetros
+    ----------
+    banco : str, opcional
+        Caminho do arquivo SQLite (padrão: SWEEP_BANCO).
+
+    Retorno
+    -------
+    sqlite3.Connection
+        Conexão aberta.
+    """
+    os.makedirs(os.path.dirname(banco), exist_ok=True)
+    conexao = sqlite3.connect(banco, timeout=60)
+    conexao.execute("PRAGMA journal_mode=WAL")
+    conexao.executescript(ESQUEMA)
+    return conexao
+
+
+def amostrar_parametros(espaco: dict, n: int, seed: int = 42) -> list:
+    """
+    Sorteia `n` combinações distintas do espaço de busca.
+
+    Parâmetros
+    ----------
+    espaco : dict
+        Mapeamento parâmetro -> lista de valores.
+    n : int
+        Número de combinações; se for maior que o espaço, todas são usadas.
+    seed : int, opcional
+        Seed do sorteio (padrão: 42).
+
+    Retorno
+    -------
+    list of dict
+        Combinações de hiperparâmetros.
+    """
+    grade = [dict(zip(espaco, valores)) for valores in itertools.product(*espaco.values())]
+    if n >= len(grade):
+        return grade
+    return random.Random(seed).sample(grade, n)
+
+
+def dividir_nucleos(concorrencia: int, cpus_por_tentativa: int = None) -> list:
+    """
+    Divide os núcleos disponíveis ao processo em fatias disjuntas, uma por tentativa simultânea.
+
+    Se `concorrencia * cpus_por_tentativa` passar do número de núcleos, a
+    concorrência é reduzida para não sobrecarregar a máquina.
+
+    Parâmetros
+    ----------
+    concorrencia : int
+        Número de tentativas simultâneas desejado.
+    cpus_por_tentativa : int, opcional
+        Núcleos por tentativa; se None, divide os núcleos igualmente.
+
+    Retorno
+    -------
+    list of list of int
+        Fatias de núcleos, uma por processo do pool.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        disponiveis = sorted(os.sched_getaffinity(0))
+    else:
+        disponiveis = list(range(os.cpu_count() or 1))
+
+    cpus = cpus_por_tentativa or max(1, len(disponiveis) // max(1, concorrencia))
+    cpus = min(cpus, len(disponiveis))
+    maximo = max(1, len(disponiveis) // cpus)
+    if concorrencia > maximo:
+        logger.warning(
+            f"{concorrencia} tentativas x {cpus} núcleos excedem os {len(disponiveis)} disponíveis; "
+            f"concorrência reduzida para {maximo}"
+        )
+        concorrencia = maximo
+    return [disponiveis[i * cpus:(i + 1) * cpus] for i in range(concorrencia)]
+
+
+def _inicializar_trabalhador(fila) -> None:
+    """
+    Fixa o processo do pool em uma fatia de núcleos e ajusta o número de threads.
+    """
+    global _NUCLEOS
+    _NUCLEOS = fila.get()
+    os.environ["OMP_NUM_THREADS"] = str(len(_NUCLEOS))
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, _NUCLEOS)
+    torch.set_num_threads(len(_NUCLEOS))
+
+
+def deve_podar(conexao, sweep: str, tentativa: int, epoca: int, fitness: float,
+               aquecimento: int = SWEEP_PODA_AQUECIMENTO, min_tentativas: int = SWEEP_PODA_MIN_TENTATIVAS) -> bool:
+    """
+    Regra da mediana: poda a tentativa se seu fitness ficar abaixo da mediana
+    das outras tentativas do mesmo sweep na mesma época.
+
+    Parâmetros
+    ----------
+    conexao : sqlite3.Connection
+        Conexão com o banco de resultados.
+    sweep : str
+        Identificador do sweep.
+    tentativa : int
+        Id da tentativa avaliada.
+    epoca : int
+        Época concluída (a partir de 1).
+    fitness : float
+        Fitness de validação da tentativa nessa época.
+    aquecimento : int, opcional
+        Épocas antes das quais nenhuma tentativa é podada (padrão: SWEEP_PODA_AQUECIMENTO).
+    min_tentativas : int, opcional
+        Número mínimo de outras tentativas com essa época (padrão: SWEEP_PODA_MIN_TENTATIVAS).
+
+    Retorno
+    -------
+    bool
+        True se a tentativa deve ser interrompida.
+    """
+    if epoca < aquecimento:
+        return False
+    outras = [linha[0] for linha in conexao.execute(
+        "SELECT e.fitness FROM epocas e JOIN tentativas t ON t.id = e.tentativa "
+        "WHERE t.sweep = ? AND e.epoca = ? AND e.tentativa != ?",
+        (sweep, epoca, tentativa),
+    )]
+    return len(outras) >= min_tentativas and fitness < statistics.median(outras)
+
+
+def _executar_tentativa(tentativa: int, parametros: dict, sweep: str, banco: str) -> dict:
+    """
+    Treina uma tentativa no processo atual do pool e grava o resultado no banco.
+    """
+    conexao = conectar(banco)
+    inicio = time.perf_counter()
+    with conexao:
+        conexao.execute(
+            "UPDATE tentativas SET estado = 'executando', nucleos = ? WHERE id = ?",
+            (json.dumps(_NUCLEOS), tentativa),
+        )
+
+    podada, treinadas = [], set()
+
+    def ao_terminar_treino_epoca(trainer):
+        treinadas.add(trainer.epoch + 1)
+
+    def ao_terminar_epoca(trainer):
+        # A validação final com best.pt também chama este callback, com uma época a mais
+        epoca, fitness = trainer.epoch + 1, float(trainer.fitness or 0.0)
+        if epoca not in treinadas:
+            return
+        with conexao:
+            conexao.execute(
+                "INSERT OR REPLACE INTO epocas (tentativa, epoca, fitness) VALUES (?, ?, ?)",
+                (tentativa, epoca, fitness),
+            )
+        if not trainer.stop and deve_podar(conexao, sweep, tentativa, epoca, fitness):
+            podada.append(epoca)
+            trainer.stop = True
+
+    try:
+        modelo = YOLO(NOME_MODELO)
+        modelo.add_callback("on_train_epoch_end", ao_terminar_treino_epoca)
+        modelo.add_callback("on_fit_epoch_end", ao_terminar_epoca)
+        modelo.train(
+            **argumentos_treino(modelo, parametros),
+            project=os.path.join(RESULTADOS_DIR, "sweep", sweep),
+            name=f"tentativa_{tentativa}",
+            exist_ok=True,
+            workers=max(1, len(_NUCLEOS or [1]) // 2),
+            plots=False,
+            verbose=False,
+        )
+        metricas = modelo.trainer.metrics
+        resultado = {
+            "estado": "podada" if podada else "concluida",
+            "fitness": float(modelo.trainer.best_fitness or 0.0),
+            "map50": metricas.get("metrics/mAP50(B)"),
+            "map50_95": metricas.get("metrics/mAP50-95(B)"),
+            "epocas": modelo.trainer.epoch + 1,
+            "erro": None,
+        }
+    except Exception as e:
+        resultado = {"estado": "falhou", "fitness": None, "map50": None, "map50_95": None, "epocas": None,
+                     "erro": str(e)}
+
+    resultado["duracao_s"] = time.perf_counter() - inicio
+    with conexao:
+        conexao.execute(
+            "UPDATE tentativas SET estado = :estado, fitness = :fitness, map50 = :map50, map50_95 = :map50_95, "
+            "epocas = :epocas, duracao_s = :duracao_s, erro = :erro WHERE id = :id",
+            {**resultado, "id": tentativa},
+        )
+    conexao.close()
+    return resultado
+
+
+def executar_sweep(
+    espaco: dict = ESPACO_BUSCA,
+    n_tentativas: int = SWEEP_TENTATIVAS,
+    concorrencia: int = SWEEP_CONCORRENCIA,
+    cpus_por_tentativa: int = SWEEP_CPUS_POR_TENTATIVA,
+    banco: str = SWEEP_BANCO,
+) -> list:
+    """
+    Executa uma busca de hiperparâmetros e retorna as tentativas ordenadas pelo fitness.
+
+    Parâmetros
+    ----------
+    espaco : dict, opcional
+        Mapeamento parâmetro -> lista de valores (padrão: ESPACO_BUSCA).
+    n_tentativas : int, opcional
+        Número de combinações sorteadas (padrão: SWEEP_TENTATIVAS).
+    concorrencia : int, opcional
+        Tentativas simultâneas (padrão: SWEEP_CONCORRENCIA).
+    cpus_por_tentativa : int, opcional
+        Núcleos fixados por tentativa; None divide os disponíveis (padrão: SWEEP_CPUS_POR_TENTATIVA).
+    banco : str, opcional
+        Arquivo SQLite dos resultados (padrão: SWEEP_BANCO).
+
+    Retorno
+    -------
+    list of dict
+        Tentativas deste sweep, da melhor para a pior.
+    """
+    sweep = time.strftime("%Y%m%d-%H%M%S")
+    combinacoes = amostrar_parametros(espaco, n_tentativas)
+    fatias = dividir_nucleos(concorrencia, cpus_por_tentativa)
+    logger.info(
+        f"Sweep {sweep}: {len(combinacoes)} tentativas, {len(fatias)} simultâneas "
+        f"com {len(fatias[0])} núcleos cada"
+    )
+
+    if CACHE_IMAGENS and ROTULOS_PACOTES:
+        armazens = [ArmazemRotulos(s) for s in ("train", "valid") if ArmazemRotulos.existe(s)]
+        for imgsz in sorted({c.get("imgsz") for c in combinacoes} - {None}):
+            preparar_cache_imagens(imgsz, armazens)
+
+    conexao = conectar(banco)
+    with conexao:
+        ids = [
+            conexao.execute(
+                "INSERT INTO tentativas (sweep, parametros, estado) VALUES (?, ?, 'pendente')",
+                (sweep, json.dumps(c)),
+            ).lastrowid
+            for c in combinacoes
+        ]
+
+    contexto = multiprocessing.get_context("spawn")
+    fila = contexto.Queue()
+    for fatia in fatias:
+        fila.put(fatia)
+
+    with ProcessPoolExecutor(len(fatias), mp_context=contexto,
+                             initializer=_inicializar_trabalhador, initargs=(fila,)) as pool:
+        futuros = {pool.submit(_executar_tentativa, i, c, sweep, banco): (i, c) for i, c in zip(ids, combinacoes)}
+        for futuro in as_completed(futuros):
+            tentativa, parametros = futuros[futuro]
+            resultado = futuro.result()
+            logger.info(
+                f"Tentativa {tentativa} {resultado['estado']} em {resultado['duracao_s']:.0f}s "
+                f"(fitness={resultado['fitness']}): {parametros}"
+            )
+
+    ranking = melhores_tentativas(conexao, sweep)
+    conexao.close()
+    if ranking:
+        logger.info(f"Melhor tentativa do sweep {sweep}: {ranking[0]}")
+    return ranking
+
+
+def melhores_tentativas(conexao, sweep: str = None, limite: int = None) -> list:
+    """
+    Consulta as tentativas com fitness, da melhor para a pior.
+
+    Parâmetros
+    ----------
+    conexao : sqlite3.Connection
+        Conexão com o banco de resultados.
+    sweep : str, opcional
+        Restringe a um sweep; se None, considera todos.
+    limite : int, opcional
+        Número máximo de tentativas retornadas.
+
+    Retorno
+    -------
+    list of dict
+        Tentativas com `parametros` já decodificados.
+    """
+    conexao.row_factory = sqlite3.Row
+    consulta = "SELECT * FROM tentativas WHERE fitness IS NOT NULL"
+    argumentos = []
+    if sweep is not None:
+        consulta += " AND sweep = ?"
+        argumentos.append(sweep)
+    consulta += " ORDER BY fitness DESC"
+    if limite is not None:
+        consulta += " LIMIT ?"
+        argumentos.append(limite)
+    linhas = [dict(linha) for linha in conexao.execute(consulta, argumentos)]
+    for linha in linhas:
+        linha["parametros"] = json.loads(linha["parametros"])
+    return linhas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Busca de hiperparâmetros do treino YOLO")
+    parser.add_argument("--tentativas", type=int, default=SWEEP_TENTATIVAS)
+    parser.add_argument("--concorrencia", type=int, default=SWEEP_CONCORRENCIA)
+    parser.add_argument("--cpus", type=int, default=SWEEP_CPUS_POR_TENTATIVA)
+    parser.add_argument("--banco", default=SWEEP_BANCO)
+    args = parser.parse_args()
+    executar_sweep(n_tentativas=args.tentativas, concorrencia=args.concorrencia,
+                   cpus_por_tentativa=args.cpus, banco=args.banco)
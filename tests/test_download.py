@@ -0,0 +1,162 @@
+"""
+Testes do download verificado de datasets (`download.py`) com `ClienteDiretorioLocal`.
+
+Uso:
+    python -m pytest tests/test_download.py
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import download
+from download import ClienteDiretorioLocal, MANIFESTO, baixar_datasets
+
+PROJETO, VERSAO = "fixture", 1
+
+
+class ClienteContador(ClienteDiretorioLocal):
+    # Conta as cópias e falha nas primeiras `falhas` chamadas
+    def __init__(self, raiz: str, falhas: int = 0):
+        super().__init__(raiz)
+        self.falhas = falhas
+        self.chamadas = 0
+
+    def _copiar(self, projeto, versao, location) -> None:
+        self.chamadas += 1
+        if self.chamadas <= self.falhas:
+            raise ConnectionError("conexão recusada")
+        super()._copiar(projeto, versao, location)
+
+
+def escrever(caminho, conteudo: bytes = b"x") -> None:
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, "wb") as f:
+        f.write(conteudo)
+
+
+@pytest.fixture
+def ambiente(tmp_path, monkeypatch):
+    origem = tmp_path / "origem" / f"{PROJETO}_v{VERSAO}"
+    escrever(origem / "data.yaml", b"names: ['produto']\n")
+    for split, nomes in (("train", ("a", "b")), ("valid", ("c",))):
+        for nome in nomes:
+            escrever(origem / split / "images" / f"{nome}.jpg", b"\xff\xd8imagem")
+            escrever(origem / split / "labels" / f"{nome}.txt", b"0 0.5 0.5 0.1 0.1\n")
+
+    base = tmp_path / "datasets"
+    monkeypatch.setattr(download, "BASE_DIR", str(base))
+    monkeypatch.setattr(download, "RESULTADOS_DIR", str(tmp_path / "resultados"))
+    monkeypatch.setattr(download, "LISTA_DATASETS", [("ws", PROJETO, VERSAO)])
+    return origem, base / f"{PROJETO}_v{VERSAO}"
+
+
+def baixar(cliente, **kwargs) -> None:
+    baixar_datasets(cliente=cliente, max_concorrencia=1, backoff=0, **kwargs)
+
+
+def test_primeiro_download_grava_manifesto(ambiente):
+    origem, destino = ambiente
+    baixar(ClienteContador(str(origem.parent)))
+
+    with open(destino / MANIFESTO) as f:
+        manifesto = json.load(f)
+    assert manifesto["contagens"] == {
+        "train": {"imagens": 2, "rotulos": 2},
+        "valid": {"imagens": 1, "rotulos": 1},
+    }
+    assert "train/images/a.jpg" in manifesto["arquivos"]
+    assert sorted(os.listdir(destino.parent)) == [destino.name]
+
+
+def test_falha_transitoria_e_repetida(ambiente):
+    origem, destino = ambiente
+    cliente = ClienteContador(str(origem.parent), falhas=1)
+    baixar(cliente, tentativas=2)
+
+    assert cliente.chamadas == 2
+    assert (destino / MANIFESTO).exists()
+
+
+def test_falhas_esgotam_tentativas(ambiente):
+    origem, destino = ambiente
+    cliente = ClienteContador(str(origem.parent), falhas=3)
+    with pytest.raises(RuntimeError, match="Falha ao baixar"):
+        baixar(cliente, tentativas=2)
+
+    assert cliente.chamadas == 2
+    assert not destino.exists()
+
+
+@pytest.mark.parametrize("defeito", ["rotulo_orfao", "imagem_vazia"])
+def test_dataset_inconsistente_e_rejeitado(ambiente, defeito):
+    origem, destino = ambiente
+    if defeito == "rotulo_orfao":
+        escrever(origem / "train" / "labels" / "sem_imagem.txt", b"0 0.5 0.5 0.1 0.1\n")
+    else:
+        escrever(origem / "train" / "images" / "vazia.jpg", b"")
+
+    with pytest.raises(RuntimeError):
+        baixar(ClienteContador(str(origem.parent)), tentativas=1)
+
+    assert not destino.exists()
+
+
+def test_dataset_valido_nao_e_baixado_novamente(ambiente):
+    origem, destino = ambiente
+    cliente = ClienteContador(str(origem.parent))
+    baixar(cliente)
+    baixar(cliente)
+
+    assert cliente.chamadas == 1
+
+
+def test_pasta_sem_manifesto_integra_e_adotada(ambiente):
+    origem, destino = ambiente
+    ClienteDiretorioLocal(str(origem.parent))._copiar(PROJETO, VERSAO, str(destino))
+    cliente = ClienteContador(str(origem.parent))
+    baixar(cliente)
+
+    assert cliente.chamadas == 0
+    assert (destino / MANIFESTO).exists()
+
+
+def test_edicao_manual_e_mantida(ambiente):
+    origem, destino = ambiente
+    cliente = ClienteContador(str(origem.parent))
+    baixar(cliente)
+    escrever(destino / "train" / "labels" / "a.txt", b"0 0.4 0.4 0.2 0.2\n0 0.7 0.7 0.1 0.1\n")
+    escrever(destino / "train" / "images" / "novo.jpg", b"\xff\xd8imagem nova")
+
+    baixar(cliente)
+
+    assert cliente.chamadas == 1
+    assert (destino / "train" / "images" / "novo.jpg").exists()
+
+
+def test_split_incompleto_e_baixado_novamente(ambiente):
+    origem, destino = ambiente
+    cliente = ClienteContador(str(origem.parent))
+    baixar(cliente)
+    os.remove(destino / "train" / "images" / "b.jpg")
+
+    baixar(cliente)
+
+    assert cliente.chamadas == 2
+    assert (destino / "train" / "images" / "b.jpg").exists()
+
+
+def test_forcar_baixa_novamente(ambiente):
+    origem, destino = ambiente
+    cliente = ClienteContador(str(origem.parent))
+    baixar(cliente)
+    escrever(destino / "train" / "images" / "novo.jpg", b"\xff\xd8imagem nova")
+
+    baixar(cliente, forcar=True)
+
+    assert cliente.chamadas == 2
+    assert not (destino / "train" / "images" / "novo.jpg").exists()
@@ -0,0 +1,186 @@
+"""
+Testes da execução incremental do pipeline (`etapas.py`) com etapas que gravam arquivos em `tmp_path`.
+
+Uso:
+    python -m pytest tests/test_etapas.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etapas import Etapa, executar_etapas, impressao_caminho
+
+
+class Pipeline:
+    # "dados" grava o valor configurado; "treino" lê a saída de "dados" e grava a sua
+    def __init__(self, pasta):
+        self.pasta = pasta
+        self.config = {"valor": "1", "comentario": "a"}
+        self.executadas = []
+        self.estado = str(pasta / "estado.json")
+
+    def caminho(self, nome):
+        return self.pasta / f"{nome}.txt"
+
+    def dados(self):
+        self.executadas.append("dados")
+        self.caminho("dados").write_text(self.config["valor"])
+
+    def treino(self):
+        self.executadas.append("treino")
+        self.caminho("treino").write_text("modelo de " + self.caminho("dados").read_text())
+
+    def etapas(self):
+        return [
+            Etapa("dados", self.dados, lambda: dict(self.config),
+                  lambda: {"dados": impressao_caminho(str(self.caminho("dados")))}),
+            Etapa("treino", self.treino, lambda: {},
+                  lambda: {"treino": impressao_caminho(str(self.caminho("treino")))}, depende=("dados",)),
+        ]
+
+    def executar(self, **kwargs):
+        self.executadas = []
+        plano = executar_etapas(self.etapas(), caminho_estado=self.estado, **kwargs)
+        return {nome: (decisao, motivo) for nome, decisao, motivo in plano}
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    pipeline = Pipeline(tmp_path)
+    pipeline.executar()
+    return pipeline
+
+
+def test_primeira_execucao_e_cache(tmp_path):
+    pipeline = Pipeline(tmp_path)
+
+    plano = pipeline.executar()
+    assert pipeline.executadas == ["dados", "treino"]
+    assert plano["dados"] == ("executar", "sem execução anterior")
+
+    plano = pipeline.executar()
+    assert pipeline.executadas == []
+    assert plano["dados"][0] == plano["treino"][0] == "pular"
+
+
+def test_artefato_ausente(pipeline):
+    os.remove(pipeline.caminho("treino"))
+
+    plano = pipeline.executar()
+
+    assert pipeline.executadas == ["treino"]
+    assert plano["treino"] == ("executar", "artefatos ausentes: treino")
+    assert pipeline.caminho("treino").exists()
+
+
+def test_artefato_alterado_a_mao(pipeline):
+    pipeline.caminho("dados").write_text("editado")
+
+    plano = pipeline.executar()
+
+    # "dados" regrava o mesmo conteúdo, então "treino" continua em cache
+    assert pipeline.executadas == ["dados"]
+    assert plano["dados"] == ("executar", "artefatos alterados desde a última execução")
+    assert plano["treino"][0] == "pular"
+
+
+def test_entradas_mudaram(pipeline):
+    pipeline.config["valor"] = "2"
+
+    plano = pipeline.executar()
+
+    assert pipeline.executadas == ["dados", "treino"]
+    assert plano["dados"] == ("executar", "entradas mudaram: valor")
+    assert plano["treino"] == ("executar", "entradas mudaram: etapa:dados")
+    assert pipeline.caminho("treino").read_text() == "modelo de 2"
+
+
+def test_saida_anterior_igual_nao_propaga(pipeline):
+    pipeline.config["comentario"] = "b"
+
+    plano = pipeline.executar()
+
+    assert pipeline.executadas == ["dados"]
+    assert plano["dados"] == ("executar", "entradas mudaram: comentario")
+    assert plano["treino"][0] == "pular"
+
+
+def test_saida_anterior_mudou(pipeline):
+    pipeline.config["valor"] = "2"
+    pipeline.executar(somente=["dados"])
+
+    plano = pipeline.executar()
+
+    assert pipeline.executadas == ["treino"]
+    assert plano["dados"][0] == "pular"
+    assert plano["treino"] == ("executar", "entradas mudaram: etapa:dados")
+
+
+def test_only(pipeline):
+    plano = pipeline.executar(somente=["treino"])
+
+    assert pipeline.executadas == ["treino"]
+    assert plano["dados"] == ("ignorar", "fora de --only")
+    assert plano["treino"] == ("executar", "forçada por --only")
+
+
+def test_from(pipeline):
+    plano = pipeline.executar(de="treino")
+    assert pipeline.executadas == ["treino"]
+    assert plano["dados"] == ("ignorar", "anterior a --from")
+    assert plano["treino"] == ("executar", "forçada por --from")
+
+    pipeline.executar(de="dados")
+    assert pipeline.executadas == ["dados", "treino"]
+
+
+def test_etapa_desconhecida(pipeline):
+    with pytest.raises(RuntimeError, match="Etapa desconhecida"):
+        pipeline.executar(somente=["avaliacao"])
+
+
+def test_mark_done_adota_artefatos_existentes(tmp_path):
+    pipeline = Pipeline(tmp_path)
+    pipeline.caminho("dados").write_text("1")
+    pipeline.caminho("treino").write_text("pesos treinados antes")
+
+    plano = pipeline.executar(marcar=True)
+    assert pipeline.executadas == []
+    assert plano["treino"][0] == "executar"
+
+    plano = pipeline.executar()
+    assert pipeline.executadas == []
+    assert plano["dados"][0] == plano["treino"][0] == "pular"
+    assert pipeline.caminho("treino").read_text() == "pesos treinados antes"
+
+
+def test_dry_run_sem_efeitos(pipeline):
+    with open(pipeline.estado, "rb") as f:
+        estado = f.read()
+    pipeline.config["valor"] = "2"
+
+    plano = pipeline.executar(simular=True)
+
+    assert pipeline.executadas == []
+    assert plano["dados"] == ("executar", "entradas mudaram: valor")
+    assert plano["treino"] == ("executar", "etapa anterior será executada: dados")
+    assert pipeline.caminho("dados").read_text() == "1"
+    with open(pipeline.estado, "rb") as f:
+        assert f.read() == estado
+
+    pipeline.executar()
+    assert pipeline.executadas == ["dados", "treino"]
+
+
+def test_dry_run_sem_estado_nao_cria_arquivos(tmp_path):
+    pipeline = Pipeline(tmp_path)
+
+    plano = pipeline.executar(simular=True)
+
+    assert pipeline.executadas == []
+    assert [decisao for decisao, _ in plano.values()] == ["executar", "executar"]
+    assert os.listdir(tmp_path) == []
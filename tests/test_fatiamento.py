@@ -0,0 +1,90 @@
+"""
+Testes das janelas e da NMS por classe da inferência fatiada (`fatiamento.py`).
+
+Uso:
+    python -m pytest tests/test_fatiamento.py
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fatiamento import gerar_janelas, nms_por_classe
+
+
+@pytest.mark.parametrize("altura, largura, tamanho, sobreposicao", [
+    (1080, 1920, 640, 0.2),
+    (3000, 4000, 640, 0.25),
+    (641, 1281, 640, 0.5),
+    (640, 640, 640, 0.2),
+])
+def test_janelas_cobrem_a_imagem_ate_as_bordas(altura, largura, tamanho, sobreposicao):
+    janelas = gerar_janelas(altura, largura, tamanho, sobreposicao)
+
+    cobertura = np.zeros((altura, largura), dtype=bool)
+    for x1, y1, x2, y2 in janelas.tolist():
+        cobertura[y1:y2, x1:x2] = True
+    assert cobertura.all()
+
+    assert (janelas[:, 2] - janelas[:, 0] == tamanho).all()
+    assert (janelas[:, 3] - janelas[:, 1] == tamanho).all()
+    assert janelas[:, 2].max() == largura and janelas[:, 3].max() == altura
+    assert janelas[:, :2].min() == 0
+
+    # Janelas vizinhas se sobrepõem em ao menos `sobreposicao` do lado
+    passo = int(tamanho * (1 - sobreposicao))
+    for eixo in (0, 1):
+        inicios = np.unique(janelas[:, eixo])
+        assert (np.diff(inicios) <= passo).all()
+
+
+def test_imagem_menor_que_a_janela():
+    janelas = gerar_janelas(300, 500, 640, 0.2)
+
+    assert janelas.tolist() == [[0, 0, 500, 300]]
+
+
+def caixas(*linhas) -> np.ndarray:
+    # Linhas x1, y1, x2, y2, confiança, classe
+    return np.array(linhas, dtype=np.float32)
+
+
+# Item em 600..700 visto inteiro numa janela e cortado na borda da vizinha
+INTEIRO = (600, 100, 700, 200, 0.9, 0)
+DESLOCADO = (604, 102, 702, 201, 0.8, 0)
+CORTADO = (680, 100, 700, 200, 0.7, 0)
+
+
+@pytest.mark.parametrize("metrica", ["iou", "ios"])
+def test_nms_remove_duplicata_entre_janelas(metrica):
+    mantidas = nms_por_classe(caixas(INTEIRO, DESLOCADO), limiar=0.5, metrica=metrica)
+
+    assert mantidas.tolist() == [0]
+
+
+def test_ios_remove_caixa_cortada_que_a_iou_mantem():
+    dados = caixas(INTEIRO, CORTADO)
+
+    assert nms_por_classe(dados, limiar=0.5, metrica="iou").tolist() == [0, 1]
+    assert nms_por_classe(dados, limiar=0.5, metrica="ios").tolist() == [0]
+
+
+@pytest.mark.parametrize("metrica", ["iou", "ios"])
+def test_nms_mantem_classes_diferentes(metrica):
+    outra_classe = (*INTEIRO[:4], 0.8, 1)
+    dados = caixas(INTEIRO, outra_classe, CORTADO[:5] + (1,))
+
+    assert sorted(nms_por_classe(dados, limiar=0.5, metrica=metrica).tolist()) == (
+        [0, 1] if metrica == "ios" else [0, 1, 2]
+    )
+
+
+def test_nms_ordena_por_confianca_e_aceita_vazio():
+    dados = caixas((0, 0, 10, 10, 0.3, 0), (50, 50, 60, 60, 0.9, 0))
+
+    assert nms_por_classe(dados, limiar=0.5).tolist() == [1, 0]
+    assert nms_por_classe(np.empty((0, 6), dtype=np.float32)).tolist() == []
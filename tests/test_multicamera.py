@@ -0,0 +1,81 @@
+"""
+Testes do escalonador de várias câmeras (`multicamera.py`) com gate de movimento.
+
+Uso:
+    python -m pytest tests/test_multicamera.py
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deteccao import deteccoes_vazias
+from multicamera import EscalonadorInferencia, CameraEscalonada
+
+ESPERA_MAX_MS = 500
+
+
+class CapturaSintetica:
+    # Frames pretos no ritmo de uma câmera
+    def __init__(self, fps: float = 20.0):
+        self.intervalo = 1 / fps
+
+    def read(self, imagem=None):
+        time.sleep(self.intervalo)
+        return True, np.zeros((48, 64, 3), dtype=np.uint8)
+
+    def release(self):
+        pass
+
+
+class GateRecusa:
+    # Cena parada: nenhum frame vai ao modelo
+    def __init__(self):
+        self.frames = 0
+
+    def deve_inferir(self, frame) -> bool:
+        self.frames += 1
+        return False
+
+
+def rodar(cameras: list, segundos: float = 1.5) -> list:
+    lotes = []
+
+    def inferir_lote(frames):
+        lotes.append(len(frames))
+        return [deteccoes_vazias({}) for _ in frames]
+
+    escalonador = EscalonadorInferencia(inferir_lote, lote_max=len(cameras), espera_max_ms=ESPERA_MAX_MS)
+    for camera in cameras:
+        escalonador.adicionar(camera)
+    escalonador.iniciar()
+    time.sleep(segundos)
+    escalonador.parar()
+    return lotes
+
+
+def test_camera_parada_nao_atrasa_as_demais():
+    gate = GateRecusa()
+    ativa = CameraEscalonada("ativa", CapturaSintetica(), lambda f, d: f)
+    parada = CameraEscalonada("parada", CapturaSintetica(), lambda f, d: f, gate=gate)
+
+    lotes = rodar([ativa, parada])
+
+    assert gate.frames > 0
+    assert parada.sem_movimento
+    assert set(lotes) == {1}
+    # Esperando a câmera parada, seriam no máximo ~3 lotes (um a cada ESPERA_MAX_MS)
+    assert len(lotes) >= 10
+
+
+def test_frames_recusados_ainda_sao_exibidos():
+    parada = CameraEscalonada("parada", CapturaSintetica(), lambda f, d: f, gate=GateRecusa())
+
+    lotes = rodar([parada], segundos=0.5)
+
+    assert lotes == []
+    assert parada.ultimo_resultado() is not None
@@ -0,0 +1,93 @@
+"""
+Testes do rastreador por IoU (`rastreamento.py`) com caixas paradas sintéticas.
+
+Uso:
+    python -m pytest tests/test_rastreamento.py
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deteccao import Deteccoes
+from rastreamento import RastreadorIoU
+
+NOMES = {0: "arroz", 1: "feijao"}
+CAIXA = (100, 100, 140, 160)
+
+
+def deteccoes(*caixas_classes) -> Deteccoes:
+    # Deteccoes a partir de pares (caixa xyxy, classe)
+    caixas = np.array([c for c, _ in caixas_classes], dtype=np.int32).reshape(-1, 4)
+    classes = np.array([k for _, k in caixas_classes], dtype=np.int64)
+    return Deteccoes(caixas, np.full(len(classes), 0.9, dtype=np.float32), classes, NOMES)
+
+
+def test_trilha_confirmada_apos_n_acertos():
+    rastreador = RastreadorIoU(limiar_iou=0.3, confirmacao=3, max_perdidos=2)
+
+    for _ in range(2):
+        assert rastreador.atualizar(deteccoes((CAIXA, 0))).ids.tolist() == [-1]
+        assert rastreador.contagem() == {}
+
+    assert rastreador.atualizar(deteccoes((CAIXA, 0))).ids.tolist() == [1]
+    assert rastreador.atualizar(deteccoes((CAIXA, 0))).ids.tolist() == [1]
+    assert rastreador.contagem() == {"arroz": 1}
+    assert rastreador.confirmacoes() == [(1, "arroz")]
+    assert rastreador.confirmacoes() == []
+
+
+def test_id_sobrevive_ate_max_perdidos():
+    rastreador = RastreadorIoU(limiar_iou=0.3, confirmacao=2, max_perdidos=2)
+    for _ in range(2):
+        rastreador.atualizar(deteccoes((CAIXA, 0)))
+
+    for _ in range(2):
+        rastreador.atualizar(deteccoes())
+    assert rastreador.atualizar(deteccoes((CAIXA, 0))).ids.tolist() == [1]
+    assert rastreador.contagem() == {"arroz": 1}
+
+
+def test_trilha_encerrada_depois_de_max_perdidos():
+    rastreador = RastreadorIoU(limiar_iou=0.3, confirmacao=2, max_perdidos=2)
+    for _ in range(2):
+        rastreador.atualizar(deteccoes((CAIXA, 0)))
+
+    for _ in range(3):
+        rastreador.atualizar(deteccoes())
+    assert rastreador.estatisticas()["trilhas_ativas"] == 0
+
+    assert rastreador.atualizar(deteccoes((CAIXA, 0))).ids.tolist() == [-1]
+    assert rastreador.atualizar(deteccoes((CAIXA, 0))).ids.tolist() == [2]
+    assert rastreador.contagem() == {"arroz": 2}
+
+
+def test_sem_associacao_entre_classes():
+    rastreador = RastreadorIoU(limiar_iou=0.3, confirmacao=2, max_perdidos=2)
+
+    rastreador.atualizar(deteccoes((CAIXA, 0)))
+    assert rastreador.atualizar(deteccoes((CAIXA, 1))).ids.tolist() == [-1]
+    assert rastreador.estatisticas()["trilhas_ativas"] == 2
+    assert rastreador.contagem() == {}
+
+    # Duas classes na mesma caixa seguem em trilhas separadas
+    ids = rastreador.atualizar(deteccoes((CAIXA, 0), (CAIXA, 1))).ids.tolist()
+    assert sorted(ids) == [1, 2]
+    assert rastreador.contagem() == {"arroz": 1, "feijao": 1}
+
+
+def test_capacidade_cresce_alem_da_inicial():
+    rastreador = RastreadorIoU(limiar_iou=0.3, confirmacao=2, max_perdidos=2, capacidade=128)
+    caixas = [((x, y, x + 10, y + 10), 0) for x in range(0, 400, 20) for y in range(0, 300, 20)]
+    assert len(caixas) == 300
+
+    rastreador.atualizar(deteccoes(*caixas))
+    ids = rastreador.atualizar(deteccoes(*caixas)).ids.tolist()
+
+    assert len(rastreador.ativas) >= 300
+    assert ids == list(range(1, 301))
+    assert rastreador.contagem() == {"arroz": 300}
+    assert rastreador.estatisticas()["trilhas_ativas"] == 300
@@ -1,10 +1,28 @@
 import os
+import re
 import json
 import random
+import sys
+import time
+from functools import partial
 import numpy as np
 import torch
-from config import BASE_DIR, RESULTADOS_DIR
+from ultralytics.data.dataset import YOLODataset
+from ultralytics.models.yolo.detect import DetectionTrainer
+from ultralytics.utils import colorstr
+from ultralytics.utils.torch_utils import unwrap_model
+from config import (
+    BASE_DIR, RESULTADOS_DIR, ROTULOS_PACOTES, CACHE_IMAGENS, HIPERPARAMETROS_TREINO,
+    CACHE_CARACTERISTICAS, CACHE_CARACTERISTICAS_MB,
+)
+from avaliacao import avaliar
 from logger import logger  # Supondo que você tenha um módulo logger.py
+from instrumentacao import medir, observar
+from rotulos import ArmazemRotulos
+from cache_imagens import CacheImagens, preparar_cache_imagens
+
+# Split do data.yaml -> subpasta do armazenamento de rótulos
+SPLITS_ARMAZEM = {"train": "train", "val": "valid", "test": "test"}
 
 def setar_seed(seed: int = 42) -> None:
     """
@@ -27,15 +45,427 @@ def setar_seed(seed: int = 42) -> None:
     torch.backends.cudnn.benchmark = False
 
 
-def treinar_modelo(modelo) -> object:
+class DatasetRotulosPacotes(YOLODataset):
+    """
+    `YOLODataset` que obtém a lista de imagens e os rótulos do armazenamento
+    compacto gerado por `rotulos.preparar_rotulos`, sem listar pastas nem ler `.txt`.
+    """
+
+    def __init__(self, *args, armazem: ArmazemRotulos, cache_imagens: CacheImagens = None, **kwargs):
+        """
+        Parâmetros
+        ----------
+        armazem : ArmazemRotulos
+            Rótulos remapeados do split.
+        cache_imagens : CacheImagens, opcional
+            Imagens já redimensionadas para `imgsz`; as ausentes do cache são
+            lidas normalmente (padrão: None).
+        *args, **kwargs
+            Argumentos repassados a `YOLODataset`.
+        """
+        self.armazem = armazem
+        self.cache_imagens = cache_imagens
+        super().__init__(*args, **kwargs)
+
+    def get_img_files(self, img_path):
+        fracao = getattr(self, "fraction", 1.0)
+        total = len(self.armazem)
+        n = fracao if isinstance(fracao, int) else max(1, round(total * fracao))
+        return self.armazem.imagens[:min(n, total)]
+
+    def get_labels(self):
+        return [self.armazem.rotulo(i) for i in range(len(self.im_files))]
+
+    def load_image(self, i, rect_mode=True, resize_short=False):
+        usar_cache = self.cache_imagens is not None and rect_mode and not resize_short and self.channels == 3
+        entrada = self.cache_imagens.obter(self.armazem.hashes[i]) if usar_cache and self.ims[i] is None else None
+        if entrada is None:
+            return super().load_image(i, rect_mode, resize_short)
+
+        im, hw0 = entrada
+        # Mesmo buffer do `load_image` original, usado pelo mosaico
+        if self.augment and self.cache != "ram":
+            self.ims[i], self.im_hw0[i], self.im_hw[i] = im, hw0, im.shape[:2]
+            self.buffer.append(i)
+            if 1 < len(self.buffer) >= self.max_buffer_length:
+                j = self.buffer.pop(0)
+                self.ims[j], self.im_hw0[j], self.im_hw[j] = None, None, None
+        return im, hw0, im.shape[:2]
+
+
+class TreinadorRotulosPacotes(DetectionTrainer):
+    """
+    `DetectionTrainer` cujos datasets de treino e validação leem o armazenamento
+    compacto de rótulos, quando ele existe e corresponde às classes do `data.yaml`,
+    e, com CACHE_IMAGENS, as imagens pré-redimensionadas de `cache_imagens`.
+    """
+
+    def build_dataset(self, img_path, mode="train", batch=None):
+        split = next((s for chave, s in SPLITS_ARMAZEM.items() if self.data.get(chave) == img_path), None)
+        if split is None or not ArmazemRotulos.existe(split):
+            return super().build_dataset(img_path, mode, batch)
+
+        armazem = ArmazemRotulos(split)
+        if armazem.meta.get("names") != list(self.data["names"].values()):
+            logger.warning(f"Rótulos compactos de {split} não correspondem às classes do data.yaml; usando os .txt.")
+            return super().build_dataset(img_path, mode, batch)
+
+        cache_imagens = CacheImagens(self.args.imgsz, somente_leitura=True) if CACHE_IMAGENS else None
+
+        modelo = getattr(self.model, "module", self.model)
+        gs = max(int(modelo.stride.max()) if modelo is not None else 0, 32)
+        return DatasetRotulosPacotes(
+            armazem=armazem,
+            cache_imagens=cache_imagens,
+            img_path=img_path,
+            imgsz=self.args.imgsz,
+            batch_size=batch,
+            augment=mode == "train",
+            hyp=self.args,
+            rect=self.args.rect or mode == "val",
+            cache=self.args.cache or None,
+            single_cls=self.args.single_cls or False,
+            stride=gs,
+            pad=0.0 if mode == "train" else 0.5,
+            prefix=colorstr(f"{mode}: "),
+            task=self.args.task,
+            classes=self.args.classes,
+            data=self.data,
+            fraction=self.args.fraction if mode == "train" else 1.0,
+        )
+
+
+class CacheCaracteristicas:
+    """
+    Saídas das camadas congeladas iniciais do modelo, por imagem, mantidas em memória.
+
+    Só é válido quando as imagens de treino não passam por aumento de dados:
+    a mesma imagem gera sempre o mesmo tensor de entrada e, com os pesos e as
+    estatísticas de BatchNorm congelados, as mesmas saídas. São guardadas
+    apenas as saídas usadas pelas camadas seguintes.
+    """
+
+    def __init__(self, modelo, n_congeladas: int, limite_mb: float = CACHE_CARACTERISTICAS_MB):
+        """
+        Parâmetros
+        ----------
+        modelo : ultralytics.nn.tasks.DetectionModel
+            Modelo em treino.
+        n_congeladas : int
+            Número de camadas iniciais congeladas (prefixo reaproveitado).
+        limite_mb : float, opcional
+            Memória máxima ocupada pelas saídas guardadas (padrão: CACHE_CARACTERISTICAS_MB).
+        """
+        self.n = n_congeladas
+        camadas = modelo.model
+        # Saídas do prefixo lidas por alguma camada seguinte
+        self.necessarias = sorted(
+            {j for m in camadas[self.n:] for j in ([m.f] if isinstance(m.f, int) else m.f) if 0 <= j < self.n}
+            | {self.n - 1}
+        )
+        self.limite = limite_mb * 2**20
+        self.ocupado = 0
+        self.saidas = {}
+        self.acertos = 0
+        self.faltas = 0
+
+    def _prefixo(self, modelo, x) -> dict:
+        y = []
+        for m in modelo.model[:self.n]:
+            if m.f != -1:
+                x = y[m.f] if isinstance(m.f, int) else [x if j == -1 else y[j] for j in m.f]
+            x = m(x)
+            y.append(x)
+        return {j: y[j] for j in self.necessarias}
+
+    def predizer(self, modelo, imagens, arquivos: list):
+        """
+        Executa o modelo reaproveitando as saídas do prefixo congelado já calculadas.
+
+        Parâmetros
+        ----------
+        modelo : ultralytics.nn.tasks.DetectionModel
+            Modelo em treino.
+        imagens : torch.Tensor
+            Lote (B, 3, H, W) já normalizado.
+        arquivos : list of str
+            Caminho da imagem de cada posição do lote.
+
+        Retorno
+        -------
+        torch.Tensor ou list
+            Mesma saída de `modelo.predict(imagens)`.
+        """
+        forma = tuple(imagens.shape[2:])
+        chaves = [(arquivo, forma) for arquivo in arquivos]
+        faltando = [i for i, chave in enumerate(chaves) if chave not in self.saidas]
+        self.acertos += len(chaves) - len(faltando)
+        self.faltas += len(faltando)
+
+        novas = {}
+        if faltando:
+            with torch.no_grad():
+                saidas = self._prefixo(modelo, imagens[faltando])
+            for posicao, i in enumerate(faltando):
+                novas[chaves[i]] = {j: t[posicao].detach().cpu() for j, t in saidas.items()}
+            for chave, tensores in novas.items():
+                tamanho = sum(t.numel() * t.element_size() for t in tensores.values())
+                if self.ocupado + tamanho <= self.limite:
+                    self.saidas[chave] = tensores
+                    self.ocupado += tamanho
+
+        def saida(chave, j):
+            return (self.saidas.get(chave) or novas[chave])[j]
+
+        y = [None] * self.n
+        for j in self.necessarias:
+            y[j] = torch.stack([saida(chave, j) for chave in chaves]).to(imagens.device, imagens.dtype)
+        x = y[self.n - 1]
+        for m in modelo.model[self.n:]:
+            if m.f != -1:
+                x = y[m.f] if isinstance(m.f, int) else [x if j == -1 else y[j] for j in m.f]
+            x = m(x)
+            y.append(x if m.i in modelo.save else None)
+        return x
+
+
+class TreinadorYOLO(TreinadorRotulosPacotes):
+    """
+    Treinador usado por `treinar_modelo`: rótulos compactos opcionais, treino
+    sem aumento de dados e cache das saídas das camadas congeladas.
+    """
+
+    def __init__(self, *args, rotulos_pacotes: bool = ROTULOS_PACOTES, aumentar: bool = True,
+                 cache_caracteristicas: bool = False, **kwargs):
+        """
+        Parâmetros
+        ----------
+        rotulos_pacotes : bool, opcional
+            Usa o armazenamento compacto de rótulos quando disponível (padrão: ROTULOS_PACOTES).
+        aumentar : bool, opcional
+            Aplica o aumento de dados do Ultralytics às imagens de treino; se
+            False, elas recebem só o letterbox, como na validação (padrão: True).
+        cache_caracteristicas : bool, opcional
+            Guarda as saídas das camadas congeladas iniciais e não as recalcula
+            nas épocas seguintes; requer `aumentar=False` (padrão: False).
+        *args, **kwargs
+            Argumentos repassados a `DetectionTrainer`.
+        """
+        self.rotulos_pacotes = rotulos_pacotes
+        self.aumentar = aumentar
+        self.cache_caracteristicas = cache_caracteristicas
+        self.cache = None
+        self._gancho_cache = None
+        super().__init__(*args, **kwargs)
+
+    def build_dataset(self, img_path, mode="train", batch=None):
+        if self.rotulos_pacotes:
+            dataset = super().build_dataset(img_path, mode, batch)
+        else:
+            dataset = DetectionTrainer.build_dataset(self, img_path, mode, batch)
+        if mode == "train" and not self.aumentar:
+            dataset.augment = False
+            dataset.transforms = dataset.build_transforms(hyp=self.args)
+        return dataset
+
+    def _setup_train(self):
+        super()._setup_train()
+        modelo = unwrap_model(self.model)
+        total = sum(p.numel() for p in modelo.parameters())
+        treinaveis = sum(p.numel() for p in modelo.parameters() if p.requires_grad)
+        logger.info(f"Parâmetros treináveis: {treinaveis:,} de {total:,}")
+
+        if not self.cache_caracteristicas:
+            return
+        n_congeladas = 0
+        for camada in modelo.model:
+            if any(p.requires_grad for p in camada.parameters()):
+                break
+            n_congeladas += 1
+        if self.aumentar or n_congeladas == 0:
+            logger.warning("Cache de características ignorado: requer aumentar=False e camadas iniciais congeladas.")
+            return
+
+        self.cache = CacheCaracteristicas(modelo, n_congeladas)
+        # O gancho é colocado depois da criação da EMA e retirado ao fim do treino,
+        # para não ir parar nos checkpoints
+        self._gancho_cache = self.model.register_forward_pre_hook(self._usar_cache, with_kwargs=True)
+        self.add_callback("on_train_end", lambda trainer: trainer._remover_cache())
+        logger.info(f"Cache de características ativo nas {n_congeladas} camadas iniciais congeladas.")
+
+    def _usar_cache(self, modulo, args, kwargs):
+        # Só no passo de treino, chamado como model(batch)
+        if not modulo.training or not args or not isinstance(args[0], dict) or "preds" in kwargs:
+            return None
+        lote = args[0]
+        preds = self.cache.predizer(unwrap_model(modulo), lote["img"], lote["im_file"])
+        return args, {**kwargs, "preds": preds}
+
+    def _remover_cache(self) -> None:
+        if self._gancho_cache is not None:
+            self._gancho_cache.remove()
+            self._gancho_cache = None
+        if self.cache is not None:
+            logger.info(
+                f"Cache de características: {self.cache.acertos} acertos, {self.cache.faltas} faltas, "
+                f"{self.cache.ocupado / 2**20:.0f} MB"
+            )
+            self.cache = None
+
+
+def indices_congelados(modelo, congelar) -> list:
+    """
+    Converte a opção `congelar` de HIPERPARAMETROS_TREINO nos índices das camadas congeladas.
+
+    Parâmetros
+    ----------
+    modelo : ultralytics.YOLO
+        Modelo que será treinado.
+    congelar : str, int ou list
+        "backbone" (todas as camadas do backbone do yaml do modelo), número de
+        camadas iniciais, ou lista de índices e nomes de módulos ("model.9" ou
+        o tipo da camada, como "SPPF" ou "C3k2").
+
+    Retorno
+    -------
+    list of int
+        Índices das camadas congeladas, em ordem.
+    """
+    camadas = modelo.model.model
+    if congelar == "backbone":
+        return list(range(len(modelo.model.yaml["backbone"])))
+    if isinstance(congelar, int):
+        return list(range(min(congelar, len(camadas))))
+
+    indices = set()
+    for item in congelar:
+        if isinstance(item, int):
+            indices.add(item)
+            continue
+        numero = re.fullmatch(r"(?:model\.)?(\d+)", str(item))
+        encontrados = {int(numero.group(1))} if numero else {
+            m.i for m in camadas if m.type.rsplit(".", 1)[-1] == item
+        }
+        if not encontrados:
+            raise ValueError(f"Camada desconhecida em 'congelar': {item}")
+        indices |= encontrados
+    return sorted(i for i in indices if 0 <= i < len(camadas))
+
+
+def camadas_congeladas(modelo, descongeladas):
+    """
+    Converte o número de camadas finais treináveis no argumento `freeze` do Ultralytics.
+
+    Parâmetros
+    ----------
+    modelo : ultralytics.YOLO
+        Modelo que será treinado.
+    descongeladas : int ou None
+        Número de camadas finais treináveis; None treina todas.
+
+    Retorno
+    -------
+    int ou None
+        Número de camadas iniciais congeladas.
+    """
+    if descongeladas is None:
+        return None
+    return max(0, len(modelo.model.model) - descongeladas)
+
+
+def argumentos_treino(modelo, hiperparametros: dict = None) -> dict:
+    """
+    Monta os argumentos de `YOLO.train` a partir de HIPERPARAMETROS_TREINO.
+
+    Parâmetros
+    ----------
+    modelo : ultralytics.YOLO
+        Modelo que será treinado.
+    hiperparametros : dict, opcional
+        Valores que substituem os de HIPERPARAMETROS_TREINO (mesmas chaves).
+
+    Retorno
+    -------
+    dict
+        Argumentos nomeados para `modelo.train`.
+    """
+    hp = {**HIPERPARAMETROS_TREINO, **(hiperparametros or {})}
+    descongeladas = hp.pop("camadas_descongeladas", None)
+    congelar = hp.pop("congelar", None)
+    aumentar = hp.pop("aumentar", True)
+    return {
+        "data": os.path.join(BASE_DIR, "data.yaml"),
+        **hp,
+        "freeze": camadas_congeladas(modelo, descongeladas) if congelar is None else indices_congelados(modelo, congelar),
+        "trainer": partial(TreinadorYOLO, aumentar=aumentar, cache_caracteristicas=CACHE_CARACTERISTICAS),
+    }
+
+
+def pico_rss_mb() -> float:
+    """
+    Retorna o pico de memória residente (RSS) do processo, em MB.
+    """
+    try:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss vem em bytes no macOS e em kilobytes no Linux
+        return pico / 2**20 if sys.platform == "darwin" else pico / 1024
+    except ImportError:  # Windows
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 2**20
+
+
+def registrar_tempo_epocas(modelo) -> None:
+    """
+    Registra no log o tempo de parede de cada época de treino (sem a validação)
+    e o pico de RSS do processo até o fim dela, e envia as durações das épocas e das passadas de validação à instrumentação
+    (etapas "treino.epoca" e "validacao").
+
+    Parâmetros
+    ----------
+    modelo : ultralytics.YOLO
+        Modelo que será treinado.
+
+    Retorno
+    -------
+    None
+    """
+    inicio = {}
+
+    def ao_iniciar_epoca(trainer):
+        inicio["t"] = time.perf_counter()
+
+    def ao_terminar_epoca(trainer):
+        duracao = time.perf_counter() - inicio["t"]
+        observar("treino.epoca", duracao)
+        logger.info(f"Época {trainer.epoch + 1}: {duracao:.1f}s de treino, pico de RSS {pico_rss_mb():.0f} MB")
+
+    def ao_iniciar_validacao(validador):
+        inicio["val"] = time.perf_counter()
+
+    def ao_terminar_validacao(validador):
+        observar("validacao", time.perf_counter() - inicio["val"])
+
+    modelo.add_callback("on_train_epoch_start", ao_iniciar_epoca)
+    modelo.add_callback("on_train_epoch_end", ao_terminar_epoca)
+    modelo.add_callback("on_val_start", ao_iniciar_validacao)
+    modelo.add_callback("on_val_end", ao_terminar_validacao)
+
+
+@medir("treino")
+def treinar_modelo(modelo, hiperparametros: dict = None) -> object:
     """
-    Realiza o treinamento do modelo YOLO, descongelando as últimas 5 camadas,
-    salva os pesos e a arquitetura do modelo, além de avaliar e salvar métricas.
+    Realiza o treinamento do modelo YOLO, congelando as camadas definidas por
+    `congelar` ou `camadas_descongeladas` em HIPERPARAMETROS_TREINO, salva os
+    pesos e a arquitetura do modelo, além de avaliar e salvar métricas.
 
     Parâmetros
     ----------
     modelo : ultralytics.YOLO
         Modelo YOLO carregado e pronto para treino.
+    hiperparametros : dict, opcional
+        Valores que substituem os de HIPERPARAMETROS_TREINO, por exemplo os
+        da melhor tentativa de `sweep.py`.
 
     Retorno
     -------
@@ -46,34 +476,20 @@ def treinar_modelo(modelo) -> object:
     
     os.makedirs(RESULTADOS_DIR, exist_ok=True)
 
-    # Descongelar as últimas 5 camadas com parâmetros treináveis
-    camadas = list(modelo.model.modules())
-    camadas_com_parametros = [c for c in camadas if any(p.requires_grad is not None for p in c.parameters())]
+    # O congelamento é aplicado pelo treinador (argumento `freeze`), que
+    # registra no log os parâmetros treináveis
+    argumentos = argumentos_treino(modelo, hiperparametros)
 
-    for camada in reversed(camadas_com_parametros[-5:]):
-        for p in camada.parameters():
-            p.requires_grad = True
+    # Pré-decodifica as imagens de treino e validação (só as novas ou alteradas)
+    if CACHE_IMAGENS and ROTULOS_PACOTES:
+        armazens = [ArmazemRotulos(s) for s in ("train", "valid") if ArmazemRotulos.existe(s)]
+        with medir("treino.cache_imagens"):
+            preparar_cache_imagens(argumentos["imgsz"], armazens)
 
-    total = sum(p.numel() for p in modelo.model.parameters())
-    treinaveis = sum(p.numel() for p in modelo.model.parameters() if p.requires_grad)
-    logger.info(f"Total de parâmetros: {total:,}")
-    logger.info(f"Parâmetros treináveis: {treinaveis:,}")
+    registrar_tempo_epocas(modelo)
 
     # Treinamento do modelo
-    modelo.train(
-        data=os.path.join(BASE_DIR, "data.yaml"),
-        epochs=15,
-        lr0=0.001,
-        batch=16,
-        imgsz=640,
-        patience=3,
-        verbose=False
-    )
-
-    total = sum(p.numel() for p in modelo.model.parameters())
-    treinaveis = sum(p.numel() for p in modelo.model.parameters() if p.requires_grad)
-    logger.info(f"Após treino - Total de parâmetros: {total:,}")
-    logger.info(f"Após treino - Parâmetros treináveis: {treinaveis:,}")
+    modelo.train(**argumentos, verbose=False)
 
     # Salvar modelo e arquitetura
     modelo_path = os.path.join(RESULTADOS_DIR, "modelo_treinado.pt")
@@ -84,11 +500,11 @@ def treinar_modelo(modelo) -> object:
     with open(arquitetura_path, "w") as f:
         f.write(str(modelo.model))
 
-    # Avaliação pós-treinamento
-    aval = modelo.val(data=os.path.join(BASE_DIR, "data.yaml"), split="test")
+    # Avaliação pós-treinamento; as predições ficam em cache para a etapa de avaliação
+    metricas = avaliar(modelo_path, split="test")
     metricas_path = os.path.join(RESULTADOS_DIR, "metricas.json")
     with open(metricas_path, "w") as f:
-        json.dump(aval.results_dict, f, indent=4)
+        json.dump(metricas, f, indent=4)
 
     logger.info(f"Métricas e arquitetura salvas em: {RESULTADOS_DIR}")
 